@@ -0,0 +1,283 @@
+"""
+Linhas de base estatísticas em streaming para a detecção de anomalias
+
+Cada dispositivo ocupa uma linha de arrays numpy de tamanho fixo, alocados
+uma vez a partir do orçamento de memória:
+
+- Média e variância exponenciais (EWMA) de cada métrica
+- Mediana e desvio absoluto mediano (MAD) aproximados em streaming
+- Média e variância exponenciais por hora da semana (168 buckets)
+
+Cada amostra é pontuada contra a linha de base e depois incorporada a ela,
+em O(1). Quando o orçamento acaba, o dispositivo usado há mais tempo perde a
+sua linha para o novo.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+HOURS_PER_WEEK = 168
+# Fator que torna o MAD comparável ao desvio padrão em dados normais
+MAD_TO_STD = 1.4826
+
+
+@dataclass
+class BaselineScores:
+    """Pontuação de amostras contra as linhas de base dos dispositivos.
+
+    Arrays com uma coluna por métrica da linha de base (uma linha por amostra
+    no lote, ou só as colunas para uma amostra); ``score`` é NaN onde não há
+    valor ou a linha de base ainda não tem amostras suficientes.
+    """
+
+    values: np.ndarray
+    expected: np.ndarray
+    scale: np.ndarray
+    score: np.ndarray
+    ready: np.ndarray
+
+
+class StreamingBaselines:
+    """Linhas de base por dispositivo e métrica em memória limitada."""
+
+    def __init__(
+        self,
+        metrics: Sequence[str],
+        min_scales: Sequence[float],
+        memory_budget_bytes: int,
+        alpha: float = 0.05,
+        min_samples: int = 30,
+        season_min_samples: int = 8
+    ):
+        """
+        Args:
+            metrics: Nomes das métricas, na ordem dos valores observados
+            min_scales: Escala mínima de cada métrica (na unidade da métrica), para
+                que séries quase constantes não transformem ruído em anomalia
+            memory_budget_bytes: Memória máxima dos arrays
+            alpha: Peso da amostra nova nas médias exponenciais
+            min_samples: Amostras antes de a linha de base ser usada
+            season_min_samples: Amostras num bucket da hora da semana antes de usá-lo
+        """
+        self.metrics = tuple(metrics)
+        self.min_scales = np.asarray(min_scales, dtype=np.float64)
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.season_min_samples = season_min_samples
+        self.capacity = max(1, int(memory_budget_bytes // self.bytes_per_device(len(self.metrics))))
+
+        shape = (self.capacity, len(self.metrics))
+        season_shape = (self.capacity, HOURS_PER_WEEK, len(self.metrics))
+        self._count = np.zeros(shape, dtype=np.int32)
+        self._mean = np.zeros(shape, dtype=np.float64)
+        self._var = np.zeros(shape, dtype=np.float64)
+        self._median = np.zeros(shape, dtype=np.float64)
+        self._mad = np.zeros(shape, dtype=np.float64)
+        self._season_count = np.zeros(season_shape, dtype=np.uint16)
+        self._season_mean = np.zeros(season_shape, dtype=np.float32)
+        self._season_var = np.zeros(season_shape, dtype=np.float32)
+
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bytes_per_device(metric_count: int) -> int:
+        """Memória ocupada por dispositivo nos arrays"""
+        return metric_count * (4 + 4 * 8 + HOURS_PER_WEEK * (2 + 4 + 4))
+
+    def observe(self, device_id: str, values: np.ndarray, timestamp: datetime) -> BaselineScores:
+        """Pontua uma amostra e a incorpora à linha de base do dispositivo.
+
+        Args:
+            device_id: ID do dispositivo
+            values: Valor de cada métrica (NaN = ausente)
+            timestamp: Instante da amostra, para o bucket da hora da semana
+
+        Returns:
+            Pontuação da amostra contra a linha de base anterior a ela
+        """
+        scores = self.observe_batch([device_id], np.asarray(values, dtype=np.float64)[np.newaxis, :], [timestamp])
+        return BaselineScores(
+            values=scores.values[0], expected=scores.expected[0], scale=scores.scale[0],
+            score=scores.score[0], ready=scores.ready[0]
+        )
+
+    def observe_batch(
+        self,
+        device_ids: Sequence[str],
+        values: np.ndarray,
+        timestamps: Union[Sequence[datetime], np.ndarray]
+    ) -> BaselineScores:
+        """Pontua uma matriz de amostras (amostras × métricas) e a incorpora às linhas de base.
+
+        As amostras de um mesmo dispositivo são aplicadas na ordem da matriz, com o
+        mesmo resultado de chamadas sucessivas de ``observe``; amostras de
+        dispositivos diferentes são pontuadas e incorporadas juntas, por rodada.
+
+        Args:
+            device_ids: Dispositivo de cada amostra
+            values: Matriz de valores (NaN = ausente)
+            timestamps: Instante de cada amostra (datetime ou segundos desde a época)
+
+        Returns:
+            Pontuações com arrays do formato da matriz
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.metrics):
+            raise ValueError(f"Matriz de valores deve ter {len(self.metrics)} colunas")
+        if len(device_ids) != values.shape[0] or len(timestamps) != values.shape[0]:
+            raise ValueError("device_ids e timestamps devem ter uma entrada por linha da matriz")
+        hours = hours_of_week(timestamps)
+
+        # Rodada de cada amostra: a k-ésima amostra de um dispositivo entra na rodada k
+        seen: Dict[str, int] = {}
+        rounds = np.empty(values.shape[0], dtype=np.int64)
+        for row, device_id in enumerate(device_ids):
+            rounds[row] = seen.get(device_id, 0)
+            seen[device_id] = rounds[row] + 1
+
+        expected = np.empty_like(values)
+        scale = np.empty_like(values)
+        score = np.empty_like(values)
+        ready = np.empty(values.shape, dtype=bool)
+        with self._lock:
+            for round_number in range(int(rounds.max(initial=-1)) + 1):
+                rows = np.flatnonzero(rounds == round_number)
+                # Até ``capacity`` dispositivos por vez, para nenhum perder a linha no meio da rodada
+                for chunk in range(0, len(rows), self.capacity):
+                    chunk_rows = rows[chunk:chunk + self.capacity]
+                    slots = np.array([self._slot(device_ids[row]) for row in chunk_rows], dtype=np.int64)
+                    chunk_values = values[chunk_rows]
+                    chunk_hours = hours[chunk_rows]
+                    present = ~np.isnan(chunk_values)
+                    (expected[chunk_rows], scale[chunk_rows],
+                     score[chunk_rows], ready[chunk_rows]) = self._score(slots, chunk_hours, chunk_values, present)
+                    self._update(slots, chunk_hours, chunk_values, present)
+
+        return BaselineScores(values=values, expected=expected, scale=scale, score=score, ready=ready)
+
+    def reset(self, device_id: Optional[str] = None):
+        """Descarta a linha de base de um dispositivo (ou de todos).
+
+        Args:
+            device_id: ID do dispositivo; None descarta todas
+        """
+        with self._lock:
+            devices = [device_id] if device_id is not None else list(self._slots)
+            for device in devices:
+                slot = self._slots.pop(device, None)
+                if slot is not None:
+                    self._clear(slot)
+                    self._free.append(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação e memória dos arrays"""
+        arrays = (self._count, self._mean, self._var, self._median, self._mad,
+                  self._season_count, self._season_mean, self._season_var)
+        return {
+            "devices": len(self._slots),
+            "capacity": self.capacity,
+            "memory_bytes": sum(array.nbytes for array in arrays),
+            "evictions": self._evictions
+        }
+
+    def _slot(self, device_id: str) -> int:
+        """Linha do dispositivo, reaproveitando a do dispositivo usado há mais tempo"""
+        slot = self._slots.get(device_id)
+        if slot is not None:
+            self._slots.move_to_end(device_id)
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self._clear(slot)
+            self._evictions += 1
+        self._slots[device_id] = slot
+        return slot
+
+    def _clear(self, slot: int):
+        for array in (self._count, self._mean, self._var, self._median, self._mad,
+                      self._season_count, self._season_mean, self._season_var):
+            array[slot] = 0
+
+    def _score(self, slots: np.ndarray, hours: np.ndarray, values: np.ndarray,
+               present: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Pontua as amostras contra as linhas de base atuais (um dispositivo por linha)"""
+        # Desvio para cima contra a expectativa sazonal (ou global) e contra a
+        # mediana; os dois precisam concordar
+        seasonal = self._season_count[slots, hours] >= self.season_min_samples
+        expected = np.where(seasonal, self._season_mean[slots, hours], self._mean[slots])
+        variance = np.where(seasonal, self._season_var[slots, hours], self._var[slots])
+        scale = np.maximum(np.sqrt(variance), self.min_scales)
+        robust_scale = np.maximum(MAD_TO_STD * self._mad[slots], self.min_scales)
+        with np.errstate(invalid="ignore"):
+            score = np.minimum((values - expected) / scale, (values - self._median[slots]) / robust_scale)
+        ready = present & (self._count[slots] >= self.min_samples)
+        return expected, scale, np.where(ready, score, np.nan), ready
+
+    def _update(self, slots: np.ndarray, hours: np.ndarray, values: np.ndarray, present: np.ndarray):
+        """Incorpora as amostras às estatísticas globais e do bucket da hora (um dispositivo por linha)"""
+        alpha = self.alpha
+        count = self._count[slots]
+        first = present & (count == 0)
+        later = present & (count > 0)
+
+        # EWMA de média e variância
+        mean = self._mean[slots]
+        diff = values - mean
+        increment = alpha * diff
+        self._var[slots] = np.where(later, (1 - alpha) * (self._var[slots] + diff * increment), self._var[slots])
+        self._mean[slots] = np.where(first, values, np.where(later, mean + increment, mean))
+
+        # Mediana por aproximação estocástica, com passo proporcional ao MAD
+        median = self._median[slots]
+        mad = self._mad[slots]
+        step = alpha * np.maximum(mad, self.min_scales)
+        self._mad[slots] = np.where(later, (1 - alpha) * mad + alpha * np.abs(values - median), mad)
+        self._median[slots] = np.where(first, values, np.where(later, median + step * np.sign(values - median), median))
+        self._count[slots] = count + present
+
+        # Mesmo esquema no bucket da hora da semana
+        season_count = self._season_count[slots, hours]
+        season_mean = self._season_mean[slots, hours].astype(np.float64)
+        season_var = self._season_var[slots, hours].astype(np.float64)
+        season_first = present & (season_count == 0)
+        season_later = present & (season_count > 0)
+        diff = values - season_mean
+        increment = alpha * diff
+        self._season_var[slots, hours] = np.where(
+            season_later, (1 - alpha) * (season_var + diff * increment), season_var
+        )
+        self._season_mean[slots, hours] = np.where(
+            season_first, values, np.where(season_later, season_mean + increment, season_mean)
+        )
+        self._season_count[slots, hours] = np.minimum(
+            season_count.astype(np.int64) + present, np.iinfo(np.uint16).max
+        )
+
+
+def hours_of_week(timestamps: Union[Sequence[datetime], np.ndarray]) -> np.ndarray:
+    """Bucket da hora da semana (0 = segunda-feira 00h) de cada instante.
+
+    Args:
+        timestamps: Instantes como datetime (sem fuso = UTC; com fuso é
+            convertido para UTC) ou segundos desde a época (UTC)
+
+    Returns:
+        Array de inteiros entre 0 e 167
+    """
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in "iuf":
+        # 1970-01-01 foi uma quinta-feira: 72 horas depois da segunda-feira 00h
+        return ((np.floor_divide(timestamps, 3600).astype(np.int64) + 72) % HOURS_PER_WEEK)
+    utc = [
+        timestamp.astimezone(timezone.utc) if timestamp.tzinfo is not None else timestamp
+        for timestamp in timestamps
+    ]
+    return np.array([timestamp.weekday() * 24 + timestamp.hour for timestamp in utc], dtype=np.int64)
@@ -0,0 +1,99 @@
+"""
+Agendador de inferência em micro-lotes
+
+Chamadas concorrentes de inferência entram numa fila por event loop; a
+primeira abre uma janela curta (alguns milissegundos) e, ao fim dela ou
+quando o lote enche, todas as entradas da fila são avaliadas de uma vez por
+uma função vetorizada. Cada chamador recebe o resultado da sua entrada.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence
+
+
+@dataclass
+class _PendingBatch:
+    """Entradas aguardando a avaliação e os futures dos chamadores"""
+    items: List[Any] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    timer: Any = None
+
+
+class InferenceScheduler:
+    """Agrupa chamadas concorrentes de inferência em lotes."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        window_ms: float = 2.0,
+        max_batch_size: int = 64
+    ):
+        """
+        Args:
+            batch_fn: Avalia uma lista de entradas e devolve um resultado por entrada, na mesma ordem
+            window_ms: Espera máxima, a partir da primeira entrada, antes de avaliar o lote
+            max_batch_size: Entradas que disparam a avaliação antes do fim da janela
+        """
+        self.batch_fn = batch_fn
+        self.window_seconds = max(window_ms, 0.0) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Dict[asyncio.AbstractEventLoop, _PendingBatch] = {}
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Enfileira uma entrada e aguarda o resultado do lote em que ela entrar.
+
+        Args:
+            item: Entrada da função de lote
+
+        Returns:
+            Resultado correspondente à entrada
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = _PendingBatch()
+            pending.timer = loop.call_later(self.window_seconds, self._flush, loop)
+        future = loop.create_future()
+        pending.items.append(item)
+        pending.futures.append(future)
+        if len(pending.items) >= self.max_batch_size:
+            pending.timer.cancel()
+            self._flush(loop)
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de chamadas e lotes avaliados"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "average_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size
+        }
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        """Avalia o lote pendente do loop e entrega os resultados"""
+        pending = self._pending.pop(loop, None)
+        if pending is None:
+            return
+        self.requests += len(pending.items)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(pending.items))
+        try:
+            results = self.batch_fn(pending.items)
+            if len(results) != len(pending.items):
+                raise RuntimeError(
+                    f"Lote de inferência devolveu {len(results)} resultados para {len(pending.items)} entradas"
+                )
+        except Exception as e:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(pending.futures, results):
+            if not future.done():
+                future.set_result(result)
@@ -4,13 +4,25 @@ Implementa análise preditiva, detecção de anomalias e recomendações intelig
 """
 
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Tuple, Any
 import logging
-from dataclasses import dataclass
+import threading
+import uuid
+from dataclasses import dataclass, replace
 from enum import Enum
 
+from app.ai.baselines import BaselineScores, StreamingBaselines
+from app.ai.inference_scheduler import InferenceScheduler
+from app.ai.prediction_cache import PredictionCache, feature_key, quantize
+from app.ai.pattern_engine import (
+    GRANULARITY_SECONDS, PERIODS, PatternFrame, correlation_matrix, dominant_periods, hourly_profile, periodicity
+)
+from app.core.config import settings
+from app.core.prometheus_metrics import track_ai_prediction
+from app.db.telemetry_store import get_telemetry_store
+
 logger = logging.getLogger(__name__)
 
 class PredictionType(Enum):
@@ -28,6 +40,73 @@ class AnomalyType(Enum):
     NETWORK_ANOMALY = "network_anomaly"
     TEMPERATURE_ABNORMAL = "temperature_abnormal"
 
+# Métricas com linha de base: nome, caminho no dicionário de métricas, escala
+# mínima e limite fixo usado enquanto a linha de base não tem amostras suficientes
+BASELINE_METRICS = (
+    ("cpu_usage", ("cpu", "usage_percent"), 2.0, 95.0),
+    ("cpu_temperature", ("cpu", "temperature"), 2.0, 80.0),
+    ("memory_usage", ("memory", "usage_percent"), 2.0, 90.0),
+    ("disk_io_read_mb", ("disk", "io_read_mb"), 10.0, 1000.0),
+    ("disk_io_write_mb", ("disk", "io_write_mb"), 10.0, 1000.0),
+    ("packet_loss_percent", ("network", "packet_loss_percent"), 0.5, 5.0),
+    ("latency_ms", ("network", "latency_ms"), 10.0, 500.0),
+)
+
+# Anomalias avaliadas pela linha de base: tipo, métricas e componentes afetados
+BASELINE_ANOMALIES = (
+    (AnomalyType.CPU_SPIKE, ("cpu_usage",), ["CPU"]),
+    (AnomalyType.MEMORY_LEAK, ("memory_usage",), ["RAM"]),
+    (AnomalyType.DISK_UNUSUAL, ("disk_io_read_mb", "disk_io_write_mb"), ["Disk"]),
+    (AnomalyType.NETWORK_ANOMALY, ("packet_loss_percent", "latency_ms"), ["Network"]),
+    (AnomalyType.TEMPERATURE_ABNORMAL, ("cpu_temperature",), ["CPU", "Cooling System"]),
+)
+
+# Reconhecimento de padrões
+DEFAULT_PATTERN_TYPES = ("usage", "performance", "seasonal")
+LOAD_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "network_speed")
+CORRELATION_THRESHOLD = 0.7
+PERIODICITY_THRESHOLD = 0.5
+# Quanto o ciclo semanal precisa superar o diário (que também se repete a cada 7 dias)
+WEEKLY_CYCLE_MARGIN = 0.1
+DOMINANT_PERIOD_SHARE = 0.3
+
+# Severidade das anomalias pelos limites fixos
+THRESHOLD_SEVERITY = {
+    AnomalyType.CPU_SPIKE: 0.9,
+    AnomalyType.MEMORY_LEAK: 0.8,
+    AnomalyType.DISK_UNUSUAL: 0.6,
+    AnomalyType.NETWORK_ANOMALY: 0.7,
+    AnomalyType.TEMPERATURE_ABNORMAL: 0.8,
+}
+
+# Features da previsão de falhas: nome, seção dos dados do sistema, campo,
+# valor padrão e largura do bucket de quantização (cpu_usage_avg e
+# cpu_usage_std vêm de cpu.usage_history)
+FAILURE_FEATURES = (
+    ("cpu_usage_avg", "cpu", None, 0.0, 1.0),
+    ("cpu_usage_std", "cpu", None, 0.0, 1.0),
+    ("cpu_temperature", "cpu", "temperature", 0.0, 1.0),
+    ("cpu_frequency", "cpu", "frequency", 0.0, 0.1),
+    ("memory_usage", "memory", "usage_percent", 0.0, 1.0),
+    ("memory_available", "memory", "available_gb", 0.0, 0.5),
+    ("swap_usage", "memory", "swap_percent", 0.0, 1.0),
+    ("disk_usage", "disk", "usage_percent", 0.0, 1.0),
+    ("disk_io_read", "disk", "io_read_mb", 0.0, 10.0),
+    ("disk_io_write", "disk", "io_write_mb", 0.0, 10.0),
+    ("disk_health", "disk", "health_score", 100.0, 1.0),
+    ("network_latency", "network", "latency_ms", 0.0, 5.0),
+    ("network_throughput", "network", "throughput_mbps", 0.0, 10.0),
+    ("packet_loss", "network", "packet_loss_percent", 0.0, 0.1),
+)
+FAILURE_FEATURE_NAMES = tuple(name for name, _, _, _, _ in FAILURE_FEATURES)
+FAILURE_FEATURE_STEPS = np.array([step for _, _, _, _, step in FAILURE_FEATURES])
+FAILURE_SECTIONS = ("cpu", "memory", "disk", "network")
+PREDICTIVE_MODEL_VERSION = "v3.0"
+
+# Recomendações: campos do estado do sistema usados pelas regras e largura do bucket
+RECOMMENDATION_FEATURES = (("cpu", "usage_percent", 1.0), ("disk", "usage_percent", 1.0))
+RECOMMENDATION_MODEL_VERSION = "3.0.0"
+
 @dataclass
 class PredictionResult:
     """Resultado de uma previsão"""
@@ -38,6 +117,7 @@ class PredictionResult:
     recommended_actions: List[str]
     risk_level: str
     details: Dict[str, Any]
+    cached: bool = False
 
 @dataclass
 class AnomalyResult:
@@ -70,7 +150,51 @@ class Recommendation:
     implementation_steps: List[str]
     resources_needed: List[str]
 
-class PredictiveAnalyzer:
+class MLEngine:
+    """Base dos engines de IA com as operações de ciclo de vida de modelo da API.
+    
+    Os engines aprendem online (linhas de base, caches) ou aplicam regras, sem
+    modelos treinados offline: treino, otimização e importação só são
+    registrados no log, e status de treino, exportação e remoção respondem
+    como modelo não encontrado.
+    """
+    
+    async def get_model_info(self) -> Dict[str, Any]:
+        """Retorna informações do modelo"""
+        raise NotImplementedError
+    
+    async def get_performance_metrics(self) -> Dict[str, Any]:
+        """Retorna as métricas de performance declaradas pelo modelo"""
+        info = await self.get_model_info()
+        return {"accuracy": info["accuracy"], "status": info["status"]}
+    
+    async def train_model(self, training_data: List[Dict[str, Any]], model_parameters: Dict[str, Any],
+                          training_id: str):
+        """Treino offline não é suportado: as amostras alimentam o engine em produção"""
+        logger.warning(f"{type(self).__name__} não tem treino offline; {training_id} ignorado "
+                       f"({len(training_data)} amostras)")
+    
+    async def optimize_model(self):
+        """Não há modelo treinado para otimizar"""
+        logger.info(f"{type(self).__name__} não tem modelo treinado para otimizar")
+    
+    async def import_model(self, model_data: Dict[str, Any], import_id: str):
+        """Importação não é suportada: não há modelo serializável"""
+        logger.warning(f"{type(self).__name__} não importa modelos; {import_id} ignorado")
+    
+    async def get_training_status(self, training_id: str) -> Optional[Dict[str, Any]]:
+        """Nenhum treino é registrado"""
+        return None
+    
+    async def delete_model(self, model_id: str) -> bool:
+        """Não há modelos removíveis"""
+        return False
+    
+    async def export_model(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """Não há modelos exportáveis"""
+        return None
+
+class PredictiveAnalyzer(MLEngine):
     """Analisador preditivo para falhas de sistema"""
     
     def __init__(self):
@@ -78,12 +202,27 @@ class PredictiveAnalyzer:
         self.feature_extractors = {}
         self.prediction_history = []
         self.accuracy_metrics = {}
-        
+        # Chamadas concorrentes de predict() são avaliadas juntas em micro-lotes
+        self.scheduler = InferenceScheduler(
+            self._predict_feature_rows,
+            window_ms=settings.PREDICTION_BATCH_WINDOW_MS,
+            max_batch_size=settings.PREDICTION_BATCH_MAX_SIZE
+        )
+        # Sistemas no mesmo estado (features quantizadas) compartilham a previsão
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL_SECONDS)
+        
+    @track_ai_prediction("predictive_analyzer")
     async def predict_failure(self, system_data: Dict[str, Any]) -> PredictionResult:
         """Prevê possíveis falhas do sistema"""
         try:
-            # Extração de features
+            # Extração de features; só a chave do cache usa as features quantizadas
             features = self._extract_features(system_data)
+            key = self._feature_cache_key(features)
+            cached = self.cache.get(key)
+            if cached is not None:
+                result = self._copy_result(cached, cached=True)
+                self.prediction_history.append(result)
+                return result
             
             # Análise de tendências
             trends = self._analyze_trends(features)
@@ -113,13 +252,14 @@ class PredictiveAnalyzer:
                 details={
                     "features_analyzed": len(features),
                     "trend_indicators": trends,
-                    "model_version": "v3.0",
+                    "model_version": PREDICTIVE_MODEL_VERSION,
                     "analysis_timestamp": datetime.now()
                 }
             )
             
             # Armazenar para histórico
             self.prediction_history.append(result)
+            self.cache.put(key, self._copy_result(result))
             
             logger.info(f"Previsão gerada: {prediction_type.value} com {probability:.2%} de probabilidade")
             return result
@@ -128,6 +268,193 @@ class PredictiveAnalyzer:
             logger.error(f"Erro na análise preditiva: {e}")
             raise
     
+    def predict_failure_batch(self, system_data_list: List[Dict[str, Any]]) -> List[PredictionResult]:
+        """Prevê falhas para vários sistemas de uma vez.
+
+        Mesmo resultado de ``predict_failure`` para cada sistema, com a extração
+        de features e a pontuação feitas sobre a matriz (sistemas × features) e
+        o mesmo cache.
+
+        Args:
+            system_data_list: Dados de cada sistema
+
+        Returns:
+            Uma previsão por sistema, na mesma ordem
+        """
+        return self._predict_feature_rows([self._feature_row(system_data) for system_data in system_data_list])
+    
+    def _feature_row(self, system_data: Dict[str, Any]) -> Tuple[List[float], List[bool], np.ndarray]:
+        """Valores das features (padrão onde ausentes), seções presentes e histórico de uso da CPU.
+
+        A conversão para float acontece aqui, por chamador: um valor não numérico
+        falha só a chamada que o enviou, antes de entrar no micro-lote compartilhado.
+
+        Raises:
+            ValueError: Se alguma feature não for numérica
+        """
+        values = []
+        for name, section, key, default, _ in FAILURE_FEATURES:
+            value = system_data[section].get(key, default) if key is not None and section in system_data else default
+            try:
+                values.append(np.nan if value is None else float(value))
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature {name} não numérica: {value!r}") from None
+        sections = [section in system_data for section in FAILURE_SECTIONS]
+        if 'cpu' in system_data:
+            try:
+                history = np.asarray(system_data['cpu'].get('usage_history', [0]), dtype=np.float64).ravel()
+            except (TypeError, ValueError):
+                raise ValueError("Feature usage_history não numérica") from None
+        else:
+            history = np.empty(0)
+        return values, sections, history
+    
+    def _predict_feature_rows(self, rows: List[Tuple[List[float], List[bool], np.ndarray]]) -> List[PredictionResult]:
+        """Extração de features vetorizada sobre um lote de linhas de ``_feature_row``, com o cache na frente do modelo"""
+        count = len(rows)
+        if not count:
+            return []
+        values = np.array([row[0] for row in rows], dtype=np.float64)
+        sections = np.array([row[1] for row in rows], dtype=bool)
+        present = sections[:, [FAILURE_SECTIONS.index(section) for _, section, _, _, _ in FAILURE_FEATURES]]
+        
+        # Média e desvio padrão do histórico de uso da CPU de todas as linhas de uma vez
+        lengths = np.array([len(row[2]) for row in rows])
+        owner = np.repeat(np.arange(count), lengths)
+        samples = np.concatenate([row[2] for row in rows])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(owner, weights=samples, minlength=count) / lengths
+            std = np.sqrt(np.bincount(owner, weights=(samples - mean[owner]) ** 2, minlength=count) / lengths)
+        has_cpu = sections[:, FAILURE_SECTIONS.index('cpu')]
+        values[:, FAILURE_FEATURE_NAMES.index('cpu_usage_avg')] = np.where(has_cpu, mean, 0.0)
+        values[:, FAILURE_FEATURE_NAMES.index('cpu_usage_std')] = np.where(has_cpu, std, 0.0)
+        buckets = quantize(values, FAILURE_FEATURE_STEPS)
+        
+        # Cache por linha; o modelo avalia uma vez cada estado ausente do cache, com os valores originais
+        results: List[Optional[PredictionResult]] = [None] * count
+        missing: Dict[bytes, List[int]] = {}
+        for row in range(count):
+            key = feature_key(PREDICTIVE_MODEL_VERSION, buckets[row], present[row])
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[row] = self._copy_result(cached, cached=True)
+            else:
+                missing.setdefault(key, []).append(row)
+        if missing:
+            first_rows = [rows_of_key[0] for rows_of_key in missing.values()]
+            scored = self._score_features(values[first_rows], present[first_rows])
+            for (key, rows_of_key), result in zip(missing.items(), scored):
+                self.cache.put(key, self._copy_result(result))
+                results[rows_of_key[0]] = result
+                for row in rows_of_key[1:]:
+                    results[row] = self._copy_result(result)
+        
+        self.prediction_history.extend(results)
+        logger.info(f"{count} previsões geradas em lote ({count - sum(map(len, missing.values()))} do cache)")
+        return results
+    
+    def _score_features(self, values: np.ndarray, present: np.ndarray) -> List[PredictionResult]:
+        """Tendências e pontuação vetorizadas sobre a matriz (sistemas × features)"""
+        count = len(values)
+        column = {name: index for index, name in enumerate(FAILURE_FEATURE_NAMES)}
+        
+        # Tendências (mesmas regras de _analyze_trends)
+        usage = np.array(['usage' in name for name in FAILURE_FEATURE_NAMES])
+        temperature = np.array(['temperature' in name for name in FAILURE_FEATURE_NAMES]) & ~usage
+        health = np.array(['health' in name for name in FAILURE_FEATURE_NAMES]) & ~usage & ~temperature
+        with np.errstate(invalid="ignore"):
+            rising = present & usage & (values > 80)
+            hot = present & temperature & (values > 70)
+            degrading = present & health & (values < 80)
+        rapid_trends = (rising | hot).sum(axis=1)
+        concerning_trends = rapid_trends + degrading.sum(axis=1)
+        labels = np.full(values.shape, "stable", dtype=object)
+        labels[rising] = "increasing_rapidly"
+        labels[hot] = "concerning_rise"
+        labels[degrading] = "degrading"
+        
+        # Pontuação (mesmas regras de _predict_with_ml)
+        cpu_usage = values[:, column['cpu_usage_avg']]
+        disk_health = values[:, column['disk_health']]
+        packet_loss = values[:, column['packet_loss']]
+        with np.errstate(invalid="ignore"):
+            risk_score = np.zeros(count)
+            risk_score += np.where(cpu_usage > 85, 0.3, 0.0)
+            risk_score += np.where(values[:, column['cpu_temperature']] > 75, 0.4, 0.0)
+            risk_score += np.where(values[:, column['memory_usage']] > 90, 0.3, 0.0)
+            risk_score += np.where(disk_health < 70, 0.5, 0.0)
+            risk_score += np.where(values[:, column['disk_usage']] > 95, 0.2, 0.0)
+            risk_score += np.where(packet_loss > 5, 0.3, 0.0)
+            prediction_types = np.select(
+                [disk_health < 70, cpu_usage > 90, packet_loss > 3], [0, 1, 2], default=3
+            )
+        type_choices = (
+            PredictionType.HARDWARE_FAILURE, PredictionType.SYSTEM_OVERLOAD,
+            PredictionType.SECURITY_BREACH, PredictionType.PERFORMANCE_DEGRADATION
+        )
+        probability = np.minimum(risk_score, 0.95)
+        
+        # Confiança, tempo até a falha e nível de risco
+        features_analyzed = present.sum(axis=1)
+        confidence = np.full(count, 0.7)
+        confidence += np.minimum(features_analyzed * 0.02, 0.2)
+        confidence += concerning_trends * 0.05
+        confidence = np.minimum(confidence, 0.95)
+        base_days = np.select([probability > 0.8, probability > 0.6, probability > 0.4], [3, 7, 14], default=30)
+        base_days = np.where(rapid_trends > 2, np.maximum(1, base_days // 2), base_days)
+        risk = probability * confidence
+        risk_levels = np.select([risk > 0.7, risk > 0.5, risk > 0.3], ["CRÍTICO", "ALTO", "MÉDIO"], default="BAIXO")
+        
+        analysis_timestamp = datetime.now()
+        recommendations: Dict[Tuple[PredictionType, bool], List[str]] = {}
+        results = []
+        # Listas do Python: indexar arrays numpy elemento a elemento custaria mais que o cálculo
+        for type_index, row_probability, row_confidence, days, risk_level, analyzed, trends, row_present in zip(
+            prediction_types.tolist(), probability.tolist(), confidence.tolist(), base_days.tolist(),
+            risk_levels.tolist(), features_analyzed.tolist(), labels.tolist(), present.tolist()
+        ):
+            prediction_type = type_choices[type_index]
+            key = (prediction_type, row_probability > 0.7)
+            if key not in recommendations:
+                recommendations[key] = self._generate_recommendations(prediction_type, row_probability)
+            results.append(PredictionResult(
+                prediction_type=prediction_type,
+                probability=row_probability,
+                confidence=row_confidence,
+                time_to_failure=timedelta(days=days) if row_probability >= 0.3 else None,
+                recommended_actions=list(recommendations[key]),
+                risk_level=risk_level,
+                details={
+                    "features_analyzed": analyzed,
+                    "trend_indicators": {
+                        name: trend for name, trend, is_present in zip(FAILURE_FEATURE_NAMES, trends, row_present)
+                        if is_present
+                    },
+                    "model_version": PREDICTIVE_MODEL_VERSION,
+                    "analysis_timestamp": analysis_timestamp
+                }
+            ))
+        return results
+    
+    def _feature_cache_key(self, features: Dict[str, float]) -> bytes:
+        """Chave do cache: features arredondadas para o início do bucket e seções presentes"""
+        present = np.array([name in features for name in FAILURE_FEATURE_NAMES])
+        values = quantize(
+            np.array([features.get(name, default) for name, _, _, default, _ in FAILURE_FEATURES], dtype=np.float64),
+            FAILURE_FEATURE_STEPS
+        )
+        return feature_key(PREDICTIVE_MODEL_VERSION, values, present)
+    
+    @staticmethod
+    def _copy_result(result: PredictionResult, cached: bool = False) -> PredictionResult:
+        """Cópia da previsão que pode ser alterada sem afetar o cache"""
+        return replace(
+            result,
+            recommended_actions=list(result.recommended_actions),
+            details={**result.details, "trend_indicators": dict(result.details["trend_indicators"])},
+            cached=cached
+        )
+    
     def _extract_features(self, system_data: Dict[str, Any]) -> Dict[str, float]:
         """Extrai features relevantes dos dados do sistema"""
         features = {}
@@ -312,6 +639,7 @@ class PredictiveAnalyzer:
         else:
             return "BAIXO"
     
+    @track_ai_prediction("predictive_analyzer")
     async def predict(self, data: List[Dict[str, Any]], prediction_type: str, 
                      time_horizon: int = 24, confidence_threshold: float = 0.7) -> Dict[str, Any]:
         """Método principal para previsões compatível com API v3"""
@@ -323,8 +651,8 @@ class PredictiveAnalyzer:
             latest_data = data[-1] if isinstance(data, list) else data
             system_data = latest_data
         
-        # Faz previsão usando método existente
-        result = await self.predict_failure(system_data)
+        # Chamadas concorrentes são avaliadas juntas no próximo micro-lote
+        result = await self.scheduler.submit(self._feature_row(system_data))
         
         return {
             "prediction_id": str(uuid.uuid4()),
@@ -336,7 +664,8 @@ class PredictiveAnalyzer:
             "confidence": result.confidence,
             "risk_factors": [f"{result.prediction_type.value}_risk"],
             "recommendations": result.recommended_actions,
-            "model_version": "v3.0"
+            "model_version": PREDICTIVE_MODEL_VERSION,
+            "cached": result.cached
         }
     
     async def get_model_info(self) -> Dict[str, Any]:
@@ -348,7 +677,9 @@ class PredictiveAnalyzer:
             "last_trained": datetime.now() - timedelta(days=7),
             "data_size": 10000,
             "features": 15,
-            "status": "ready"
+            "status": "ready",
+            "batching": self.scheduler.stats(),
+            "cache": self.cache.stats()
         }
     
     async def update_model_performance(self, prediction_type: str, result: Dict[str, Any]):
@@ -357,31 +688,62 @@ class PredictiveAnalyzer:
         logger.info(f"Atualizando performance do modelo para {prediction_type}")
         pass
 
-class AnomalyDetector:
+class AnomalyDetector(MLEngine):
     """Detector de anomalias em tempo real"""
     
     def __init__(self):
-        self.baseline_metrics = {}
+        self.baselines = StreamingBaselines(
+            metrics=[name for name, _, _, _ in BASELINE_METRICS],
+            min_scales=[min_scale for _, _, min_scale, _ in BASELINE_METRICS],
+            memory_budget_bytes=settings.ANOMALY_BASELINE_MEMORY_MB * 1024 * 1024,
+            alpha=settings.ANOMALY_BASELINE_ALPHA,
+            min_samples=settings.ANOMALY_BASELINE_MIN_SAMPLES
+        )
         self.detection_models = {}
-        self.anomaly_history = []
+        # Buffer circular: só as anomalias mais recentes ficam em memória
+        self.anomaly_history = deque(maxlen=settings.ANOMALY_HISTORY_SIZE)
+        self._threshold_detectors = {
+            AnomalyType.CPU_SPIKE: self._detect_cpu_anomalies,
+            AnomalyType.MEMORY_LEAK: self._detect_memory_anomalies,
+            AnomalyType.DISK_UNUSUAL: self._detect_disk_anomalies,
+            AnomalyType.NETWORK_ANOMALY: self._detect_network_anomalies,
+            AnomalyType.TEMPERATURE_ABNORMAL: self._detect_temperature_anomalies,
+        }
+        
+    async def detect_anomalies(self, current_metrics: Dict[str, Any],
+                               sensitivity: Optional[float] = None) -> List[AnomalyResult]:
+        """Detecta anomalias nas métricas atuais.
         
-    async def detect_anomalies(self, current_metrics: Dict[str, Any]) -> List[AnomalyResult]:
-        """Detecta anomalias nos métricas atuais"""
+        Cada métrica é comparada com a linha de base do dispositivo
+        (``device_id`` nas métricas); enquanto a linha de base não tem amostras
+        suficientes, valem os limites fixos.
+        
+        Args:
+            current_metrics: Métricas coletadas, com ``device_id`` e ``timestamp`` opcionais
+            sensitivity: Sensibilidade entre 0 e 1; menor exige desvios maiores
+            
+        Returns:
+            Anomalias detectadas
+        """
         try:
             anomalies = []
+            timestamp = self._sample_timestamp(current_metrics)
+            device_id = str(current_metrics.get("device_id") or "default")
+            values = np.array([self._metric_value(current_metrics, path) for _, path, _, _ in BASELINE_METRICS])
+            scores = self.baselines.observe(device_id, values, timestamp)
+            threshold = self._z_threshold(sensitivity)
             
-            # Detectar diferentes tipos de anomalias
-            cpu_anomalies = self._detect_cpu_anomalies(current_metrics)
-            memory_anomalies = self._detect_memory_anomalies(current_metrics)
-            disk_anomalies = self._detect_disk_anomalies(current_metrics)
-            network_anomalies = self._detect_network_anomalies(current_metrics)
-            temperature_anomalies = self._detect_temperature_anomalies(current_metrics)
-            
-            anomalies.extend(cpu_anomalies)
-            anomalies.extend(memory_anomalies)
-            anomalies.extend(disk_anomalies)
-            anomalies.extend(network_anomalies)
-            anomalies.extend(temperature_anomalies)
+            for anomaly_type, metrics, components in BASELINE_ANOMALIES:
+                indexes = [self.baselines.metrics.index(metric) for metric in metrics]
+                present = [index for index in indexes if not np.isnan(values[index])]
+                if present and all(scores.ready[index] for index in present):
+                    anomaly = self._baseline_anomaly(
+                        anomaly_type, components, present, scores, threshold, timestamp
+                    )
+                    if anomaly:
+                        anomalies.append(anomaly)
+                else:
+                    anomalies.extend(self._threshold_detectors[anomaly_type](current_metrics))
             
             # Armazenar no histórico
             self.anomaly_history.extend(anomalies)
@@ -395,6 +757,132 @@ class AnomalyDetector:
             logger.error(f"Erro na detecção de anomalias: {e}")
             return []
     
+    def detect_anomalies_batch(
+        self,
+        device_ids: List[str],
+        timestamps: List[datetime],
+        values: np.ndarray,
+        metrics: Optional[List[str]] = None,
+        sensitivity: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Detecta anomalias numa matriz de amostras (amostras × métricas) de vários dispositivos.
+        
+        Todas as células são pontuadas de uma vez contra as linhas de base (as
+        mesmas de ``detect_anomalies``), que incorporam as amostras; células sem
+        linha de base pronta usam os limites fixos.
+        
+        Args:
+            device_ids: Dispositivo de cada amostra
+            timestamps: Instante de cada amostra
+            values: Matriz de valores (NaN = ausente)
+            metrics: Métrica de cada coluna (padrão: todas as métricas da linha de base)
+            sensitivity: Sensibilidade entre 0 e 1; menor exige desvios maiores
+            
+        Returns:
+            Só as células anômalas, na ordem das amostras
+            
+        Raises:
+            ValueError: Se a matriz, as métricas (desconhecidas ou repetidas) ou os instantes forem inconsistentes
+        """
+        names = self.baselines.metrics
+        metrics = list(metrics) if metrics is not None else list(names)
+        unknown = [metric for metric in metrics if metric not in names]
+        if unknown:
+            raise ValueError(f"Métricas sem linha de base: {', '.join(unknown)}")
+        repeated = sorted({metric for metric in metrics if metrics.count(metric) > 1})
+        if repeated:
+            raise ValueError(f"Métricas repetidas: {', '.join(repeated)}")
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(metrics):
+            raise ValueError(f"Matriz de valores deve ter {len(metrics)} colunas")
+        
+        # Colunas ausentes da matriz ficam como NaN
+        matrix = np.full((values.shape[0], len(names)), np.nan)
+        matrix[:, [names.index(metric) for metric in metrics]] = values
+        scores = self.baselines.observe_batch(device_ids, matrix, timestamps)
+        
+        threshold = self._z_threshold(sensitivity)
+        limits = np.array([limit for _, _, _, limit in BASELINE_METRICS])
+        with np.errstate(invalid="ignore"):
+            baseline_hits = scores.ready & (scores.score > threshold)
+            threshold_hits = ~scores.ready & (matrix > limits)
+        rows, columns = np.nonzero(baseline_hits | threshold_hits)
+        
+        anomaly_types = {metric: anomaly_type for anomaly_type, group, _ in BASELINE_ANOMALIES for metric in group}
+        records = []
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            anomaly_type = anomaly_types[names[column]]
+            from_baseline = bool(baseline_hits[row, column])
+            score = float(scores.score[row, column])
+            records.append({
+                "index": row,
+                "device_id": device_ids[row],
+                "timestamp": timestamps[row],
+                "metric": names[column],
+                "anomaly_type": anomaly_type.value,
+                "value": float(matrix[row, column]),
+                "expected": round(float(scores.expected[row, column]), 3) if from_baseline else None,
+                "score": round(score, 3) if from_baseline else None,
+                "severity": round(min(1.0, score / (2 * threshold)), 3) if from_baseline
+                else THRESHOLD_SEVERITY[anomaly_type],
+                "method": "baseline" if from_baseline else "threshold"
+            })
+        return records
+    
+    @staticmethod
+    def _z_threshold(sensitivity: Optional[float]) -> float:
+        """Limiar de desvio da linha de base para a sensibilidade pedida"""
+        if sensitivity is None:
+            return settings.ANOMALY_Z_THRESHOLD
+        return settings.ANOMALY_Z_THRESHOLD * (2.0 - min(max(sensitivity, 0.0), 1.0))
+    
+    def _baseline_anomaly(self, anomaly_type: AnomalyType, components: List[str], indexes: List[int],
+                          scores: BaselineScores, threshold: float,
+                          timestamp: datetime) -> Optional[AnomalyResult]:
+        """Cria a anomalia das métricas que passaram do limiar da linha de base"""
+        deviating = [index for index in indexes if scores.score[index] > threshold]
+        if not deviating:
+            return None
+        
+        worst = max(scores.score[index] for index in deviating)
+        details = ", ".join(
+            f"{self.baselines.metrics[index]} {scores.values[index]:.1f} "
+            f"(esperado {scores.expected[index]:.1f} ± {scores.scale[index]:.1f})"
+            for index in deviating
+        )
+        return AnomalyResult(
+            anomaly_type=anomaly_type,
+            severity=round(min(1.0, worst / (2 * threshold)), 3),
+            timestamp=timestamp,
+            affected_components=list(components),
+            description=f"Desvio da linha de base do dispositivo: {details}",
+            suggested_investigation=[
+                "Comparar com o histórico do dispositivo no mesmo horário",
+                "Verificar mudanças recentes (atualizações, novos processos, carga de trabalho)"
+            ]
+        )
+    
+    @staticmethod
+    def _metric_value(metrics: Dict[str, Any], path: Tuple[str, str]) -> float:
+        """Valor numérico de uma métrica aninhada (NaN se ausente)"""
+        section = metrics.get(path[0])
+        value = section.get(path[1]) if isinstance(section, dict) else None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float("nan")
+    
+    @staticmethod
+    def _sample_timestamp(metrics: Dict[str, Any]) -> datetime:
+        """Instante da amostra (``timestamp`` nas métricas ou agora)"""
+        timestamp = metrics.get("timestamp")
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp)
+            except ValueError:
+                timestamp = None
+        return timestamp if isinstance(timestamp, datetime) else datetime.now()
+    
     def _detect_cpu_anomalies(self, metrics: Dict[str, Any]) -> List[AnomalyResult]:
         """Detecta anomalias de CPU"""
         anomalies = []
@@ -523,7 +1011,7 @@ class AnomalyDetector:
         import uuid
         
         # Detecta anomalias usando método existente
-        anomalies = await self.detect_anomalies(metrics)
+        anomalies = await self.detect_anomalies(metrics, sensitivity=sensitivity)
         
         return {
             "detection_id": str(uuid.uuid4()),
@@ -551,31 +1039,38 @@ class AnomalyDetector:
             "last_trained": datetime.now() - timedelta(days=5),
             "data_size": 15000,
             "features": 12,
-            "status": "ready"
+            "status": "ready",
+            "baselines": self.baselines.stats(),
+            "anomaly_history_size": len(self.anomaly_history)
         }
 
-class PatternRecognizer:
+class PatternRecognizer(MLEngine):
     """Reconhecedor de padrões em dados históricos"""
     
     def __init__(self):
-        self.pattern_database = {}
-        self.correlation_matrix = {}
+        # Análises por dispositivo, válidas enquanto a marca d'água dos dados não muda
+        self._cache: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
         
     async def recognize_patterns(self, historical_data: List[Dict[str, Any]]) -> List[PatternResult]:
         """Reconhece padrões nos dados históricos"""
         try:
+            frame = PatternFrame.from_records(historical_data, GRANULARITY_SECONDS["hourly"])
+            stats = self._frame_stats(frame)
             patterns = []
             
             # Padrões temporais
-            temporal_patterns = self._find_temporal_patterns(historical_data)
+            temporal_patterns = self._find_temporal_patterns(frame, stats)
             patterns.extend(temporal_patterns)
             
             # Padrões de correlação
-            correlation_patterns = self._find_correlation_patterns(historical_data)
+            correlation_patterns = self._find_correlation_patterns(frame, stats)
             patterns.extend(correlation_patterns)
             
             # Padrões de frequência
-            frequency_patterns = self._find_frequency_patterns(historical_data)
+            frequency_patterns = self._find_frequency_patterns(frame, stats)
             patterns.extend(frequency_patterns)
             
             logger.info(f"Reconhecidos {len(patterns)} padrões")
@@ -585,62 +1080,178 @@ class PatternRecognizer:
             logger.error(f"Erro no reconhecimento de padrões: {e}")
             return []
     
-    def _find_temporal_patterns(self, data: List[Dict[str, Any]]) -> List[PatternResult]:
-        """Encontra padrões temporais"""
+    def _frame_stats(self, frame: PatternFrame) -> Dict[str, Any]:
+        """Correlação, ciclos, períodos dominantes e perfil por hora do histórico alinhado"""
+        periods, shares = dominant_periods(frame)
+        return {
+            "correlation": correlation_matrix(frame.values),
+            "periodicity": periodicity(frame),
+            "dominant_periods": periods,
+            "dominant_shares": shares,
+            "hourly_profile": hourly_profile(frame)
+        }
+    
+    def _find_temporal_patterns(self, frame: PatternFrame, stats: Dict[str, Any]) -> List[PatternResult]:
+        """Encontra ciclos diários e semanais (autocorrelação no atraso do período)"""
         patterns = []
+        if not len(frame):
+            return patterns
         
-        # Simulação de detecção de padrões temporais
-        # Padrão de pico de CPU às segundas-feiras
-        patterns.append(PatternResult(
-            pattern_name="Pico de CPU Segunda-feira",
-            frequency=4,  # 4 vezes por mês
-            last_occurrence=datetime.now() - timedelta(days=7),
-            correlation_strength=0.85,
-            related_events=["Backup semanal", "Sincronização de dados"],
-            business_impact="Lentidão no início da semana"
-        ))
+        daily = stats["periodicity"]["daily"]
+        weekly = stats["periodicity"]["weekly"]
+        span_seconds = len(frame) * frame.step_seconds
+        last_occurrence = self._frame_end(frame)
+        for column, metric in enumerate(frame.metrics):
+            if daily[column] >= PERIODICITY_THRESHOLD:
+                patterns.append(PatternResult(
+                    pattern_name=f"Ciclo diário de {metric}",
+                    frequency=int(span_seconds // 86400),
+                    last_occurrence=last_occurrence,
+                    correlation_strength=round(float(daily[column]), 3),
+                    related_events=[metric],
+                    business_impact=f"{metric} se repete a cada dia; a carga é previsível pelo horário"
+                ))
+            # O ciclo semanal só conta quando explica mais que a repetição diária
+            if weekly[column] >= PERIODICITY_THRESHOLD and \
+                    not daily[column] >= weekly[column] - WEEKLY_CYCLE_MARGIN:
+                patterns.append(PatternResult(
+                    pattern_name=f"Ciclo semanal de {metric}",
+                    frequency=int(span_seconds // 604800),
+                    last_occurrence=last_occurrence,
+                    correlation_strength=round(float(weekly[column]), 3),
+                    related_events=[metric],
+                    business_impact=f"{metric} muda conforme o dia da semana"
+                ))
         
         return patterns
     
-    def _find_correlation_patterns(self, data: List[Dict[str, Any]]) -> List[PatternResult]:
-        """Encontra padrões de correlação"""
+    def _find_correlation_patterns(self, frame: PatternFrame, stats: Dict[str, Any]) -> List[PatternResult]:
+        """Encontra pares de métricas correlacionadas (matriz de correlação)"""
         patterns = []
+        if not len(frame):
+            return patterns
         
-        # Simulação de correlações
-        patterns.append(PatternResult(
-            pattern_name="Correlação Temperatura-Performance",
-            frequency=10,
-            last_occurrence=datetime.now() - timedelta(days=2),
-            correlation_strength=0.92,
-            related_events=["Alta temperatura", "Queda de performance"],
-            business_impact="Degradação de performance em dias quentes"
-        ))
+        corr = stats["correlation"]
+        present = (~np.isnan(frame.values)).astype(np.int64)
+        pairs = present.T @ present
+        last_occurrence = self._frame_end(frame)
+        rows, columns = np.triu_indices(len(frame.metrics), k=1)
+        with np.errstate(invalid="ignore"):
+            strong = np.abs(corr[rows, columns]) >= CORRELATION_THRESHOLD
+        for row, column in zip(rows[strong].tolist(), columns[strong].tolist()):
+            first, second = frame.metrics[row], frame.metrics[column]
+            value = float(corr[row, column])
+            direction = "juntas" if value > 0 else "em sentidos opostos"
+            patterns.append(PatternResult(
+                pattern_name=f"Correlação {first} × {second}",
+                frequency=int(pairs[row, column]),
+                last_occurrence=last_occurrence,
+                correlation_strength=round(abs(value), 3),
+                related_events=[first, second],
+                business_impact=f"{first} e {second} variam {direction} (r = {value:.2f})"
+            ))
         
         return patterns
     
-    def _find_frequency_patterns(self, data: List[Dict[str, Any]]) -> List[PatternResult]:
-        """Encontra padrões de frequência"""
+    def _find_frequency_patterns(self, frame: PatternFrame, stats: Dict[str, Any]) -> List[PatternResult]:
+        """Encontra oscilações dominantes fora dos ciclos diário e semanal (espectro de potência)"""
         patterns = []
+        if not len(frame):
+            return patterns
         
-        # Simulação de padrões de frequência
-        patterns.append(PatternResult(
-            pattern_name="Reinicializações Frequentes",
-            frequency=3,
-            last_occurrence=datetime.now() - timedelta(days=5),
-            correlation_strength=0.78,
-            related_events=["Falha de memória", "Travamento de sistema"],
-            business_impact="Interrupções no trabalho"
-        ))
+        span_seconds = len(frame) * frame.step_seconds
+        last_occurrence = self._frame_end(frame)
+        for column, metric in enumerate(frame.metrics):
+            period = stats["dominant_periods"][column]
+            share = stats["dominant_shares"][column]
+            if not share >= DOMINANT_PERIOD_SHARE or period >= span_seconds / 2:
+                continue
+            if any(abs(period - known) <= frame.step_seconds for _, known in PERIODS):
+                continue
+            patterns.append(PatternResult(
+                pattern_name=f"Oscilação de {metric} a cada {period / 3600:.1f} h",
+                frequency=int(span_seconds // period),
+                last_occurrence=last_occurrence,
+                correlation_strength=round(float(share), 3),
+                related_events=[metric],
+                business_impact=f"{metric} oscila com período de {period / 3600:.1f} h "
+                                f"({share:.0%} da variação)"
+            ))
         
         return patterns
     
     async def analyze_patterns(self, data: List[Dict[str, Any]], analysis_period: int = 30,
                               pattern_types: List[str] = None, granularity: str = "daily") -> Dict[str, Any]:
         """Método principal para análise de padrões compatível com API v3"""
-        import uuid
+        frame = PatternFrame.from_records(data, GRANULARITY_SECONDS.get(granularity, 86400))
+        return self._analysis(frame, pattern_types)
+    
+    def analyze_device(self, device_id: str, analysis_period: int = 30, pattern_types: List[str] = None,
+                       granularity: str = "hourly") -> Dict[str, Any]:
+        """Analisa os padrões do histórico do dispositivo no store de telemetria.
+        
+        O resultado fica em cache enquanto o dispositivo não recebe amostras
+        novas e a janela não avança um bucket.
+        
+        Args:
+            device_id: ID do dispositivo
+            analysis_period: Janela da análise em dias
+            pattern_types: Tipos de padrão (usage, performance, seasonal)
+            granularity: Largura dos buckets (minute, hourly, daily, weekly)
+            
+        Returns:
+            Análise no formato de ``analyze_patterns``, com ``cached``
+        """
+        step = GRANULARITY_SECONDS.get(granularity, 3600)
+        store = get_telemetry_store()
+        watermark = store.watermark(device_id)
+        first_bucket = int((datetime.now(timezone.utc).timestamp() - analysis_period * 86400) // step)
+        key = (device_id, analysis_period, granularity, tuple(sorted(pattern_types or DEFAULT_PATTERN_TYPES)))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[:2] == (watermark, first_bucket):
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return dict(cached[2], analysis_id=str(uuid.uuid4()), cached=True)
+        
+        window = store.downsample(device_id, step, start=first_bucket * step * 1000)
+        frame = PatternFrame.from_arrays(window.timestamps / 1000.0, window.columns, step)
+        result = self._analysis(frame, pattern_types)
+        with self._cache_lock:
+            self.cache_misses += 1
+            self._cache[key] = (watermark, first_bucket, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.PATTERN_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return dict(result, cached=False)
+    
+    def _analysis(self, frame: PatternFrame, pattern_types: Optional[List[str]]) -> Dict[str, Any]:
+        """Resultado da análise de padrões no formato da API v3"""
+        types = set(pattern_types or DEFAULT_PATTERN_TYPES)
+        stats = self._frame_stats(frame)
         
-        # Analisa padrões usando método existente
-        patterns = await self.recognize_patterns(data)
+        patterns = []
+        if "seasonal" in types:
+            patterns.extend(self._find_temporal_patterns(frame, stats))
+        if "performance" in types:
+            patterns.extend(self._find_correlation_patterns(frame, stats))
+        if "usage" in types:
+            patterns.extend(self._find_frequency_patterns(frame, stats))
+        
+        seasonal = {
+            name: {metric: self._rounded(strength) for metric, strength in zip(frame.metrics, strengths)}
+            for name, strengths in stats["periodicity"].items()
+        }
+        # Ciclo mais curto entre os detectados, salvo se um mais longo explicar claramente mais
+        cycle_type = None
+        best = PERIODICITY_THRESHOLD
+        for name, _ in PERIODS:
+            strengths = stats["periodicity"][name]
+            strength = np.nanmax(strengths) if not np.isnan(strengths).all() else np.nan
+            if strength >= best + (WEEKLY_CYCLE_MARGIN if cycle_type else 0.0):
+                cycle_type, best = name, strength
+        seasonal["detected"] = cycle_type is not None
+        seasonal["type"] = cycle_type
         
         return {
             "analysis_id": str(uuid.uuid4()),
@@ -649,16 +1260,59 @@ class PatternRecognizer:
                     "name": pattern.pattern_name,
                     "frequency": pattern.frequency,
                     "strength": pattern.correlation_strength,
+                    "metrics": pattern.related_events,
+                    "last_occurrence": pattern.last_occurrence.isoformat(),
                     "impact": pattern.business_impact
                 } for pattern in patterns
             ],
-            "strength": sum(p.correlation_strength for p in patterns) / len(patterns) if patterns else 0,
-            "seasonal": {"detected": True, "type": "weekly"},
-            "usage": {"peak_hours": "09:00-17:00", "low_hours": "22:00-06:00"},
-            "cycles": {"daily": True, "weekly": True, "monthly": False},
-            "insights": [p.business_impact for p in patterns]
+            "strength": round(sum(p.correlation_strength for p in patterns) / len(patterns), 3) if patterns else 0,
+            "seasonal": seasonal,
+            "usage": self._usage_patterns(frame, stats["hourly_profile"]),
+            "cycles": [
+                {
+                    "metric": metric,
+                    "period_hours": round(float(period) / 3600, 2),
+                    "strength": round(float(share), 3)
+                }
+                for metric, period, share in zip(frame.metrics, stats["dominant_periods"], stats["dominant_shares"])
+                if share >= DOMINANT_PERIOD_SHARE
+            ],
+            "insights": [p.business_impact for p in patterns],
+            "samples": len(frame)
         }
     
+    def _usage_patterns(self, frame: PatternFrame, profile: np.ndarray) -> Dict[str, Any]:
+        """Horas de pico e de menor uso pelo perfil médio das métricas de carga"""
+        usage = {
+            "hourly_profile": {
+                metric: [self._rounded(value) for value in profile[:, column]]
+                for column, metric in enumerate(frame.metrics)
+            }
+        }
+        columns = [frame.metrics.index(metric) for metric in LOAD_METRICS if metric in frame.metrics]
+        if not columns or np.isnan(profile[:, columns]).all():
+            return usage
+        
+        # Perfis padronizados para métricas de escalas diferentes pesarem igual
+        load = profile[:, columns]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            standardized = (load - np.nanmean(load, axis=0)) / np.nanstd(load, axis=0)
+        score = np.nanmean(np.where(np.isnan(standardized), 0.0, standardized), axis=1)
+        hours = np.flatnonzero(~np.isnan(load).all(axis=1))
+        peak = int(hours[np.argmax(score[hours])])
+        low = int(hours[np.argmin(score[hours])])
+        usage["peak_hours"] = f"{peak:02d}:00-{(peak + 1) % 24:02d}:00"
+        usage["low_hours"] = f"{low:02d}:00-{(low + 1) % 24:02d}:00"
+        return usage
+    
+    @staticmethod
+    def _frame_end(frame: PatternFrame) -> datetime:
+        return datetime.fromtimestamp(float(frame.epoch_seconds[-1]), timezone.utc).replace(tzinfo=None)
+    
+    @staticmethod
+    def _rounded(value: float) -> Optional[float]:
+        return None if np.isnan(value) else round(float(value), 3)
+    
     async def get_model_info(self) -> Dict[str, Any]:
         """Retorna informações do modelo reconhecedor de padrões"""
         return {
@@ -668,51 +1322,77 @@ class PatternRecognizer:
             "last_trained": datetime.now() - timedelta(days=3),
             "data_size": 8000,
             "features": 10,
-            "status": "ready"
+            "status": "ready",
+            "cache": {"entries": len(self._cache), "hits": self.cache_hits, "misses": self.cache_misses}
         }
 
-class RecommendationEngine:
+class RecommendationEngine(MLEngine):
     """Motor de recomendações personalizadas"""
     
     def __init__(self):
         self.user_profiles = {}
         self.recommendation_history = {}
         self.effectiveness_scores = {}
+        # Usuários no mesmo estado (campos quantizados, perfil e preferências) compartilham as recomendações
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL_SECONDS)
         
     async def generate_recommendations(self, 
                                      user_id: str, 
                                      system_state: Dict[str, Any],
                                      user_preferences: Dict[str, Any] = None) -> List[Recommendation]:
         """Gera recomendações personalizadas"""
+        recommendations, _ = self._recommend(user_id, system_state, user_preferences)
+        return recommendations
+    
+    def _recommend(self, user_id: str, system_state: Dict[str, Any],
+                   user_preferences: Dict[str, Any] = None) -> Tuple[List[Recommendation], bool]:
+        """Top 10 recomendações e se vieram do cache"""
         try:
-            recommendations = []
-            
-            # Recomendações baseadas no estado do sistema
-            system_recommendations = self._get_system_recommendations(system_state)
-            recommendations.extend(system_recommendations)
-            
-            # Recomendações baseadas no perfil do usuário
-            if user_id in self.user_profiles:
-                profile_recommendations = self._get_profile_recommendations(user_id, system_state)
-                recommendations.extend(profile_recommendations)
-            
-            # Recomendações baseadas em preferências
-            if user_preferences:
-                preference_recommendations = self._get_preference_recommendations(user_preferences, system_state)
-                recommendations.extend(preference_recommendations)
+            # Só os campos lidos pelas regras; a chave usa o início do bucket, as regras o valor original
+            values = np.array([system_state.get(section, {}).get(field, 0) for section, field, _ in RECOMMENDATION_FEATURES],
+                              dtype=np.float64)
+            buckets = quantize(values, np.array([step for _, _, step in RECOMMENDATION_FEATURES]))
+            state: Dict[str, Dict[str, float]] = {}
+            for (section, field, _), value in zip(RECOMMENDATION_FEATURES, values.tolist()):
+                state.setdefault(section, {})[field] = value
+            # Perfil e preferências entram na chave como as regras os leem
+            experience_level = self.user_profiles[user_id].get('experience_level') if user_id in self.user_profiles else None
+            auto_optimization = bool(user_preferences and user_preferences.get('auto_optimization', False))
+            key = feature_key(RECOMMENDATION_MODEL_VERSION, buckets, experience_level, auto_optimization)
             
-            # Ordenar por prioridade e relevância
-            recommendations = self._prioritize_recommendations(recommendations)
+            cached = self.cache.get(key)
+            if cached is not None:
+                recommendations = list(cached)
+            else:
+                recommendations = []
+                
+                # Recomendações baseadas no estado do sistema
+                system_recommendations = self._get_system_recommendations(state)
+                recommendations.extend(system_recommendations)
+                
+                # Recomendações baseadas no perfil do usuário
+                if user_id in self.user_profiles:
+                    profile_recommendations = self._get_profile_recommendations(user_id, state)
+                    recommendations.extend(profile_recommendations)
+                
+                # Recomendações baseadas em preferências
+                if user_preferences:
+                    preference_recommendations = self._get_preference_recommendations(user_preferences, state)
+                    recommendations.extend(preference_recommendations)
+                
+                # Ordenar por prioridade e relevância
+                recommendations = self._prioritize_recommendations(recommendations)
+                self.cache.put(key, list(recommendations))
             
             # Armazenar no histórico
             self.recommendation_history[user_id] = recommendations
             
             logger.info(f"Geradas {len(recommendations)} recomendações para usuário {user_id}")
-            return recommendations[:10]  # Top 10
+            return recommendations[:10], cached is not None  # Top 10
             
         except Exception as e:
             logger.error(f"Erro na geração de recomendações: {e}")
-            return []
+            return [], False
     
     def _get_system_recommendations(self, system_state: Dict[str, Any]) -> List[Recommendation]:
         """Gera recomendações baseadas no estado do sistema"""
@@ -810,6 +1490,7 @@ class RecommendationEngine:
                      key=lambda r: priority_order.get(r.priority, 0), 
                      reverse=True)
     
+    @track_ai_prediction("recommendation_engine")
     async def generate_recommendations_v3(self, system_state: Dict[str, Any], 
                                      user_preferences: Dict[str, Any] = None,
                                      context: str = "general", priority_level: str = "medium") -> Dict[str, Any]:
@@ -817,7 +1498,7 @@ class RecommendationEngine:
         import uuid
         
         # Gera recomendações usando método existente
-        recommendations = await self.generate_recommendations("system", system_state, user_preferences)
+        recommendations, cached = self._recommend("system", system_state, user_preferences)
         
         return {
             "recommendation_id": str(uuid.uuid4()),
@@ -834,7 +1515,8 @@ class RecommendationEngine:
             "difficulty": {rec.title: "Medium" for rec in recommendations},
             "time": {rec.title: "30-60 minutes" for rec in recommendations},
             "risks": {rec.title: "Low" for rec in recommendations},
-            "success_rate": 0.85
+            "success_rate": 0.85,
+            "cached": cached
         }
     
     async def get_model_info(self) -> Dict[str, Any]:
@@ -846,7 +1528,8 @@ class RecommendationEngine:
             "last_trained": datetime.now() - timedelta(days=1),
             "data_size": 12000,
             "features": 18,
-            "status": "ready"
+            "status": "ready",
+            "cache": self.cache.stats()
         }
 
 # Instâncias globais
@@ -855,6 +1538,28 @@ anomaly_detector = AnomalyDetector()
 pattern_recognizer = PatternRecognizer()
 recommendation_engine = RecommendationEngine()
 
+def load_device_history(device_id: str, days: int = 30, step_seconds: Optional[float] = 3600,
+                        aggregation: str = "avg") -> List[Dict[str, Any]]:
+    """Histórico de um dispositivo a partir do store colunar de telemetria
+    
+    Retorna registros ``{"timestamp": ..., métrica: valor}`` (um por bucket de
+    ``step_seconds``, ou por amostra se None) no formato de ``historical_data``.
+    """
+    store = get_telemetry_store()
+    start = datetime.utcnow() - timedelta(days=days)
+    if step_seconds:
+        window = store.downsample(device_id, step_seconds, start, aggregation=aggregation)
+    else:
+        window = store.range(device_id, start)
+    columns = {metric: np.asarray(column, dtype=np.float64).tolist() for metric, column in window.columns.items()}
+    return [
+        {
+            "timestamp": timestamp.isoformat(),
+            **{metric: (None if np.isnan(values[i]) else values[i]) for metric, values in columns.items()}
+        }
+        for i, timestamp in enumerate(window.datetimes())
+    ]
+
 # Funções de conveniência
 async def predict_system_failure(system_data: Dict[str, Any]) -> PredictionResult:
     """Função de conveniência para previsão de falhas"""
@@ -0,0 +1,251 @@
+"""
+Cálculos numéricos do reconhecimento de padrões
+
+O histórico vira um ``PatternFrame``: uma grade regular de instantes e uma
+matriz (instantes × métricas) com a média de cada bucket (NaN = sem amostras).
+Sobre a matriz, de uma vez para todas as métricas:
+
+- Matriz de correlação entre métricas em um produto de matrizes
+- Autocorrelação por FFT, para a força dos ciclos diário e semanal
+- Período dominante pelo pico do espectro de potência
+- Perfil médio por hora do dia
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+GRANULARITY_SECONDS = {"minute": 60, "hourly": 3600, "daily": 86400, "weekly": 604800}
+PERIODS = (("daily", 86400), ("weekly", 604800))
+# Limita a grade às amostras mais recentes (90 dias por minuto cabem)
+MAX_GRID_POINTS = 200_000
+
+
+@dataclass
+class PatternFrame:
+    """Histórico alinhado numa grade regular.
+
+    ``epoch_seconds`` é o início de cada bucket; ``values`` tem uma linha por
+    bucket e uma coluna por métrica.
+    """
+
+    epoch_seconds: np.ndarray
+    metrics: Tuple[str, ...]
+    values: np.ndarray
+    step_seconds: float
+
+    def __len__(self) -> int:
+        return len(self.epoch_seconds)
+
+    @classmethod
+    def from_arrays(cls, epoch_seconds: np.ndarray, columns: Dict[str, np.ndarray],
+                    step_seconds: float) -> "PatternFrame":
+        """Alinha colunas de amostras irregulares na grade de ``step_seconds``.
+
+        Args:
+            epoch_seconds: Instante de cada amostra (segundos desde a época)
+            columns: Valores de cada métrica por amostra (NaN = ausente)
+            step_seconds: Largura de cada bucket da grade
+
+        Returns:
+            Frame com a média de cada bucket
+        """
+        metrics = tuple(columns)
+        epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+        if not len(epoch_seconds) or not metrics:
+            return cls(np.empty(0), metrics, np.empty((0, len(metrics))), step_seconds)
+
+        buckets = np.floor(epoch_seconds / step_seconds).astype(np.int64)
+        first = max(int(buckets.min()), int(buckets.max()) - MAX_GRID_POINTS + 1)
+        keep = buckets >= first
+        index = buckets[keep] - first
+        size = int(index.max()) + 1
+
+        values = np.empty((size, len(metrics)))
+        for column, metric in enumerate(metrics):
+            samples = np.asarray(columns[metric], dtype=np.float64)[keep]
+            present = ~np.isnan(samples)
+            sums = np.bincount(index[present], weights=samples[present], minlength=size)
+            counts = np.bincount(index[present], minlength=size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values[:, column] = np.where(counts > 0, sums / counts, np.nan)
+        grid = (first + np.arange(size)) * float(step_seconds)
+        return cls(grid, metrics, values, step_seconds)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]], step_seconds: float,
+                     metrics: Optional[Sequence[str]] = None) -> "PatternFrame":
+        """Alinha registros ``{"timestamp": ..., métrica: valor}`` na grade.
+
+        Registros sem instante válido são ignorados; métricas são os campos
+        numéricos dos registros quando não informadas.
+
+        Args:
+            records: Registros do histórico (``historical_data``)
+            step_seconds: Largura de cada bucket da grade
+            metrics: Métricas a alinhar
+
+        Returns:
+            Frame com a média de cada bucket
+        """
+        timestamps = []
+        rows = []
+        for record in records:
+            epoch = _epoch_seconds(record.get("timestamp"))
+            if epoch is not None:
+                timestamps.append(epoch)
+                rows.append(record)
+        if metrics is None:
+            metrics = sorted({
+                key for record in rows for key, value in record.items()
+                if key != "timestamp" and isinstance(value, (int, float)) and not isinstance(value, bool)
+            })
+        columns = {
+            metric: np.array([_number(record.get(metric)) for record in rows], dtype=np.float64)
+            for metric in metrics
+        }
+        return cls.from_arrays(np.array(timestamps, dtype=np.float64), columns, step_seconds)
+
+
+def correlation_matrix(values: np.ndarray) -> np.ndarray:
+    """Correlação de Pearson entre as colunas, num único produto de matrizes.
+
+    Buckets ausentes contam como a média da coluna; colunas constantes ficam
+    com NaN.
+
+    Args:
+        values: Matriz (instantes × métricas)
+
+    Returns:
+        Matriz (métricas × métricas)
+    """
+    present, mean, std = _column_stats(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(present, (values - mean) / std, 0.0)
+        pairs = present.T.astype(np.float64) @ present.astype(np.float64)
+        corr = (z.T @ z) / pairs
+    constant = ~(std > 0)
+    corr[:, constant] = np.nan
+    corr[constant, :] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def autocorrelation(values: np.ndarray) -> np.ndarray:
+    """Autocorrelação de cada coluna por FFT, corrigida pela sobreposição de cada atraso.
+
+    Args:
+        values: Matriz (instantes × métricas), grade regular
+
+    Returns:
+        Matriz (atrasos × métricas) com 1.0 no atraso zero
+    """
+    n = len(values)
+    present, mean, _ = _column_stats(values)
+    centered = np.where(present, values - mean, 0.0)
+    size = 1 << int(2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centered, n=size, axis=0)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=0)[:n]
+    overlap = (n - np.arange(n, dtype=np.float64))[:, np.newaxis] / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return acf / overlap / acf[0]
+
+
+def periodicity(frame: PatternFrame, periods: Sequence[Tuple[str, float]] = PERIODS) -> Dict[str, np.ndarray]:
+    """Força de cada ciclo por métrica: autocorrelação no atraso do período.
+
+    Ciclos que não cabem duas vezes na janela (ou menores que dois buckets)
+    ficam com NaN.
+
+    Args:
+        frame: Histórico alinhado
+        periods: Pares (nome, período em segundos)
+
+    Returns:
+        Nome do ciclo -> força por métrica (entre -1 e 1)
+    """
+    acf = autocorrelation(frame.values) if len(frame) else None
+    strengths = {}
+    for name, period in periods:
+        lag = int(round(period / frame.step_seconds))
+        if acf is None or lag < 2 or len(frame) < 2 * lag:
+            strengths[name] = np.full(len(frame.metrics), np.nan)
+        else:
+            strengths[name] = np.clip(acf[lag], -1.0, 1.0)
+    return strengths
+
+
+def dominant_periods(frame: PatternFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Período de maior potência no espectro de cada métrica.
+
+    Args:
+        frame: Histórico alinhado
+
+    Returns:
+        Período em segundos e fração da potência (sem a componente contínua)
+        concentrada nele, por métrica
+    """
+    if len(frame) < 4:
+        nan = np.full(len(frame.metrics), np.nan)
+        return nan, nan.copy()
+    present, mean, _ = _column_stats(frame.values)
+    centered = np.where(present, frame.values - mean, 0.0)
+    power = np.abs(np.fft.rfft(centered, axis=0)[1:]) ** 2
+    frequencies = np.fft.rfftfreq(len(frame), d=frame.step_seconds)[1:]
+    peak = np.argmax(power, axis=0)
+    total = power.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = power[peak, np.arange(power.shape[1])] / total
+    return 1.0 / frequencies[peak], share
+
+
+def hourly_profile(frame: PatternFrame) -> np.ndarray:
+    """Média de cada métrica por hora do dia (UTC).
+
+    Args:
+        frame: Histórico alinhado
+
+    Returns:
+        Matriz (24 × métricas), NaN nas horas sem dados
+    """
+    hours = ((frame.epoch_seconds // 3600) % 24).astype(np.int64)
+    profile = np.full((24, len(frame.metrics)), np.nan)
+    for column in range(len(frame.metrics)):
+        samples = frame.values[:, column]
+        present = ~np.isnan(samples)
+        sums = np.bincount(hours[present], weights=samples[present], minlength=24)
+        counts = np.bincount(hours[present], minlength=24)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            profile[:, column] = np.where(counts > 0, sums / counts, np.nan)
+    return profile
+
+
+def _column_stats(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Máscara de valores presentes, média e desvio padrão de cada coluna ignorando NaN"""
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(present, values, 0.0).sum(axis=0) / counts
+        std = np.sqrt(np.where(present, (values - mean) ** 2, 0.0).sum(axis=0) / counts)
+    return present, mean, std
+
+
+def _epoch_seconds(value: Any) -> Optional[float]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
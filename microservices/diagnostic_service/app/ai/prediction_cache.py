@@ -0,0 +1,116 @@
+"""
+Cache de predições por hash das features quantizadas
+
+Dispositivos no mesmo estado geram vetores de features quase idênticos. Para
+a chave, as features são arredondadas para baixo em buckets (por exemplo 1%
+de uso de CPU) e o hash do vetor quantizado com a versão do modelo identifica
+a predição. O modelo continua avaliando as features originais, então os
+limiares estritos (``temperatura > 75``) valem exatamente numa falta; um
+acerto devolve a predição do primeiro sistema avaliado no bucket, aproximada
+dentro dele: um bucket que contém o limiar (75,0 a 76,0) pode repetir o
+resultado de um vizinho do outro lado.
+
+Entradas expiram após o TTL e, cheio o cache, sai a usada há mais tempo.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def quantize(values: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """Início do bucket de cada valor.
+
+    Args:
+        values: Valores das features (uma coluna por feature)
+        steps: Largura do bucket de cada feature
+
+    Returns:
+        Valores quantizados, no formato de ``values``
+    """
+    return np.floor(np.asarray(values, dtype=np.float64) / steps) * steps
+
+
+def feature_key(model_version: str, values: np.ndarray, *extra: Any) -> bytes:
+    """Chave do cache para um vetor de features quantizado.
+
+    Args:
+        model_version: Versão do modelo que avalia as features
+        values: Vetor quantizado (e máscaras, se houver, em ``extra``)
+        *extra: Outras entradas do modelo que mudam o resultado
+
+    Returns:
+        Hash de 16 bytes
+    """
+    digest = hashlib.blake2b(model_version.encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(values).tobytes())
+    for item in extra:
+        digest.update(item.tobytes() if isinstance(item, np.ndarray) else repr(item).encode())
+    return digest.digest()
+
+
+class PredictionCache:
+    """Cache LRU com TTL de resultados de predição."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        """
+        Args:
+            max_entries: Entradas mantidas; 0 desativa o cache
+            ttl_seconds: Validade de cada entrada
+        """
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Resultado guardado para a chave, ou None se ausente ou expirado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: bytes, value: Any):
+        """Guarda um resultado, descartando o usado há mais tempo se o cache estiver cheio"""
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Descarta todas as entradas"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação e contadores de acertos do cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -3,58 +3,32 @@
 Consolida todas as funcionalidades de IA e Machine Learning.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import Dict, List, Optional, Any
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, status
+from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
+from pydantic import BaseModel, Field
+import asyncio
 import logging
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from ..diagnostics.endpoints import AsyncDiagnosticRepository, get_current_user_dependency
 
-# Importações dos engines de IA (assumindo que existem)
 try:
-    from ...ai.ml_engine import (
-        PredictiveAnalyzer,
-        AnomalyDetector, 
-        PatternRecognizer,
-        RecommendationEngine
-    )
+    from app.services.predictive_service import PredictiveService
 except ImportError:
-    # Fallback para desenvolvimento
-    class PredictiveAnalyzer:
-        async def predict(self, **kwargs): return {"prediction_id": "test", "values": [], "confidence": 0.8, "risk_factors": [], "recommendations": [], "model_version": "1.0"}
-        async def get_model_info(self): return {"model_id": "pred_1", "version": "1.0", "accuracy": 0.85, "last_trained": datetime.now(), "data_size": 1000, "features": 10, "status": "active"}
-        async def train_model(self, *args): pass
-        async def get_training_status(self, training_id): return None
-        async def optimize_model(self): pass
-        async def get_performance_metrics(self): return {"accuracy": 0.85, "precision": 0.82, "recall": 0.88}
-        async def delete_model(self, model_id): return False
-        async def export_model(self, model_id): return None
-        async def import_model(self, *args): pass
-        async def update_model_performance(self, *args): pass
-    
-    class AnomalyDetector:
-        async def detect_anomalies_v3(self, **kwargs): return {"detection_id": "test", "anomalies": [], "severity_scores": {}, "affected_components": [], "root_causes": [], "actions": [], "confidence": 0.9}
-        async def get_model_info(self): return {"model_id": "anom_1", "version": "1.0", "accuracy": 0.92, "last_trained": datetime.now(), "data_size": 5000, "features": 15, "status": "active"}
-        async def train_model(self, *args): pass
-        async def get_training_status(self, training_id): return None
-        async def optimize_model(self): pass
-        async def get_performance_metrics(self): return {"accuracy": 0.92, "precision": 0.89, "recall": 0.94}
-        async def delete_model(self, model_id): return False
-        async def export_model(self, model_id): return None
-        async def import_model(self, *args): pass
-    
-    class PatternRecognizer:
-        async def analyze_patterns(self, **kwargs): return {"analysis_id": "test", "patterns": [], "strength": 0.7, "seasonal": {}, "usage": {}, "cycles": [], "insights": []}
-        async def get_model_info(self): return {"model_id": "pattern_1", "version": "1.0", "accuracy": 0.78, "last_trained": datetime.now(), "data_size": 2000, "features": 8, "status": "active"}
-        async def train_model(self, *args): pass
-        async def get_training_status(self, training_id): return None
-        async def optimize_model(self): pass
-        async def get_performance_metrics(self): return {"accuracy": 0.78, "precision": 0.75, "recall": 0.81}
-        async def delete_model(self, model_id): return False
-        async def export_model(self, model_id): return None
-        async def import_model(self, *args): pass
-    
-    class RecommendationEngine:
-        async def generate_recommendations_v3(self, **kwargs): return {"recommendation_id": "test", "recommendations": [], "priorities": {}, "impact": {}, "difficulty": {}, "time": {}, "risks": {}, "success_rate": 0.85}
-        async def get_performance_metrics(self): return {"accuracy": 0.88, "user_satisfaction": 0.91, "implementation_rate": 0.73}
+    PredictiveService = None
+
+try:
+    from app.core.config import settings
+    ANOMALY_BATCH_MAX_SAMPLES = settings.ANOMALY_BATCH_MAX_SAMPLES
+except (ImportError, AttributeError):
+    ANOMALY_BATCH_MAX_SAMPLES = 100000
+
+# Engines de IA (instâncias globais: linhas de base, micro-lotes e caches são compartilhados)
+from app.ai.ml_engine import anomaly_detector, pattern_recognizer, predictive_analyzer, recommendation_engine
 
 # Importações dos modelos (assumindo que existem)
 try:
@@ -85,7 +59,7 @@ except ImportError:
     class PredictionResponse(BaseModel):
         prediction_id: str
         prediction_type: str
-        predicted_values: List[Any]
+        predicted_values: Union[Dict[str, Any], List[Any]]
         confidence_score: float
         time_horizon: int
         risk_factors: List[str]
@@ -110,7 +84,8 @@ except ImportError:
         detection_timestamp: datetime
     
     class PatternAnalysisRequest(BaseModel):
-        system_data: List[Dict[str, Any]]
+        system_data: List[Dict[str, Any]] = []
+        device_id: Optional[str] = None
         analysis_period: int = 30
         pattern_types: List[str] = ["usage", "performance", "seasonal"]
         granularity: str = "hourly"
@@ -167,15 +142,38 @@ except ImportError:
         data_size: int
         started_at: datetime
 
+class BatchAnomalyDetectionRequest(BaseModel):
+    """Schema para detecção de anomalias numa matriz de amostras (amostras × métricas)"""
+    device_ids: List[str] = Field(..., min_length=1, description="Dispositivo de cada amostra")
+    timestamps: List[datetime] = Field(..., description="Instante de cada amostra")
+    metrics: List[str] = Field(..., min_length=1, description="Métrica de cada coluna")
+    values: List[List[Optional[float]]] = Field(..., description="Uma linha por amostra; null = ausente")
+    sensitivity: Optional[float] = Field(default=None, ge=0, le=1)
+
+class BatchAnomalyRecord(BaseModel):
+    """Schema para uma célula anômala da matriz"""
+    index: int
+    device_id: str
+    timestamp: datetime
+    metric: str
+    anomaly_type: str
+    value: float
+    expected: Optional[float] = None
+    score: Optional[float] = None
+    severity: float
+    method: str
+
+class BatchAnomalyDetectionResponse(BaseModel):
+    """Schema para resposta da detecção de anomalias em lote"""
+    detection_id: str
+    samples: int
+    devices: int
+    anomalies: List[BatchAnomalyRecord]
+    detection_timestamp: datetime
+
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Artificial Intelligence"])
 
-# Instâncias dos engines de IA
-predictive_analyzer = PredictiveAnalyzer()
-anomaly_detector = AnomalyDetector()
-pattern_recognizer = PatternRecognizer()
-recommendation_engine = RecommendationEngine()
-
 @router.post("/predict", response_model=PredictionResponse)
 async def predict_system_behavior(
     request: PredictionRequest,
@@ -186,8 +184,7 @@ async def predict_system_behavior(
     """
     try:
         logger.info(f"Iniciando predição para {request.prediction_type}")
-        
-        # Executar predição
+        # Executar predição (chamadas concorrentes são agrupadas em micro-lotes)
         prediction_result = await predictive_analyzer.predict(
             data=request.historical_data,
             prediction_type=request.prediction_type,
@@ -214,6 +211,9 @@ async def predict_system_behavior(
             created_at=datetime.now()
         )
         
+    except ValueError as e:
+        # Feature não numérica: erro do chamador, rejeitado antes do micro-lote
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Erro na predição: {e}")
         raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
@@ -251,6 +251,46 @@ async def detect_system_anomalies(
         logger.error(f"Erro na detecção de anomalias: {e}")
         raise HTTPException(status_code=500, detail=f"Erro na detecção: {str(e)}")
 
+@router.post("/detect-anomalies/batch", response_model=BatchAnomalyDetectionResponse)
+async def detect_anomalies_batch(
+    request: BatchAnomalyDetectionRequest
+) -> BatchAnomalyDetectionResponse:
+    """
+    Detecta anomalias numa matriz de amostras de vários dispositivos em uma chamada
+    
+    Retorna só as células anômalas; as amostras também atualizam as linhas de
+    base dos dispositivos.
+    """
+    samples = len(request.values)
+    if samples > ANOMALY_BATCH_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lote excede o limite de {ANOMALY_BATCH_MAX_SAMPLES} amostras"
+        )
+    if not (len(request.device_ids) == len(request.timestamps) == samples):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="device_ids, timestamps e values devem ter o mesmo número de amostras"
+        )
+    
+    try:
+        # Pontuação vetorizada fora do event loop
+        anomalies = await asyncio.to_thread(
+            anomaly_detector.detect_anomalies_batch,
+            request.device_ids, request.timestamps, request.values,
+            request.metrics, request.sensitivity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return BatchAnomalyDetectionResponse(
+        detection_id=str(uuid.uuid4()),
+        samples=samples,
+        devices=len(set(request.device_ids)),
+        anomalies=anomalies,
+        detection_timestamp=datetime.now()
+    )
+
 @router.post("/analyze-patterns", response_model=PatternAnalysisResponse)
 async def analyze_system_patterns(
     request: PatternAnalysisRequest
@@ -261,13 +301,22 @@ async def analyze_system_patterns(
     try:
         logger.info(f"Analisando padrões em {request.analysis_period} dias")
         
-        # Executar análise de padrões
-        pattern_result = await pattern_recognizer.analyze_patterns(
-            data=request.system_data,
-            analysis_period=request.analysis_period,
-            pattern_types=request.pattern_types,
-            granularity=request.granularity
-        )
+        # Sem dados no corpo, analisa o histórico do dispositivo no store de telemetria
+        # (em cache até chegarem amostras novas)
+        device_id = getattr(request, "device_id", None)
+        if not request.system_data and device_id:
+            pattern_result = await asyncio.to_thread(
+                pattern_recognizer.analyze_device, device_id, request.analysis_period,
+                request.pattern_types, request.granularity
+            )
+        else:
+            # Executar análise de padrões
+            pattern_result = await pattern_recognizer.analyze_patterns(
+                data=request.system_data,
+                analysis_period=request.analysis_period,
+                pattern_types=request.pattern_types,
+                granularity=request.granularity
+            )
         
         return PatternAnalysisResponse(
             analysis_id=pattern_result["analysis_id"],
@@ -661,6 +710,32 @@ async def import_ml_model(
         logger.error(f"Erro na importação: {e}")
         raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
 
+@router.get("/devices/{device_id}/trend")
+async def get_device_current_trend(
+    device_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+) -> Dict[str, Any]:
+    """
+    Retorna a tendência atual do dispositivo a partir do estado incremental, sem ler o histórico
+    """
+    if PredictiveService is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço preditivo indisponível"
+        )
+    # O estado de tendência não guarda o usuário: a posse vem dos diagnósticos do dispositivo
+    if not await AsyncDiagnosticRepository(db).owns_device(current_user, device_id):
+        raise HTTPException(status_code=404, detail="Nenhum diagnóstico encontrado para o dispositivo")
+    try:
+        result = await db.run_sync(lambda session: PredictiveService(session).get_current_trend(device_id))
+    except Exception as e:
+        logger.error(f"Erro ao obter tendência de {device_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
+    if result["risk_level"] == "unknown":
+        raise HTTPException(status_code=404, detail="Nenhum diagnóstico encontrado para o dispositivo")
+    return result
+
 @router.get("/health")
 async def ai_health_check() -> Dict[str, Any]:
     """
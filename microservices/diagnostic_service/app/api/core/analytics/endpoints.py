@@ -5,15 +5,32 @@ Consolida todas as funcionalidades de análise e relatórios.
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 from pydantic import BaseModel
 from enum import Enum
+import asyncio
 import json
+import math
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from ..diagnostics.endpoints import AsyncDiagnosticRepository, get_current_user_dependency
+
+try:
+    from app.core.config import settings
+    from app.db.telemetry_store import AGGREGATIONS, TELEMETRY_METRICS, get_telemetry_store
+    TELEMETRY_STORE_ENABLED = settings.TELEMETRY_STORE_ENABLED
+except (ImportError, AttributeError):
+    TELEMETRY_STORE_ENABLED = False
+    TELEMETRY_METRICS = ()
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Analytics"])
 
+GRANULARITY_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 86400}
+
 # Modelos de dados
 class ReportType(str, Enum):
     SYSTEM_PERFORMANCE = "system_performance"
@@ -100,15 +117,27 @@ dashboards_storage = {}
 metrics_data = {}
 
 @router.post("/query", response_model=Dict[str, Any])
-async def query_analytics_data(query: AnalyticsQuery) -> Dict[str, Any]:
+async def query_analytics_data(
+    query: AnalyticsQuery,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+) -> Dict[str, Any]:
     """
     Executa uma consulta de análise de dados
+    
+    Com ``filters.device_id`` o dispositivo precisa ter diagnósticos do
+    usuário, e as métricas de telemetria vêm só do store (série vazia se não
+    houver amostras).
     """
+    device_id = query.filters.get("device_id")
+    if device_id and not await AsyncDiagnosticRepository(db).owns_device(current_user, device_id):
+        raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
+    
     try:
         logger.info(f"Executando consulta de análise para métricas: {query.metrics}")
         
-        # Calcular período de tempo
-        end_time = query.end_date or datetime.now()
+        # Calcular período de tempo (UTC sem fuso, como gravado na telemetria)
+        end_time = _naive_utc(query.end_date) if query.end_date else _naive_utc(datetime.now(timezone.utc))
         
         if query.time_range == TimeRange.LAST_HOUR:
             start_time = end_time - timedelta(hours=1)
@@ -121,14 +150,23 @@ async def query_analytics_data(query: AnalyticsQuery) -> Dict[str, Any]:
         elif query.time_range == TimeRange.LAST_90D:
             start_time = end_time - timedelta(days=90)
         else:
-            start_time = query.start_date or (end_time - timedelta(hours=24))
+            start_time = _naive_utc(query.start_date) if query.start_date else end_time - timedelta(hours=24)
         
-        # Simular dados de métricas
+        # Métricas do dispositivo vêm do store de telemetria; as demais são simuladas
         results = {}
         for metric in query.metrics:
-            results[metric.value] = _generate_metric_data(
-                metric, start_time, end_time, query.granularity, query.aggregation
-            )
+            if device_id and metric.value in TELEMETRY_METRICS:
+                if TELEMETRY_STORE_ENABLED:
+                    results[metric.value] = await asyncio.to_thread(
+                        _query_telemetry_metric, device_id, metric, start_time, end_time,
+                        query.granularity, query.aggregation
+                    )
+                else:
+                    results[metric.value] = _empty_telemetry_metric(metric)
+            else:
+                results[metric.value] = _generate_metric_data(
+                    metric, start_time, end_time, query.granularity, query.aggregation
+                )
         
         return {
             "query_id": f"query_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
@@ -532,6 +570,56 @@ def _generate_metric_data(
         }
     }
 
+def _query_telemetry_metric(
+    device_id: str,
+    metric: MetricType,
+    start_time: datetime,
+    end_time: datetime,
+    granularity: str,
+    aggregation: str
+) -> Dict[str, Any]:
+    """Série agregada de uma métrica do dispositivo a partir do store de telemetria"""
+    store = get_telemetry_store()
+    window = store.downsample(
+        device_id, GRANULARITY_SECONDS.get(granularity, 3600), start_time, end_time,
+        metrics=[metric.value], aggregation=aggregation if aggregation in AGGREGATIONS else "avg"
+    )
+    if not len(window):
+        return _empty_telemetry_metric(metric)
+    values = window.columns[metric.value].tolist()
+    data_points = [
+        {"timestamp": timestamp, "value": round(value, 2)}
+        for timestamp, value in zip(window.datetimes(), values) if not math.isnan(value)
+    ]
+    statistics = store.aggregate(device_id, start_time, end_time, metrics=[metric.value])[metric.value]
+    
+    return {
+        "metric": metric.value,
+        "values": data_points,
+        "source": "telemetry",
+        "statistics": {
+            "min": statistics["min"] or 0,
+            "max": statistics["max"] or 0,
+            "avg": statistics["avg"] or 0,
+            "count": statistics["count"]
+        }
+    }
+
+def _empty_telemetry_metric(metric: MetricType) -> Dict[str, Any]:
+    """Série vazia de uma métrica do dispositivo sem amostras na janela"""
+    return {
+        "metric": metric.value,
+        "values": [],
+        "source": "telemetry",
+        "statistics": {"min": 0, "max": 0, "avg": 0, "count": 0}
+    }
+
+def _naive_utc(value: datetime) -> datetime:
+    """Converte uma data com fuso para UTC sem fuso"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 def _calculate_summary(results: Dict[str, Any]) -> Dict[str, Any]:
     """Calcula resumo dos resultados"""
     summary = {
@@ -5,8 +5,9 @@ Database Core - Configuração e modelos do banco de dados da API Core
 Configuração consolidada para conexão com banco de dados usando SQLAlchemy.
 """
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from sqlalchemy import create_engine, MetaData, Column, Integer, String, DateTime, Text, Boolean, Float
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
@@ -27,6 +28,10 @@ metadata = MetaData()
 engine = None
 SessionLocal = None
 
+# Engine assíncrono (asyncpg/aiosqlite) usado pelos endpoints async
+async_engine = None
+AsyncSessionLocal = None
+
 def create_database_engine():
     """
     Cria o engine do banco de dados.
@@ -108,6 +113,91 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+def create_async_database_engine() -> AsyncEngine:
+    """
+    Cria o engine assíncrono do banco de dados.
+    
+    Usa ``ASYNC_DATABASE_URL`` ou a URL síncrona com o driver trocado
+    (asyncpg no PostgreSQL, aiosqlite no SQLite).
+    
+    Returns:
+        AsyncEngine: Engine SQLAlchemy assíncrono configurado
+    """
+    global async_engine
+    
+    if async_engine is None:
+        try:
+            database_url = settings.async_database_url_computed
+            
+            engine_kwargs = {
+                "pool_pre_ping": True,
+                "echo": settings.DEBUG and settings.ENVIRONMENT.value == "development"
+            }
+            
+            # Para SQLite (desenvolvimento/testes)
+            if "sqlite" in database_url:
+                engine_kwargs.update({
+                    "poolclass": StaticPool,
+                    "connect_args": {"check_same_thread": False}
+                })
+            else:
+                engine_kwargs.update({
+                    "pool_recycle": settings.DB_POOL_RECYCLE,
+                    "pool_size": settings.ASYNC_DB_POOL_SIZE,
+                    "max_overflow": settings.ASYNC_DB_MAX_OVERFLOW,
+                    "pool_timeout": settings.DB_POOL_TIMEOUT
+                })
+            
+            async_engine = create_async_engine(database_url, **engine_kwargs)
+            
+            logger.info(f"Engine assíncrono de banco de dados criado: {settings.DB_HOST}:{settings.DB_PORT}")
+            
+        except Exception as e:
+            logger.error(f"Erro ao criar engine assíncrono do banco de dados: {e}")
+            raise
+    
+    return async_engine
+
+def create_async_session_factory() -> async_sessionmaker:
+    """
+    Cria a factory de sessões assíncronas do banco de dados.
+    
+    Os objetos não expiram no commit: depois dele, ler um atributo exigiria
+    I/O implícito, que não é permitido em uma sessão assíncrona.
+    
+    Returns:
+        async_sessionmaker: Factory de sessões assíncronas configurada
+    """
+    global AsyncSessionLocal
+    
+    if AsyncSessionLocal is None:
+        AsyncSessionLocal = async_sessionmaker(
+            create_async_database_engine(),
+            autoflush=False,
+            expire_on_commit=False
+        )
+        
+        logger.info("Factory de sessões assíncronas criada")
+    
+    return AsyncSessionLocal
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency para obter uma sessão assíncrona de banco de dados.
+    
+    Yields:
+        AsyncSession: Sessão SQLAlchemy assíncrona
+    """
+    AsyncSessionLocal = create_async_session_factory()
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Erro na sessão assíncrona do banco de dados: {e}")
+            await db.rollback()
+            raise
+
 def init_database():
     """
     Inicializa o banco de dados criando todas as tabelas.
@@ -174,6 +264,24 @@ def close_database_connections():
     except Exception as e:
         logger.error(f"Erro ao fechar conexões do banco de dados: {e}")
 
+async def close_async_database_connections():
+    """
+    Fecha todas as conexões do engine assíncrono.
+    """
+    global async_engine, AsyncSessionLocal
+    
+    try:
+        if async_engine:
+            await async_engine.dispose()
+            async_engine = None
+            
+        AsyncSessionLocal = None
+        
+        logger.info("Conexões assíncronas do banco de dados fechadas")
+        
+    except Exception as e:
+        logger.error(f"Erro ao fechar conexões assíncronas do banco de dados: {e}")
+
 # Modelos básicos para diagnósticos
 class DiagnosticResult(Base):
     """
@@ -4,19 +4,23 @@ Consolida todas as funcionalidades de diagnóstico do sistema,
 combinando as capacidades das v1 e v3 com melhorias.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import Dict, List, Optional, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import logging
 import uuid
 import asyncio
+import inspect
+import json
+import time
 
 # REMOVIDO: from ..security import get_current_user
 # Será importado localmente apenas nos endpoints que precisam
 
-from ..database import get_db
-from sqlalchemy.orm import Session
+from ..database import get_async_db, create_session_factory
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import condicional para autenticação - apenas onde necessário
 def get_current_user_dependency():
@@ -56,15 +60,62 @@ except ImportError:
         def collect_system_info(self): return {"os": "Windows 10", "cpu": "Intel Core i7", "ram": "16GB"}
 
 try:
-    from app.db.repositories.diagnostic_repository import DiagnosticRepository
+    from app.db.repositories.diagnostic_repository import AsyncDiagnosticRepository, DiagnosticRepository
 except ImportError:
     class DiagnosticRepository:
         def __init__(self, db): pass
-        def create_diagnostic(self, **kwargs): return type('obj', (object,), {'id': 'test-123'})
-        def update_diagnostic(self, **kwargs): pass
+        def get_by_id(self, diagnostic_id): return None
+        def create(self, diagnostic_data): return type('obj', (object,), diagnostic_data)
+        def update(self, diagnostic_id, update_data): return None
         def get_user_diagnostics(self, **kwargs): return []
+        def get_diagnostics_keyset(self, **kwargs):
+            return type('page', (object,), {'items': [], 'next_cursor': None, 'total': 0, 'total_is_estimate': False})
         def get_diagnostic(self, diagnostic_id): return None
+        def bulk_create(self, diagnostics): return len(diagnostics)
+        def get_existing_ids(self, diagnostic_ids): return set()
         def delete_diagnostic(self, diagnostic_id): pass
+    class AsyncDiagnosticRepository:
+        def __init__(self, db): pass
+        async def get_by_id(self, diagnostic_id): return None
+        async def delete(self, diagnostic_id): return False
+        async def owns_device(self, user_id, device_id): return False
+        async def get_diagnostics_keyset(self, user_id, **kwargs):
+            return type('page', (object,), {'items': [], 'next_cursor': None, 'total': 0, 'total_is_estimate': False})
+
+try:
+    from app.services.rollup_service import RollupService
+except ImportError:
+    RollupService = None
+
+try:
+    from app.services.fleet_risk_service import FleetRiskScorer, get_device_risk_snapshot
+except ImportError:
+    FleetRiskScorer = None
+    get_device_risk_snapshot = None
+
+try:
+    from app.services.diagnostic_ingest_service import IngestBatch, ingest_diagnostics, write_ingest_batch
+except ImportError:
+    ingest_diagnostics = None
+    write_ingest_batch = None
+
+try:
+    from app.services.metric_batch_protocol import (
+        MSGPACK_CONTENT_TYPES, MetricBatchError, MetricBatchTooLarge, decode_metric_batch, supported_encodings
+    )
+except ImportError:
+    decode_metric_batch = None
+
+try:
+    from app.core.advanced_pool import get_advanced_pool
+except ImportError:
+    get_advanced_pool = None
+
+try:
+    from app.db.pagination import InvalidCursorError
+except ImportError:
+    class InvalidCursorError(ValueError):
+        pass
 
 try:
     from app.core.models.diagnostic import DiagnosticStatus
@@ -79,6 +130,37 @@ try:
 except ImportError:
     def check_system_resources(): return {"cpu": 45, "memory": 68, "disk": 73}
 
+try:
+    from app.core.system_sampler import system_sampler
+except ImportError:
+    system_sampler = None
+
+try:
+    from ..config import settings
+except ImportError:
+    settings = None
+
+# Cada configuração cai no próprio padrão, sem afetar as demais
+QUICK_DIAGNOSTIC_MAX_STALENESS = getattr(settings, "QUICK_DIAGNOSTIC_MAX_STALENESS_SECONDS", 5.0)
+STREAM_ANALYZER_TIMEOUT = getattr(settings, "DIAGNOSTIC_ANALYZER_TIMEOUT_SECONDS", 15.0)
+FLEET_BATCH_CONCURRENCY = getattr(settings, "FLEET_BATCH_CONCURRENCY", 32)
+FLEET_BATCH_MAX_DEVICES = getattr(settings, "FLEET_BATCH_MAX_DEVICES", 10000)
+FLEET_BATCH_INSERT_SIZE = getattr(settings, "FLEET_BATCH_INSERT_SIZE", 200)
+DIAGNOSTIC_INGEST_MAX_ITEMS = getattr(settings, "DIAGNOSTIC_INGEST_MAX_ITEMS", 5000)
+DIAGNOSTIC_INGEST_USE_COPY = getattr(settings, "DIAGNOSTIC_INGEST_USE_COPY", True)
+METRIC_BATCH_MAX_SAMPLES = getattr(settings, "METRIC_BATCH_MAX_SAMPLES", 50000)
+METRIC_BATCH_MAX_BYTES = getattr(settings, "METRIC_BATCH_MAX_BYTES", 16 * 1024 * 1024)
+
+try:
+    from app.services.analyzer_runner import get_analyzer_executor
+except ImportError:
+    def get_analyzer_executor(): return None
+
+try:
+    from app.services.job_queue import job_queue, JobStatus, LeaseLostError
+except ImportError:
+    job_queue = None
+
 try:
     from app.core.advanced_monitoring import MetricsCollector
 except ImportError:
@@ -95,6 +177,15 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DIAGNOSTIC_JOB_KIND = "diagnostic.run"
+AI_ANALYSIS_JOB_KIND = "diagnostic.ai_analysis"
+STATUS_URL_TEMPLATE = "/api/core/diagnostics/{diagnostic_id}/status"
+BATCH_JOB_KIND = "diagnostic.batch"
+BATCH_STATUS_URL_TEMPLATE = "/api/core/diagnostics/batch/{batch_id}"
+DIAGNOSTIC_LEVEL_PATTERN = "^(quick|standard|comprehensive)$"
+FLEET_RISK_JOB_KIND = "predictive.fleet_risk"
+FLEET_RISK_STATUS_URL_TEMPLATE = "/api/core/diagnostics/fleet/risk/jobs/{job_id}"
+
 # Schemas
 class DiagnosticRequest(BaseModel):
     """Schema para requisição de diagnóstico"""
@@ -105,10 +196,13 @@ class DiagnosticRequest(BaseModel):
     include_anomalies: bool = Field(default=True)
     include_ai_analysis: bool = Field(default=True)
     system_info: Optional[Dict[str, Any]] = None
+    priority: int = Field(default=0, ge=-10, le=10, description="Prioridade na fila (maior executa primeiro)")
 
 class QuickDiagnosticRequest(BaseModel):
     """Schema para diagnóstico rápido"""
     components: Optional[List[str]] = Field(default=["cpu", "memory"])
+    use_cached_snapshot: bool = Field(default=True, description="Responder a partir do último snapshot amostrado")
+    max_staleness_seconds: Optional[float] = Field(default=None, ge=0, description="Idade máxima aceita do snapshot")
 
 class DiagnosticResponse(BaseModel):
     """Schema para resposta de diagnóstico"""
@@ -120,6 +214,124 @@ class DiagnosticResponse(BaseModel):
     recommendations: List[Dict[str, Any]]
     execution_time: float
     ai_insights: Optional[Dict[str, Any]] = None
+    snapshot_age_seconds: Optional[float] = None
+
+class DiagnosticJobResponse(BaseModel):
+    """Schema para diagnóstico aceito na fila"""
+    diagnostic_id: str
+    job_id: str
+    status: str
+    priority: int
+    attempts: int
+    status_url: str
+    created_at: datetime
+
+class DiagnosticJobStatus(BaseModel):
+    """Schema para status de um diagnóstico na fila"""
+    diagnostic_id: str
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+
+class BatchDiagnosticRequest(BaseModel):
+    """Schema para diagnóstico em lote de vários dispositivos"""
+    device_ids: List[str] = Field(..., min_length=1)
+    diagnostic_level: str = Field(default="quick", pattern=DIAGNOSTIC_LEVEL_PATTERN)
+    device_levels: Dict[str, str] = Field(default_factory=dict, description="Nível por dispositivo (sobrescreve diagnostic_level)")
+    target_components: Optional[List[str]] = Field(default=["cpu", "memory", "disk", "network"])
+    priority: int = Field(default=0, ge=-10, le=10, description="Prioridade na fila (maior executa primeiro)")
+
+class BatchDiagnosticJobResponse(BaseModel):
+    """Schema para lote de diagnósticos aceito na fila"""
+    batch_id: str
+    status: str
+    total_devices: int
+    priority: int
+    status_url: str
+    created_at: datetime
+
+class BatchDeviceResult(BaseModel):
+    """Schema para o resultado de um dispositivo do lote"""
+    device_id: str
+    diagnostic_id: str
+    diagnostic_level: str
+    status: str
+    overall_health: Optional[int] = None
+    execution_time: float
+    error: Optional[str] = None
+
+class BatchDiagnosticStatus(BaseModel):
+    """Schema para progresso de um lote de diagnósticos"""
+    batch_id: str
+    status: str
+    attempts: int
+    total: int
+    completed: int
+    failed: int
+    running: int
+    pending: int
+    persisted: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: List[BatchDeviceResult]
+
+class FleetRiskScoreRequest(BaseModel):
+    """Schema para pontuação de risco da frota"""
+    time_window_days: Optional[int] = Field(default=None, ge=1, le=365)
+    source: str = Field(default="auto", pattern="^(auto|rollup|raw)$")
+
+class FleetRiskJobResponse(BaseModel):
+    """Schema para pontuação da frota aceita na fila"""
+    job_id: str
+    status: str
+    status_url: str
+    created_at: datetime
+
+class FleetRiskJobStatus(BaseModel):
+    """Schema para status da pontuação da frota"""
+    job_id: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+
+class DiagnosticIngestRequest(BaseModel):
+    """Schema para ingestão em lote de diagnósticos dos agentes de coleta"""
+    items: List[Dict[str, Any]] = Field(..., min_length=1, description="Diagnósticos com system_info opcional")
+
+class DiagnosticIngestResult(BaseModel):
+    """Schema para o resultado de um item da ingestão"""
+    index: int
+    id: Optional[str] = None
+    system_info_id: Optional[str] = None
+    error: Optional[str] = None
+
+class DiagnosticIngestResponse(BaseModel):
+    """Schema para resposta da ingestão em lote"""
+    total: int
+    inserted: int
+    failed: int
+    method: str
+    results: List[DiagnosticIngestResult]
+
+class MetricBatchIngestResponse(BaseModel):
+    """Schema para resposta da ingestão de um lote binário de métricas"""
+    devices: int
+    samples: int
+    inserted: int
+    failed: int
+    method: str
+    errors: List[DiagnosticIngestResult]
 
 class DiagnosticSummary(BaseModel):
     """Schema para resumo de diagnóstico"""
@@ -171,70 +383,435 @@ def diagnostics_health_check():
 
 # OUTROS ENDPOINTS (continuam na mesma ordem)
 
-@router.post("/run", response_model=DiagnosticResponse)
+@router.post("/run", response_model=DiagnosticJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def run_comprehensive_diagnostic(
     request: DiagnosticRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
     current_user: str = Depends(get_current_user_dependency())
 ):
     """
-    Executa um diagnóstico completo do sistema com IA integrada
+    Enfileira um diagnóstico completo do sistema com IA integrada.
+    
+    Retorna 202 imediatamente; o progresso é consultado em
+    ``GET /diagnostics/{diagnostic_id}/status``. Requisições repetidas com o
+    mesmo ``Idempotency-Key`` retornam o job já existente.
     """
+    if job_queue is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de diagnósticos indisponível"
+        )
+    
     try:
-        start_time = datetime.now()
         diagnostic_id = f"diag_{uuid.uuid4().hex[:12]}"
+        job = await asyncio.to_thread(
+            job_queue.enqueue,
+            DIAGNOSTIC_JOB_KIND,
+            {
+                "diagnostic_id": diagnostic_id,
+                "user_id": current_user,
+                "request": request.model_dump()
+            },
+            priority=request.priority,
+            idempotency_key=f"{current_user}:{idempotency_key}" if idempotency_key else None,
+            job_id=diagnostic_id
+        )
         
-        # Inicializar repositório
-        diagnostic_repo = DiagnosticRepository(db)
+        return DiagnosticJobResponse(
+            diagnostic_id=job.id,
+            job_id=job.id,
+            status=job.status,
+            priority=job.priority,
+            attempts=job.attempts,
+            status_url=STATUS_URL_TEMPLATE.format(diagnostic_id=job.id),
+            created_at=datetime.fromtimestamp(job.created_at)
+        )
         
-        # Criar registro de diagnóstico
-        diagnostic = diagnostic_repo.create_diagnostic(
-            user_id=current_user,
-            device_id=request.device_id or f"device_{uuid.uuid4().hex[:8]}",
-            status=DiagnosticStatus.IN_PROGRESS
+    except Exception as e:
+        logger.exception(f"Erro ao enfileirar diagnóstico: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao executar diagnóstico: {str(e)}"
         )
+
+@router.post("/run/stream")
+async def stream_comprehensive_diagnostic(
+    request: DiagnosticRequest,
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Executa o diagnóstico transmitindo cada componente via Server-Sent Events.
+    
+    Eventos: ``started``, um ``component`` por analisador na ordem em que
+    terminam e ``health`` com o score final.
+    """
+    diagnostic_id = f"diag_{uuid.uuid4().hex[:12]}"
+    
+    async def event_source():
+        async for event in _stream_component_results(request, diagnostic_id):
+            yield _format_sse(event["event"], event["data"])
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws/run")
+async def websocket_diagnostic(
+    websocket: WebSocket,
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """WebSocket que executa um diagnóstico e envia cada componente ao terminar
+    
+    O usuário é resolvido no handshake, antes do ``accept``: uma dependência
+    de autenticação que rejeite o cliente recusa a conexão sem rodar os
+    analisadores. Navegadores não enviam ``Authorization`` no handshake, então
+    o token deve vir no query param ``token``.
+    """
+    await websocket.accept()
+    try:
+        request = DiagnosticRequest(**json.loads(await websocket.receive_text()))
+        diagnostic_id = f"diag_{uuid.uuid4().hex[:12]}"
+        logger.info(f"Diagnóstico {diagnostic_id} via WebSocket para {current_user}")
         
-        # Executar diagnóstico baseado no nível
-        if request.diagnostic_level == "quick":
-            result = await _run_quick_diagnostic(request, diagnostic_id)
-        elif request.diagnostic_level == "standard":
-            result = await _run_standard_diagnostic(request, diagnostic_id)
-        else:  # comprehensive
-            result = await _run_comprehensive_diagnostic_internal(request, diagnostic_id)
+        async for event in _stream_component_results(request, diagnostic_id):
+            await websocket.send_text(json.dumps({"type": event["event"], **event["data"]}, default=str))
         
-        # Calcular tempo de execução
-        execution_time = (datetime.now() - start_time).total_seconds()
-        result["execution_time"] = execution_time
+        await websocket.close()
         
-        # Atualizar registro no banco
-        diagnostic_repo.update_diagnostic(
-            diagnostic_id=diagnostic.id,
-            user_id=current_user,
-            status=DiagnosticStatus.COMPLETED,
-            overall_health=result["overall_health"],
-            raw_data=result,
-            execution_time=execution_time
+    except WebSocketDisconnect:
+        logger.info("WebSocket de diagnóstico desconectado")
+    except Exception as e:
+        logger.error(f"Erro no WebSocket de diagnóstico: {e}")
+        await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+        await websocket.close()
+
+@router.post("/batch", response_model=BatchDiagnosticJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_batch_diagnostic(
+    request: BatchDiagnosticRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Enfileira diagnósticos para uma frota de dispositivos.
+    
+    O lote inteiro vira um único job: os dispositivos são executados com
+    concorrência limitada e os resultados são gravados em inserts em massa.
+    O progresso é consultado em ``GET /diagnostics/batch/{batch_id}``.
+    """
+    if job_queue is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de diagnósticos indisponível"
+        )
+    
+    device_ids = list(dict.fromkeys(request.device_ids))
+    if len(device_ids) > FLEET_BATCH_MAX_DEVICES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lote excede o limite de {FLEET_BATCH_MAX_DEVICES} dispositivos"
+        )
+    invalid_levels = {level for level in request.device_levels.values()
+                      if level not in ("quick", "standard", "comprehensive")}
+    if invalid_levels:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Níveis de diagnóstico inválidos: {sorted(invalid_levels)}"
+        )
+    
+    try:
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        devices = [
+            {"device_id": device_id,
+             "diagnostic_level": request.device_levels.get(device_id, request.diagnostic_level)}
+            for device_id in device_ids
+        ]
+        job = await asyncio.to_thread(
+            job_queue.enqueue,
+            BATCH_JOB_KIND,
+            {
+                "batch_id": batch_id,
+                "user_id": current_user,
+                "devices": devices,
+                "target_components": request.target_components
+            },
+            priority=request.priority,
+            idempotency_key=f"{current_user}:batch:{idempotency_key}" if idempotency_key else None,
+            job_id=batch_id
         )
         
-        # Agendar análise de IA em background se solicitado
-        if request.include_ai_analysis:
-            background_tasks.add_task(
-                _perform_ai_analysis, 
-                diagnostic.id, 
-                result, 
-                current_user
-            )
-        
-        return DiagnosticResponse(**result)
+        return BatchDiagnosticJobResponse(
+            batch_id=job.id,
+            status=job.status,
+            total_devices=len(job.payload["devices"]),
+            priority=job.priority,
+            status_url=BATCH_STATUS_URL_TEMPLATE.format(batch_id=job.id),
+            created_at=datetime.fromtimestamp(job.created_at)
+        )
         
     except Exception as e:
-        logger.exception(f"Erro ao executar diagnóstico: {e}")
+        logger.exception(f"Erro ao enfileirar lote de diagnósticos: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao executar diagnóstico: {str(e)}"
+            detail=f"Erro ao enfileirar lote de diagnósticos: {str(e)}"
         )
 
+@router.get("/batch/{batch_id}", response_model=BatchDiagnosticStatus)
+async def get_batch_diagnostic_status(
+    batch_id: str,
+    offset: int = 0,
+    limit: int = 500,
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Retorna os contadores de progresso e os resultados por dispositivo de um lote
+    """
+    job = await asyncio.to_thread(job_queue.get, batch_id) if job_queue is not None else None
+    if job is None or job.kind != BATCH_JOB_KIND or job.payload.get("user_id") != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lote não encontrado"
+        )
+    
+    total = len(job.payload["devices"])
+    progress = job.result or job.progress or {}
+    results = progress.get("results", [])
+    completed = progress.get("completed", 0)
+    failed = progress.get("failed", 0)
+    running = progress.get("running", 0) if job.status == JobStatus.RUNNING else 0
+    
+    return BatchDiagnosticStatus(
+        batch_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        total=total,
+        completed=completed,
+        failed=failed,
+        running=running,
+        pending=max(0, total - completed - failed - running),
+        persisted=progress.get("persisted", 0),
+        error=job.error,
+        created_at=datetime.fromtimestamp(job.created_at),
+        started_at=datetime.fromtimestamp(job.started_at) if job.started_at else None,
+        finished_at=datetime.fromtimestamp(job.finished_at) if job.finished_at else None,
+        results=results[max(0, offset):max(0, offset) + max(0, limit)]
+    )
+
+@router.post("/ingest", response_model=DiagnosticIngestResponse)
+async def ingest_diagnostics_batch(
+    request: DiagnosticIngestRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Grava em lote diagnósticos já executados pelos agentes de coleta.
+    
+    Cada item é validado isoladamente e o resultado traz, na ordem recebida,
+    o ID gravado ou o erro do item. Em PostgreSQL com o pool avançado ativo as
+    linhas são gravadas com COPY; nos demais casos com executemany.
+    """
+    if ingest_diagnostics is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestão de diagnósticos indisponível"
+        )
+    if len(request.items) > DIAGNOSTIC_INGEST_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lote excede o limite de {DIAGNOSTIC_INGEST_MAX_ITEMS} diagnósticos"
+        )
+    
+    # O dono é sempre o usuário autenticado, mesmo que o item traga outro user_id
+    items = [{**item, "user_id": current_user} for item in request.items]
+    try:
+        return await ingest_diagnostics(db, items, pool=await _get_ingest_pool(db))
+    except Exception as e:
+        logger.exception(f"Erro na ingestão de diagnósticos: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na ingestão de diagnósticos: {str(e)}"
+        )
+
+@router.post("/ingest/metrics", response_model=MetricBatchIngestResponse)
+async def ingest_metric_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Grava um lote binário de amostras de métricas enviado pelos agentes.
+    
+    O corpo é msgpack (``Content-Type: application/x-msgpack``), opcionalmente
+    comprimido com gzip ou zstd (``Content-Encoding``), com instantes em delta
+    e séries numéricas por métrica. Cada amostra vira um diagnóstico concluído
+    e alimenta os rollups e o estado de tendência do dispositivo.
+    """
+    if decode_metric_batch is None or write_ingest_batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestão de métricas indisponível"
+        )
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in MSGPACK_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type deve ser um de {list(MSGPACK_CONTENT_TYPES)}"
+        )
+    encoding = request.headers.get("content-encoding")
+    if (encoding or "identity").strip().lower() not in supported_encodings():
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Encoding deve ser um de {list(supported_encodings())}"
+        )
+    
+    body = await _read_body_capped(request, METRIC_BATCH_MAX_BYTES)
+    try:
+        # Descompressão e decodificação fora do event loop
+        rows = await asyncio.to_thread(
+            decode_metric_batch, body, encoding, current_user,
+            max_bytes=METRIC_BATCH_MAX_BYTES, max_samples=METRIC_BATCH_MAX_SAMPLES
+        )
+    except MetricBatchTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MetricBatchError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    batch = IngestBatch.from_rows(rows)
+    try:
+        method = await write_ingest_batch(db, batch, pool=await _get_ingest_pool(db))
+    except Exception as e:
+        logger.exception(f"Erro na ingestão de métricas: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na ingestão de métricas: {str(e)}"
+        )
+    summary = batch.summary(method)
+    return MetricBatchIngestResponse(
+        devices=len({row["device_id"] for row in rows}),
+        samples=summary["total"],
+        inserted=summary["inserted"],
+        failed=summary["failed"],
+        method=method,
+        errors=[result for result in summary["results"] if result["error"]]
+    )
+
+async def _read_body_capped(request: Request, max_bytes: int) -> bytes:
+    """Lê o corpo da requisição sem passar de ``max_bytes``.
+    
+    Rejeita pelo ``Content-Length`` antes de ler e, sem ele (chunked), para
+    de ler assim que o limite é ultrapassado.
+    
+    Raises:
+        HTTPException: 413 se o corpo passar do limite
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Corpo excede {max_bytes} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+async def _get_ingest_pool(db: AsyncSession):
+    """Pool avançado para o COPY, se ativo e apontando para PostgreSQL"""
+    if not DIAGNOSTIC_INGEST_USE_COPY or get_advanced_pool is None:
+        return None
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        return await get_advanced_pool()
+    except Exception:
+        return None
+
+@router.post("/fleet/risk/score", response_model=FleetRiskJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def score_fleet_risk(
+    request: FleetRiskScoreRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Enfileira a pontuação de risco de toda a frota
+    
+    O job recalcula o snapshot ``device_risk`` lido por ``GET /fleet/risk``.
+    """
+    if job_queue is None or FleetRiskScorer is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Pontuação de risco da frota indisponível"
+        )
+    
+    job = await asyncio.to_thread(
+        job_queue.enqueue,
+        FLEET_RISK_JOB_KIND,
+        {"user_id": current_user, **request.model_dump()},
+        idempotency_key=f"{current_user}:{idempotency_key}" if idempotency_key else None
+    )
+    return FleetRiskJobResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=FLEET_RISK_STATUS_URL_TEMPLATE.format(job_id=job.id),
+        created_at=datetime.fromtimestamp(job.created_at)
+    )
+
+@router.get("/fleet/risk/jobs/{job_id}", response_model=FleetRiskJobStatus)
+async def get_fleet_risk_job_status(
+    job_id: str,
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Retorna o status de uma pontuação de risco da frota
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id) if job_queue is not None else None
+    if job is None or job.kind != FLEET_RISK_JOB_KIND or job.payload.get("user_id") != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pontuação de risco não encontrada"
+        )
+    
+    return FleetRiskJobStatus(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        error=job.error,
+        created_at=datetime.fromtimestamp(job.created_at),
+        started_at=datetime.fromtimestamp(job.started_at) if job.started_at else None,
+        finished_at=datetime.fromtimestamp(job.finished_at) if job.finished_at else None,
+        result=job.result
+    )
+
+@router.get("/fleet/risk")
+async def get_fleet_risk(
+    risk_level: Optional[List[str]] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Retorna o snapshot de risco da frota, dos dispositivos mais críticos para os menos
+    
+    O snapshot cobre todos os dispositivos; cada usuário vê só os dispositivos
+    em que tem diagnósticos.
+    """
+    if get_device_risk_snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Snapshot de risco da frota indisponível"
+        )
+    
+    rows = await db.run_sync(
+        lambda session: get_device_risk_snapshot(session, risk_level, limit=limit, offset=offset, user_id=current_user)
+    )
+    return [row.to_dict() for row in rows]
+
 @router.post("/quick", response_model=DiagnosticResponse)
 async def run_quick_diagnostic(
     request: QuickDiagnosticRequest,
@@ -247,9 +824,10 @@ async def run_quick_diagnostic(
         start_time = datetime.now()
         diagnostic_id = f"quick_{uuid.uuid4().hex[:8]}"
         
-        # Coletar métricas básicas
-        metrics_collector = MetricsCollector()
-        system_metrics = await metrics_collector.collect_system_metrics()
+        # Coletar métricas básicas (snapshot em cache quando disponível)
+        system_metrics, snapshot_age = await _get_quick_metrics(
+            request.use_cached_snapshot, request.max_staleness_seconds
+        )
         
         # Analisar componentes solicitados
         components_analysis = {}
@@ -269,7 +847,8 @@ async def run_quick_diagnostic(
             overall_health=overall_health,
             components=components_analysis,
             recommendations=_generate_quick_recommendations(components_analysis),
-            execution_time=execution_time
+            execution_time=execution_time,
+            snapshot_age_seconds=snapshot_age
         )
         
     except Exception as e:
@@ -281,21 +860,37 @@ async def run_quick_diagnostic(
 
 @router.get("/history", response_model=List[DiagnosticSummary])
 async def get_diagnostic_history(
-    limit: int = 10,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    device_id: Optional[str] = None,
+    exact_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user_dependency())
 ):
     """
     Retorna o histórico de diagnósticos do usuário
+    
+    A paginação é por cursor: o cabeçalho ``X-Next-Cursor`` traz o valor a ser
+    enviado em ``cursor`` para a próxima página. ``X-Total-Count`` é estimado
+    (``X-Total-Is-Estimate: true``) a menos que ``exact_total`` seja pedido.
     """
     try:
-        diagnostic_repo = DiagnosticRepository(db)
-        diagnostics = diagnostic_repo.get_user_diagnostics(
+        diagnostic_repo = AsyncDiagnosticRepository(db)
+        page = await diagnostic_repo.get_diagnostics_keyset(
             user_id=current_user,
             limit=limit,
-            offset=offset
+            cursor=cursor,
+            filters={"device_id": device_id},
+            total="exact" if exact_total else "estimate"
         )
+        diagnostics = page.items
+        
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        if page.total is not None:
+            response.headers["X-Total-Count"] = str(page.total)
+            response.headers["X-Total-Is-Estimate"] = "true" if page.total_is_estimate else "false"
         
         return [
             DiagnosticSummary(
@@ -309,6 +904,11 @@ async def get_diagnostic_history(
             for diag in diagnostics
         ]
         
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Erro ao buscar histórico: {e}")
         raise HTTPException(
@@ -316,18 +916,94 @@ async def get_diagnostic_history(
             detail=f"Erro ao buscar histórico: {str(e)}"
         )
 
+@router.get("/devices/{device_id}/metrics")
+async def get_device_metrics(
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    metrics: Optional[List[str]] = Query(None),
+    resolution: Optional[str] = Query(None, pattern="^(1m|1h|1d)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Retorna a série de métricas do dispositivo a partir dos rollups
+    
+    Sem ``resolution``, usa o rollup mais grosso que ainda atende à janela
+    (padrão: últimos 7 dias).
+    """
+    if RollupService is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rollups de métricas indisponíveis"
+        )
+    
+    # Os rollups não guardam o usuário: a posse vem dos diagnósticos do dispositivo
+    if not await AsyncDiagnosticRepository(db).owns_device(current_user, device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dispositivo não encontrado"
+        )
+    
+    start = start or datetime.utcnow() - timedelta(days=7)
+    try:
+        result = await db.run_sync(
+            lambda session: RollupService(session).query(device_id, start, end, metrics=metrics, resolution=resolution)
+        )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Consulta de métricas inválida: {str(e)}"
+        )
+    
+    return {
+        "device_id": device_id,
+        "resolution": result["resolution"],
+        "series": {
+            metric: [bucket.to_dict() for bucket in buckets]
+            for metric, buckets in result["series"].items()
+        }
+    }
+
+@router.get("/{diagnostic_id}/status", response_model=DiagnosticJobStatus)
+async def get_diagnostic_status(
+    diagnostic_id: str,
+    current_user: str = Depends(get_current_user_dependency())
+):
+    """
+    Retorna o status de um diagnóstico enfileirado
+    """
+    job = await asyncio.to_thread(job_queue.get, diagnostic_id) if job_queue is not None else None
+    if job is None or job.kind != DIAGNOSTIC_JOB_KIND or job.payload.get("user_id") != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Diagnóstico não encontrado"
+        )
+    
+    return DiagnosticJobStatus(
+        diagnostic_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        error=job.error,
+        created_at=datetime.fromtimestamp(job.created_at),
+        started_at=datetime.fromtimestamp(job.started_at) if job.started_at else None,
+        finished_at=datetime.fromtimestamp(job.finished_at) if job.finished_at else None,
+        result=job.result
+    )
+
 @router.get("/{diagnostic_id}", response_model=DiagnosticResponse)
 async def get_diagnostic_details(
     diagnostic_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user_dependency())
 ):
     """
     Retorna detalhes de um diagnóstico específico
     """
     try:
-        diagnostic_repo = DiagnosticRepository(db)
-        diagnostic = diagnostic_repo.get_diagnostic(diagnostic_id)
+        diagnostic_repo = AsyncDiagnosticRepository(db)
+        diagnostic = await diagnostic_repo.get_by_id(diagnostic_id)
         
         if not diagnostic or str(diagnostic.user_id) != current_user:
             raise HTTPException(
@@ -361,15 +1037,15 @@ async def get_diagnostic_details(
 @router.delete("/{diagnostic_id}")
 async def delete_diagnostic(
     diagnostic_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user_dependency())
 ):
     """
     Remove um diagnóstico específico
     """
     try:
-        diagnostic_repo = DiagnosticRepository(db)
-        diagnostic = diagnostic_repo.get_diagnostic(diagnostic_id)
+        diagnostic_repo = AsyncDiagnosticRepository(db)
+        diagnostic = await diagnostic_repo.get_by_id(diagnostic_id)
         
         if not diagnostic or str(diagnostic.user_id) != current_user:
             raise HTTPException(
@@ -377,7 +1053,7 @@ async def delete_diagnostic(
                 detail="Diagnóstico não encontrado"
             )
         
-        diagnostic_repo.delete_diagnostic(diagnostic_id)
+        await diagnostic_repo.delete(diagnostic_id)
         
         return {"message": "Diagnóstico removido com sucesso"}
         
@@ -394,15 +1070,15 @@ async def delete_diagnostic(
 async def get_diagnostic_report(
     diagnostic_id: str,
     format: str = "json",
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user_dependency())
 ):
     """
     Gera relatório detalhado de um diagnóstico
     """
     try:
-        diagnostic_repo = DiagnosticRepository(db)
-        diagnostic = diagnostic_repo.get_diagnostic(diagnostic_id)
+        diagnostic_repo = AsyncDiagnosticRepository(db)
+        diagnostic = await diagnostic_repo.get_by_id(diagnostic_id)
         
         if not diagnostic or str(diagnostic.user_id) != current_user:
             raise HTTPException(
@@ -440,10 +1116,260 @@ async def get_diagnostic_report(
 
 # Funções auxiliares
 
+async def _execute_diagnostic_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um diagnóstico enfileirado (handler da fila de jobs)"""
+    start_time = datetime.now()
+    diagnostic_id = payload["diagnostic_id"]
+    user_id = payload["user_id"]
+    request = DiagnosticRequest(**payload["request"])
+    
+    # Executar diagnóstico baseado no nível; o job usa o ID do diagnóstico
+    result = await _run_with_lease(diagnostic_id, _run_diagnostic_level(request, diagnostic_id))
+    
+    # Calcular tempo de execução
+    execution_time = (datetime.now() - start_time).total_seconds()
+    result["execution_time"] = execution_time
+    
+    response = DiagnosticResponse(**result).model_dump(mode="json")
+    # Falhas do banco sobem para a fila, que repete o job com backoff
+    _persist_diagnostic_result(diagnostic_id, request, user_id, response, execution_time)
+    
+    # Agendar análise de IA como job próprio se solicitado
+    if request.include_ai_analysis and job_queue is not None:
+        await asyncio.to_thread(
+            job_queue.enqueue,
+            AI_ANALYSIS_JOB_KIND,
+            {"diagnostic_id": diagnostic_id, "user_id": user_id, "diagnostic_data": result},
+            priority=request.priority - 1,
+            idempotency_key=f"{diagnostic_id}:ai"
+        )
+    
+    return response
+
+async def _run_with_lease(job_id: str, coro: Any) -> Any:
+    """Executa a corrotina renovando o lease do job enquanto ela roda.
+    
+    Sem a renovação, um diagnóstico completo mais longo que o lease voltaria
+    a ser reservado e executado em paralelo por outro worker. Se o lease for
+    perdido mesmo assim, a execução é cancelada.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id) if job_queue is not None else None
+    if job is None or job.worker is None:
+        return await coro
+    
+    task = asyncio.ensure_future(coro)
+    interval = job_queue.lease / 3
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            return task.result()
+        try:
+            await asyncio.to_thread(job_queue.renew_lease, job_id, job.worker)
+        except LeaseLostError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+
+def _persist_diagnostic_result(diagnostic_id: str, request: DiagnosticRequest, user_id: str,
+                               result: Dict[str, Any], execution_time: float):
+    """Grava o resultado no banco com o mesmo ID do job.
+    
+    A linha é criada só se ainda não existir, então um retry do job depois
+    de uma falha no meio da gravação apenas a completa.
+    """
+    db = create_session_factory()()
+    try:
+        diagnostic_repo = DiagnosticRepository(db)
+        if diagnostic_repo.get_by_id(diagnostic_id) is None:
+            diagnostic_repo.create({
+                "id": diagnostic_id,
+                "user_id": user_id,
+                "device_id": request.device_id or f"device_{uuid.uuid4().hex[:8]}",
+                "status": DiagnosticStatus.IN_PROGRESS
+            })
+        diagnostic_repo.update(diagnostic_id, {
+            "status": DiagnosticStatus.COMPLETED,
+            "overall_health": result["overall_health"],
+            "raw_data": result,
+            "execution_time": execution_time
+        })
+    finally:
+        db.close()
+
+async def _execute_ai_analysis_job(payload: Dict[str, Any]):
+    """Executa a análise de IA enfileirada (handler da fila de jobs)"""
+    await _perform_ai_analysis(payload["diagnostic_id"], payload["diagnostic_data"], payload["user_id"])
+
+async def _run_diagnostic_level(request: DiagnosticRequest, diagnostic_id: str) -> Dict[str, Any]:
+    """Executa o diagnóstico do nível solicitado"""
+    if request.diagnostic_level == "quick":
+        return await _run_quick_diagnostic(request, diagnostic_id)
+    elif request.diagnostic_level == "standard":
+        return await _run_standard_diagnostic(request, diagnostic_id)
+    else:  # comprehensive
+        return await _run_comprehensive_diagnostic_internal(request, diagnostic_id)
+
+async def _execute_batch_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um lote de diagnósticos (handler da fila de jobs).
+    
+    No máximo ``FLEET_BATCH_CONCURRENCY`` dispositivos rodam ao mesmo tempo.
+    Os resultados são acumulados e gravados a cada ``FLEET_BATCH_INSERT_SIZE``
+    com um único INSERT; o progresso do job é atualizado após cada gravação,
+    então um retry retoma o lote pulando os dispositivos já gravados.
+    """
+    start_time = time.perf_counter()
+    batch_id = payload["batch_id"]
+    user_id = payload["user_id"]
+    target_components = payload.get("target_components")
+    
+    previous = await asyncio.to_thread(job_queue.get, batch_id) if job_queue is not None else None
+    progress = dict((previous.progress if previous else None) or {})
+    # Worker que reservou o lote: o progresso só é gravado enquanto ele detém o lease
+    worker = previous.worker if previous else None
+    results: List[Dict[str, Any]] = list(progress.get("results", []))
+    done = {result["device_id"] for result in results}
+    counters = {
+        "completed": sum(1 for r in results if r["status"] == DiagnosticStatus.COMPLETED),
+        "failed": sum(1 for r in results if r["status"] != DiagnosticStatus.COMPLETED),
+        "persisted": progress.get("persisted", 0),
+        "running": 0
+    }
+    # A posição no payload define o ID do diagnóstico, estável entre tentativas
+    devices = [(index, device) for index, device in enumerate(payload["devices"])
+               if device["device_id"] not in done]
+    
+    semaphore = asyncio.Semaphore(max(1, FLEET_BATCH_CONCURRENCY))
+    pending_rows: List[Dict[str, Any]] = []
+    pending_results: List[Dict[str, Any]] = []
+    
+    async def run_device(index: int, device: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        async with semaphore:
+            counters["running"] += 1
+            try:
+                return await _run_batch_device(batch_id, index, device, user_id, target_components)
+            finally:
+                counters["running"] -= 1
+    
+    async def flush():
+        if not pending_rows:
+            return
+        rows, summaries = list(pending_rows), list(pending_results)
+        pending_rows.clear()
+        pending_results.clear()
+        counters["persisted"] += await asyncio.to_thread(_persist_batch_rows, batch_id, rows)
+        results.extend(summaries)
+        if job_queue is not None:
+            await asyncio.to_thread(job_queue.update_progress, batch_id, _batch_progress(counters, results), worker)
+    
+    tasks = [run_device(index, device) for index, device in devices]
+    for next_result in asyncio.as_completed(tasks):
+        row, summary = await next_result
+        counters["completed" if summary["status"] == DiagnosticStatus.COMPLETED else "failed"] += 1
+        pending_rows.append(row)
+        pending_results.append(summary)
+        if len(pending_rows) >= FLEET_BATCH_INSERT_SIZE:
+            await flush()
+    await flush()
+    
+    aggregate = _batch_progress(counters, results)
+    aggregate.update({
+        "batch_id": batch_id,
+        "total": len(payload["devices"]),
+        "execution_time": time.perf_counter() - start_time
+    })
+    logger.info(f"Lote {batch_id} concluído: {counters['completed']} ok, {counters['failed']} falhas")
+    return aggregate
+
+async def _run_batch_device(batch_id: str, index: int, device: Dict[str, Any], user_id: str,
+                            target_components: Optional[List[str]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Executa o diagnóstico de um dispositivo do lote.
+    
+    Returns:
+        Tupla com a linha a ser inserida e o resumo do dispositivo
+    """
+    started = time.perf_counter()
+    # ID determinístico: um retry do lote não duplica diagnósticos
+    diagnostic_id = f"{batch_id}_{index}"
+    request = DiagnosticRequest(
+        device_id=device["device_id"],
+        diagnostic_level=device["diagnostic_level"],
+        target_components=target_components or ["cpu", "memory", "disk", "network"],
+        include_ai_analysis=False
+    )
+    try:
+        result = await _run_diagnostic_level(request, diagnostic_id)
+        execution_time = time.perf_counter() - started
+        result["execution_time"] = execution_time
+        raw_data = DiagnosticResponse(**result).model_dump(mode="json")
+        status_value, overall_health, error = DiagnosticStatus.COMPLETED, raw_data["overall_health"], None
+    except Exception as e:
+        logger.warning(f"Diagnóstico do dispositivo {device['device_id']} no lote {batch_id} falhou: {e}")
+        execution_time = time.perf_counter() - started
+        raw_data, status_value, overall_health, error = None, DiagnosticStatus.FAILED, None, str(e)
+    
+    row = {
+        "id": diagnostic_id,
+        "user_id": user_id,
+        "device_id": device["device_id"],
+        "status": status_value,
+        "overall_health": overall_health,
+        "raw_data": raw_data,
+        "error_message": error,
+        "execution_time": execution_time
+    }
+    summary = {
+        "device_id": device["device_id"],
+        "diagnostic_id": diagnostic_id,
+        "diagnostic_level": device["diagnostic_level"],
+        "status": status_value,
+        "overall_health": overall_health,
+        "execution_time": execution_time,
+        "error": error
+    }
+    return row, summary
+
+def _batch_progress(counters: Dict[str, int], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o registro de progresso/resultado do lote"""
+    return {
+        "completed": counters["completed"],
+        "failed": counters["failed"],
+        "running": counters["running"],
+        "persisted": counters["persisted"],
+        "results": results
+    }
+
+def _execute_fleet_risk_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Recalcula o snapshot de risco da frota (handler da fila de jobs)"""
+    db = create_session_factory()()
+    try:
+        return FleetRiskScorer(db).score_all(payload.get("time_window_days"), payload.get("source", "auto"))
+    finally:
+        db.close()
+
+def _persist_batch_rows(batch_id: str, rows: List[Dict[str, Any]]) -> int:
+    """Grava um bloco de resultados do lote com um único INSERT.
+    
+    Erros do banco sobem para a fila, que repete o lote; os dispositivos do
+    bloco não entram no progresso e rodam de novo no retry. Linhas que já
+    existem (bloco gravado numa tentativa que caiu antes de registrar o
+    progresso) não são inseridas outra vez.
+    
+    Returns:
+        Número de linhas do bloco gravadas no banco
+    """
+    db = create_session_factory()()
+    try:
+        repository = DiagnosticRepository(db)
+        existing = repository.get_existing_ids(row["id"] for row in rows)
+        if existing:
+            logger.info(f"Lote {batch_id}: {len(existing)} diagnósticos já gravados numa tentativa anterior")
+        return repository.bulk_create([row for row in rows if row["id"] not in existing]) + len(existing)
+    finally:
+        db.close()
+
 async def _run_quick_diagnostic(request: DiagnosticRequest, diagnostic_id: str) -> Dict[str, Any]:
     """Executa diagnóstico rápido"""
-    metrics_collector = MetricsCollector()
-    system_metrics = await metrics_collector.collect_system_metrics()
+    system_metrics, snapshot_age = await _get_quick_metrics()
     
     components_analysis = {}
     overall_health = 100
@@ -459,29 +1385,39 @@ async def _run_quick_diagnostic(request: DiagnosticRequest, diagnostic_id: str)
         "status": "completed",
         "overall_health": overall_health,
         "components": components_analysis,
-        "recommendations": _generate_quick_recommendations(components_analysis)
+        "recommendations": _generate_quick_recommendations(components_analysis),
+        "snapshot_age_seconds": snapshot_age
     }
 
+async def _get_quick_metrics(
+    use_cached_snapshot: bool = True,
+    max_staleness_seconds: Optional[float] = None
+) -> Tuple[Dict[str, Any], Optional[float]]:
+    """Obtém métricas para o diagnóstico rápido.
+    
+    Usa o último snapshot do amostrador compartilhado quando ele não é mais
+    antigo que o limite de staleness; caso contrário coleta um snapshot novo.
+    
+    Returns:
+        Tupla com as métricas e a idade do snapshot em segundos
+    """
+    if max_staleness_seconds is None:
+        max_staleness_seconds = QUICK_DIAGNOSTIC_MAX_STALENESS
+    
+    if system_sampler is not None:
+        snapshot = system_sampler.latest(max_age=max_staleness_seconds) if use_cached_snapshot else None
+        if snapshot is None:
+            # Coleta do psutil (e o prime da primeira amostra) fora do event loop
+            snapshot = await asyncio.to_thread(system_sampler.sample)
+        return snapshot.to_dict(), round(snapshot.age, 3)
+    
+    metrics_collector = MetricsCollector()
+    system_metrics = await metrics_collector.collect_system_metrics()
+    return system_metrics, 0.0
+
 async def _run_standard_diagnostic(request: DiagnosticRequest, diagnostic_id: str) -> Dict[str, Any]:
     """Executa diagnóstico padrão"""
-    # Inicializar analisadores
-    cpu_analyzer = CPUAnalyzer()
-    memory_analyzer = MemoryAnalyzer()
-    disk_analyzer = DiskAnalyzer()
-    network_analyzer = NetworkAnalyzer()
-    
-    # Executar análises
-    cpu_result = cpu_analyzer.analyze()
-    memory_result = memory_analyzer.analyze()
-    disk_result = disk_analyzer.analyze()
-    network_result = network_analyzer.analyze()
-    
-    components_analysis = {
-        "cpu": cpu_result,
-        "memory": memory_result,
-        "disk": disk_result,
-        "network": network_result
-    }
+    components_analysis = await _run_components(_level_analyzers("standard"))
     
     overall_health = _calculate_health_score(components_analysis)
     
@@ -496,37 +1432,14 @@ async def _run_standard_diagnostic(request: DiagnosticRequest, diagnostic_id: st
 
 async def _run_comprehensive_diagnostic_internal(request: DiagnosticRequest, diagnostic_id: str) -> Dict[str, Any]:
     """Executa diagnóstico completo com todos os analisadores"""
-    # Inicializar todos os analisadores
-    cpu_analyzer = CPUAnalyzer()
-    memory_analyzer = MemoryAnalyzer()
-    disk_analyzer = DiskAnalyzer()
-    network_analyzer = NetworkAnalyzer()
-    antivirus_analyzer = AntivirusAnalyzer()
-    driver_analyzer = DriverAnalyzer()
-    system_info_service = SystemInfoService()
-    
-    # Executar análises
-    cpu_result = cpu_analyzer.analyze()
-    memory_result = memory_analyzer.analyze()
-    disk_result = disk_analyzer.analyze()
-    network_result = network_analyzer.analyze()
-    antivirus_result = antivirus_analyzer.analyze()
-    driver_result = driver_analyzer.analyze()
-    
-    # Coletar informações do sistema
-    system_info = system_info_service.collect_system_info()
+    # Analisadores e coleta de informações do sistema rodam em paralelo fora do event loop
+    components_analysis, system_info = await asyncio.gather(
+        _run_components(_level_analyzers("comprehensive")),
+        asyncio.to_thread(SystemInfoService().collect_system_info)
+    )
     if request.system_info:
         system_info.update(request.system_info)
-    
-    components_analysis = {
-        "cpu": cpu_result,
-        "memory": memory_result,
-        "disk": disk_result,
-        "network": network_result,
-        "antivirus": antivirus_result,
-        "drivers": driver_result,
-        "system_info": system_info
-    }
+    components_analysis["system_info"] = system_info
     
     overall_health = _calculate_health_score(components_analysis)
     
@@ -539,6 +1452,111 @@ async def _run_comprehensive_diagnostic_internal(request: DiagnosticRequest, dia
         "recommendations": _generate_comprehensive_recommendations(components_analysis)
     }
 
+def _level_analyzers(diagnostic_level: str, target_components: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Analisadores de cada nível de diagnóstico.
+    
+    Usado pelo streaming e pelos níveis padrão e completo: o nível define os
+    analisadores disponíveis, ``target_components`` escolhe entre eles e o
+    diagnóstico rápido fica limitado aos dois primeiros componentes.
+    
+    Args:
+        diagnostic_level: quick, standard ou comprehensive
+        target_components: Componentes pedidos (padrão: todos os do nível)
+        
+    Returns:
+        Mapeamento componente -> classe do analisador, na ordem pedida
+    """
+    analyzers = {
+        "cpu": CPUAnalyzer,
+        "memory": MemoryAnalyzer,
+        "disk": DiskAnalyzer,
+        "network": NetworkAnalyzer
+    }
+    if diagnostic_level == "comprehensive":
+        analyzers["antivirus"] = AntivirusAnalyzer
+        analyzers["drivers"] = DriverAnalyzer
+    if target_components is not None:
+        analyzers = {name: analyzers[name] for name in dict.fromkeys(target_components) if name in analyzers}
+    if diagnostic_level == "quick":
+        analyzers = dict(list(analyzers.items())[:2])
+    return analyzers
+
+def _run_analyzer_blocking(analyzer_class) -> Dict[str, Any]:
+    """Executa um analisador (síncrono ou assíncrono) fora do event loop"""
+    result = analyzer_class().analyze()
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    return result
+
+async def _run_component(component: str, analyzer_class) -> Tuple[str, Dict[str, Any]]:
+    """Executa um analisador no executor compartilhado com timeout.
+    
+    Analisadores que falham ou excedem o timeout viram um resultado com
+    status ``error`` ou ``timed_out`` em vez de derrubar o diagnóstico.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(get_analyzer_executor(), _run_analyzer_blocking, analyzer_class),
+            timeout=STREAM_ANALYZER_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        result = {"status": "timed_out", "error_message": f"Analyzer did not finish within {STREAM_ANALYZER_TIMEOUT}s"}
+    except Exception as e:
+        logger.error(f"Erro no analisador {component}: {e}")
+        result = {"status": "error", "error_message": str(e)}
+    return component, result
+
+async def _run_components(analyzers: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Executa os analisadores em paralelo e devolve os resultados na ordem pedida"""
+    results = await asyncio.gather(*(_run_component(name, cls) for name, cls in analyzers.items()))
+    return dict(results)
+
+async def _stream_component_results(request: DiagnosticRequest, diagnostic_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Executa os analisadores em paralelo e produz um evento por componente concluído.
+    
+    Os analisadores rodam no executor compartilhado, então um analisador
+    lento não bloqueia o event loop nem atrasa os demais. Componentes que
+    excedem o timeout são emitidos com status ``timed_out``.
+    """
+    start = time.monotonic()
+    # Sem target_components explícito, os níveis padrão e completo transmitem todos os seus analisadores
+    explicit = "target_components" in request.model_fields_set or request.diagnostic_level == "quick"
+    analyzers = _level_analyzers(request.diagnostic_level, request.target_components if explicit else None)
+    
+    yield {"event": "started", "data": {
+        "diagnostic_id": diagnostic_id,
+        "components": list(analyzers.keys()),
+        "timestamp": datetime.now().isoformat()
+    }}
+    
+    tasks = [asyncio.ensure_future(_run_component(name, cls)) for name, cls in analyzers.items()]
+    components_analysis = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            component, result = await next_done
+            components_analysis[component] = result
+            yield {"event": "component", "data": {
+                "diagnostic_id": diagnostic_id,
+                "component": component,
+                "result": result,
+                "elapsed_seconds": round(time.monotonic() - start, 3)
+            }}
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    yield {"event": "health", "data": {
+        "diagnostic_id": diagnostic_id,
+        "overall_health": _calculate_health_score(components_analysis),
+        "recommendations": _generate_comprehensive_recommendations(components_analysis),
+        "execution_time": round(time.monotonic() - start, 3)
+    }}
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 async def _analyze_component_quick(component: str, system_metrics: Dict[str, Any]) -> Dict[str, Any]:
     """Análise rápida de componente"""
     component_data = system_metrics.get(component, {})
@@ -665,3 +1683,9 @@ async def _perform_ai_analysis(diagnostic_id: str, diagnostic_data: Dict[str, An
     except Exception as e:
         logger.error(f"Erro na análise de IA: {e}")
 
+if job_queue is not None:
+    job_queue.register(DIAGNOSTIC_JOB_KIND, _execute_diagnostic_job)
+    job_queue.register(AI_ANALYSIS_JOB_KIND, _execute_ai_analysis_job)
+    job_queue.register(BATCH_JOB_KIND, _execute_batch_job)
+    if FleetRiskScorer is not None:
+        job_queue.register(FLEET_RISK_JOB_KIND, _execute_fleet_risk_job)
@@ -21,6 +21,7 @@ from typing import Dict, Any
 # Importações locais
 from .config import settings, validate_environment, apply_environment_config
 from .router import api_router
+from .database import close_async_database_connections
 from app.middleware.logging_middleware import StructuredLoggingMiddleware, RequestContextMiddleware
 from app.core.logging import setup_logging, get_logger
 
@@ -94,6 +95,7 @@ async def cleanup_components():
     """Limpa recursos da aplicação"""
     logger.info("Fechando conexões de banco de dados...")
     # await close_database_connections()
+    await close_async_database_connections()
     
     logger.info("Fechando conexões Redis...")
     # await close_redis_connections()
@@ -11,6 +11,8 @@ import psutil
 import asyncio
 from typing import Dict, Any
 
+from app.core.system_sampler import system_sampler
+
 # Importar schemas e utilitários
 try:
     from app.schemas.api_contracts import ApiResponse
@@ -215,15 +217,17 @@ async def performance_metrics(request: Request) -> Dict[str, Any]:
 async def _collect_system_metrics() -> Dict[str, Any]:
     """Coletar métricas do sistema"""
     try:
+        snapshot = system_sampler.snapshot()
+        
         # CPU
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        cpu_count = psutil.cpu_count()
+        cpu_percent = snapshot.cpu_percent
+        cpu_count = snapshot.cpu_count
         
         # Memória
-        memory = psutil.virtual_memory()
+        memory = snapshot.memory
         
         # Disco
-        disk = psutil.disk_usage('/')
+        disk = snapshot.disk
         
         return {
             "cpu_usage_percent": cpu_percent,
@@ -13,6 +13,8 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import psutil
 
+from app.core.system_sampler import system_sampler
+
 logger = logging.getLogger(__name__)
 
 
@@ -69,26 +71,21 @@ class MetricsCollector:
     async def collect_system_metrics(self) -> Dict[str, Any]:
         """Coleta m√©tricas detalhadas do sistema"""
         try:
-            # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_count = psutil.cpu_count()
-            cpu_freq = psutil.cpu_freq()
-            
-            # Mem√≥ria
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            # Snapshot compartilhado (CPU, mem√≥ria, disco, rede, processos)
+            snapshot = system_sampler.snapshot()
+            cpu_percent = snapshot.cpu_percent
+            cpu_count = snapshot.cpu_count
+            cpu_freq = snapshot.cpu_freq
+            memory = snapshot.memory
+            swap = snapshot.swap
+            disk_usage = snapshot.disk
+            disk_io = snapshot.disk_io
+            network_io = snapshot.net_io
+            process_count = snapshot.process_count
             
-            # Disco
-            disk_usage = psutil.disk_usage('/')
-            disk_io = psutil.disk_io_counters()
-            
-            # Rede
-            network_io = psutil.net_io_counters()
+            # Conex√µes de rede n√£o fazem parte do snapshot
             network_connections = len(psutil.net_connections())
             
-            # Processos
-            process_count = len(psutil.pids())
-            
             metrics = {
                 "timestamp": datetime.now().isoformat(),
                 "cpu": {
@@ -299,6 +299,22 @@ class AdvancedConnectionPool:
                     results.append([dict(row) for row in result])
                 return results
     
+    async def copy_records(self, copies: List[tuple]) -> int:
+        """Grava registros com COPY em uma única transação
+        
+        Cada item de ``copies`` é ``(tabela, colunas, registros)``; as tabelas
+        são gravadas na ordem recebida (pais antes dos filhos).
+        """
+        total = 0
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                for table, columns, records in copies:
+                    if not records:
+                        continue
+                    await conn.copy_records_to_table(table, columns=columns, records=records)
+                    total += len(records)
+        return total
+    
     async def _health_check_loop(self):
         """Loop de health check em background"""
         while True:
@@ -67,6 +67,9 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = Field(default=20, env="DB_MAX_OVERFLOW")
     DB_POOL_TIMEOUT: int = Field(default=30, env="DB_POOL_TIMEOUT")
     DB_POOL_RECYCLE: int = Field(default=3600, env="DB_POOL_RECYCLE")
+    ASYNC_DATABASE_URL: Optional[str] = Field(default=None, env="ASYNC_DATABASE_URL")
+    ASYNC_DB_POOL_SIZE: int = Field(default=20, env="ASYNC_DB_POOL_SIZE")
+    ASYNC_DB_MAX_OVERFLOW: int = Field(default=10, env="ASYNC_DB_MAX_OVERFLOW")
     
     # Configurações de armazenamento
     REPORT_STORAGE_PATH: str = Field(default="/tmp/reports", env="REPORT_STORAGE_PATH")
@@ -105,6 +108,39 @@ class Settings(BaseSettings):
                 return int(v[:-1])
             return int(v)
         return v
+    
+    # Amostrador compartilhado de métricas do sistema
+    SYSTEM_SAMPLER_ENABLED: bool = Field(default=True, env="SYSTEM_SAMPLER_ENABLED")
+    SYSTEM_SAMPLER_INTERVAL_SECONDS: float = Field(default=1.0, env="SYSTEM_SAMPLER_INTERVAL_SECONDS")
+    SYSTEM_SAMPLER_HISTORY_SIZE: int = Field(default=300, env="SYSTEM_SAMPLER_HISTORY_SIZE")
+    SYSTEM_SAMPLER_DISK_PATH: str = Field(default="/", env="SYSTEM_SAMPLER_DISK_PATH")
+    QUICK_DIAGNOSTIC_MAX_STALENESS_SECONDS: float = Field(default=5.0, env="QUICK_DIAGNOSTIC_MAX_STALENESS_SECONDS")
+    
+    # Fila de jobs de diagnóstico (SQLite local, sem broker externo)
+    JOB_QUEUE_ENABLED: bool = Field(default=True, env="JOB_QUEUE_ENABLED")
+    JOB_QUEUE_PATH: str = Field(default="./data/jobs.db", env="JOB_QUEUE_PATH")
+    JOB_QUEUE_WORKERS: int = Field(default=4, env="JOB_QUEUE_WORKERS")
+    JOB_QUEUE_MAX_ATTEMPTS: int = Field(default=3, env="JOB_QUEUE_MAX_ATTEMPTS")
+    JOB_QUEUE_RETRY_BACKOFF_SECONDS: float = Field(default=2.0, env="JOB_QUEUE_RETRY_BACKOFF_SECONDS")
+    JOB_QUEUE_RETRY_BACKOFF_MAX_SECONDS: float = Field(default=60.0, env="JOB_QUEUE_RETRY_BACKOFF_MAX_SECONDS")
+    JOB_QUEUE_POLL_INTERVAL_SECONDS: float = Field(default=0.5, env="JOB_QUEUE_POLL_INTERVAL_SECONDS")
+    JOB_QUEUE_LEASE_SECONDS: float = Field(default=300.0, env="JOB_QUEUE_LEASE_SECONDS")
+    JOB_QUEUE_RETENTION_DAYS: float = Field(default=7.0, env="JOB_QUEUE_RETENTION_DAYS")
+    JOB_QUEUE_PRUNE_INTERVAL_SECONDS: float = Field(default=3600.0, env="JOB_QUEUE_PRUNE_INTERVAL_SECONDS")
+    
+    # Diagnósticos em lote para a frota de dispositivos
+    FLEET_BATCH_CONCURRENCY: int = Field(default=32, env="FLEET_BATCH_CONCURRENCY")
+    FLEET_BATCH_MAX_DEVICES: int = Field(default=10000, env="FLEET_BATCH_MAX_DEVICES")
+    FLEET_BATCH_INSERT_SIZE: int = Field(default=200, env="FLEET_BATCH_INSERT_SIZE")
+    
+    # Ingestão em massa de diagnósticos (COPY no PostgreSQL, executemany nos demais)
+    DIAGNOSTIC_INGEST_MAX_ITEMS: int = Field(default=5000, env="DIAGNOSTIC_INGEST_MAX_ITEMS")
+    DIAGNOSTIC_INGEST_USE_COPY: bool = Field(default=True, env="DIAGNOSTIC_INGEST_USE_COPY")
+    
+    # Lotes binários de métricas dos agentes (limite de bytes antes e depois da descompressão)
+    METRIC_BATCH_MAX_SAMPLES: int = Field(default=50000, env="METRIC_BATCH_MAX_SAMPLES")
+    METRIC_BATCH_MAX_BYTES: int = Field(default=16 * 1024 * 1024, env="METRIC_BATCH_MAX_BYTES")
+    
     ALERT_WEBHOOK_URL: Optional[str] = Field(default=None, env="ALERT_WEBHOOK_URL")
     LOG_RETENTION_DAYS: int = Field(default=30, env="LOG_RETENTION_DAYS")
     ENABLE_PERFORMANCE_PROFILING: bool = Field(default=False, env="ENABLE_PERFORMANCE_PROFILING")
@@ -188,6 +224,62 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_DIAGNOSTICS: int = Field(default=5, env="MAX_CONCURRENT_DIAGNOSTICS")
     DIAGNOSTIC_TIMEOUT_SECONDS: int = Field(default=300, env="DIAGNOSTIC_TIMEOUT_SECONDS")
     DIAGNOSTIC_MAX_HISTORY: int = Field(default=100, env="DIAGNOSTIC_MAX_HISTORY")
+    DIAGNOSTIC_CONCURRENT_ANALYZERS: bool = Field(default=True, env="DIAGNOSTIC_CONCURRENT_ANALYZERS")
+    DIAGNOSTIC_ANALYZER_WORKERS: int = Field(default=8, env="DIAGNOSTIC_ANALYZER_WORKERS")
+    DIAGNOSTIC_ANALYZER_TIMEOUT_SECONDS: float = Field(default=15.0, env="DIAGNOSTIC_ANALYZER_TIMEOUT_SECONDS")
+    DIAGNOSTIC_RUN_DEADLINE_SECONDS: float = Field(default=30.0, env="DIAGNOSTIC_RUN_DEADLINE_SECONDS")
+    DIAGNOSTIC_UNIT_OF_WORK: bool = Field(default=False, env="DIAGNOSTIC_UNIT_OF_WORK")
+    DIAGNOSTIC_PROGRESS_CHECKPOINT: bool = Field(default=True, env="DIAGNOSTIC_PROGRESS_CHECKPOINT")
+    DIAGNOSTIC_COUNT_ESTIMATE_CAP: int = Field(default=10000, env="DIAGNOSTIC_COUNT_ESTIMATE_CAP")
+    
+    # raw_data em blocos deduplicados e comprimidos
+    RAW_DATA_BLOB_STORE_ENABLED: bool = Field(default=True, env="RAW_DATA_BLOB_STORE_ENABLED")
+    RAW_DATA_COMPRESSION: str = Field(default="zstd", env="RAW_DATA_COMPRESSION")
+    RAW_DATA_CHUNK_MIN_BYTES: int = Field(default=256, env="RAW_DATA_CHUNK_MIN_BYTES")
+    RAW_DATA_CHUNK_MAX_DEPTH: int = Field(default=3, env="RAW_DATA_CHUNK_MAX_DEPTH")
+    RAW_DATA_BLOB_CACHE_SIZE: int = Field(default=2048, env="RAW_DATA_BLOB_CACHE_SIZE")
+    RAW_DATA_BLOB_GC_GRACE_SECONDS: float = Field(default=3600.0, env="RAW_DATA_BLOB_GC_GRACE_SECONDS")
+    
+    # Rollups de métricas por dispositivo (1 minuto, 1 hora, 1 dia)
+    METRIC_ROLLUPS_ENABLED: bool = Field(default=True, env="METRIC_ROLLUPS_ENABLED")
+    METRIC_ROLLUP_MIN_POINTS: int = Field(default=24, env="METRIC_ROLLUP_MIN_POINTS")
+    METRIC_ROLLUP_MINUTE_RETENTION_DAYS: int = Field(default=7, env="METRIC_ROLLUP_MINUTE_RETENTION_DAYS")
+    METRIC_ROLLUP_HOUR_RETENTION_DAYS: int = Field(default=180, env="METRIC_ROLLUP_HOUR_RETENTION_DAYS")
+    
+    # Motor de tendências da análise preditiva
+    PREDICTIVE_SERIES_POINTS: int = Field(default=200, env="PREDICTIVE_SERIES_POINTS")
+    PREDICTIVE_EWMA_ALPHA: float = Field(default=0.3, env="PREDICTIVE_EWMA_ALPHA")
+    FLEET_RISK_WINDOW_DAYS: int = Field(default=30, env="FLEET_RISK_WINDOW_DAYS")
+    FLEET_RISK_CHUNK_DEVICES: int = Field(default=5000, env="FLEET_RISK_CHUNK_DEVICES")
+    TREND_STATE_ENABLED: bool = Field(default=True, env="TREND_STATE_ENABLED")
+    TREND_STATE_WINDOW: int = Field(default=30, env="TREND_STATE_WINDOW")
+    
+    # Store colunar local (memmap) do histórico de métricas por dispositivo
+    TELEMETRY_STORE_ENABLED: bool = Field(default=False, env="TELEMETRY_STORE_ENABLED")
+    TELEMETRY_STORE_PATH: str = Field(default="/var/lib/techze/telemetry", env="TELEMETRY_STORE_PATH")
+    TELEMETRY_STORE_SHARDS: int = Field(default=256, env="TELEMETRY_STORE_SHARDS")
+
+    # Linhas de base em streaming do detector de anomalias
+    ANOMALY_BASELINE_ALPHA: float = Field(default=0.05, env="ANOMALY_BASELINE_ALPHA")
+    ANOMALY_BASELINE_MIN_SAMPLES: int = Field(default=30, env="ANOMALY_BASELINE_MIN_SAMPLES")
+    ANOMALY_BASELINE_MEMORY_MB: int = Field(default=64, env="ANOMALY_BASELINE_MEMORY_MB")
+    ANOMALY_Z_THRESHOLD: float = Field(default=4.0, env="ANOMALY_Z_THRESHOLD")
+    ANOMALY_HISTORY_SIZE: int = Field(default=1000, env="ANOMALY_HISTORY_SIZE")
+    ANOMALY_BATCH_MAX_SAMPLES: int = Field(default=100000, env="ANOMALY_BATCH_MAX_SAMPLES")
+    PATTERN_CACHE_SIZE: int = Field(default=1024, env="PATTERN_CACHE_SIZE")
+
+    # Micro-lotes e cache de inferência dos modelos preditivos
+    PREDICTION_BATCH_WINDOW_MS: float = Field(default=2.0, env="PREDICTION_BATCH_WINDOW_MS")
+    PREDICTION_BATCH_MAX_SIZE: int = Field(default=64, env="PREDICTION_BATCH_MAX_SIZE")
+    PREDICTION_CACHE_SIZE: int = Field(default=10000, env="PREDICTION_CACHE_SIZE")
+    PREDICTION_CACHE_TTL_SECONDS: float = Field(default=300.0, env="PREDICTION_CACHE_TTL_SECONDS")
+
+    NETWORK_PROBE_TARGETS: str = Field(default="8.8.8.8,1.1.1.1", env="NETWORK_PROBE_TARGETS")
+    NETWORK_DNS_DOMAINS: str = Field(default="google.com,microsoft.com,amazon.com", env="NETWORK_DNS_DOMAINS")
+    NETWORK_PROBE_TIMEOUT_SECONDS: float = Field(default=3.0, env="NETWORK_PROBE_TIMEOUT_SECONDS")
+    NETWORK_SAMPLE_WINDOW_SECONDS: float = Field(default=0.1, env="NETWORK_SAMPLE_WINDOW_SECONDS")
+    INVENTORY_CACHE_ENABLED: bool = Field(default=True, env="INVENTORY_CACHE_ENABLED")
+    INVENTORY_CACHE_MAX_AGE_SECONDS: float = Field(default=3600.0, env="INVENTORY_CACHE_MAX_AGE_SECONDS")
     REPORT_FORMATS: str = Field(default='["pdf","json"]', env="REPORT_FORMATS")
     REPORT_PUBLIC_URL_BASE: Optional[str] = Field(default=None, env="REPORT_PUBLIC_URL_BASE")
     
@@ -212,6 +304,20 @@ class Settings(BaseSettings):
             return self.DATABASE_URL
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    @property
+    def async_database_url_computed(self) -> str:
+        """URL de conexão do banco com driver assíncrono (asyncpg/aiosqlite)"""
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        url = self.SQLALCHEMY_DATABASE_URI or self.database_url_computed
+        scheme, _, rest = url.partition("://")
+        dialect = scheme.split("+")[0]
+        if dialect in ("postgresql", "postgres"):
+            return f"postgresql+asyncpg://{rest}"
+        if dialect == "sqlite":
+            return f"sqlite+aiosqlite://{rest}"
+        return url
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         
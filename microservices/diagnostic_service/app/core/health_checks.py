@@ -5,7 +5,6 @@ Verifica estado detalhado de todos os componentes críticos do sistema
 
 import asyncio
 import time
-import psutil
 import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta, timezone
@@ -20,6 +19,7 @@ except ImportError:
     REDIS_AVAILABLE = False
 
 from app.core.config import settings
+from app.core.system_sampler import system_sampler
 
 logger = logging.getLogger(__name__)
 
@@ -111,18 +111,20 @@ class AdvancedHealthChecker:
     async def check_system_resources(self) -> ComponentHealth:
         """Verifica recursos do sistema (CPU, Memória, Disco)"""
         try:
+            snapshot = system_sampler.snapshot()
+            
             # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_count = psutil.cpu_count()
+            cpu_percent = snapshot.cpu_percent
+            cpu_count = snapshot.cpu_count
             
             # Memória
-            memory = psutil.virtual_memory()
+            memory = snapshot.memory
             
             # Disco
-            disk = psutil.disk_usage('/')
+            disk = snapshot.disk
             
             # Processos
-            process_count = len(psutil.pids())
+            process_count = snapshot.process_count
             
             # Determina status baseado nos recursos
             status = HealthStatus.HEALTHY
@@ -152,7 +154,7 @@ class AdvancedHealthChecker:
                     "cpu": {
                         "percent": cpu_percent,
                         "count": cpu_count,
-                        "load_avg": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
+                        "load_avg": snapshot.load_avg
                     },
                     "memory": {
                         "total_gb": round(memory.total / (1024**3), 2),
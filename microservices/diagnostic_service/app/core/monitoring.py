@@ -2,7 +2,6 @@
 Sistema de Monitoramento e Métricas com Prometheus
 """
 import time
-import psutil
 import uuid
 import random
 import asyncio
@@ -13,6 +12,8 @@ from fastapi import FastAPI, Request, Response
 import logging
 from datetime import datetime
 
+from app.core.system_sampler import system_sampler
+
 logger = logging.getLogger(__name__)
 
 
@@ -152,18 +153,16 @@ class TechZeMetrics:
     def update_system_metrics(self):
         """Atualiza métricas do sistema"""
         try:
+            snapshot = system_sampler.snapshot()
+            
             # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
-            self.system_cpu_usage.set(cpu_percent)
+            self.system_cpu_usage.set(snapshot.cpu_percent)
             
             # Memória
-            memory = psutil.virtual_memory()
-            self.system_memory_usage.set(memory.percent)
+            self.system_memory_usage.set(snapshot.memory.percent)
             
             # Disco
-            disk = psutil.disk_usage('/')
-            disk_percent = (disk.used / disk.total) * 100
-            self.system_disk_usage.set(disk_percent)
+            self.system_disk_usage.set(snapshot.disk_percent)
             
         except Exception as e:
             logger.error(f"Erro ao atualizar métricas do sistema: {e}")
@@ -859,9 +858,10 @@ async def check_redis_health() -> Dict[str, Any]:
 async def check_system_resources() -> Dict[str, Any]:
     """Verifica recursos do sistema"""
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        snapshot = system_sampler.snapshot()
+        cpu_percent = snapshot.cpu_percent
+        memory = snapshot.memory
+        disk = snapshot.disk
         
         status = "healthy"
         warnings = []
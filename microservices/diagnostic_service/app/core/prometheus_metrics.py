@@ -116,6 +116,20 @@ AI_CONFIDENCE_SCORE = Histogram(
     registry=registry
 )
 
+AI_PREDICTION_CACHE_HIT_COUNT = Counter(
+    'ai_prediction_cache_hit_total',
+    'Total de predições de IA servidas pelo cache',
+    ['model'],
+    registry=registry
+)
+
+AI_PREDICTION_CACHE_MISS_COUNT = Counter(
+    'ai_prediction_cache_miss_total',
+    'Total de predições de IA calculadas pelo modelo',
+    ['model'],
+    registry=registry
+)
+
 # Métricas de sistema
 SYSTEM_RESOURCE_USAGE = Gauge(
     'system_resource_usage',
@@ -243,6 +257,13 @@ def track_ai_prediction(model: str):
                     prediction_type = result.get("prediction_type", "unknown")
                     AI_CONFIDENCE_SCORE.labels(model=model, prediction_type=prediction_type).observe(result["confidence"])
                 
+                # Registrar hit/miss do cache de predições se o resultado informar
+                cached = result.get("cached") if isinstance(result, dict) else getattr(result, "cached", None)
+                if cached is True:
+                    AI_PREDICTION_CACHE_HIT_COUNT.labels(model=model).inc()
+                elif cached is False:
+                    AI_PREDICTION_CACHE_MISS_COUNT.labels(model=model).inc()
+                
                 return result
             except Exception as e:
                 AI_PREDICTION_COUNT.labels(model=model, success="false").inc()
@@ -0,0 +1,242 @@
+"""
+Amostrador compartilhado de métricas do sistema
+
+Uma única thread em background coleta um snapshot do psutil por intervalo e
+o guarda em um ring buffer de tamanho fixo. Analisadores, monitores e health
+checks leem o snapshot mais recente sem bloquear e sem chamar o psutil.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SystemSnapshot:
+    """Snapshot imutável das métricas do sistema"""
+    timestamp: float
+    monotonic: float
+    cpu_percent: float
+    cpu_count: Optional[int]
+    cpu_freq: Optional[Any]
+    load_avg: Optional[tuple]
+    memory: Any
+    swap: Any
+    disk: Any
+    disk_io: Optional[Any]
+    net_io: Optional[Any]
+    process_count: int
+
+    @property
+    def age(self) -> float:
+        """Idade do snapshot em segundos"""
+        return time.monotonic() - self.monotonic
+
+    @property
+    def disk_percent(self) -> float:
+        """Uso de disco em porcentagem"""
+        return (self.disk.used / self.disk.total) * 100 if self.disk.total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte o snapshot para o formato de MetricsCollector.collect_system_metrics"""
+        return {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "cpu": {
+                "percent": self.cpu_percent,
+                "count": self.cpu_count,
+                "frequency": {
+                    "current": self.cpu_freq.current if self.cpu_freq else None,
+                    "min": self.cpu_freq.min if self.cpu_freq else None,
+                    "max": self.cpu_freq.max if self.cpu_freq else None
+                }
+            },
+            "memory": {
+                "total": self.memory.total,
+                "available": self.memory.available,
+                "percent": self.memory.percent,
+                "used": self.memory.used,
+                "free": self.memory.free
+            },
+            "swap": {
+                "total": self.swap.total,
+                "used": self.swap.used,
+                "free": self.swap.free,
+                "percent": self.swap.percent
+            },
+            "disk": {
+                "total": self.disk.total,
+                "used": self.disk.used,
+                "free": self.disk.free,
+                "percent": self.disk_percent
+            },
+            "network": {
+                "bytes_sent": self.net_io.bytes_sent if self.net_io else 0,
+                "bytes_recv": self.net_io.bytes_recv if self.net_io else 0,
+                "packets_sent": self.net_io.packets_sent if self.net_io else 0,
+                "packets_recv": self.net_io.packets_recv if self.net_io else 0
+            },
+            "processes": {
+                "count": self.process_count
+            }
+        }
+
+
+class SystemSampler:
+    """Coletor em background com ring buffer de snapshots.
+
+    Os escritores são serializados por ``_write_lock``: cada um grava o slot
+    do buffer e só então publica a referência em ``_latest``. Como a troca de
+    referência é atômica, os leitores nunca precisam de lock.
+    """
+
+    def __init__(self, interval: Optional[float] = None, capacity: Optional[int] = None,
+                 disk_path: Optional[str] = None):
+        self.interval = interval if interval is not None else settings.SYSTEM_SAMPLER_INTERVAL_SECONDS
+        self.capacity = capacity if capacity is not None else settings.SYSTEM_SAMPLER_HISTORY_SIZE
+        self.disk_path = disk_path or settings.SYSTEM_SAMPLER_DISK_PATH
+        self._buffer: List[Optional[SystemSnapshot]] = [None] * self.capacity
+        self._written = 0
+        self._latest: Optional[SystemSnapshot] = None
+        self._primed = False
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Indica se a thread de coleta está ativa"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Inicia a coleta em background"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="system-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"System sampler iniciado (intervalo={self.interval}s, buffer={self.capacity})")
+
+    def stop(self, timeout: float = 5.0):
+        """Para a coleta em background"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("System sampler parado")
+
+    def _loop(self):
+        """Loop da thread de coleta"""
+        # A primeira leitura de cpu_percent(None) só define a referência
+        self._prime()
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Erro ao coletar snapshot do sistema: {e}")
+
+    def _prime(self):
+        """Inicializa a referência de tempos de CPU do psutil"""
+        psutil.cpu_percent(interval=None)
+        self._primed = True
+
+    def sample(self) -> SystemSnapshot:
+        """Coleta um snapshot e o publica no ring buffer.
+
+        Returns:
+            Snapshot coletado
+        """
+        with self._write_lock:
+            return self._sample()
+
+    def _sample(self) -> SystemSnapshot:
+        """Coleta e publica um snapshot (chamado com o lock de escrita)"""
+        if not self._primed:
+            self._prime()
+            time.sleep(0.1)
+
+        cpu_freq = psutil.cpu_freq()
+        load_avg = psutil.getloadavg() if hasattr(psutil, "getloadavg") else None
+        snapshot = SystemSnapshot(
+            timestamp=time.time(),
+            monotonic=time.monotonic(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            cpu_count=psutil.cpu_count(),
+            cpu_freq=cpu_freq,
+            load_avg=load_avg,
+            memory=psutil.virtual_memory(),
+            swap=psutil.swap_memory(),
+            disk=psutil.disk_usage(self.disk_path),
+            disk_io=psutil.disk_io_counters(),
+            net_io=psutil.net_io_counters(),
+            process_count=len(psutil.pids())
+        )
+
+        self._buffer[self._written % self.capacity] = snapshot
+        self._written += 1
+        self._latest = snapshot
+        return snapshot
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[SystemSnapshot]:
+        """Retorna o snapshot mais recente sem bloquear.
+
+        Args:
+            max_age: Idade máxima aceita em segundos (padrão: sem limite)
+
+        Returns:
+            Snapshot ou None se não houver um snapshot dentro do limite
+        """
+        snapshot = self._latest
+        if snapshot is None:
+            return None
+        if max_age is not None and snapshot.age > max_age:
+            return None
+        return snapshot
+
+    def fresh(self) -> Optional[SystemSnapshot]:
+        """Retorna o snapshot mais recente se o amostrador estiver em dia.
+
+        Consumidores usam este método e, se receberem None, caem para a
+        coleta direta via psutil.
+        """
+        return self.latest(max_age=self.interval * 2 + 1.0)
+
+    def snapshot(self) -> SystemSnapshot:
+        """Retorna o snapshot recente ou coleta um novo na hora.
+
+        Returns:
+            Snapshot do sistema
+        """
+        return self.fresh() or self.sample()
+
+    def history(self, limit: Optional[int] = None) -> List[SystemSnapshot]:
+        """Retorna os snapshots do buffer do mais antigo ao mais recente.
+
+        Args:
+            limit: Número máximo de snapshots mais recentes
+
+        Returns:
+            Lista de snapshots
+        """
+        written = self._written
+        count = min(written, self.capacity)
+        if limit is not None:
+            count = min(count, limit)
+        snapshots = [self._buffer[i % self.capacity] for i in range(written - count, written)]
+        return [s for s in snapshots if s is not None]
+
+
+# Instância global
+system_sampler = SystemSampler()
+
+
+def get_system_sampler() -> SystemSampler:
+    """Retorna o amostrador global"""
+    return system_sampler
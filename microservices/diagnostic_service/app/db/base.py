@@ -1,5 +1,9 @@
 # Importa todos os modelos aqui para que o Alembic possa detectá-los
 from app.db.base_class import Base  # noqa
+from app.models.device_risk import DeviceRisk  # noqa
+from app.models.device_trend_state import DeviceTrendState  # noqa
 from app.models.diagnostic import Diagnostic  # noqa
+from app.models.metric_rollup import DiagnosticMetricRollup  # noqa
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef  # noqa
 from app.models.report import Report  # noqa
 from app.models.system_info import SystemInfo  # noqa
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Paginação por cursor (keyset) e contagem estimada
+
+Em vez de ``OFFSET`` (que percorre e descarta todas as linhas anteriores), a
+página seguinte é filtrada pela chave ``(created_at, id)`` do último item
+retornado, então páginas profundas custam o mesmo que a primeira.
+"""
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import and_, func, literal_column, or_, select, text
+from sqlalchemy.orm import Query
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class InvalidCursorError(ValueError):
+    """Cursor de paginação malformado"""
+
+
+@dataclass
+class KeysetPage(Generic[T]):
+    """Página de resultados paginados por cursor"""
+    items: List[T]
+    next_cursor: Optional[str]
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+def encode_cursor(created_at: datetime, item_id: str) -> str:
+    """Codifica a chave ``(created_at, id)`` em um cursor opaco.
+
+    Args:
+        created_at: Data de criação do último item
+        item_id: ID do último item
+
+    Returns:
+        Cursor em base64 seguro para URL
+    """
+    raw = json.dumps([created_at.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decodifica um cursor gerado por ``encode_cursor``.
+
+    Args:
+        cursor: Cursor opaco
+
+    Returns:
+        Tupla com data de criação e ID
+
+    Raises:
+        InvalidCursorError: Se o cursor for inválido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(item_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Cursor inválido: {cursor}") from e
+
+
+def keyset_filter(created_column: Any, id_column: Any, cursor: str):
+    """Condição que seleciona os itens após o cursor em ordem decrescente.
+
+    Args:
+        created_column: Coluna de data de criação
+        id_column: Coluna de ID (desempate)
+        cursor: Cursor da página anterior
+
+    Returns:
+        Expressão SQL para o WHERE
+    """
+    created_at, item_id = decode_cursor(cursor)
+    return or_(
+        created_column < created_at,
+        and_(created_column == created_at, id_column < item_id)
+    )
+
+
+def estimate_count(query: Query, cap: int) -> Tuple[int, bool]:
+    """Estima o total de linhas de uma query sem um ``COUNT(*)`` completo.
+
+    No PostgreSQL usa a estimativa do planejador (``EXPLAIN``); nos demais
+    bancos conta no máximo ``cap`` linhas. Contagens menores que o limite
+    são exatas.
+
+    Args:
+        query: Query filtrada (sem ordenação nem paginação)
+        cap: Número máximo de linhas contadas
+
+    Returns:
+        Tupla com o total e se ele é uma estimativa
+    """
+    session = query.session
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql":
+        try:
+            compiled = query.statement.compile(bind, compile_kwargs={"literal_binds": True})
+            plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            logger.debug(f"Estimativa do planejador indisponível, contando até {cap}: {e}")
+            estimate = 0
+        if estimate > cap:
+            return estimate, True
+
+    limited = query.with_entities(literal_column("1")).limit(cap + 1).subquery()
+    total = session.execute(select(func.count()).select_from(limited)).scalar() or 0
+    if total > cap:
+        return cap, True
+    return total, False
+
+
+def paginate_keyset(
+    query: Query,
+    created_column: Any,
+    id_column: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    total: Optional[str] = "estimate",
+    count_cap: int = 10000,
+    options: Tuple = ()
+) -> KeysetPage:
+    """Busca uma página ordenada por ``(created_at, id)`` decrescente.
+
+    Args:
+        query: Query filtrada (sem ordenação nem paginação)
+        created_column: Coluna de data de criação
+        id_column: Coluna de ID (desempate)
+        limit: Itens por página
+        cursor: Cursor retornado pela página anterior
+        total: "exact" (COUNT completo), "estimate" ou None (sem total)
+        count_cap: Limite de linhas contadas na estimativa
+        options: Opções de carga aplicadas aos itens (ex.: ``defer``)
+
+    Returns:
+        Página com os itens e o cursor da próxima página
+
+    Raises:
+        InvalidCursorError: Se o cursor for inválido
+    """
+    page_total, is_estimate = None, False
+    if total == "exact":
+        page_total = query.count()
+    elif total == "estimate":
+        page_total, is_estimate = estimate_count(query, count_cap)
+
+    if cursor:
+        query = query.filter(keyset_filter(created_column, id_column, cursor))
+    if options:
+        query = query.options(*options)
+
+    # Um item a mais indica se existe próxima página
+    items = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+
+    return KeysetPage(items=items, next_cursor=next_cursor, total=page_total,
+                      total_is_estimate=is_estimate)
@@ -0,0 +1,502 @@
+"""
+Armazenamento deduplicado e comprimido de ``Diagnostic.raw_data``
+
+O raw_data é dividido em blocos (subárvores do JSON), cada bloco é
+identificado pelo SHA-256 do seu JSON canônico, comprimido e gravado uma única
+vez na tabela ``rawdatablob``. A coluna ``raw_data`` passa a guardar apenas um
+manifesto com os valores pequenos (voláteis) inline e referências aos blocos.
+A reidratação acontece nos eventos de carga do ORM, então quem lê
+``diagnostic.raw_data`` continua recebendo o dicionário completo.
+
+Cada manifesto gravado registra as suas referências na tabela
+``rawdatablobref`` (dono, bloco), na mesma transação. Blocos sem referência
+(diagnósticos apagados) são removidos por ``RawDataBlobStore.collect_garbage``,
+que os acha pelo índice dessa tabela sem ler os manifestos. Cada gravação que reutiliza um bloco
+renova o seu ``updated_at`` se ele estiver há mais de meia carência sem
+escrita, e a coleta só apaga blocos fora da carência, então um bloco não
+some sob uma transação que acabou de referenciá-lo.
+"""
+import hashlib
+import json
+import logging
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_KEY = "__blob_manifest__"
+BLOB_REF_KEY = "__blob__"
+MANIFEST_VERSION = 1
+
+
+def _utc_now() -> datetime:
+    """Instante atual em UTC sem fuso, como gravado nas colunas de data"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def canonical_json(value: Any) -> bytes:
+    """Serializa um valor em JSON canônico (chaves ordenadas, sem espaços)"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def is_manifest(value: Any) -> bool:
+    """Indica se o valor armazenado é um manifesto de blocos"""
+    return isinstance(value, dict) and MANIFEST_KEY in value
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Comprime os dados com o codec informado"""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Descomprime os dados com o codec informado"""
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Bloco comprimido com zstd, mas o pacote zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def split_raw_data(raw_data: Dict[str, Any], min_chunk_size: int,
+                   max_depth: int) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Divide o raw_data em um manifesto e blocos endereçados por hash.
+
+    Subárvores com JSON de pelo menos ``min_chunk_size`` bytes viram blocos;
+    dicionários grandes acima de ``max_depth`` são divididos por chave para
+    que as partes estáveis sejam deduplicadas mesmo quando há valores
+    voláteis ao lado.
+
+    Args:
+        raw_data: Dados brutos do diagnóstico
+        min_chunk_size: Tamanho mínimo de um bloco em bytes
+        max_depth: Profundidade máxima de divisão dos dicionários
+
+    Returns:
+        Tupla com o manifesto e os blocos (hash -> JSON canônico)
+    """
+    chunks: Dict[str, bytes] = {}
+
+    def split(value: Any, depth: int) -> Any:
+        encoded = canonical_json(value)
+        if len(encoded) < min_chunk_size:
+            return value
+        if isinstance(value, dict) and depth < max_depth:
+            return {key: split(child, depth + 1) for key, child in value.items()}
+        digest = hashlib.sha256(encoded).hexdigest()
+        chunks[digest] = encoded
+        return {BLOB_REF_KEY: digest}
+
+    tree = {key: split(value, 1) for key, value in raw_data.items()}
+    return {MANIFEST_KEY: MANIFEST_VERSION, "tree": tree}, chunks
+
+
+def manifest_refs(manifest: Dict[str, Any]) -> set:
+    """Retorna os hashes referenciados por um manifesto"""
+    refs = set()
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            if BLOB_REF_KEY in node and len(node) == 1:
+                refs.add(node[BLOB_REF_KEY])
+            else:
+                for child in node.values():
+                    walk(child)
+
+    walk(manifest["tree"])
+    return refs
+
+
+def rehydrate(manifest: Dict[str, Any], blobs: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstrói o raw_data a partir do manifesto e dos blocos decodificados.
+
+    Args:
+        manifest: Manifesto gerado por ``split_raw_data``
+        blobs: Mapeamento hash -> valor decodificado
+
+    Returns:
+        Dicionário raw_data completo
+    """
+    def build(node: Any) -> Any:
+        if isinstance(node, dict):
+            if BLOB_REF_KEY in node and len(node) == 1:
+                return json.loads(json.dumps(blobs[node[BLOB_REF_KEY]]))
+            return {key: build(child) for key, child in node.items()}
+        return node
+
+    return build(manifest["tree"])
+
+
+class RawDataBlobStore:
+    """Grava e lê blocos de raw_data na tabela ``rawdatablob``.
+
+    Blocos são imutáveis (o ID é o hash do conteúdo), então os decodificados
+    ficam em um LRU em memória compartilhado entre sessões.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        codec: Optional[str] = None,
+        min_chunk_size: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        gc_grace_seconds: Optional[float] = None
+    ):
+        """Inicializa o store.
+
+        Args:
+            enabled: Ativa a divisão em blocos na gravação
+            codec: "zstd" ou "zlib" (zstd cai para zlib sem o pacote zstandard)
+            min_chunk_size: Tamanho mínimo de um bloco em bytes
+            max_depth: Profundidade máxima de divisão dos dicionários
+            cache_size: Número de blocos decodificados mantidos em memória
+            gc_grace_seconds: Idade mínima sem escrita para um bloco sem referência ser apagado
+        """
+        self.enabled = enabled if enabled is not None else settings.RAW_DATA_BLOB_STORE_ENABLED
+        codec = codec or settings.RAW_DATA_COMPRESSION
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            codec = "zlib"
+        self.codec = codec
+        self.min_chunk_size = min_chunk_size if min_chunk_size is not None else settings.RAW_DATA_CHUNK_MIN_BYTES
+        self.max_depth = max_depth if max_depth is not None else settings.RAW_DATA_CHUNK_MAX_DEPTH
+        self.cache_size = cache_size if cache_size is not None else settings.RAW_DATA_BLOB_CACHE_SIZE
+        self.gc_grace_seconds = (gc_grace_seconds if gc_grace_seconds is not None
+                                 else settings.RAW_DATA_BLOB_GC_GRACE_SECONDS)
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pack(self, session: Session, raw_data: Any) -> Any:
+        """Converte o raw_data em manifesto, gravando os blocos novos.
+
+        Valores pequenos, não-dicionários ou já convertidos são retornados
+        sem alteração.
+
+        Args:
+            session: Sessão usada para gravar os blocos
+            raw_data: Dados brutos do diagnóstico
+
+        Returns:
+            Manifesto ou o próprio valor
+        """
+        if not self.enabled or not isinstance(raw_data, dict) or is_manifest(raw_data):
+            return raw_data
+        manifest, chunks = split_raw_data(raw_data, self.min_chunk_size, self.max_depth)
+        if not chunks:
+            return raw_data
+        self.save_chunks(session, chunks)
+        return manifest
+
+    def save_chunks(self, session: Session, chunks: Dict[str, bytes]):
+        """Grava os blocos que ainda não existem na tabela.
+
+        A existência é conferida no banco, na transação da sessão, e não no
+        cache em memória: o cache pode conter blocos lidos de uma gravação
+        que depois foi desfeita. Blocos já existentes e próximos do fim da
+        carência têm ``updated_at`` renovado para a coleta não apagá-los.
+        """
+        if not chunks:
+            return
+        table = RawDataBlob.__table__
+        now = _utc_now()
+        existing = dict(session.execute(
+            select(table.c.id, table.c.updated_at).where(table.c.id.in_(list(chunks)))
+        ).all())
+
+        stale_before = now - timedelta(seconds=self.gc_grace_seconds / 2)
+        stale = [digest for digest, updated_at in existing.items() if updated_at is None or updated_at < stale_before]
+        if stale:
+            session.execute(
+                update(table)
+                .where(table.c.id.in_(stale), (table.c.updated_at < stale_before) | table.c.updated_at.is_(None))
+                .values(updated_at=now)
+            )
+
+        rows = [
+            {"id": digest, "codec": self.codec, "size": len(data), "data": compress(data, self.codec),
+             "created_at": now, "updated_at": now}
+            for digest, data in chunks.items() if digest not in existing
+        ]
+        if rows:
+            # ON CONFLICT DO NOTHING cobre blocos gravados em paralelo
+            session.execute(_insert_ignoring_conflicts(session, table, ["id"]), rows)
+
+    def record_refs(self, session: Session, manifests: Dict[str, Any], replace: bool = False):
+        """Registra os blocos referenciados pelos manifestos de cada dono.
+
+        Valores que não são manifesto não geram referência. Referências já
+        existentes são ignoradas, então gravar o mesmo manifesto de novo
+        (ex.: ingestão que cai do COPY para o executemany) é seguro.
+
+        Args:
+            session: Sessão usada para gravar as referências
+            manifests: Mapeamento ID do dono -> valor armazenado em raw_data
+            replace: Apaga antes as referências atuais dos donos (atualização)
+        """
+        if not manifests:
+            return
+        table = RawDataBlobRef.__table__
+        if replace:
+            self.forget_refs(session, list(manifests))
+        now = _utc_now()
+        rows = [
+            {"owner_id": owner_id, "blob_id": digest, "created_at": now, "updated_at": now}
+            for owner_id, stored in manifests.items() if is_manifest(stored)
+            for digest in sorted(manifest_refs(stored))
+        ]
+        if rows:
+            session.execute(_insert_ignoring_conflicts(session, table, ["owner_id", "blob_id"]), rows)
+
+    def forget_refs(self, session: Session, owner_ids: Iterable[str]):
+        """Apaga as referências dos donos informados"""
+        owner_ids = list(owner_ids)
+        if owner_ids:
+            table = RawDataBlobRef.__table__
+            session.execute(delete(table).where(table.c.owner_id.in_(owner_ids)))
+
+    def backfill_refs(self, session: Session, batch_size: int = 1000) -> int:
+        """Registra as referências de manifestos gravados antes da tabela de referências.
+
+        Lê todos os manifestos uma única vez; deve rodar antes da primeira
+        coleta em bancos com raw_data convertido por versões anteriores. O
+        commit fica com o chamador.
+
+        Args:
+            session: Sessão usada para ler os manifestos e gravar as referências
+            batch_size: Linhas lidas e gravadas por vez
+
+        Returns:
+            Número de diagnósticos com manifesto processados
+        """
+        # Import local: o modelo de diagnóstico importa este módulo
+        from app.models.diagnostic import Diagnostic
+
+        columns = Diagnostic.__table__.c
+        rows = session.execute(
+            select(columns.id, columns.raw_data).where(columns.raw_data.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        total = 0
+        for partition in rows.partitions():
+            manifests = {owner_id: stored for owner_id, stored in partition if is_manifest(stored)}
+            self.record_refs(session, manifests)
+            total += len(manifests)
+        logger.info(f"Referências de {total} manifestos de raw_data registradas")
+        return total
+
+    def collect_garbage(self, session: Session, grace_seconds: Optional[float] = None,
+                        batch_size: int = 1000) -> int:
+        """Apaga os blocos que nenhum diagnóstico referencia.
+
+        Só são candidatos os blocos sem escrita há mais de ``grace_seconds``
+        e sem linha em ``rawdatablobref`` de um diagnóstico existente; as duas
+        condições são conferidas de novo no DELETE. Referências de
+        diagnósticos apagados fora do ORM não seguram o bloco e saem junto com
+        ele. O commit fica com o chamador.
+
+        Args:
+            session: Sessão usada para buscar e apagar os blocos
+            grace_seconds: Carência (padrão: a do store)
+            batch_size: Blocos apagados por vez
+
+        Returns:
+            Número de blocos apagados
+        """
+        # Import local: o modelo de diagnóstico importa este módulo
+        from app.models.diagnostic import Diagnostic
+
+        table = RawDataBlob.__table__
+        refs = RawDataBlobRef.__table__
+        owners = Diagnostic.__table__
+        grace = grace_seconds if grace_seconds is not None else self.gc_grace_seconds
+        cutoff = _utc_now() - timedelta(seconds=grace)
+        referenced = (
+            select(refs.c.blob_id)
+            .join(owners, owners.c.id == refs.c.owner_id)
+            .where(refs.c.blob_id == table.c.id)
+            .exists()
+        )
+        orphans = list(session.execute(
+            select(table.c.id).where(table.c.updated_at < cutoff, ~referenced)
+        ).scalars())
+        if not orphans:
+            return 0
+
+        deleted = 0
+        for start in range(0, len(orphans), batch_size):
+            digests = orphans[start:start + batch_size]
+            result = session.execute(
+                delete(table).where(table.c.id.in_(digests), table.c.updated_at < cutoff, ~referenced)
+            )
+            deleted += result.rowcount or 0
+            session.execute(
+                delete(refs).where(
+                    refs.c.blob_id.in_(digests),
+                    ~select(table.c.id).where(table.c.id == refs.c.blob_id).exists()
+                )
+            )
+        with self._lock:
+            for digest in orphans:
+                self._cache.pop(digest, None)
+        logger.info(f"{deleted} blocos de raw_data sem referência removidos")
+        return deleted
+
+    def unpack(self, session: Optional[Session], stored: Any) -> Any:
+        """Reconstrói o raw_data a partir do valor armazenado.
+
+        Args:
+            session: Sessão usada para ler os blocos ausentes do cache
+            stored: Valor da coluna raw_data
+
+        Returns:
+            Dicionário raw_data completo (ou o próprio valor se não for manifesto)
+        """
+        if not is_manifest(stored):
+            return stored
+        return rehydrate(stored, self.load_chunks(session, manifest_refs(stored)))
+
+    def load_chunks(self, session: Optional[Session], digests: Iterable[str]) -> Dict[str, Any]:
+        """Lê os blocos pelo hash, consultando o banco só para os ausentes do cache"""
+        blobs: Dict[str, Any] = {}
+        missing = []
+        with self._lock:
+            for digest in digests:
+                if digest in self._cache:
+                    self._cache.move_to_end(digest)
+                    blobs[digest] = self._cache[digest]
+                else:
+                    missing.append(digest)
+        if not missing:
+            return blobs
+        if session is None:
+            raise RuntimeError("Sessão necessária para carregar blocos de raw_data")
+
+        rows = session.execute(
+            select(RawDataBlob.id, RawDataBlob.codec, RawDataBlob.data).where(RawDataBlob.id.in_(missing))
+        ).all()
+        for digest, codec, data in rows:
+            blobs[digest] = json.loads(decompress(data, codec))
+        lost = set(missing) - blobs.keys()
+        if lost:
+            raise LookupError(f"Blocos de raw_data ausentes: {sorted(lost)}")
+
+        with self._lock:
+            for digest in missing:
+                self._cache[digest] = blobs[digest]
+                self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return blobs
+
+    def clear_cache(self):
+        """Esvazia o cache de blocos decodificados"""
+        with self._lock:
+            self._cache.clear()
+
+
+def _insert_ignoring_conflicts(session: Session, table: Any, index_elements: list):
+    """INSERT que ignora linhas já existentes (ON CONFLICT DO NOTHING onde houver)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+
+# Instância global
+raw_data_store = RawDataBlobStore()
+
+
+def get_raw_data_store() -> RawDataBlobStore:
+    """Retorna o store de raw_data global"""
+    return raw_data_store
+
+
+def attach_raw_data_store(model: Any, attribute: str = "raw_data"):
+    """Liga o store de blocos a uma coluna JSON de um modelo.
+
+    Na gravação (``before_flush``) o valor vira manifesto e os blocos e as
+    referências do registro são inseridos na mesma transação; na carga (``load``/``refresh``, inclusive
+    de colunas adiadas) o manifesto é reidratado. Depois do flush o objeto
+    em memória volta a ter o dicionário completo.
+
+    Args:
+        model: Classe mapeada
+        attribute: Nome do atributo JSON
+    """
+    pending_key = f"raw_data_store:{model.__name__}.{attribute}"
+
+    def hydrate(target: Any, session: Optional[Session]):
+        stored = target.__dict__.get(attribute)
+        if not is_manifest(stored):
+            return
+        if session is not None:
+            with session.no_autoflush:
+                value = get_raw_data_store().unpack(session, stored)
+        else:
+            value = get_raw_data_store().unpack(None, stored)
+        set_committed_value(target, attribute, value)
+
+    @event.listens_for(model, "load")
+    def on_load(target, context):
+        hydrate(target, context.session)
+
+    @event.listens_for(model, "refresh")
+    def on_refresh(target, context, attrs):
+        if attrs is None or attribute in attrs:
+            hydrate(target, context.session)
+
+    @event.listens_for(Session, "before_flush")
+    def pack_before_flush(session, flush_context, instances):
+        store = get_raw_data_store()
+        written: Dict[str, Any] = {}
+        updated = []
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, model):
+                continue
+            if obj not in session.new and not inspect(obj).attrs[attribute].history.has_changes():
+                continue
+            value = obj.__dict__.get(attribute)
+            stored = value
+            if store.enabled and value is not None and not is_manifest(value):
+                stored = store.pack(session, value)
+                if stored is not value:
+                    setattr(obj, attribute, stored)
+                    session.info.setdefault(pending_key, {})[obj] = value
+            if obj.id is None:
+                # A referência precisa do ID antes do INSERT
+                obj.id = str(uuid.uuid4())
+            written[obj.id] = stored
+            if obj not in session.new:
+                updated.append(obj.id)
+
+        store.forget_refs(session, updated + [obj.id for obj in session.deleted if isinstance(obj, model)])
+        store.record_refs(session, written)
+
+    @event.listens_for(Session, "after_flush_postexec")
+    def restore_after_flush(session, flush_context):
+        for obj, value in session.info.pop(pending_key, {}).items():
+            set_committed_value(obj, attribute, value)
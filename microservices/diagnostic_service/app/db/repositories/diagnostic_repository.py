@@ -1,11 +1,31 @@
+import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy import desc, and_, or_, func
-from sqlalchemy.orm import Session
+from typing import Iterable, List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import desc, and_, or_, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer, lazyload
 
+from app.core.config import settings
+from app.db.pagination import KeysetPage, paginate_keyset
+from app.db.raw_data_store import get_raw_data_store
 from app.models.diagnostic import Diagnostic, DiagnosticStatus
 
 
+def summary_options() -> tuple:
+    """Opções de carga para listagens: adia ``raw_data`` e ``system_info``."""
+    return (defer(Diagnostic.raw_data), lazyload(Diagnostic.system_info))
+
+
+def user_device_ids(user_id: str):
+    """Subconsulta dos dispositivos com diagnósticos do usuário."""
+    return select(Diagnostic.device_id).where(Diagnostic.user_id == user_id, Diagnostic.device_id.isnot(None))
+
+
+def device_owner_query(user_id: str, device_id: str):
+    """Consulta de um diagnóstico do usuário no dispositivo (posse do dispositivo)."""
+    return select(Diagnostic.id).where(Diagnostic.device_id == device_id, Diagnostic.user_id == user_id).limit(1)
+
+
 class DiagnosticRepository:
     """Repositório para operações de diagnóstico no banco de dados."""
     
@@ -32,6 +52,42 @@ class DiagnosticRepository:
         self.db.refresh(db_obj)
         return db_obj
     
+    def bulk_create(self, diagnostics: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Cria vários diagnósticos com um único INSERT (executemany) e um commit.
+        
+        Args:
+            diagnostics: Lista de dados de diagnóstico
+            commit: Se False, deixa a transação aberta para o chamador
+            
+        Returns:
+            Número de diagnósticos inseridos
+        """
+        if not diagnostics:
+            return 0
+        store = get_raw_data_store()
+        rows = []
+        for data in diagnostics:
+            row = dict(data)
+            if isinstance(row.get("status"), str):
+                row["status"] = DiagnosticStatus(row["status"])
+            if row.get("raw_data") is not None:
+                row["raw_data"] = store.pack(self.db, row["raw_data"])
+                row.setdefault("id", str(uuid.uuid4()))
+            rows.append(row)
+        # INSERT do Core: o ORM dividiria o lote por colunas com valor None
+        self.db.execute(insert(Diagnostic.__table__), rows)
+        store.record_refs(self.db, {row["id"]: row["raw_data"] for row in rows if row.get("raw_data") is not None})
+        # Import local: app.services importa este repositório
+        from app.services.rollup_service import record_diagnostic_rollups
+        from app.services.trend_state_service import record_trend_state
+        from app.db.telemetry_store import record_telemetry
+        record_diagnostic_rollups(self.db, diagnostics)
+        record_trend_state(self.db, diagnostics)
+        record_telemetry(self.db, diagnostics)
+        if commit:
+            self.db.commit()
+        return len(rows)
+    
     def get_by_id(self, diagnostic_id: str) -> Optional[Diagnostic]:
         """Obtém um diagnóstico pelo ID.
         
@@ -43,6 +99,20 @@ class DiagnosticRepository:
         """
         return self.db.query(Diagnostic).filter(Diagnostic.id == diagnostic_id).first()
     
+    def get_existing_ids(self, diagnostic_ids: Iterable[str]) -> Set[str]:
+        """Obtém, entre os IDs informados, os que já existem no banco.
+        
+        Args:
+            diagnostic_ids: IDs de diagnóstico
+            
+        Returns:
+            Conjunto dos IDs já gravados
+        """
+        ids = list(diagnostic_ids)
+        if not ids:
+            return set()
+        return set(self.db.scalars(select(Diagnostic.id).where(Diagnostic.id.in_(ids))))
+    
     def get_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[Diagnostic]:
         """Obtém diagnósticos de um usuário específico.
         
@@ -61,6 +131,18 @@ class DiagnosticRepository:
             .limit(limit)\
             .all()
     
+    def owns_device(self, user_id: str, device_id: str) -> bool:
+        """Indica se o usuário tem ao menos um diagnóstico do dispositivo.
+        
+        Args:
+            user_id: ID do usuário
+            device_id: ID do dispositivo
+            
+        Returns:
+            True se o dispositivo pertence ao usuário
+        """
+        return self.db.execute(device_owner_query(user_id, device_id)).first() is not None
+    
     def update(self, diagnostic_id: str, update_data: Dict[str, Any]) -> Optional[Diagnostic]:
         """Atualiza um diagnóstico existente.
         
@@ -117,6 +199,64 @@ class DiagnosticRepository:
         Returns:
             Tupla com lista de diagnósticos e contagem total
         """
+        query = self._filtered_query(user_id, filters, start_date, end_date)
+        
+        # Obter contagem total
+        total = query.count()
+        
+        # Aplicar paginação
+        offset = (page - 1) * limit
+        items = query.order_by(desc(Diagnostic.created_at)).offset(offset).limit(limit).all()
+        
+        return items, total
+    
+    def get_diagnostics_keyset(
+        self,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        filters: Dict[str, Any] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        total: Optional[str] = "estimate",
+        include_details: bool = False
+    ) -> KeysetPage[Diagnostic]:
+        """Obtém uma página de diagnósticos por cursor em ``(created_at, id)``.
+        
+        Args:
+            user_id: ID do usuário
+            limit: Itens por página
+            cursor: Cursor retornado pela página anterior
+            filters: Filtros adicionais (device_id, status, etc.)
+            start_date: Data inicial para filtro (formato ISO)
+            end_date: Data final para filtro (formato ISO)
+            total: "exact" (COUNT completo), "estimate" ou None (sem total)
+            include_details: Carregar ``raw_data`` e ``system_info`` junto
+            
+        Returns:
+            Página com os diagnósticos e o cursor da próxima página
+            
+        Raises:
+            InvalidCursorError: Se o cursor for inválido
+        """
+        query = self._filtered_query(user_id, filters, start_date, end_date)
+        
+        return paginate_keyset(
+            query, Diagnostic.created_at, Diagnostic.id, limit,
+            cursor=cursor,
+            total=total,
+            count_cap=settings.DIAGNOSTIC_COUNT_ESTIMATE_CAP,
+            options=() if include_details else summary_options()
+        )
+    
+    def _filtered_query(
+        self,
+        user_id: str,
+        filters: Dict[str, Any] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ):
+        """Monta a query de diagnósticos do usuário com os filtros aplicados"""
         # Inicializar query base
         query = self.db.query(Diagnostic).filter(Diagnostic.user_id == user_id)
         
@@ -141,11 +281,144 @@ class DiagnosticRepository:
             except ValueError:
                 pass  # Ignorar data inválida
         
-        # Obter contagem total
-        total = query.count()
+        return query
+
+class AsyncDiagnosticRepository:
+    """Repositório assíncrono de diagnósticos, para uso em endpoints async.
+    
+    As operações simples são consultas assíncronas; a paginação por cursor e
+    a inserção em lote reutilizam ``DiagnosticRepository`` via ``run_sync``,
+    que executa o código síncrono na mesma conexão sem bloquear o event loop.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        """Inicializa o repositório com uma sessão assíncrona do banco de dados.
         
-        # Aplicar paginação
-        offset = (page - 1) * limit
-        items = query.order_by(desc(Diagnostic.created_at)).offset(offset).limit(limit).all()
+        Args:
+            db: Sessão assíncrona do banco de dados
+        """
+        self.db = db
+    
+    async def create(self, diagnostic_data: Dict[str, Any]) -> Diagnostic:
+        """Cria um novo diagnóstico.
+        
+        Args:
+            diagnostic_data: Dados do diagnóstico
+            
+        Returns:
+            Objeto Diagnostic criado
+        """
+        db_obj = Diagnostic(**diagnostic_data)
+        self.db.add(db_obj)
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        return db_obj
+    
+    async def bulk_create(self, diagnostics: List[Dict[str, Any]]) -> int:
+        """Cria vários diagnósticos com um único INSERT (executemany) e um commit.
+        
+        Args:
+            diagnostics: Lista de dados de diagnóstico
+            
+        Returns:
+            Número de diagnósticos inseridos
+        """
+        return await self.db.run_sync(lambda session: DiagnosticRepository(session).bulk_create(diagnostics))
+    
+    async def get_by_id(self, diagnostic_id: str) -> Optional[Diagnostic]:
+        """Obtém um diagnóstico pelo ID.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            
+        Returns:
+            Objeto Diagnostic ou None se não encontrado
+        """
+        result = await self.db.execute(select(Diagnostic).where(Diagnostic.id == diagnostic_id))
+        return result.scalars().first()
+    
+    async def get_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[Diagnostic]:
+        """Obtém diagnósticos de um usuário específico.
+        
+        Args:
+            user_id: ID do usuário
+            skip: Número de registros para pular
+            limit: Número máximo de registros para retornar
+            
+        Returns:
+            Lista de diagnósticos
+        """
+        result = await self.db.execute(
+            select(Diagnostic)
+            .options(*summary_options())
+            .where(Diagnostic.user_id == user_id)
+            .order_by(desc(Diagnostic.created_at))
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.scalars())
+    
+    async def owns_device(self, user_id: str, device_id: str) -> bool:
+        """Indica se o usuário tem ao menos um diagnóstico do dispositivo.
+        
+        Args:
+            user_id: ID do usuário
+            device_id: ID do dispositivo
+            
+        Returns:
+            True se o dispositivo pertence ao usuário
+        """
+        result = await self.db.execute(device_owner_query(user_id, device_id))
+        return result.first() is not None
+    
+    async def update(self, diagnostic_id: str, update_data: Dict[str, Any]) -> Optional[Diagnostic]:
+        """Atualiza um diagnóstico existente.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            update_data: Dados para atualização
+            
+        Returns:
+            Objeto Diagnostic atualizado ou None se não encontrado
+        """
+        db_obj = await self.get_by_id(diagnostic_id)
+        if db_obj:
+            for key, value in update_data.items():
+                setattr(db_obj, key, value)
+            await self.db.commit()
+            await self.db.refresh(db_obj)
+        return db_obj
+    
+    async def delete(self, diagnostic_id: str) -> bool:
+        """Exclui um diagnóstico pelo ID.
         
-        return items, total
\ No newline at end of file
+        Args:
+            diagnostic_id: ID do diagnóstico
+            
+        Returns:
+            True se excluído com sucesso, False caso contrário
+        """
+        db_obj = await self.get_by_id(diagnostic_id)
+        if db_obj:
+            await self.db.delete(db_obj)
+            await self.db.commit()
+            return True
+        return False
+    
+    async def get_diagnostics_keyset(self, user_id: str, **kwargs: Any) -> KeysetPage[Diagnostic]:
+        """Obtém uma página de diagnósticos por cursor em ``(created_at, id)``.
+        
+        Aceita os mesmos argumentos de ``DiagnosticRepository.get_diagnostics_keyset``.
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            Página com os diagnósticos e o cursor da próxima página
+            
+        Raises:
+            InvalidCursorError: Se o cursor for inválido
+        """
+        return await self.db.run_sync(
+            lambda session: DiagnosticRepository(session).get_diagnostics_keyset(user_id, **kwargs)
+        )
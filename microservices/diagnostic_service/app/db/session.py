@@ -1,6 +1,7 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -16,6 +17,22 @@ SessionLocal = None
 if engine:
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrono (asyncpg/aiosqlite) para os endpoints async; a conexão só é aberta no primeiro uso
+async_engine = None
+if settings.SQLALCHEMY_DATABASE_URI:
+    async_url = settings.async_database_url_computed
+    pool_kwargs = {} if async_url.startswith("sqlite") else {
+        "pool_size": settings.ASYNC_DB_POOL_SIZE,
+        "max_overflow": settings.ASYNC_DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE
+    }
+    async_engine = create_async_engine(async_url, pool_pre_ping=True, **pool_kwargs)
+
+AsyncSessionLocal = None
+if async_engine:
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base para os modelos declarativos
 Base = declarative_base()
 
@@ -33,4 +50,17 @@ def get_db() -> Generator:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Fornece uma sessão assíncrona de banco de dados para as operações.
+    
+    Yields:
+        Sessão assíncrona do SQLAlchemy
+    """
+    if not AsyncSessionLocal:
+        raise RuntimeError("Database not configured. Please set SQLALCHEMY_DATABASE_URI.")
+    
+    async with AsyncSessionLocal() as db:
+        yield db
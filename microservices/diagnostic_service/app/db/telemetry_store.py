@@ -0,0 +1,485 @@
+"""
+Armazenamento colunar local do histórico de métricas por dispositivo
+
+Cada dispositivo tem um diretório (agrupado em shards pelo hash do ID) com um
+índice de tempo append-only (``time.i8``, epoch em ms, int64) e um arquivo por
+métrica (``<métrica>.f4``, float32, NaN = ausente), todos com o mesmo número de
+linhas. As leituras são ``numpy.memmap`` fatiados com ``searchsorted`` no
+índice de tempo: janelas viram fatias dos arquivos, sem ORM nem JSON.
+
+As colunas de métricas são gravadas antes do índice de tempo, então o tamanho
+do índice marca as linhas confirmadas e leitores nunca veem linhas parciais.
+
+Vários workers podem gravar no mesmo diretório: cada gravação segura um
+``flock`` exclusivo em ``.lock`` dentro do diretório do dispositivo, além do
+lock por thread. Sem ``fcntl`` (Windows) só o lock por thread existe e o store
+exige um único processo escritor.
+"""
+import logging
+import os
+import threading
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, unquote
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.diagnostic import DiagnosticStatus
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TIME_FILE = "time.i8"
+LOCK_FILE = ".lock"
+TIME_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+METRIC_SUFFIX = ".f4"
+
+# Colunas de ``diagnostic`` gravadas no store
+TELEMETRY_METRICS: Sequence[str] = (
+    "cpu_usage", "cpu_temperature", "memory_usage", "memory_available",
+    "disk_usage", "disk_available", "network_speed", "overall_health"
+)
+AGGREGATIONS = ("avg", "min", "max", "sum", "count", "last")
+
+PENDING_KEY = "telemetry_pending"
+
+TimeLike = Union[datetime, int, float, None]
+
+
+@dataclass
+class TelemetryWindow:
+    """Janela de amostras de um dispositivo.
+
+    ``timestamps`` em epoch ms; cada coluna tem o mesmo tamanho. Em ``range``
+    os arrays são fatias dos arquivos mapeados (somente leitura).
+    """
+
+    device_id: str
+    timestamps: np.ndarray
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def datetimes(self) -> List[datetime]:
+        """Instantes da janela como datetime UTC sem fuso"""
+        return [
+            datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None)
+            for ms in self.timestamps.tolist()
+        ]
+
+
+class TelemetryStore:
+    """Store colunar de métricas por dispositivo baseado em arquivos mapeados."""
+
+    def __init__(self, root: Optional[str] = None, shards: Optional[int] = None):
+        """Inicializa o store.
+
+        Args:
+            root: Diretório raiz (padrão: TELEMETRY_STORE_PATH)
+            shards: Número de shards de dispositivos (padrão: TELEMETRY_STORE_SHARDS)
+        """
+        self.root = root or settings.TELEMETRY_STORE_PATH
+        self.shards = shards or settings.TELEMETRY_STORE_SHARDS
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def append(self, device_id: str, timestamps: Sequence[TimeLike], metrics: Dict[str, Sequence[Any]]) -> int:
+        """Adiciona amostras de um dispositivo.
+
+        O índice é append-only: amostras mais antigas que a última gravada são
+        descartadas (a análise preditiva cai para os rollups quando o store
+        fica com menos amostras que eles). Métricas ausentes ficam NaN.
+
+        Args:
+            device_id: ID do dispositivo
+            timestamps: Instantes das amostras (datetime ou epoch ms)
+            metrics: Valores de cada métrica, alinhados com ``timestamps``
+
+        Returns:
+            Número de amostras gravadas
+        """
+        epoch_ms = to_epoch_ms(timestamps)
+        if not len(epoch_ms):
+            return 0
+        unknown = set(metrics) - set(TELEMETRY_METRICS)
+        if unknown:
+            raise ValueError(f"Métricas desconhecidas: {sorted(unknown)}")
+        order = np.argsort(epoch_ms, kind="stable")
+        epoch_ms = epoch_ms[order]
+        values = {
+            metric: np.asarray([np.nan if v is None else v for v in column], dtype=np.float64)[order]
+            for metric, column in metrics.items()
+        }
+
+        directory = self._device_dir(device_id)
+        with self._write_lock(device_id, directory):
+            times = self._times(directory)
+            length = len(times)
+            if length:
+                keep = epoch_ms >= times[-1]
+                if not keep.all():
+                    logger.info(f"{int((~keep).sum())} amostras de {device_id} anteriores ao índice descartadas")
+                epoch_ms = epoch_ms[keep]
+                values = {metric: column[keep] for metric, column in values.items()}
+            if not len(epoch_ms):
+                return 0
+
+            for metric in set(self._metric_names(directory)) | set(values):
+                path = os.path.join(directory, metric + METRIC_SUFFIX)
+                column = values.get(metric)
+                if column is None:
+                    column = np.full(len(epoch_ms), np.nan)
+                # Completa com NaN métricas novas ou que ficaram para trás numa gravação interrompida
+                stored = os.path.getsize(path) // VALUE_DTYPE.itemsize if os.path.exists(path) else 0
+                if stored > length:
+                    with open(path, "r+b") as handle:
+                        handle.truncate(length * VALUE_DTYPE.itemsize)
+                    stored = length
+                with open(path, "ab") as handle:
+                    if stored < length:
+                        np.full(length - stored, np.nan, dtype=VALUE_DTYPE).tofile(handle)
+                    column.astype(VALUE_DTYPE).tofile(handle)
+
+            # O índice de tempo por último: confirma as linhas
+            with open(os.path.join(directory, TIME_FILE), "ab") as handle:
+                epoch_ms.astype(TIME_DTYPE).tofile(handle)
+        return len(epoch_ms)
+
+    def append_samples(self, samples: Iterable[Tuple[str, TimeLike, Dict[str, Any]]]) -> int:
+        """Adiciona amostras de vários dispositivos.
+
+        Args:
+            samples: Tuplas ``(device_id, instante, {métrica: valor})``
+
+        Returns:
+            Número de amostras gravadas
+        """
+        by_device: Dict[str, List[Tuple[TimeLike, Dict[str, Any]]]] = defaultdict(list)
+        for device_id, timestamp, values in samples:
+            by_device[device_id].append((timestamp, values))
+        written = 0
+        for device_id, device_samples in by_device.items():
+            metrics = {metric for _, values in device_samples for metric in values}
+            written += self.append(
+                device_id,
+                [timestamp for timestamp, _ in device_samples],
+                {metric: [values.get(metric) for _, values in device_samples] for metric in metrics}
+            )
+        return written
+
+    def range(
+        self,
+        device_id: str,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        metrics: Optional[Sequence[str]] = None
+    ) -> TelemetryWindow:
+        """Amostras do dispositivo em ``[start, end)``, sem cópia.
+
+        Args:
+            device_id: ID do dispositivo
+            start: Início da janela (inclusivo)
+            end: Fim da janela (exclusivo)
+            metrics: Métricas retornadas (padrão: todas as gravadas)
+
+        Returns:
+            Janela com fatias dos arquivos mapeados
+        """
+        directory = self._device_dir(device_id)
+        times = self._times(directory)
+        if metrics is None:
+            metrics = self._metric_names(directory)
+        lo = int(np.searchsorted(times, _bound(start), "left")) if start is not None else 0
+        hi = int(np.searchsorted(times, _bound(end), "left")) if end is not None else len(times)
+        hi = max(lo, hi)
+        return TelemetryWindow(
+            device_id=device_id,
+            timestamps=times[lo:hi],
+            columns={metric: self._column(directory, metric, len(times))[lo:hi] for metric in metrics}
+        )
+
+    def downsample(
+        self,
+        device_id: str,
+        step_seconds: float,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        metrics: Optional[Sequence[str]] = None,
+        aggregation: str = "avg"
+    ) -> TelemetryWindow:
+        """Agrega a janela em buckets de ``step_seconds`` alinhados à época.
+
+        Buckets sem amostras não aparecem; NaN é ignorado na agregação.
+
+        Args:
+            device_id: ID do dispositivo
+            step_seconds: Largura de cada bucket
+            start: Início da janela (inclusivo)
+            end: Fim da janela (exclusivo)
+            metrics: Métricas retornadas (padrão: todas as gravadas)
+            aggregation: avg, min, max, sum, count ou last
+
+        Returns:
+            Janela com o início de cada bucket (epoch ms) e os valores agregados
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Agregação desconhecida: {aggregation}")
+        step_ms = int(step_seconds * 1000)
+        if step_ms <= 0:
+            raise ValueError("step_seconds deve ser positivo")
+        window = self.range(device_id, start, end, metrics)
+        if not len(window):
+            return window
+
+        buckets = window.timestamps // step_ms
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        columns = {
+            metric: _reduce(np.asarray(column, dtype=np.float64), starts, aggregation)
+            for metric, column in window.columns.items()
+        }
+        return TelemetryWindow(device_id=device_id, timestamps=buckets[starts] * step_ms, columns=columns)
+
+    def aggregate(
+        self,
+        device_id: str,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        metrics: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Estatísticas de cada métrica na janela.
+
+        Args:
+            device_id: ID do dispositivo
+            start: Início da janela (inclusivo)
+            end: Fim da janela (exclusivo)
+            metrics: Métricas retornadas (padrão: todas as gravadas)
+
+        Returns:
+            Dicionário métrica -> count, min, max, avg e last
+        """
+        window = self.range(device_id, start, end, metrics)
+        result = {}
+        for metric, column in window.columns.items():
+            valid = np.asarray(column, dtype=np.float64)
+            valid = valid[~np.isnan(valid)]
+            result[metric] = {
+                "count": int(valid.size),
+                "min": float(valid.min()) if valid.size else None,
+                "max": float(valid.max()) if valid.size else None,
+                "avg": float(valid.mean()) if valid.size else None,
+                "last": float(valid[-1]) if valid.size else None
+            }
+        return result
+
+    def length(self, device_id: str) -> int:
+        """Número de amostras confirmadas do dispositivo"""
+        return len(self._times(self._device_dir(device_id)))
+
+    def watermark(self, device_id: str) -> Tuple[int, int]:
+        """Marca d'água dos dados do dispositivo: (amostras confirmadas, último instante em epoch ms)"""
+        times = self._times(self._device_dir(device_id))
+        return len(times), int(times[-1]) if len(times) else 0
+
+    def devices(self) -> List[str]:
+        """IDs dos dispositivos com amostras no store"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            unquote(name)
+            for shard in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, shard))
+            for name in os.listdir(os.path.join(self.root, shard))
+        )
+
+    def _device_dir(self, device_id: str) -> str:
+        shard = zlib.crc32(device_id.encode()) % self.shards
+        return os.path.join(self.root, f"{shard:04d}", quote(device_id, safe=""))
+
+    def _lock(self, device_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks[device_id]
+
+    @contextmanager
+    def _write_lock(self, device_id: str, directory: str) -> Iterator[None]:
+        """Exclusão mútua das gravações de um dispositivo entre threads e processos"""
+        with self._lock(device_id):
+            os.makedirs(directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(directory, LOCK_FILE), "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _times(self, directory: str) -> np.ndarray:
+        path = os.path.join(directory, TIME_FILE)
+        length = os.path.getsize(path) // TIME_DTYPE.itemsize if os.path.exists(path) else 0
+        if not length:
+            return np.empty(0, dtype=TIME_DTYPE)
+        return np.memmap(path, dtype=TIME_DTYPE, mode="r", shape=(length,))
+
+    def _column(self, directory: str, metric: str, length: int) -> np.ndarray:
+        path = os.path.join(directory, metric + METRIC_SUFFIX)
+        stored = os.path.getsize(path) // VALUE_DTYPE.itemsize if os.path.exists(path) else 0
+        if not stored:
+            return np.full(length, np.nan, dtype=VALUE_DTYPE)
+        if stored < length:
+            column = np.memmap(path, dtype=VALUE_DTYPE, mode="r", shape=(stored,))
+            return np.concatenate([column, np.full(length - stored, np.nan, dtype=VALUE_DTYPE)])
+        return np.memmap(path, dtype=VALUE_DTYPE, mode="r", shape=(length,))
+
+    def _metric_names(self, directory: str) -> List[str]:
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(METRIC_SUFFIX)] for name in os.listdir(directory) if name.endswith(METRIC_SUFFIX))
+
+
+def to_epoch_ms(values: Sequence[TimeLike]) -> np.ndarray:
+    """Converte instantes (datetime, sem fuso = UTC, ou epoch ms) em epoch ms int64"""
+    return np.asarray([_bound(value) for value in values], dtype=np.int64)
+
+
+def _bound(value: TimeLike) -> int:
+    if value is None:
+        value = datetime.now(timezone.utc)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(round(value.timestamp() * 1000))
+    return int(value)
+
+
+def _reduce(values: np.ndarray, starts: np.ndarray, aggregation: str) -> np.ndarray:
+    """Agrega segmentos consecutivos iniciados em ``starts`` ignorando NaN"""
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    if aggregation == "count":
+        return counts.astype(np.float64)
+    if aggregation == "min":
+        return np.fmin.reduceat(values, starts)
+    if aggregation == "max":
+        return np.fmax.reduceat(values, starts)
+    if aggregation == "last":
+        # Último valor válido de cada bucket
+        positions = np.where(valid, np.arange(len(values)), -1)
+        last = np.maximum.reduceat(positions, starts)
+        return np.where(last >= 0, values[np.maximum(last, 0)], np.nan)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    if aggregation == "sum":
+        return np.where(counts > 0, sums, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+telemetry_store: Optional[TelemetryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_telemetry_store() -> TelemetryStore:
+    """Retorna o store de telemetria global"""
+    global telemetry_store
+    with _store_lock:
+        if telemetry_store is None:
+            telemetry_store = TelemetryStore()
+        return telemetry_store
+
+
+# As gravações saem do thread que confirmou a transação (o event loop, em
+# commits de AsyncSession): um único worker faz os appends e o flock em ordem
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telemetry-writer")
+
+
+def _append_pending(store: TelemetryStore, samples: List[Tuple[str, TimeLike, Dict[str, Any]]]):
+    try:
+        store.append_samples(samples)
+    except Exception as e:
+        logger.warning(f"Amostras não gravadas no store de telemetria: {e}")
+
+
+def flush_telemetry(timeout: Optional[float] = None):
+    """Aguarda as gravações já enfileiradas no store.
+
+    Args:
+        timeout: Tempo máximo de espera em segundos (padrão: sem limite)
+    """
+    _writer.submit(lambda: None).result(timeout)
+
+
+def record_telemetry(db: Session, diagnostics: Iterable[Any]):
+    """Enfileira diagnósticos concluídos para o store, gravados após o commit.
+
+    As amostras ficam em ``session.info`` e só vão para os arquivos quando a
+    transação externa é confirmada; um rollback dela as descarta, e o
+    rollback de um SAVEPOINT descarta só as amostras enfileiradas dentro dele.
+
+    Args:
+        db: Sessão do diagnóstico
+        diagnostics: Diagnósticos (objetos ``Diagnostic`` ou dicionários)
+    """
+    if not settings.TELEMETRY_STORE_ENABLED:
+        return
+    pending = db.info.setdefault(PENDING_KEY, [])
+    savepoint = db.get_nested_transaction()
+    for diagnostic in diagnostics:
+        get = diagnostic.get if isinstance(diagnostic, dict) else (lambda key: getattr(diagnostic, key, None))
+        device_id = get("device_id")
+        if not device_id or get("status") not in (DiagnosticStatus.COMPLETED, DiagnosticStatus.COMPLETED.value):
+            continue
+        values = {metric: get(metric) for metric in TELEMETRY_METRICS if get(metric) is not None}
+        pending.append((savepoint, (device_id, get("created_at"), values)))
+
+
+def _within(savepoint: Any, transaction: Any) -> bool:
+    """Se o SAVEPOINT é ``transaction`` ou está aninhado nela"""
+    while savepoint is not None:
+        if savepoint is transaction:
+            return True
+        savepoint = savepoint.parent
+    return False
+
+
+@event.listens_for(Session, "after_commit")
+def _write_pending_telemetry(session: Session):
+    # Também disparado ao liberar um SAVEPOINT: a transação externa ainda pode ser desfeita
+    if session.in_nested_transaction():
+        return
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    samples = [sample for _, sample in pending]
+    try:
+        _writer.submit(_append_pending, get_telemetry_store(), samples)
+    except RuntimeError as e:  # executor encerrado no fim do processo
+        logger.warning(f"Amostras não gravadas no store de telemetria: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_telemetry(session: Session, previous_transaction: Any):
+    pending = session.info.get(PENDING_KEY)
+    if not pending:
+        return
+    if previous_transaction.nested:
+        session.info[PENDING_KEY] = [
+            (savepoint, sample) for savepoint, sample in pending
+            if not _within(savepoint, previous_transaction)
+        ]
+    elif previous_transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+
@@ -55,7 +55,7 @@ except ImportError:
 # ==========================================
     
 try:
-    from app.core.advanced_pool import DatabasePool, get_advanced_pool, initialize_advanced_pool
+    from app.core.advanced_pool import get_advanced_pool, initialize_advanced_pool
     POOL_AVAILABLE = True
     ADVANCED_POOL_AVAILABLE = True
 except ImportError:
@@ -63,6 +63,27 @@ except ImportError:
     POOL_AVAILABLE = False
     ADVANCED_POOL_AVAILABLE = False
     
+try:
+    from app.core.system_sampler import system_sampler
+    SYSTEM_SAMPLER_AVAILABLE = True
+except ImportError:
+    logger.warning("System sampler not available")
+    SYSTEM_SAMPLER_AVAILABLE = False
+    
+try:
+    from app.services.job_queue import job_queue
+    JOB_QUEUE_AVAILABLE = True
+except ImportError:
+    logger.warning("Job queue not available")
+    JOB_QUEUE_AVAILABLE = False
+    
+try:
+    from app.api.core.database import close_async_database_connections
+    ASYNC_DATABASE_AVAILABLE = True
+except ImportError:
+    logger.warning("Async database not available")
+    ASYNC_DATABASE_AVAILABLE = False
+    
 try:
     from app.middleware.rate_limiter import RateLimitMiddleware
     RATE_LIMITER_AVAILABLE = True
@@ -165,11 +186,33 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"❌ Erro ao inicializar connection pooling: {e}")
     
+    # Iniciar amostrador compartilhado de métricas do sistema
+    if SYSTEM_SAMPLER_AVAILABLE and getattr(settings, 'SYSTEM_SAMPLER_ENABLED', True):
+        try:
+            system_sampler.start()
+            logger.info("✅ System sampler inicializado")
+        except Exception as e:
+            logger.error(f"❌ Erro ao inicializar system sampler: {e}")
+    
+    # Iniciar workers da fila de diagnósticos
+    if JOB_QUEUE_AVAILABLE and getattr(settings, 'JOB_QUEUE_ENABLED', True):
+        try:
+            job_queue.start()
+            logger.info("✅ Job queue inicializada")
+        except Exception as e:
+            logger.error(f"❌ Erro ao inicializar job queue: {e}")
+    
     yield
     
     # Shutdown
     logger.info("🛑 Encerrando TechZe Diagnostic Service...")
     
+    if JOB_QUEUE_AVAILABLE and job_queue.running:
+        job_queue.stop()
+    
+    if SYSTEM_SAMPLER_AVAILABLE and system_sampler.running:
+        system_sampler.stop()
+    
     if ADVANCED_POOL_AVAILABLE:
         try:
             pool = await get_advanced_pool()
@@ -178,6 +221,10 @@ async def lifespan(app: FastAPI):
                 logger.info("✅ Connection pooling encerrado")
         except Exception as e:
             logger.error(f"❌ Erro ao encerrar connection pooling: {e}")
+    
+    # Depois da fila: jobs em andamento ainda usam o engine assíncrono
+    if ASYNC_DATABASE_AVAILABLE:
+        await close_async_database_connections()
 
 # ==========================================
 # CONFIGURAÇÃO DA APLICAÇÃO FASTAPI
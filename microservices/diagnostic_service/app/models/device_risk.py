@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, DateTime, Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class DeviceRisk(Base):
+    """Snapshot do risco de falha de um dispositivo.
+    
+    Gravado pela pontuação da frota (``FleetRiskScorer``) com uma linha por
+    dispositivo, para que o painel dos técnicos leia o risco diretamente sem
+    recalcular as tendências.
+    """
+    
+    __tablename__ = "device_risk"
+    
+    device_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
+    risk_level: Mapped[str] = mapped_column(String(16), index=True)
+    risk_components: Mapped[List[str]] = mapped_column(JSON, default=list)
+    
+    # Valor atual e inclinação (unidades por dia) de cada métrica
+    cpu_usage: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    cpu_slope: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    memory_usage: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    memory_slope: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    disk_usage: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    disk_slope: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    overall_health: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    health_slope: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    
+    diagnostics_analyzed: Mapped[int] = mapped_column(Integer, default=0)
+    window_days: Mapped[int] = mapped_column(Integer)
+    source: Mapped[str] = mapped_column(String(16))  # rollup ou raw
+    scored_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte o snapshot para um dicionário.
+        
+        Returns:
+            Dicionário com o risco e as métricas do dispositivo
+        """
+        return {
+            "device_id": self.device_id,
+            "risk_level": self.risk_level,
+            "risk_components": self.risk_components or [],
+            "cpu_usage": self.cpu_usage,
+            "cpu_slope": self.cpu_slope,
+            "memory_usage": self.memory_usage,
+            "memory_slope": self.memory_slope,
+            "disk_usage": self.disk_usage,
+            "disk_slope": self.disk_slope,
+            "overall_health": self.overall_health,
+            "health_slope": self.health_slope,
+            "diagnostics_analyzed": self.diagnostics_analyzed,
+            "window_days": self.window_days,
+            "source": self.source,
+            "scored_at": self.scored_at.isoformat() if self.scored_at else None
+        }
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import JSON, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class DeviceTrendState(Base):
+    """Estado incremental das tendências de um dispositivo.
+    
+    Guarda, por métrica, as estatísticas atualizadas em O(1) a cada
+    diagnóstico concluído (ver ``app.services.trend_state_service``), para
+    que a tendência atual seja respondida sem reler o histórico.
+    """
+    
+    device_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
+    samples: Mapped[int] = mapped_column(Integer, default=0)
+    last_at: Mapped[datetime] = mapped_column(DateTime)
+    
+    # Métrica -> estado serializado de ``MetricTrendState``
+    metrics: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict)
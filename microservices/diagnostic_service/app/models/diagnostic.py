@@ -1,7 +1,7 @@
 from enum import Enum as PyEnum
 from typing import Dict, Any, Optional
 
-from sqlalchemy import String, Integer, Float, JSON, ForeignKey, Enum, Boolean, Text
+from sqlalchemy import String, Integer, Float, JSON, ForeignKey, Enum, Boolean, Text, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from app.db.base_class import Base
@@ -19,6 +19,12 @@ class DiagnosticStatus(str, PyEnum):
 class Diagnostic(Base):
     """Modelo para armazenar informações de diagnóstico."""
     
+    # Índices da paginação por cursor em (created_at, id)
+    __table_args__ = (
+        Index("ix_diagnostic_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_diagnostic_device_created_id", "device_id", "created_at", "id"),
+    )
+    
     # Informações básicas
     user_id: Mapped[Optional[str]] = mapped_column(String(36), index=True, nullable=True)  # Pode ser nulo para diagnósticos anônimos
     device_id: Mapped[Optional[str]] = mapped_column(String(36), index=True, nullable=True)  # Identificador do dispositivo
@@ -88,4 +94,10 @@ class Diagnostic(Base):
             "overall_health": self.overall_health,
             "error_message": self.error_message,
             "execution_time": self.execution_time,
-        }
\ No newline at end of file
+        }
+
+
+# raw_data é gravado em blocos deduplicados e comprimidos (tabela rawdatablob)
+from app.db.raw_data_store import attach_raw_data_store  # noqa: E402
+
+attach_raw_data_store(Diagnostic)
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class DiagnosticMetricRollup(Base):
+    """Agregado de uma métrica de diagnóstico por dispositivo e intervalo de tempo.
+    
+    Cada linha resume os diagnósticos de um dispositivo em um bucket de
+    1 minuto, 1 hora ou 1 dia, permitindo consultas de tendência sem reler
+    os diagnósticos brutos.
+    """
+    
+    __table_args__ = (
+        UniqueConstraint("device_id", "resolution", "metric", "bucket_start", name="uq_metric_rollup_bucket"),
+    )
+    
+    device_id: Mapped[str] = mapped_column(String(36), index=True)
+    resolution: Mapped[str] = mapped_column(String(4))  # 1m, 1h, 1d
+    metric: Mapped[str] = mapped_column(String(32))
+    bucket_start: Mapped[datetime] = mapped_column(DateTime)
+    
+    min_value: Mapped[float] = mapped_column(Float)
+    max_value: Mapped[float] = mapped_column(Float)
+    sum_value: Mapped[float] = mapped_column(Float)
+    count: Mapped[int] = mapped_column(Integer)
+    
+    # Último valor do bucket e o instante em que foi medido
+    last_value: Mapped[float] = mapped_column(Float)
+    last_at: Mapped[datetime] = mapped_column(DateTime)
+    
+    @property
+    def avg_value(self) -> Optional[float]:
+        """Média do bucket"""
+        return self.sum_value / self.count if self.count else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte o bucket para um dicionário.
+        
+        Returns:
+            Dicionário com as estatísticas do bucket
+        """
+        return {
+            "bucket_start": self.bucket_start.isoformat() if self.bucket_start else None,
+            "min": self.min_value,
+            "max": self.max_value,
+            "avg": self.avg_value,
+            "count": self.count,
+            "last": self.last_value
+        }
@@ -0,0 +1,44 @@
+from sqlalchemy import Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class RawDataBlob(Base):
+    """Bloco comprimido de ``Diagnostic.raw_data``, endereçado pelo hash do conteúdo.
+    
+    Blocos idênticos entre execuções (partições, interfaces, drivers, etc.)
+    são gravados uma única vez e referenciados pelos diagnósticos.
+    """
+    
+    # SHA-256 do JSON canônico do bloco
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    
+    # Algoritmo de compressão (zstd ou zlib)
+    codec: Mapped[str] = mapped_column(String(16))
+    
+    # Tamanho do JSON sem compressão em bytes
+    size: Mapped[int] = mapped_column(Integer)
+    
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class RawDataBlobRef(Base):
+    """Referência de um registro com ``raw_data`` (diagnóstico) a um bloco.
+    
+    Gravada junto com o manifesto, permite à coleta de lixo achar os blocos
+    órfãos pelo índice de ``blob_id`` sem ler os manifestos.
+    """
+    
+    # Chave composta no lugar do ID UUID da base
+    id = None
+    
+    # ID do registro dono do manifesto
+    owner_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    
+    # Hash do bloco referenciado
+    blob_id: Mapped[str] = mapped_column(String(64), primary_key=True, index=True)
+    
+    def __repr__(self) -> str:
+        """Representação string do objeto."""
+        return f"<{self.__class__.__name__}(owner_id={self.owner_id}, blob_id={self.blob_id})>"
@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, field_validator
 
 from app.models.diagnostic import DiagnosticStatus
+from app.schemas.system_info import SystemInfoCreate
 
 
 # Schemas compartilhados
@@ -42,6 +43,16 @@ class DiagnosticUpdate(BaseModel):
     execution_time: Optional[float] = None
 
 
+# Schema para ingestão em lote de diagnósticos já executados pelos agentes
+class DiagnosticIngestItem(DiagnosticUpdate):
+    """Diagnóstico recebido na ingestão em lote, com as informações do sistema."""
+    user_id: Optional[str] = None
+    device_id: Optional[str] = None
+    status: DiagnosticStatus = DiagnosticStatus.COMPLETED
+    created_at: Optional[datetime] = None
+    system_info: Optional[SystemInfoCreate] = None
+
+
 # Schema para leitura de diagnóstico
 class DiagnosticInDB(DiagnosticBase):
     """Atributos retornados ao ler um diagnóstico do banco de dados."""
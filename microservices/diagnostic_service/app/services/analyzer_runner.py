@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TIMED_OUT_STATUS = "timed_out"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Futuros que estouraram o timeout mas ainda ocupam uma thread do executor atual
+_stuck_futures: Set[Future] = set()
+
+
+def get_analyzer_executor() -> ThreadPoolExecutor:
+    """Retorna o executor compartilhado pelos analisadores.
+
+    O executor é limitado por ``DIAGNOSTIC_ANALYZER_WORKERS`` para que
+    analisadores travados não criem threads sem limite.
+
+    Returns:
+        ThreadPoolExecutor compartilhado
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DIAGNOSTIC_ANALYZER_WORKERS,
+                    thread_name_prefix="analyzer"
+                )
+    return _executor
+
+
+def stuck_analyzer_count() -> int:
+    """Retorna quantos analisadores expirados ainda ocupam o executor compartilhado."""
+    with _executor_lock:
+        return len(_stuck_futures)
+
+
+def _abandon_future(future: Future, executor: ThreadPoolExecutor) -> None:
+    """Registra um analisador expirado que continua rodando.
+
+    ``Future.cancel`` não interrompe uma thread em execução, então o
+    analisador continua ocupando um worker. Quando metade dos workers do
+    executor compartilhado está presa, o executor é substituído por um novo;
+    o antigo é encerrado sem esperar e suas threads terminam quando os
+    analisadores travados retornarem.
+    """
+    global _executor, _stuck_futures
+    if future.cancel():
+        return
+    with _executor_lock:
+        if executor is not _executor:
+            return
+        _stuck_futures.add(future)
+        future.add_done_callback(_stuck_futures.discard)
+        stuck = len(_stuck_futures)
+        if stuck * 2 < settings.DIAGNOSTIC_ANALYZER_WORKERS:
+            logger.warning(f"{stuck} timed-out analyzers still running on the shared executor")
+            return
+        logger.error(f"Replacing analyzer executor: {stuck} workers stuck in timed-out analyzers")
+        _executor = None
+        _stuck_futures = set()
+    executor.shutdown(wait=False)
+
+
+class AnalyzerRunner:
+    """Executa analisadores em paralelo com prazo total e timeout individual."""
+
+    def __init__(
+        self,
+        executor: Optional[ThreadPoolExecutor] = None,
+        analyzer_timeout: Optional[float] = None,
+        deadline: Optional[float] = None
+    ):
+        """Inicializa o executor de analisadores.
+
+        Args:
+            executor: Executor a ser usado (padrão: executor compartilhado)
+            analyzer_timeout: Timeout de cada analisador em segundos
+            deadline: Prazo total da execução em segundos
+        """
+        self.executor = executor
+        self.analyzer_timeout = (
+            analyzer_timeout if analyzer_timeout is not None
+            else settings.DIAGNOSTIC_ANALYZER_TIMEOUT_SECONDS
+        )
+        self.deadline = deadline if deadline is not None else settings.DIAGNOSTIC_RUN_DEADLINE_SECONDS
+
+    def run(self, tasks: Dict[str, Callable[[], Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Executa as tarefas em paralelo e coleta os resultados.
+
+        O timeout individual conta a partir do início efetivo de cada
+        analisador, não da submissão, então analisadores que esperam na fila
+        do executor só são limitados pelo prazo total. Tarefas que excedem o
+        timeout individual ou o prazo total retornam um resultado parcial com
+        status ``timed_out`` em vez de falhar a execução.
+
+        Args:
+            tasks: Mapeamento nome -> função sem argumentos que retorna o resultado
+
+        Returns:
+            Mapeamento nome -> resultado, na mesma ordem das tarefas
+        """
+        executor = self.executor or get_analyzer_executor()
+        run_deadline = time.monotonic() + self.deadline
+
+        started_at: Dict[str, float] = {}
+        started_events: Dict[str, threading.Event] = {name: threading.Event() for name in tasks}
+
+        def timed(name: str, func: Callable[[], Dict[str, Any]]) -> Callable[[], Dict[str, Any]]:
+            def call() -> Dict[str, Any]:
+                started_at[name] = time.monotonic()
+                started_events[name].set()
+                return func()
+            return call
+
+        futures: Dict[str, Future] = {
+            name: executor.submit(timed(name, func)) for name, func in tasks.items()
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, future in futures.items():
+            started_events[name].wait(max(0.0, run_deadline - time.monotonic()))
+            start = started_at.get(name)
+            limit = run_deadline if start is None else min(start + self.analyzer_timeout, run_deadline)
+            try:
+                results[name] = future.result(timeout=max(0.0, limit - time.monotonic()))
+            except FutureTimeoutError:
+                if start is None:
+                    message = f"Analyzer {name} did not start before the run deadline"
+                else:
+                    message = f"Analyzer {name} did not finish within {time.monotonic() - start:.2f}s"
+                logger.warning(message)
+                if self.executor is None:
+                    _abandon_future(future, executor)
+                else:
+                    future.cancel()
+                results[name] = {
+                    "status": TIMED_OUT_STATUS,
+                    "timed_out": True,
+                    "error_message": message
+                }
+            except Exception as e:
+                logger.exception(f"Error running analyzer {name}: {str(e)}")
+                results[name] = {
+                    "status": "error",
+                    "error_message": str(e)
+                }
+
+        return results
@@ -1,32 +1,64 @@
+import asyncio
 import logging
 import os
 import platform
-import subprocess
-import winreg
 from typing import Dict, Any, List, Optional
 
+try:
+    import winreg
+except ImportError:
+    winreg = None  # Disponível apenas no Windows
+
+from app.services.analyzers.inventory_cache import InventoryCache, inventory_cache, run_command, run_commands, run_sync
+
 logger = logging.getLogger(__name__)
 
+# Arquivos de configuração alterados ao ativar/desativar firewalls no Linux
+LINUX_FIREWALL_CONFIG_PATHS = ["/etc/ufw/ufw.conf", "/etc/firewalld/firewalld.conf", "/etc/sysconfig/iptables"]
+
 
 class AntivirusAnalyzer:
     """Analisador de antivírus para diagnóstico de sistema."""
     
-    def __init__(self):
-        """Inicializa o analisador de antivírus."""
-        pass
+    def __init__(self, cache: Optional[InventoryCache] = None):
+        """Inicializa o analisador de antivírus.
+        
+        Args:
+            cache: Cache de inventário (padrão: cache global)
+        """
+        self.cache = cache if cache is not None else inventory_cache
     
-    def analyze(self) -> Dict[str, Any]:
+    def analyze(self, force_refresh: bool = False) -> Dict[str, Any]:
         """Realiza análise completa dos sistemas de proteção.
         
+        Para chamadores síncronos (threads do executor de analisadores).
+        Código que roda no event loop deve usar ``analyze_async``.
+        
+        Args:
+            force_refresh: Ignora o inventário em cache e consulta o sistema
+            
+        Returns:
+            Dicionário com resultados da análise
+        """
+        return run_sync(self.analyze_async(force_refresh))
+    
+    async def analyze_async(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Realiza análise completa dos sistemas de proteção sem bloquear o event loop.
+        
+        Args:
+            force_refresh: Ignora o inventário em cache e consulta o sistema
+            
         Returns:
             Dicionário com resultados da análise
         """
         try:
             # Coleta informações dos antivírus
-            installed_antiviruses = self._get_installed_antiviruses()
-            windows_defender = self._check_windows_defender()
-            firewall_status = self._check_firewall()
-            real_time_protection = self._check_real_time_protection()
+            installed_antiviruses, windows_defender, firewall_status = await asyncio.gather(
+                self._get_installed_antiviruses(force_refresh),
+                self._check_windows_defender(),
+                self._check_firewall(force_refresh)
+            )
+            real_time_protection = await self._check_real_time_protection(windows_defender, installed_antiviruses)
             
             # Determina o status geral de proteção
             status = self._determine_protection_status(
@@ -56,9 +88,20 @@ class AntivirusAnalyzer:
                 "error_message": str(e)
             }
     
-    def _get_installed_antiviruses(self) -> List[Dict[str, Any]]:
+    async def _get_installed_antiviruses(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """Obtém lista de antivírus instalados no sistema.
         
+        Args:
+            force_refresh: Ignora o inventário em cache
+            
+        Returns:
+            Lista de antivírus encontrados
+        """
+        return await self.cache.aget("antiviruses", self._collect_installed_antiviruses, force_refresh)
+    
+    async def _collect_installed_antiviruses(self) -> List[Dict[str, Any]]:
+        """Coleta a lista de antivírus da plataforma atual.
+        
         Returns:
             Lista de antivírus encontrados
         """
@@ -66,9 +109,10 @@ class AntivirusAnalyzer:
         
         try:
             if platform.system() == "Windows":
-                antiviruses.extend(self._scan_windows_antiviruses())
+                # Leitura do registro, síncrona, fora do event loop
+                antiviruses.extend(await asyncio.to_thread(self._scan_windows_antiviruses))
             elif platform.system() == "Linux":
-                antiviruses.extend(self._scan_linux_antiviruses())
+                antiviruses.extend(await self._scan_linux_antiviruses())
             
         except Exception as e:
             logger.error(f"Error scanning for antiviruses: {str(e)}")
@@ -166,7 +210,7 @@ class AntivirusAnalyzer:
         
         return antiviruses
     
-    def _scan_linux_antiviruses(self) -> List[Dict[str, Any]]:
+    async def _scan_linux_antiviruses(self) -> List[Dict[str, Any]]:
         """Escaneia antivírus instalados no Linux.
         
         Returns:
@@ -183,31 +227,29 @@ class AntivirusAnalyzer:
             {"name": "Bitdefender", "command": "bdscan", "service": "bd-protection"}
         ]
         
+        try:
+            # Verifica se os comandos existem, todos em paralelo
+            results = await run_commands(
+                {av["name"]: ["which", av["command"]] for av in linux_antiviruses},
+                timeout=5
+            )
+        except Exception as e:
+            logger.debug(f"Error checking Linux antiviruses: {str(e)}")
+            return antiviruses
+        
         for av in linux_antiviruses:
-            try:
-                # Verifica se o comando existe
-                result = subprocess.run(
-                    ["which", av["command"]], 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=5
-                )
-                
-                if result.returncode == 0:
-                    antiviruses.append({
-                        "name": av["name"],
-                        "command": av["command"],
-                        "path": result.stdout.strip(),
-                        "status": "installed"
-                    })
-                    
-            except Exception as e:
-                logger.debug(f"Error checking {av['name']}: {str(e)}")
-                continue
+            result = results.get(av["name"])
+            if result is not None and result.returncode == 0:
+                antiviruses.append({
+                    "name": av["name"],
+                    "command": av["command"],
+                    "path": result.stdout.strip(),
+                    "status": "installed"
+                })
         
         return antiviruses
     
-    def _check_windows_defender(self) -> Dict[str, Any]:
+    async def _check_windows_defender(self) -> Dict[str, Any]:
         """Verifica o status do Windows Defender.
         
         Returns:
@@ -224,48 +266,52 @@ class AntivirusAnalyzer:
             return defender_info
         
         try:
-            # Verifica via PowerShell
-            powershell_commands = [
-                "Get-MpComputerStatus | Select-Object -Property AntivirusEnabled,RealTimeProtectionEnabled,AntivirusSignatureLastUpdated,QuickScanAge",
-                "Get-MpPreference | Select-Object -Property DisableRealtimeMonitoring"
-            ]
+            # Verifica via PowerShell, as duas consultas em paralelo
+            powershell_commands = {
+                "status": "Get-MpComputerStatus | Select-Object -Property AntivirusEnabled,RealTimeProtectionEnabled,AntivirusSignatureLastUpdated,QuickScanAge",
+                "preference": "Get-MpPreference | Select-Object -Property DisableRealtimeMonitoring"
+            }
+            results = await run_commands(
+                {name: ["powershell", "-Command", cmd] for name, cmd in powershell_commands.items()},
+                timeout=10
+            )
             
-            for cmd in powershell_commands:
-                try:
-                    result = subprocess.run(
-                        ["powershell", "-Command", cmd],
-                        capture_output=True,
-                        text=True,
-                        timeout=10
-                    )
+            for result in results.values():
+                # None: PowerShell indisponível ou consulta excedeu o timeout
+                if result is not None and result.returncode == 0 and result.stdout:
+                    output = result.stdout.lower()
                     
-                    if result.returncode == 0 and result.stdout:
-                        output = result.stdout.lower()
-                        
-                        if "antivirusenabled" in output and "true" in output:
-                            defender_info["enabled"] = True
-                        
-                        if "realtimeprotectionenabled" in output and "true" in output:
-                            defender_info["real_time_protection"] = True
-                        
-                        if "disablerealtimemonitoring" in output and "false" in output:
-                            defender_info["real_time_protection"] = True
-                        
-                except subprocess.TimeoutExpired:
-                    logger.warning("PowerShell command timed out")
-                    continue
-                except Exception as e:
-                    logger.debug(f"PowerShell command failed: {str(e)}")
-                    continue
+                    if "antivirusenabled" in output and "true" in output:
+                        defender_info["enabled"] = True
+                    
+                    if "realtimeprotectionenabled" in output and "true" in output:
+                        defender_info["real_time_protection"] = True
+                    
+                    if "disablerealtimemonitoring" in output and "false" in output:
+                        defender_info["real_time_protection"] = True
         
         except Exception as e:
             logger.error(f"Error checking Windows Defender: {str(e)}")
         
         return defender_info
     
-    def _check_firewall(self) -> Dict[str, Any]:
+    async def _check_firewall(self, force_refresh: bool = False) -> Dict[str, Any]:
         """Verifica o status do firewall do sistema.
         
+        Args:
+            force_refresh: Ignora o status em cache
+            
+        Returns:
+            Informações sobre o firewall
+        """
+        return await self.cache.aget(
+            "firewall", self._collect_firewall_status, force_refresh,
+            watch_paths=LINUX_FIREWALL_CONFIG_PATHS
+        )
+    
+    async def _collect_firewall_status(self) -> Dict[str, Any]:
+        """Coleta o status do firewall da plataforma atual.
+        
         Returns:
             Informações sobre o firewall
         """
@@ -277,16 +323,16 @@ class AntivirusAnalyzer:
         
         try:
             if platform.system() == "Windows":
-                firewall_info = self._check_windows_firewall()
+                firewall_info = await self._check_windows_firewall()
             elif platform.system() == "Linux":
-                firewall_info = self._check_linux_firewall()
+                firewall_info = await self._check_linux_firewall()
                 
         except Exception as e:
             logger.error(f"Error checking firewall: {str(e)}")
         
         return firewall_info
     
-    def _check_windows_firewall(self) -> Dict[str, Any]:
+    async def _check_windows_firewall(self) -> Dict[str, Any]:
         """Verifica o firewall do Windows.
         
         Returns:
@@ -300,14 +346,9 @@ class AntivirusAnalyzer:
         
         try:
             # Verifica via netsh
-            result = subprocess.run(
-                ["netsh", "advfirewall", "show", "allprofiles", "state"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = await run_command(["netsh", "advfirewall", "show", "allprofiles", "state"], timeout=10)
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 output = result.stdout.lower()
                 profiles = ["domain", "private", "public"]
                 
@@ -328,7 +369,7 @@ class AntivirusAnalyzer:
         
         return firewall_info
     
-    def _check_linux_firewall(self) -> Dict[str, Any]:
+    async def _check_linux_firewall(self) -> Dict[str, Any]:
         """Verifica firewalls no Linux.
         
         Returns:
@@ -347,16 +388,19 @@ class AntivirusAnalyzer:
             {"name": "firewalld", "check_cmd": ["firewall-cmd", "--state"]}
         ]
         
+        try:
+            # Todos os firewalls são consultados em paralelo; a ordem da lista
+            # continua definindo a prioridade na interpretação
+            results = await run_commands({fw["name"]: fw["check_cmd"] for fw in firewalls}, timeout=5)
+        except Exception as e:
+            logger.debug(f"Error checking Linux firewalls: {str(e)}")
+            return firewall_info
+        
         for fw in firewalls:
             try:
-                result = subprocess.run(
-                    fw["check_cmd"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
+                result = results.get(fw["name"])
                 
-                if result.returncode == 0:
+                if result is not None and result.returncode == 0:
                     output = result.stdout.lower()
                     
                     if fw["name"] == "ufw" and "status: active" in output:
@@ -383,9 +427,14 @@ class AntivirusAnalyzer:
         
         return firewall_info
     
-    def _check_real_time_protection(self) -> Dict[str, Any]:
+    async def _check_real_time_protection(self, defender_info: Optional[Dict[str, Any]] = None,
+                                          installed_avs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Verifica se a proteção em tempo real está ativa.
         
+        Args:
+            defender_info: Status do Windows Defender já coletado (padrão: consultado agora)
+            installed_avs: Antivírus instalados já coletados (padrão: consultados agora)
+            
         Returns:
             Status da proteção em tempo real
         """
@@ -397,13 +446,15 @@ class AntivirusAnalyzer:
         try:
             if platform.system() == "Windows":
                 # Verifica Windows Defender
-                defender_info = self._check_windows_defender()
+                if defender_info is None:
+                    defender_info = await self._check_windows_defender()
                 if defender_info.get("real_time_protection", False):
                     protection_info["enabled"] = True
                     protection_info["sources"].append("Windows Defender")
                 
                 # Verifica outros antivírus (implementação básica)
-                installed_avs = self._get_installed_antiviruses()
+                if installed_avs is None:
+                    installed_avs = await self._get_installed_antiviruses()
                 for av in installed_avs:
                     if av["name"] != "Windows Defender":
                         protection_info["sources"].append(av["name"])
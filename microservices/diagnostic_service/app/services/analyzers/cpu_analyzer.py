@@ -1,7 +1,9 @@
 import logging
 import platform
 import psutil
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.core.system_sampler import system_sampler
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,7 @@ class CPUAnalyzer:
             cpu_usage = self._get_cpu_usage()
             cpu_temperature = self._get_cpu_temperature()
             cpu_info = self._get_cpu_info()
-            cpu_load = self._get_cpu_load()
+            cpu_load = self._get_cpu_load(cpu_usage)
             cpu_frequency = self._get_cpu_frequency()
             
             # Determina o status da CPU
@@ -57,6 +59,11 @@ class CPUAnalyzer:
             Porcentagem de uso da CPU
         """
         try:
+            # Usa o snapshot compartilhado quando o amostrador está ativo
+            snapshot = system_sampler.fresh()
+            if snapshot is not None:
+                return snapshot.cpu_percent
+            
             # Uso da CPU em porcentagem (média de todos os núcleos)
             return psutil.cpu_percent(interval=1)
         except Exception as e:
@@ -123,9 +130,12 @@ class CPUAnalyzer:
                 "logical_cores": psutil.cpu_count(logical=True) or 0
             }
     
-    def _get_cpu_load(self) -> Dict[str, float]:
+    def _get_cpu_load(self, cpu_usage: Optional[float] = None) -> Dict[str, float]:
         """Obtém a carga da CPU (load average).
         
+        Args:
+            cpu_usage: Uso da CPU já medido (padrão: lido do snapshot)
+            
         Returns:
             Dicionário com carga da CPU em diferentes intervalos
         """
@@ -141,7 +151,7 @@ class CPUAnalyzer:
             else:
                 # Windows não suporta getloadavg(), usamos uma aproximação
                 return {
-                    "current": psutil.cpu_percent() / 100.0
+                    "current": (cpu_usage if cpu_usage is not None else self._get_cpu_usage()) / 100.0
                 }
                 
         except Exception as e:
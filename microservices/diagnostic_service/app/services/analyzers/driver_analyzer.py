@@ -1,29 +1,53 @@
 import logging
 import os
 import platform
-import subprocess
-import winreg
 from typing import Dict, Any, List, Optional
 
+from app.services.analyzers.inventory_cache import InventoryCache, inventory_cache, run_commands, run_sync
+
 logger = logging.getLogger(__name__)
 
+WINDOWS_DRIVERS_CMD = "Get-WmiObject Win32_PnPSignedDriver | Select-Object DeviceName, DriverVersion, Manufacturer, DriverDate, IsSigned | ConvertTo-Json"
+WINDOWS_PROBLEM_DEVICES_CMD = "Get-WmiObject Win32_PnPEntity | Where-Object {$_.ConfigManagerErrorCode -ne 0} | Select-Object Name, DeviceID, ConfigManagerErrorCode | ConvertTo-Json"
+
 
 class DriverAnalyzer:
     """Analisador de drivers para diagnóstico de sistema."""
     
-    def __init__(self):
-        """Inicializa o analisador de drivers."""
-        pass
+    def __init__(self, cache: Optional[InventoryCache] = None):
+        """Inicializa o analisador de drivers.
+        
+        Args:
+            cache: Cache de inventário (padrão: cache global)
+        """
+        self.cache = cache if cache is not None else inventory_cache
     
-    def analyze(self) -> Dict[str, Any]:
+    def analyze(self, force_refresh: bool = False) -> Dict[str, Any]:
         """Realiza análise completa dos drivers do sistema.
         
+        Para chamadores síncronos (threads do executor de analisadores).
+        Código que roda no event loop deve usar ``analyze_async``.
+        
+        Args:
+            force_refresh: Ignora o inventário em cache e consulta o sistema
+            
+        Returns:
+            Dicionário com resultados da análise
+        """
+        return run_sync(self.analyze_async(force_refresh))
+    
+    async def analyze_async(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Realiza análise completa dos drivers sem bloquear o event loop.
+        
+        Args:
+            force_refresh: Ignora o inventário em cache e consulta o sistema
+            
         Returns:
             Dicionário com resultados da análise
         """
         try:
             # Coleta informações dos drivers
-            drivers_info = self._get_drivers_info()
+            drivers_info = await self._get_drivers_info(force_refresh)
             problematic_drivers = self._identify_problematic_drivers(drivers_info)
             outdated_drivers = self._identify_outdated_drivers(drivers_info)
             
@@ -56,9 +80,23 @@ class DriverAnalyzer:
                 "error_message": str(e)
             }
     
-    def _get_drivers_info(self) -> List[Dict[str, Any]]:
+    async def _get_drivers_info(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """Obtém informações sobre os drivers instalados no sistema.
         
+        O inventário só é coletado novamente após reinicialização, mudança no
+        banco de pacotes ou quando ``force_refresh`` é informado.
+        
+        Args:
+            force_refresh: Ignora o inventário em cache
+            
+        Returns:
+            Lista de informações sobre drivers
+        """
+        return await self.cache.aget("drivers", self._collect_drivers_info, force_refresh)
+    
+    async def _collect_drivers_info(self) -> List[Dict[str, Any]]:
+        """Coleta o inventário de drivers da plataforma atual.
+        
         Returns:
             Lista de informações sobre drivers
         """
@@ -66,16 +104,16 @@ class DriverAnalyzer:
         
         try:
             if platform.system() == "Windows":
-                drivers = self._get_windows_drivers()
+                drivers = await self._get_windows_drivers()
             elif platform.system() == "Linux":
-                drivers = self._get_linux_drivers()
+                drivers = await self._get_linux_drivers()
                 
         except Exception as e:
             logger.error(f"Error getting drivers information: {str(e)}")
         
         return drivers
     
-    def _get_windows_drivers(self) -> List[Dict[str, Any]]:
+    async def _get_windows_drivers(self) -> List[Dict[str, Any]]:
         """Obtém informações sobre drivers no Windows.
         
         Returns:
@@ -84,17 +122,14 @@ class DriverAnalyzer:
         drivers = []
         
         try:
-            # Usar PowerShell para obter informações sobre drivers
-            powershell_cmd = "Get-WmiObject Win32_PnPSignedDriver | Select-Object DeviceName, DriverVersion, Manufacturer, DriverDate, IsSigned | ConvertTo-Json"
-            
-            result = subprocess.run(
-                ["powershell", "-Command", powershell_cmd],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            # Drivers e dispositivos com problema são consultados em paralelo
+            results = await run_commands({
+                "drivers": ["powershell", "-Command", WINDOWS_DRIVERS_CMD],
+                "problems": ["powershell", "-Command", WINDOWS_PROBLEM_DEVICES_CMD]
+            }, timeout=30)
+            result = results["drivers"]
             
-            if result.returncode == 0 and result.stdout:
+            if result is not None and result.returncode == 0 and result.stdout:
                 import json
                 try:
                     # Processar saída JSON
@@ -119,31 +154,28 @@ class DriverAnalyzer:
                     logger.error(f"Error decoding driver JSON: {str(e)}")
             
             # Verificar drivers no Device Manager
-            self._check_device_manager_status(drivers)
+            await self._check_device_manager_status(drivers, results["problems"])
             
         except Exception as e:
             logger.error(f"Error getting Windows drivers: {str(e)}")
         
         return drivers
     
-    def _check_device_manager_status(self, drivers: List[Dict[str, Any]]):
+    async def _check_device_manager_status(self, drivers: List[Dict[str, Any]], result=None):
         """Verifica o status dos dispositivos no Gerenciador de Dispositivos.
         
         Args:
             drivers: Lista de drivers para atualizar com informações de status
+            result: Saída já coletada da consulta de dispositivos com problema
         """
         try:
-            # Usar PowerShell para obter dispositivos com problemas
-            powershell_cmd = "Get-WmiObject Win32_PnPEntity | Where-Object {$_.ConfigManagerErrorCode -ne 0} | Select-Object Name, DeviceID, ConfigManagerErrorCode | ConvertTo-Json"
+            if result is None:
+                # Usar PowerShell para obter dispositivos com problemas
+                result = (await run_commands({
+                    "problems": ["powershell", "-Command", WINDOWS_PROBLEM_DEVICES_CMD]
+                }, timeout=30))["problems"]
             
-            result = subprocess.run(
-                ["powershell", "-Command", powershell_cmd],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode == 0 and result.stdout and result.stdout.strip() != "":
+            if result is not None and result.returncode == 0 and result.stdout and result.stdout.strip() != "":
                 import json
                 try:
                     # Processar saída JSON
@@ -206,7 +238,7 @@ class DriverAnalyzer:
         except Exception as e:
             logger.error(f"Error checking device manager status: {str(e)}")
     
-    def _get_linux_drivers(self) -> List[Dict[str, Any]]:
+    async def _get_linux_drivers(self) -> List[Dict[str, Any]]:
         """Obtém informações sobre drivers no Linux.
         
         Returns:
@@ -216,14 +248,9 @@ class DriverAnalyzer:
         
         try:
             # Usar lsmod para listar módulos do kernel
-            result = subprocess.run(
-                ["lsmod"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = (await run_commands({"lsmod": ["lsmod"]}, timeout=10))["lsmod"]
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 lines = result.stdout.strip().split('\n')
                 
                 # Pular o cabeçalho
@@ -0,0 +1,200 @@
+import asyncio
+import copy
+import logging
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bancos de pacotes cujo mtime muda quando drivers ou antivírus são instalados
+PACKAGE_DB_PATHS = [
+    "/var/lib/dpkg/status",
+    "/var/lib/rpm",
+    "/var/lib/pacman/local",
+    os.path.join(os.environ.get("SystemRoot", r"C:\Windows"), "System32", "DriverStore", "FileRepository"),
+]
+
+
+@dataclass
+class CommandResult:
+    """Resultado de um comando externo"""
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+async def run_command(command: List[str], timeout: float) -> Optional[CommandResult]:
+    """Executa um comando em subprocesso assíncrono.
+
+    Args:
+        command: Comando e argumentos
+        timeout: Timeout em segundos
+
+    Returns:
+        Resultado do comando ou None se não puder ser executado a tempo
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except OSError as e:
+        logger.debug(f"Command {command[0]} unavailable: {str(e)}")
+        return None
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logger.warning(f"Command {command[0]} timed out after {timeout}s")
+        return None
+
+    return CommandResult(
+        returncode=process.returncode,
+        stdout=stdout.decode(errors="ignore"),
+        stderr=stderr.decode(errors="ignore")
+    )
+
+
+async def run_commands(commands: Dict[str, List[str]], timeout: float) -> Dict[str, Optional[CommandResult]]:
+    """Executa vários comandos em paralelo.
+
+    Args:
+        commands: Mapeamento nome -> comando
+        timeout: Timeout de cada comando em segundos
+
+    Returns:
+        Mapeamento nome -> resultado, na mesma ordem dos comandos
+    """
+    results = await asyncio.gather(*(run_command(cmd, timeout) for cmd in commands.values()))
+    return dict(zip(commands.keys(), results))
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """Executa uma corrotina a partir de código síncrono.
+
+    Serve ao ``analyze()`` síncrono dos analisadores, chamado das threads do
+    executor de analisadores. Se já houver um loop rodando neste thread, a
+    corrotina roda em um loop próprio em outro thread e o loop atual fica
+    parado até ela terminar; código async deve aguardar a corrotina
+    diretamente (``analyze_async``).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    logger.warning("run_sync chamado dentro de um event loop; aguarde a corrotina diretamente")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _path_mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def inventory_key(watch_paths: Iterable[str] = ()) -> Tuple[Any, ...]:
+    """Calcula a chave de validade do inventário.
+
+    Args:
+        watch_paths: Arquivos adicionais cuja alteração invalida a entrada
+
+    Returns:
+        Tupla com plataforma, boot time e mtimes observados
+    """
+    package_mtime = max((_path_mtime(path) for path in PACKAGE_DB_PATHS), default=0.0)
+    return (
+        platform.system(),
+        psutil.boot_time(),
+        package_mtime,
+        tuple(_path_mtime(path) for path in watch_paths)
+    )
+
+
+class InventoryCache:
+    """Cache do inventário de drivers e antivírus.
+
+    As entradas são válidas enquanto o sistema não reiniciar e o banco de
+    pacotes não mudar. ``max_age`` limita a idade de qualquer entrada para
+    capturar mudanças que não passam pelo gerenciador de pacotes.
+    """
+
+    def __init__(self, max_age: Optional[float] = None, enabled: Optional[bool] = None,
+                 key_func: Callable[..., Tuple[Any, ...]] = inventory_key):
+        self.max_age = max_age if max_age is not None else settings.INVENTORY_CACHE_MAX_AGE_SECONDS
+        self.enabled = enabled if enabled is not None else settings.INVENTORY_CACHE_ENABLED
+        self.key_func = key_func
+        self._entries: Dict[str, Tuple[Tuple[Any, ...], float, Any]] = {}
+        self._lock = threading.Lock()
+
+    async def aget(self, name: str, loader: Callable[[], Awaitable[Any]], force_refresh: bool = False,
+                   watch_paths: Iterable[str] = ()) -> Any:
+        """Retorna a entrada do cache ou a recarrega com um loader assíncrono.
+
+        Args:
+            name: Nome da entrada
+            loader: Função assíncrona que coleta o inventário em caso de falta
+            force_refresh: Ignora o cache e recarrega a entrada
+            watch_paths: Arquivos adicionais que fazem parte da chave
+
+        Returns:
+            Cópia do inventário
+        """
+        if not self.enabled:
+            return await loader()
+
+        key = self.key_func(watch_paths)
+        hit, value = self._lookup(name, key, force_refresh)
+        if hit:
+            return value
+        return self._store(name, key, await loader())
+
+    def _lookup(self, name: str, key: Tuple[Any, ...], force_refresh: bool) -> Tuple[bool, Any]:
+        """Cópia da entrada se ela ainda for válida para a chave"""
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and not force_refresh:
+            entry_key, loaded_at, value = entry
+            if entry_key == key and (not self.max_age or time.monotonic() - loaded_at < self.max_age):
+                return True, copy.deepcopy(value)
+        return False, None
+
+    def _store(self, name: str, key: Tuple[Any, ...], value: Any) -> Any:
+        """Guarda o inventário recarregado e devolve uma cópia"""
+        with self._lock:
+            self._entries[name] = (key, time.monotonic(), value)
+        logger.debug(f"Inventory cache entry {name} refreshed")
+        return copy.deepcopy(value)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Remove uma entrada ou todo o cache.
+
+        Args:
+            name: Nome da entrada (padrão: todas)
+        """
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+# Instância global
+inventory_cache = InventoryCache()
+
+
+def get_inventory_cache() -> InventoryCache:
+    """Retorna o cache global de inventário"""
+    return inventory_cache
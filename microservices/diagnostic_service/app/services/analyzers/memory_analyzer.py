@@ -2,6 +2,8 @@ import logging
 import psutil
 from typing import Dict, Any
 
+from app.core.system_sampler import system_sampler
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,6 +50,16 @@ class MemoryAnalyzer:
                 "error_message": str(e)
             }
     
+    def _virtual_memory(self):
+        """Retorna a memória virtual do snapshot compartilhado ou do psutil."""
+        snapshot = system_sampler.fresh()
+        return snapshot.memory if snapshot is not None else psutil.virtual_memory()
+    
+    def _swap_memory(self):
+        """Retorna a memória swap do snapshot compartilhado ou do psutil."""
+        snapshot = system_sampler.fresh()
+        return snapshot.swap if snapshot is not None else psutil.swap_memory()
+    
     def _get_memory_usage(self) -> float:
         """Obtém o uso atual da memória em porcentagem.
         
@@ -55,7 +67,7 @@ class MemoryAnalyzer:
             Porcentagem de uso da memória
         """
         try:
-            return psutil.virtual_memory().percent
+            return self._virtual_memory().percent
         except Exception as e:
             logger.error(f"Error getting memory usage: {str(e)}")
             return 0.0
@@ -67,7 +79,7 @@ class MemoryAnalyzer:
             Dicionário com informações da memória
         """
         try:
-            mem = psutil.virtual_memory()
+            mem = self._virtual_memory()
             return {
                 "total": mem.total / (1024 * 1024),  # Converte para MB
                 "available": mem.available / (1024 * 1024),  # Converte para MB
@@ -90,7 +102,7 @@ class MemoryAnalyzer:
             Dicionário com informações da memória swap
         """
         try:
-            swap = psutil.swap_memory()
+            swap = self._swap_memory()
             return {
                 "total": swap.total / (1024 * 1024),  # Converte para MB
                 "used": swap.used / (1024 * 1024),  # Converte para MB
@@ -113,7 +125,7 @@ class MemoryAnalyzer:
             Dicionário com detalhes da memória
         """
         try:
-            mem = psutil.virtual_memory()
+            mem = self._virtual_memory()
             details = {}
             
             # Adiciona atributos disponíveis
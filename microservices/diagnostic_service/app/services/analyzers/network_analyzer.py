@@ -1,51 +1,87 @@
+import asyncio
 import logging
-import platform
 import psutil
 import socket
-import subprocess
 import time
 from typing import Dict, Any, List, Tuple, Optional
 
+from app.core.config import settings
+from app.services.analyzers.inventory_cache import run_sync
+from app.services.analyzers.network_prober import NetworkProber
+
 logger = logging.getLogger(__name__)
 
 
 class NetworkAnalyzer:
     """Analisador de rede para diagnóstico de sistema."""
     
-    def __init__(self):
-        """Inicializa o analisador de rede."""
-        self.ping_targets = ["8.8.8.8", "1.1.1.1"]  # Servidores DNS do Google e Cloudflare
+    def __init__(
+        self,
+        ping_targets: Optional[List[str]] = None,
+        dns_domains: Optional[List[str]] = None,
+        probe_timeout: Optional[float] = None,
+        sample_window: Optional[float] = None
+    ):
+        """Inicializa o analisador de rede.
+        
+        Args:
+            ping_targets: Alvos de latência (``host`` para ping ICMP ou ``host:porta`` para TCP)
+            dns_domains: Domínios usados no teste de DNS
+            probe_timeout: Orçamento total de tempo das sondas em segundos
+            sample_window: Janela de medição dos contadores das interfaces em segundos
+        """
+        # Padrão: servidores DNS do Google e Cloudflare
+        self.ping_targets = ping_targets if ping_targets is not None else _split_setting(settings.NETWORK_PROBE_TARGETS)
+        self.dns_domains = dns_domains if dns_domains is not None else _split_setting(settings.NETWORK_DNS_DOMAINS)
+        self.probe_timeout = probe_timeout if probe_timeout is not None else settings.NETWORK_PROBE_TIMEOUT_SECONDS
+        self.sample_window = sample_window if sample_window is not None else settings.NETWORK_SAMPLE_WINDOW_SECONDS
+        # Event loop do chamador async; com ele, analyze() roda analyze_async() nesse loop
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
     
     def analyze(self) -> Dict[str, Any]:
         """Realiza análise completa da rede.
         
+        Para chamadores síncronos (threads do executor de analisadores).
+        Código que roda no event loop deve usar ``analyze_async``; quando
+        ``loop`` aponta para o loop de um chamador async, a análise é enviada
+        para esse loop e esta thread só espera o resultado.
+        
         Returns:
             Dicionário com resultados da análise
         """
+        if self.loop is not None and self.loop.is_running() and not self._on_loop(self.loop):
+            return asyncio.run_coroutine_threadsafe(self.analyze_async(), self.loop).result()
+        
         try:
-            # Coleta informações da rede
-            interfaces = self._get_network_interfaces()
-            connectivity = self._check_connectivity()
-            latency = self._measure_latency()
-            bandwidth = self._estimate_bandwidth()
-            dns = self._check_dns()
-            
-            # Determina o status da rede
-            status = self._determine_status(connectivity, latency, interfaces)
-            
-            # Compila os resultados
-            result = {
-                "status": status,
-                "interfaces": interfaces,
-                "connectivity": connectivity,
-                "latency": latency,
-                "bandwidth": bandwidth,
-                "dns": dns
+            # As sondas rodam dentro da janela de medição das interfaces
+            counters_before = self._read_counters()
+            probes = self._run_probes()
+            interfaces = self._get_network_interfaces(counters_before)
+            return self._compile_result(probes, interfaces)
+        except Exception as e:
+            logger.exception(f"Error analyzing network: {str(e)}")
+            return {
+                "status": "error",
+                "error_message": str(e)
             }
-            
-            logger.info(f"Network analysis completed: {status}")
-            return result
-            
+    
+    async def analyze_async(self) -> Dict[str, Any]:
+        """Realiza análise completa da rede sem bloquear o event loop.
+        
+        As sondas rodam no próprio loop e a janela de medição das
+        interfaces (que dorme até o fim da amostra) roda num thread.
+        
+        Returns:
+            Dicionário com resultados da análise
+        """
+        try:
+            counters_before = self._read_counters()
+            prober = NetworkProber(self.ping_targets, self.dns_domains, self.probe_timeout)
+            probes, interfaces = await asyncio.gather(
+                prober.probe_all(),
+                asyncio.to_thread(self._get_network_interfaces, counters_before)
+            )
+            return self._compile_result(probes, interfaces)
         except Exception as e:
             logger.exception(f"Error analyzing network: {str(e)}")
             return {
@@ -53,18 +89,92 @@ class NetworkAnalyzer:
                 "error_message": str(e)
             }
     
-    def _get_network_interfaces(self) -> Dict[str, Dict[str, Any]]:
+    @staticmethod
+    def _on_loop(loop: asyncio.AbstractEventLoop) -> bool:
+        """Indica se o thread atual é o que roda ``loop``"""
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+    
+    def _compile_result(self, probes: Dict[str, Any], interfaces: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Monta o resultado da análise a partir das sondas e das interfaces.
+        
+        Args:
+            probes: Resultados do NetworkProber
+            interfaces: Informações por interface
+            
+        Returns:
+            Dicionário com resultados da análise
+        """
+        connectivity = self._check_connectivity(probes)
+        latency = self._measure_latency(probes)
+        bandwidth = self._estimate_bandwidth(interfaces)
+        dns = self._check_dns(probes)
+        
+        # Determina o status da rede
+        status = self._determine_status(connectivity, latency, interfaces)
+        
+        # Compila os resultados
+        result = {
+            "status": status,
+            "interfaces": interfaces,
+            "connectivity": connectivity,
+            "latency": latency,
+            "bandwidth": bandwidth,
+            "dns": dns,
+            "timed_out_probes": probes.get("timed_out", [])
+        }
+        
+        logger.info(f"Network analysis completed: {status}")
+        return result
+    
+    def _run_probes(self) -> Dict[str, Any]:
+        """Executa as sondas de latência e DNS em paralelo.
+        
+        Returns:
+            Resultados do NetworkProber
+        """
+        prober = NetworkProber(self.ping_targets, self.dns_domains, self.probe_timeout)
+        return run_sync(prober.probe_all())
+    
+    def _read_counters(self) -> Tuple[float, Dict[str, Any]]:
+        """Lê os contadores de I/O de todas as interfaces de uma vez.
+        
+        Returns:
+            Tupla com o instante da leitura e os contadores por interface
+        """
+        return time.monotonic(), psutil.net_io_counters(pernic=True)
+    
+    def _get_network_interfaces(
+        self, counters_before: Optional[Tuple[float, Dict[str, Any]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
         """Obtém informações sobre interfaces de rede.
         
+        Todas as interfaces compartilham um único par de leituras dos
+        contadores, então o tempo de medição não cresce com o número de NICs.
+        
+        Args:
+            counters_before: Leitura inicial de ``_read_counters`` (padrão: lida agora)
+            
         Returns:
             Dicionário com informações por interface
         """
         try:
             interfaces = {}
-            net_io = psutil.net_io_counters(pernic=True)
+            if counters_before is None:
+                counters_before = self._read_counters()
+            started, net_io = counters_before
             net_if_addrs = psutil.net_if_addrs()
             net_if_stats = psutil.net_if_stats()
             
+            # Completa a janela de medição e lê os contadores novamente
+            remaining = self.sample_window - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+            finished, net_io_after = self._read_counters()
+            time_diff = max(finished - started, 1e-6)  # Segundos
+            
             for nic, addrs in net_if_addrs.items():
                 # Ignora interfaces virtuais e de loopback
                 if nic == "lo" or nic.startswith("veth") or nic.startswith("docker"):
@@ -102,16 +212,11 @@ class NetworkAnalyzer:
                         "dropout": io.dropout
                     }
                 
-                # Coleta estatísticas novamente após um intervalo para calcular taxas
-                time.sleep(0.1)  # Pequeno intervalo para medir a diferença
-                net_io_after = psutil.net_io_counters(pernic=True)
-                
                 # Calcula taxas de transferência
                 transfer_rates = {}
                 if nic in net_io and nic in net_io_after:
                     io_before = net_io[nic]
                     io_after = net_io_after[nic]
-                    time_diff = 0.1  # Segundos
                     
                     bytes_sent_diff = io_after.bytes_sent - io_before.bytes_sent
                     bytes_recv_diff = io_after.bytes_recv - io_before.bytes_recv
@@ -138,32 +243,27 @@ class NetworkAnalyzer:
             logger.error(f"Error getting network interfaces: {str(e)}")
             return {}
     
-    def _check_connectivity(self) -> Dict[str, Any]:
+    def _check_connectivity(self, probes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Verifica a conectividade com a Internet.
         
+        Args:
+            probes: Resultados de ``_run_probes`` (padrão: executa as sondas)
+            
         Returns:
             Dicionário com resultados da verificação
         """
         try:
-            # Verifica se há conexão com a Internet
-            connected = False
-            for target in self.ping_targets:
-                if self._ping(target)[0]:
-                    connected = True
-                    break
+            if probes is None:
+                probes = self._run_probes()
             
-            # Obtém o hostname local
-            hostname = socket.gethostname()
-            
-            # Tenta resolver o endereço IP local
-            local_ip = None
-            try:
-                local_ip = socket.gethostbyname(hostname)
-            except socket.gaierror:
-                pass
+            # Verifica se há conexão com a Internet
+            connected = any(result.get("success", False) for result in probes["latency"].values())
             
-            # Verifica se há um gateway padrão
-            gateway = self._get_default_gateway()
+            # Hostname, IP local e gateway padrão são consultados pelo NetworkProber
+            host = probes.get("host", {})
+            hostname = host.get("hostname") or socket.gethostname()
+            local_ip = host.get("local_ip")
+            gateway = host.get("gateway")
             
             return {
                 "internet_connected": connected,
@@ -179,23 +279,29 @@ class NetworkAnalyzer:
                 "error_message": str(e)
             }
     
-    def _measure_latency(self) -> Dict[str, Any]:
+    def _measure_latency(self, probes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Mede a latência da rede para servidores externos.
         
+        Args:
+            probes: Resultados de ``_run_probes`` (padrão: executa as sondas)
+            
         Returns:
             Dicionário com resultados de latência
         """
         try:
+            if probes is None:
+                probes = self._run_probes()
+            
             results = {}
-            for target in self.ping_targets:
-                success, latency = self._ping(target)
+            for target, probe in probes["latency"].items():
                 results[target] = {
-                    "success": success,
-                    "latency_ms": latency
+                    "success": probe.get("success", False),
+                    "latency_ms": probe.get("latency_ms")
                 }
             
             # Calcula a latência média
-            successful_pings = [result["latency_ms"] for result in results.values() if result["success"]]
+            successful_pings = [result["latency_ms"] for result in results.values()
+                                if result["success"] and result["latency_ms"] is not None]
             avg_latency = sum(successful_pings) / len(successful_pings) if successful_pings else None
             
             return {
@@ -209,16 +315,20 @@ class NetworkAnalyzer:
                 "error_message": str(e)
             }
     
-    def _estimate_bandwidth(self) -> Dict[str, Any]:
+    def _estimate_bandwidth(self, interfaces: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Estima a largura de banda disponível.
         
+        Args:
+            interfaces: Interfaces já medidas (padrão: mede novamente)
+            
         Returns:
             Dicionário com estimativas de largura de banda
         """
         try:
             # Em um sistema real, isso seria implementado com testes reais de velocidade
             # Por enquanto, usamos uma estimativa baseada nas interfaces de rede
-            interfaces = self._get_network_interfaces()
+            if interfaces is None:
+                interfaces = self._get_network_interfaces()
             
             # Calcula a média das velocidades de todas as interfaces ativas
             upload_speeds = []
@@ -249,32 +359,19 @@ class NetworkAnalyzer:
                 "estimated": True
             }
     
-    def _check_dns(self) -> Dict[str, Any]:
+    def _check_dns(self, probes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Verifica a resolução DNS.
         
+        Args:
+            probes: Resultados de ``_run_probes`` (padrão: executa as sondas)
+            
         Returns:
             Dicionário com resultados da verificação DNS
         """
         try:
-            domains = ["google.com", "microsoft.com", "amazon.com"]
-            results = {}
-            
-            for domain in domains:
-                try:
-                    start_time = time.time()
-                    ip = socket.gethostbyname(domain)
-                    resolve_time = (time.time() - start_time) * 1000  # ms
-                    
-                    results[domain] = {
-                        "success": True,
-                        "ip": ip,
-                        "resolve_time_ms": resolve_time
-                    }
-                except socket.gaierror:
-                    results[domain] = {
-                        "success": False,
-                        "error": "DNS resolution failed"
-                    }
+            if probes is None:
+                probes = self._run_probes()
+            results = probes["dns"]
             
             # Calcula o tempo médio de resolução
             successful_resolves = [result["resolve_time_ms"] for result in results.values() 
@@ -297,81 +394,6 @@ class NetworkAnalyzer:
                 "error_message": str(e)
             }
     
-    def _ping(self, host: str) -> Tuple[bool, Optional[float]]:
-        """Realiza um ping para o host especificado.
-        
-        Args:
-            host: Endereço do host para ping
-            
-        Returns:
-            Tupla com sucesso (bool) e latência em ms (float ou None)
-        """
-        try:
-            # Determina o comando de ping com base no sistema operacional
-            if platform.system().lower() == "windows":
-                command = ["ping", "-n", "1", "-w", "1000", host]
-            else:  # Linux/Mac
-                command = ["ping", "-c", "1", "-W", "1", host]
-            
-            # Executa o comando de ping
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            # Verifica se o ping foi bem-sucedido
-            if result.returncode == 0:
-                # Extrai o tempo de latência da saída
-                output = result.stdout.lower()
-                if "time=" in output or "tempo=" in output:
-                    # Extrai o valor de tempo da saída
-                    time_str = output.split("time=")[1].split("ms")[0].strip() if "time=" in output else \
-                              output.split("tempo=")[1].split("ms")[0].strip()
-                    try:
-                        return True, float(time_str)
-                    except ValueError:
-                        return True, None
-                return True, None
-            else:
-                return False, None
-                
-        except Exception as e:
-            logger.error(f"Error pinging {host}: {str(e)}")
-            return False, None
-    
-    def _get_default_gateway(self) -> Optional[str]:
-        """Obtém o endereço IP do gateway padrão.
-        
-        Returns:
-            Endereço IP do gateway ou None
-        """
-        try:
-            # Tenta obter o gateway usando psutil (não disponível em todas as plataformas)
-            if hasattr(psutil, "net_if_default_gateway"):
-                gateways = psutil.net_if_default_gateway()
-                if gateways and len(gateways) > 0:
-                    return list(gateways.values())[0][0]
-            
-            # Método alternativo para Windows
-            if platform.system().lower() == "windows":
-                output = subprocess.check_output(["ipconfig"], text=True)
-                for line in output.split("\n"):
-                    if "Default Gateway" in line or "Gateway Padrão" in line:
-                        parts = line.split(":", 1)
-                        if len(parts) > 1 and parts[1].strip():
-                            return parts[1].strip()
-            
-            # Método alternativo para Linux
-            elif platform.system().lower() == "linux":
-                output = subprocess.check_output(["ip", "route", "show", "default"], text=True)
-                if output:
-                    parts = output.split()
-                    if len(parts) > 2 and parts[0] == "default":
-                        return parts[2]
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error getting default gateway: {str(e)}")
-            return None
-    
     def _determine_status(self, connectivity: Dict[str, Any], latency: Dict[str, Any], 
                          interfaces: Dict[str, Dict[str, Any]]) -> str:
         """Determina o status da rede com base na conectividade e latência.
@@ -408,4 +430,9 @@ class NetworkAnalyzer:
                 if stats.get("errin", 0) > 0 or stats.get("errout", 0) > 0:
                     return "warning"
         
-        return "healthy"
\ No newline at end of file
+        return "healthy"
+
+
+def _split_setting(value: str) -> List[str]:
+    """Converte uma configuração separada por vírgulas em lista."""
+    return [item.strip() for item in value.split(",") if item.strip()]
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import platform
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Executor próprio para getaddrinfo: o executor padrão do loop é aguardado
+# no encerramento do asyncio.run, o que anularia o orçamento de tempo
+_dns_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dns-probe")
+
+
+def parse_ping_output(output: str) -> Optional[float]:
+    """Extrai a latência (ms) da saída do comando ping.
+
+    Args:
+        output: Saída do comando ping
+
+    Returns:
+        Latência em ms ou None se não encontrada
+    """
+    output = output.lower()
+    if "time=" in output or "tempo=" in output:
+        marker = "time=" if "time=" in output else "tempo="
+        time_str = output.split(marker)[1].split("ms")[0].strip()
+        try:
+            return float(time_str)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_default_gateway(output: str, system: str) -> Optional[str]:
+    """Extrai o gateway padrão da saída de ``ipconfig`` ou ``ip route``.
+
+    Args:
+        output: Saída do comando
+        system: Nome do sistema em minúsculas (``windows`` ou ``linux``)
+
+    Returns:
+        Endereço IP do gateway ou None se não encontrado
+    """
+    if system == "windows":
+        for line in output.split("\n"):
+            if "Default Gateway" in line or "Gateway Padrão" in line:
+                parts = line.split(":", 1)
+                if len(parts) > 1 and parts[1].strip():
+                    return parts[1].strip()
+    elif system == "linux":
+        parts = output.split()
+        if len(parts) > 2 and parts[0] == "default":
+            return parts[2]
+    return None
+
+
+def split_target(target: str) -> Tuple[str, Optional[int]]:
+    """Separa um alvo no formato ``host`` ou ``host:porta``.
+
+    Args:
+        target: Alvo da sonda
+
+    Returns:
+        Tupla com host e porta (None para ping ICMP)
+    """
+    if target.count(":") == 1:
+        host, port = target.rsplit(":", 1)
+        if port.isdigit():
+            return host, int(port)
+    return target, None
+
+
+class NetworkProber:
+    """Executa sondas de latência e DNS concorrentemente com asyncio.
+
+    Alvos no formato ``host:porta`` são medidos pelo tempo de conexão TCP, o
+    que permite usar um servidor local como substituto em testes; alvos sem
+    porta usam o comando ``ping`` do sistema em um subprocesso assíncrono.
+    O IP local e o gateway padrão também são consultados sem bloquear o
+    loop. Todas as sondas compartilham um único orçamento de tempo.
+    """
+
+    def __init__(self, latency_targets: List[str], dns_domains: List[str], timeout: float = 3.0):
+        """Inicializa o executor de sondas.
+
+        Args:
+            latency_targets: Alvos de latência/conectividade
+            dns_domains: Domínios para teste de resolução DNS
+            timeout: Orçamento total de tempo em segundos
+        """
+        self.latency_targets = latency_targets
+        self.dns_domains = dns_domains
+        self.timeout = timeout
+
+    async def probe_all(self) -> Dict[str, Any]:
+        """Executa todas as sondas em paralelo.
+
+        Returns:
+            Dicionário com resultados de latência, DNS, dados do host e sondas que expiraram
+        """
+        hostname = socket.gethostname()
+        host_tasks = {
+            "local_ip": asyncio.ensure_future(self._resolve_local_ip(hostname)),
+            "gateway": asyncio.ensure_future(self._default_gateway())
+        }
+        tasks = {}
+        for target in self.latency_targets:
+            tasks[("latency", target)] = asyncio.ensure_future(self._probe_latency(target))
+        for domain in self.dns_domains:
+            tasks[("dns", domain)] = asyncio.ensure_future(self._probe_dns(domain))
+
+        await asyncio.wait([*tasks.values(), *host_tasks.values()], timeout=self.timeout)
+
+        results: Dict[str, Any] = {"latency": {}, "dns": {}, "host": {"hostname": hostname}, "timed_out": []}
+        cancelled = []
+        for name, task in host_tasks.items():
+            if not task.done():
+                task.cancel()
+                cancelled.append(task)
+                results["host"][name] = None
+            elif task.exception() is not None:
+                logger.error(f"Error probing {name}: {str(task.exception())}")
+                results["host"][name] = None
+            else:
+                results["host"][name] = task.result()
+        for (kind, target), task in tasks.items():
+            if not task.done():
+                task.cancel()
+                cancelled.append(task)
+                results["timed_out"].append(target)
+                results[kind][target] = {
+                    "success": False,
+                    "timed_out": True,
+                    "error": f"Probe exceeded {self.timeout}s budget"
+                }
+            elif task.exception() is not None:
+                results[kind][target] = {
+                    "success": False,
+                    "error": str(task.exception())
+                }
+            else:
+                results[kind][target] = task.result()
+
+        # Aguarda o cancelamento para não deixar subprocessos órfãos
+        if cancelled:
+            await asyncio.gather(*cancelled, return_exceptions=True)
+
+        return results
+
+    async def _probe_latency(self, target: str) -> Dict[str, Any]:
+        """Mede a latência para um alvo.
+
+        Args:
+            target: Alvo no formato ``host`` ou ``host:porta``
+
+        Returns:
+            Dicionário com sucesso e latência em ms
+        """
+        host, port = split_target(target)
+        if port is not None:
+            return await self._tcp_connect(host, port)
+        return await self._icmp_ping(host)
+
+    async def _tcp_connect(self, host: str, port: int) -> Dict[str, Any]:
+        """Mede o tempo de conexão TCP."""
+        start_time = time.perf_counter()
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            return {"success": False, "latency_ms": None, "error": str(e)}
+        latency = (time.perf_counter() - start_time) * 1000
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return {"success": True, "latency_ms": latency}
+
+    async def _icmp_ping(self, host: str) -> Dict[str, Any]:
+        """Executa um ping ICMP em subprocesso assíncrono."""
+        wait_seconds = max(1, int(self.timeout))
+        if platform.system().lower() == "windows":
+            command = ["ping", "-n", "1", "-w", str(wait_seconds * 1000), host]
+        else:  # Linux/Mac
+            command = ["ping", "-c", "1", "-W", str(wait_seconds), host]
+
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, _ = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+            raise
+
+        if process.returncode != 0:
+            return {"success": False, "latency_ms": None}
+        return {"success": True, "latency_ms": parse_ping_output(stdout.decode(errors="ignore"))}
+
+    async def _probe_dns(self, domain: str) -> Dict[str, Any]:
+        """Mede o tempo de resolução DNS de um domínio."""
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        try:
+            infos = await loop.run_in_executor(
+                _dns_executor, socket.getaddrinfo, domain, None, socket.AF_INET, socket.SOCK_STREAM
+            )
+        except socket.gaierror:
+            return {"success": False, "error": "DNS resolution failed"}
+        resolve_time = (time.perf_counter() - start_time) * 1000
+        return {
+            "success": True,
+            "ip": infos[0][4][0] if infos else None,
+            "resolve_time_ms": resolve_time
+        }
+
+    async def _resolve_local_ip(self, hostname: str) -> Optional[str]:
+        """Resolve o IP local a partir do hostname."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_dns_executor, socket.gethostbyname, hostname)
+        except socket.gaierror:
+            return None
+
+    async def _default_gateway(self) -> Optional[str]:
+        """Obtém o gateway padrão com ``ipconfig``/``ip route`` em subprocesso assíncrono."""
+        # psutil não oferece essa consulta em todas as plataformas
+        if hasattr(psutil, "net_if_default_gateway"):
+            gateways = psutil.net_if_default_gateway()
+            if gateways:
+                return list(gateways.values())[0][0]
+
+        system = platform.system().lower()
+        if system == "windows":
+            command = ["ipconfig"]
+        elif system == "linux":
+            command = ["ip", "route", "show", "default"]
+        else:
+            return None
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError as e:
+            logger.debug(f"Command {command[0]} unavailable: {str(e)}")
+            return None
+        try:
+            stdout, _ = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+            raise
+
+        if process.returncode != 0:
+            return None
+        return parse_default_gateway(stdout.decode(errors="ignore"), system)
@@ -0,0 +1,247 @@
+import enum
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import JSON, Enum, Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.raw_data_store import get_raw_data_store
+from app.db.telemetry_store import record_telemetry
+from app.db.repositories.diagnostic_repository import DiagnosticRepository
+from app.models.diagnostic import Diagnostic
+from app.models.system_info import SystemInfo
+from app.schemas.diagnostic import DiagnosticIngestItem
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestBatch:
+    """Lote validado, com IDs atribuídos e o resultado de cada item."""
+
+    diagnostics: List[Dict[str, Any]] = field(default_factory=list)
+    system_infos: List[Dict[str, Any]] = field(default_factory=list)
+    results: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_rows(cls, diagnostics: List[Dict[str, Any]]) -> "IngestBatch":
+        """Lote a partir de linhas de ``diagnostic`` já montadas (sem system_info)"""
+        return cls(diagnostics=diagnostics, results=[
+            {"index": index, "id": row["id"], "system_info_id": None, "error": None}
+            for index, row in enumerate(diagnostics)
+        ])
+
+    def summary(self, method: str) -> Dict[str, Any]:
+        """Resumo da ingestão com o resultado por item"""
+        failed = sum(1 for result in self.results if result["error"])
+        return {
+            "total": len(self.results),
+            "inserted": len(self.results) - failed,
+            "failed": failed,
+            "method": method,
+            "results": self.results
+        }
+
+
+class DiagnosticIngestService:
+    """Ingestão em lote de diagnósticos enviados pelos agentes de coleta.
+
+    Os itens são validados um a um e gravados com um INSERT executemany por
+    tabela e um único commit. Se o lote falhar no banco, cada item é gravado
+    em um savepoint próprio para identificar quais linhas foram rejeitadas.
+    """
+
+    def __init__(self, db: Session):
+        """Inicializa o serviço.
+
+        Args:
+            db: Sessão do banco de dados
+        """
+        self.db = db
+
+    def prepare(self, items: List[Dict[str, Any]]) -> IngestBatch:
+        """Valida os itens e monta as linhas de ``systeminfo`` e ``diagnostic``.
+
+        Itens inválidos entram só nos resultados, com o erro de validação.
+
+        Args:
+            items: Diagnósticos recebidos
+
+        Returns:
+            Lote pronto para gravação
+        """
+        batch = IngestBatch()
+        now = datetime.now(timezone.utc)
+        for index, item in enumerate(items):
+            try:
+                data = DiagnosticIngestItem.model_validate(item)
+            except ValidationError as e:
+                batch.results.append({"index": index, "id": None, "system_info_id": None,
+                                      "error": _validation_message(e)})
+                continue
+
+            row = data.model_dump(exclude={"system_info"})
+            row.update(id=str(uuid.uuid4()), created_at=data.created_at or now, updated_at=now, system_info_id=None)
+            if data.system_info is not None:
+                system_info = data.system_info.model_dump()
+                system_info.update(id=str(uuid.uuid4()), created_at=row["created_at"], updated_at=now)
+                batch.system_infos.append(system_info)
+                row["system_info_id"] = system_info["id"]
+            batch.diagnostics.append(row)
+            batch.results.append({"index": index, "id": row["id"],
+                                  "system_info_id": row["system_info_id"], "error": None})
+        return batch
+
+    def ingest(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Valida e grava um lote de diagnósticos com executemany.
+
+        Args:
+            items: Diagnósticos recebidos
+
+        Returns:
+            Resumo com o ID ou o erro de cada item, na ordem recebida
+        """
+        batch = self.prepare(items)
+        self.write(batch)
+        return batch.summary("executemany")
+
+    def write(self, batch: IngestBatch):
+        """Grava um lote preparado em uma transação, caindo para item a item se falhar"""
+        if not batch.diagnostics:
+            return
+        try:
+            self._insert(batch.system_infos, batch.diagnostics)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Ingestão em lote falhou, gravando item a item: {e}")
+            self._write_rows_individually(batch)
+
+    def pack_raw_data(self, batch: IngestBatch):
+        """Converte o ``raw_data`` do lote em manifestos e confirma os blocos e as referências gravados"""
+        store = get_raw_data_store()
+        for row in batch.diagnostics:
+            if row.get("raw_data") is not None:
+                row["raw_data"] = store.pack(self.db, row["raw_data"])
+        store.record_refs(self.db, {row["id"]: row["raw_data"] for row in batch.diagnostics
+                                    if row.get("raw_data") is not None})
+        self.db.commit()
+
+    def record_derived(self, batch: IngestBatch):
+        """Atualiza rollups e estado de tendência de diagnósticos gravados fora da sessão"""
+        # Import local: rollup_service importa o repositório de diagnósticos
+        from app.services.rollup_service import record_diagnostic_rollups
+        from app.services.trend_state_service import record_trend_state
+        record_diagnostic_rollups(self.db, batch.diagnostics)
+        record_trend_state(self.db, batch.diagnostics)
+        record_telemetry(self.db, batch.diagnostics)
+        self.db.commit()
+
+    def _insert(self, system_infos: List[Dict[str, Any]], diagnostics: List[Dict[str, Any]]):
+        if system_infos:
+            self.db.execute(insert(SystemInfo.__table__), system_infos)
+        DiagnosticRepository(self.db).bulk_create(diagnostics, commit=False)
+
+    def _write_rows_individually(self, batch: IngestBatch):
+        system_infos = {system_info["id"]: system_info for system_info in batch.system_infos}
+        results = {result["id"]: result for result in batch.results if result["id"]}
+        for row in batch.diagnostics:
+            system_info = system_infos.get(row.get("system_info_id"))
+            try:
+                with self.db.begin_nested():
+                    self._insert([system_info] if system_info else [], [row])
+            except Exception as e:
+                result = results[row["id"]]
+                result.update(id=None, system_info_id=None, error=str(getattr(e, "orig", None) or e))
+        self.db.commit()
+
+
+async def ingest_diagnostics(
+    db: AsyncSession,
+    items: List[Dict[str, Any]],
+    pool: Optional[Any] = None
+) -> Dict[str, Any]:
+    """Ingestão em lote a partir de um endpoint assíncrono.
+
+    Args:
+        db: Sessão assíncrona do banco de dados
+        items: Diagnósticos recebidos
+        pool: Pool avançado de conexões (opcional)
+
+    Returns:
+        Resumo com o ID ou o erro de cada item, na ordem recebida
+    """
+    batch = DiagnosticIngestService(db=None).prepare(items)
+    method = await write_ingest_batch(db, batch, pool=pool)
+    return batch.summary(method)
+
+
+async def write_ingest_batch(db: AsyncSession, batch: IngestBatch, pool: Optional[Any] = None) -> str:
+    """Grava um lote preparado a partir de um endpoint assíncrono.
+
+    Com um ``AdvancedConnectionPool`` (PostgreSQL) as linhas são gravadas com
+    COPY em uma transação do pool; o raw_data é convertido antes e rollups e
+    estado de tendência são atualizados depois, pela sessão. Sem pool, ou se o
+    COPY falhar, o lote segue pelo executemany da sessão.
+
+    Args:
+        db: Sessão assíncrona do banco de dados
+        batch: Lote preparado
+        pool: Pool avançado de conexões (opcional)
+
+    Returns:
+        Método usado na gravação ("copy" ou "executemany")
+    """
+    if pool is not None and batch.diagnostics:
+        await db.run_sync(lambda session: DiagnosticIngestService(session).pack_raw_data(batch))
+        try:
+            await pool.copy_records([
+                copy_arguments(SystemInfo.__table__, batch.system_infos),
+                copy_arguments(Diagnostic.__table__, batch.diagnostics)
+            ])
+        except Exception as e:
+            logger.warning(f"COPY da ingestão falhou, usando executemany: {e}")
+        else:
+            await db.run_sync(lambda session: DiagnosticIngestService(session).record_derived(batch))
+            return "copy"
+
+    await db.run_sync(lambda session: DiagnosticIngestService(session).write(batch))
+    return "executemany"
+
+
+def copy_arguments(table: Table, rows: List[Dict[str, Any]]) -> tuple:
+    """Monta ``(tabela, colunas, registros)`` para o COPY do asyncpg.
+
+    Enums são gravados pelo nome (como o SQLAlchemy faz), JSON como texto e
+    datas sem fuso, em UTC.
+    """
+    columns = [column.name for column in table.columns]
+    records = [
+        tuple(_copy_value(column, row.get(column.name)) for column in table.columns)
+        for row in rows
+    ]
+    return table.name, columns, records
+
+
+def _copy_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column.type, Enum) and isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(column.type, JSON):
+        return json.dumps(value, default=str)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+    )
@@ -1,10 +1,18 @@
+import asyncio
 import logging
 import time
+import uuid
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.db.pagination import KeysetPage, paginate_keyset
+from app.db.repositories.diagnostic_repository import summary_options
+from app.db.telemetry_store import record_telemetry
 from app.models.diagnostic import Diagnostic, DiagnosticStatus
 from app.models.system_info import SystemInfo
 from app.schemas.diagnostic import DiagnosticCreate, DiagnosticUpdate
@@ -13,6 +21,9 @@ from app.services.analyzers.cpu_analyzer import CPUAnalyzer
 from app.services.analyzers.memory_analyzer import MemoryAnalyzer
 from app.services.analyzers.disk_analyzer import DiskAnalyzer
 from app.services.analyzers.network_analyzer import NetworkAnalyzer
+from app.services.analyzer_runner import AnalyzerRunner, TIMED_OUT_STATUS
+from app.services.rollup_service import record_diagnostic_rollups
+from app.services.trend_state_service import record_trend_state
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +83,9 @@ class DiagnosticService:
     ) -> Tuple[List[Diagnostic], int]:
         """Obtém uma lista de diagnósticos com filtros opcionais.
         
+        Para listagens longas prefira ``get_diagnostics_page``, que não
+        degrada com o número da página.
+        
         Args:
             user_id: Filtrar por ID do usuário
             device_id: Filtrar por ID do dispositivo
@@ -81,6 +95,50 @@ class DiagnosticService:
         Returns:
             Tupla com lista de diagnósticos e contagem total
         """
+        query = self._list_query(user_id, device_id)
+        
+        total = query.count()
+        items = query.order_by(Diagnostic.created_at.desc()).offset(skip).limit(limit).all()
+        
+        return items, total
+    
+    def get_diagnostics_page(
+        self,
+        user_id: Optional[str] = None,
+        device_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        total: Optional[str] = "estimate",
+        include_details: bool = False
+    ) -> KeysetPage[Diagnostic]:
+        """Obtém uma página de diagnósticos por cursor em ``(created_at, id)``.
+        
+        Args:
+            user_id: Filtrar por ID do usuário
+            device_id: Filtrar por ID do dispositivo
+            cursor: Cursor retornado pela página anterior
+            limit: Número máximo de registros para retornar
+            total: "exact" (COUNT completo), "estimate" ou None (sem total)
+            include_details: Carregar ``raw_data`` e ``system_info`` junto
+            
+        Returns:
+            Página com os diagnósticos e o cursor da próxima página
+            
+        Raises:
+            InvalidCursorError: Se o cursor for inválido
+        """
+        query = self._list_query(user_id, device_id)
+        
+        return paginate_keyset(
+            query, Diagnostic.created_at, Diagnostic.id, limit,
+            cursor=cursor,
+            total=total,
+            count_cap=settings.DIAGNOSTIC_COUNT_ESTIMATE_CAP,
+            options=() if include_details else summary_options()
+        )
+    
+    def _list_query(self, user_id: Optional[str], device_id: Optional[str]):
+        """Monta a query de listagem com os filtros opcionais"""
         query = self.db.query(Diagnostic)
         
         if user_id:
@@ -89,10 +147,7 @@ class DiagnosticService:
         if device_id:
             query = query.filter(Diagnostic.device_id == device_id)
         
-        total = query.count()
-        items = query.order_by(Diagnostic.created_at.desc()).offset(skip).limit(limit).all()
-        
-        return items, total
+        return query
     
     def update_diagnostic(
         self, diagnostic_id: str, obj_in: DiagnosticUpdate
@@ -138,15 +193,32 @@ class DiagnosticService:
         logger.info(f"Deleted diagnostic with ID: {diagnostic_id}")
         return True
     
-    def run_diagnostic(self, diagnostic_id: str) -> Diagnostic:
+    def run_diagnostic(
+        self,
+        diagnostic_id: str,
+        concurrent: Optional[bool] = None,
+        unit_of_work: Optional[bool] = None,
+        checkpoint: Optional[bool] = None
+    ) -> Diagnostic:
         """Executa um diagnóstico completo do sistema.
         
         Args:
             diagnostic_id: ID do diagnóstico a ser executado
+            concurrent: Executa os analisadores em paralelo com prazo
+                (padrão: DIAGNOSTIC_CONCURRENT_ANALYZERS)
+            unit_of_work: Grava todo o resultado em uma única transação
+                (padrão: DIAGNOSTIC_UNIT_OF_WORK)
+            checkpoint: No modo unit of work, confirma o status IN_PROGRESS
+                antes de executar os analisadores (padrão: DIAGNOSTIC_PROGRESS_CHECKPOINT)
             
         Returns:
             Objeto Diagnostic atualizado com os resultados
         """
+        if unit_of_work is None:
+            unit_of_work = settings.DIAGNOSTIC_UNIT_OF_WORK
+        if unit_of_work:
+            return self._run_diagnostic_unit_of_work(diagnostic_id, concurrent, checkpoint)
+        
         # Obtém o diagnóstico
         diagnostic = self.get_diagnostic(diagnostic_id)
         if not diagnostic:
@@ -159,19 +231,116 @@ class DiagnosticService:
             obj_in=DiagnosticUpdate(status=DiagnosticStatus.IN_PROGRESS)
         )
         
+        update_data = self._analyze(
+            diagnostic_id,
+            collect_system_info=lambda: self._collect_system_info(diagnostic_id),
+            concurrent=concurrent
+        )
+        
+        # Atualiza o diagnóstico com os resultados ou erro
+        diagnostic = self.update_diagnostic(
+            diagnostic_id=diagnostic_id,
+            obj_in=DiagnosticUpdate(**update_data)
+        )
+        if diagnostic is not None and diagnostic.status == DiagnosticStatus.COMPLETED:
+            record_diagnostic_rollups(self.db, [diagnostic])
+            record_trend_state(self.db, [diagnostic])
+            record_telemetry(self.db, [diagnostic])
+            self.db.commit()
+        return diagnostic
+    
+    def _run_diagnostic_unit_of_work(
+        self,
+        diagnostic_id: str,
+        concurrent: Optional[bool] = None,
+        checkpoint: Optional[bool] = None
+    ) -> Diagnostic:
+        """Executa o diagnóstico gravando tudo em uma única transação.
+        
+        O diagnóstico é carregado uma vez; as transições de status e o
+        registro SystemInfo ficam pendentes na sessão e são gravados em um
+        único commit no final. Com ``checkpoint`` o status IN_PROGRESS é
+        confirmado antes dos analisadores para que consultas de progresso o
+        vejam, ao custo de um commit extra.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico a ser executado
+            concurrent: Executa os analisadores em paralelo com prazo
+            checkpoint: Confirma o status IN_PROGRESS antes da análise
+            
+        Returns:
+            Objeto Diagnostic atualizado com os resultados
+        """
+        if checkpoint is None:
+            checkpoint = settings.DIAGNOSTIC_PROGRESS_CHECKPOINT
+        
+        diagnostic = self.get_diagnostic(diagnostic_id)
+        if not diagnostic:
+            logger.error(f"Diagnostic not found: {diagnostic_id}")
+            raise ValueError(f"Diagnostic not found: {diagnostic_id}")
+        
+        diagnostic.status = DiagnosticStatus.IN_PROGRESS
+        if checkpoint:
+            self.db.commit()
+        
+        def stage_system_info() -> Optional[SystemInfo]:
+            system_info = self._build_system_info()
+            if system_info is not None:
+                self.db.add(system_info)
+                diagnostic.system_info_id = system_info.id
+            return system_info
+        
+        update_data = self._analyze(diagnostic_id, stage_system_info, concurrent)
+        for field, value in DiagnosticUpdate(**update_data).model_dump(exclude_unset=True).items():
+            setattr(diagnostic, field, value)
+        if diagnostic.status == DiagnosticStatus.COMPLETED:
+            record_diagnostic_rollups(self.db, [diagnostic])
+            record_trend_state(self.db, [diagnostic])
+            record_telemetry(self.db, [diagnostic])
+        
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        logger.info(f"Updated diagnostic with ID: {diagnostic_id}")
+        return diagnostic
+    
+    def _analyze(
+        self,
+        diagnostic_id: str,
+        collect_system_info: Callable[[], Optional[SystemInfo]],
+        concurrent: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Coleta informações do sistema, executa os analisadores e monta a atualização.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            collect_system_info: Função que obtém o SystemInfo do diagnóstico
+            concurrent: Executa os analisadores em paralelo com prazo
+            
+        Returns:
+            Campos do diagnóstico a serem atualizados (resultado ou falha)
+        """
         start_time = time.time()
         error_message = None
         raw_data = {}
         
         try:
             # Coleta informações do sistema
-            system_info = self._collect_system_info(diagnostic_id)
+            system_info = collect_system_info()
             
             # Executa análises
-            cpu_result = self.cpu_analyzer.analyze()
-            memory_result = self.memory_analyzer.analyze()
-            disk_result = self.disk_analyzer.analyze()
-            network_result = self.network_analyzer.analyze()
+            results = self._run_analyzers(concurrent)
+            cpu_result = results["cpu"]
+            memory_result = results["memory"]
+            disk_result = results["disk"]
+            network_result = results["network"]
+            timed_out = [
+                name for name, result in results.items()
+                if result.get("status") == TIMED_OUT_STATUS
+            ]
             
             # Calcula o score de saúde geral
             overall_health = self._calculate_overall_health(
@@ -185,6 +354,7 @@ class DiagnosticService:
                 "disk": disk_result,
                 "network": network_result,
                 "system_info": system_info.to_dict() if system_info else None,
+                "timed_out": timed_out,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
@@ -218,11 +388,35 @@ class DiagnosticService:
                 "execution_time": time.time() - start_time
             }
         
-        # Atualiza o diagnóstico com os resultados ou erro
-        return self.update_diagnostic(
-            diagnostic_id=diagnostic_id,
-            obj_in=DiagnosticUpdate(**update_data)
-        )
+        return update_data
+    
+    def _run_analyzers(self, concurrent: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """Executa os analisadores de CPU, memória, disco e rede.
+        
+        No modo concorrente os analisadores rodam em paralelo no executor
+        compartilhado; os que não terminam a tempo retornam status
+        ``timed_out`` e o diagnóstico segue com os resultados parciais.
+        
+        Args:
+            concurrent: Executa em paralelo (padrão: DIAGNOSTIC_CONCURRENT_ANALYZERS)
+            
+        Returns:
+            Dicionário com o resultado de cada analisador
+        """
+        tasks = {
+            "cpu": self.cpu_analyzer.analyze,
+            "memory": self.memory_analyzer.analyze,
+            "disk": self.disk_analyzer.analyze,
+            "network": self.network_analyzer.analyze
+        }
+        
+        if concurrent is None:
+            concurrent = settings.DIAGNOSTIC_CONCURRENT_ANALYZERS
+        
+        if not concurrent:
+            return {name: analyze() for name, analyze in tasks.items()}
+        
+        return AnalyzerRunner().run(tasks)
     
     def _collect_system_info(self, diagnostic_id: str) -> Optional[SystemInfo]:
         """Coleta informações do sistema e cria um registro SystemInfo.
@@ -233,6 +427,37 @@ class DiagnosticService:
         Returns:
             Objeto SystemInfo criado ou None em caso de erro
         """
+        try:
+            system_info = self._build_system_info()
+            if system_info is None:
+                return None
+            
+            # Cria o objeto SystemInfo
+            self.db.add(system_info)
+            self.db.commit()
+            self.db.refresh(system_info)
+            
+            # Associa ao diagnóstico
+            diagnostic = self.get_diagnostic(diagnostic_id)
+            diagnostic.system_info_id = system_info.id
+            self.db.add(diagnostic)
+            self.db.commit()
+            
+            return system_info
+            
+        except Exception as e:
+            logger.exception(f"Error collecting system info: {str(e)}")
+            return None
+    
+    def _build_system_info(self) -> Optional[SystemInfo]:
+        """Monta um objeto SystemInfo ainda não adicionado à sessão.
+        
+        O ID e os timestamps são definidos aqui para que o objeto possa ser
+        referenciado e serializado antes do flush.
+        
+        Returns:
+            Objeto SystemInfo ou None em caso de erro
+        """
         try:
             # Aqui seria implementada a coleta real de informações do sistema
             # Por enquanto, usamos dados de exemplo
@@ -267,22 +492,11 @@ class DiagnosticService:
                 }
             }
             
-            # Cria o objeto SystemInfo
-            system_info = SystemInfo(**system_info_data)
-            self.db.add(system_info)
-            self.db.commit()
-            self.db.refresh(system_info)
-            
-            # Associa ao diagnóstico
-            diagnostic = self.get_diagnostic(diagnostic_id)
-            diagnostic.system_info_id = system_info.id
-            self.db.add(diagnostic)
-            self.db.commit()
-            
-            return system_info
+            now = datetime.now(timezone.utc)
+            return SystemInfo(id=str(uuid.uuid4()), created_at=now, updated_at=now, **system_info_data)
             
         except Exception as e:
-            logger.exception(f"Error collecting system info: {str(e)}")
+            logger.exception(f"Error building system info: {str(e)}")
             return None
     
     def _calculate_overall_health(self, cpu_result: Dict[str, Any], memory_result: Dict[str, Any], 
@@ -327,4 +541,176 @@ class DiagnosticService:
             network_score * weights["network"]
         )
         
-        return round(overall_score)
\ No newline at end of file
+        return round(overall_score)
+
+class AsyncDiagnosticService:
+    """Versão assíncrona de ``DiagnosticService`` para endpoints async.
+    
+    O acesso ao banco usa ``AsyncSession``; os analisadores, que bloqueiam
+    (amostragem de CPU e disco), rodam em uma thread para não parar o event
+    loop, e a rede roda no próprio loop via ``NetworkAnalyzer.analyze_async``.
+    A análise em si é a mesma de ``DiagnosticService``.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        """Inicializa o serviço de diagnóstico.
+        
+        Args:
+            db: Sessão assíncrona do banco de dados
+        """
+        self.db = db
+        # Só a parte sem banco (analisadores e montagem do resultado) é usada
+        self.analysis = DiagnosticService(db=None)
+    
+    async def create_diagnostic(self, obj_in: DiagnosticCreate) -> Diagnostic:
+        """Cria um novo diagnóstico.
+        
+        Args:
+            obj_in: Dados para criação do diagnóstico
+            
+        Returns:
+            Objeto Diagnostic criado
+        """
+        db_obj = Diagnostic(
+            user_id=obj_in.user_id,
+            device_id=obj_in.device_id,
+            status=DiagnosticStatus.PENDING
+        )
+        self.db.add(db_obj)
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        logger.info(f"Created diagnostic with ID: {db_obj.id}")
+        return db_obj
+    
+    async def get_diagnostic(self, diagnostic_id: str) -> Optional[Diagnostic]:
+        """Obtém um diagnóstico pelo ID.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            
+        Returns:
+            Objeto Diagnostic ou None se não encontrado
+        """
+        result = await self.db.execute(select(Diagnostic).where(Diagnostic.id == diagnostic_id))
+        return result.scalars().first()
+    
+    async def get_diagnostics_page(self, **kwargs: Any) -> KeysetPage[Diagnostic]:
+        """Obtém uma página de diagnósticos por cursor em ``(created_at, id)``.
+        
+        Aceita os mesmos argumentos de ``DiagnosticService.get_diagnostics_page``.
+        
+        Returns:
+            Página com os diagnósticos e o cursor da próxima página
+            
+        Raises:
+            InvalidCursorError: Se o cursor for inválido
+        """
+        return await self.db.run_sync(lambda session: DiagnosticService(session).get_diagnostics_page(**kwargs))
+    
+    async def update_diagnostic(
+        self, diagnostic_id: str, obj_in: DiagnosticUpdate
+    ) -> Optional[Diagnostic]:
+        """Atualiza um diagnóstico existente.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            obj_in: Dados para atualização
+            
+        Returns:
+            Objeto Diagnostic atualizado ou None se não encontrado
+        """
+        db_obj = await self.get_diagnostic(diagnostic_id)
+        if not db_obj:
+            return None
+        
+        for field, value in obj_in.model_dump(exclude_unset=True).items():
+            setattr(db_obj, field, value)
+        
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        logger.info(f"Updated diagnostic with ID: {db_obj.id}")
+        return db_obj
+    
+    async def delete_diagnostic(self, diagnostic_id: str) -> bool:
+        """Exclui um diagnóstico pelo ID.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico
+            
+        Returns:
+            True se excluído com sucesso, False caso contrário
+        """
+        db_obj = await self.get_diagnostic(diagnostic_id)
+        if not db_obj:
+            return False
+        
+        await self.db.delete(db_obj)
+        await self.db.commit()
+        logger.info(f"Deleted diagnostic with ID: {diagnostic_id}")
+        return True
+    
+    async def run_diagnostic(
+        self,
+        diagnostic_id: str,
+        concurrent: Optional[bool] = None,
+        checkpoint: Optional[bool] = None
+    ) -> Diagnostic:
+        """Executa um diagnóstico completo do sistema.
+        
+        Segue o modo unit of work de ``DiagnosticService``: o resultado, o
+        SystemInfo e os rollups são gravados em um único commit.
+        
+        Args:
+            diagnostic_id: ID do diagnóstico a ser executado
+            concurrent: Executa os analisadores em paralelo com prazo
+                (padrão: DIAGNOSTIC_CONCURRENT_ANALYZERS)
+            checkpoint: Confirma o status IN_PROGRESS antes da análise
+                (padrão: DIAGNOSTIC_PROGRESS_CHECKPOINT)
+            
+        Returns:
+            Objeto Diagnostic atualizado com os resultados
+        """
+        if checkpoint is None:
+            checkpoint = settings.DIAGNOSTIC_PROGRESS_CHECKPOINT
+        
+        diagnostic = await self.get_diagnostic(diagnostic_id)
+        if not diagnostic:
+            logger.error(f"Diagnostic not found: {diagnostic_id}")
+            raise ValueError(f"Diagnostic not found: {diagnostic_id}")
+        
+        diagnostic.status = DiagnosticStatus.IN_PROGRESS
+        if checkpoint:
+            await self.db.commit()
+        
+        # O SystemInfo é montado na thread e só entra na sessão de volta ao event loop
+        staged: List[SystemInfo] = []
+        
+        def build_system_info() -> Optional[SystemInfo]:
+            system_info = self.analysis._build_system_info()
+            if system_info is not None:
+                staged.append(system_info)
+            return system_info
+        
+        # As sondas de rede rodam neste loop (analyze_async); a thread só espera o resultado
+        self.analysis.network_analyzer.loop = asyncio.get_running_loop()
+        update_data = await asyncio.to_thread(self.analysis._analyze, diagnostic_id, build_system_info, concurrent)
+        for system_info in staged:
+            self.db.add(system_info)
+            diagnostic.system_info_id = system_info.id
+        for field, value in DiagnosticUpdate(**update_data).model_dump(exclude_unset=True).items():
+            setattr(diagnostic, field, value)
+        if diagnostic.status == DiagnosticStatus.COMPLETED:
+            await self.db.run_sync(lambda session: (
+                record_diagnostic_rollups(session, [diagnostic]),
+                record_trend_state(session, [diagnostic]),
+                record_telemetry(session, [diagnostic])
+            ))
+        
+        try:
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        logger.info(f"Updated diagnostic with ID: {diagnostic_id}")
+        return diagnostic
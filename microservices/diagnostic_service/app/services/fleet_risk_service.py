@@ -0,0 +1,303 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import case, delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.repositories.diagnostic_repository import user_device_ids
+from app.models.device_risk import DeviceRisk
+from app.models.diagnostic import Diagnostic
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.services.predictive_service import (
+    HIGH_RISK_HEALTH, INVERSE_TREND_METRICS, MEDIUM_RISK_HEALTH, RISK_RULES, TREND_METRICS
+)
+from app.services.rollup_service import RollupService
+from app.services.trend_engine import compute_group_trends, to_epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# Colunas do snapshot para o valor atual e a inclinação de cada métrica
+SNAPSHOT_COLUMNS = {
+    "cpu_usage": ("cpu_usage", "cpu_slope"),
+    "memory_usage": ("memory_usage", "memory_slope"),
+    "disk_usage": ("disk_usage", "disk_slope"),
+    "overall_health": ("overall_health", "health_slope")
+}
+
+
+class FleetRiskScorer:
+    """Calcula o risco de falha de toda a frota e grava o snapshot ``device_risk``.
+
+    Os dispositivos são processados em blocos: cada bloco é lido com uma
+    consulta por métrica (rollups) ou uma única consulta (diagnósticos
+    brutos) e as tendências de todos os dispositivos do bloco são calculadas
+    de uma vez com NumPy, com as mesmas regras de ``PredictiveService``.
+    """
+
+    def __init__(self, db: Session, chunk_devices: Optional[int] = None):
+        """Inicializa o scorer.
+
+        Args:
+            db: Sessão do banco de dados
+            chunk_devices: Dispositivos por bloco (padrão: FLEET_RISK_CHUNK_DEVICES)
+        """
+        self.db = db
+        self.chunk_devices = chunk_devices or settings.FLEET_RISK_CHUNK_DEVICES
+
+    def score_all(self, time_window_days: Optional[int] = None, source: str = "auto") -> Dict[str, Any]:
+        """Pontua todos os dispositivos com dados na janela e substitui o snapshot.
+
+        Args:
+            time_window_days: Janela de tempo em dias (padrão: FLEET_RISK_WINDOW_DAYS)
+            source: "rollup", "raw" ou "auto" (rollups se houver, senão diagnósticos)
+
+        Returns:
+            Resumo da execução (dispositivos, contagem por nível de risco, fonte e duração)
+        """
+        started = time.perf_counter()
+        time_window_days = time_window_days or settings.FLEET_RISK_WINDOW_DAYS
+        scored_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = scored_at - timedelta(days=time_window_days)
+
+        resolution = RollupService(self.db).choose_resolution(start, scored_at)
+        device_ids: List[str] = []
+        if source in ("auto", "rollup"):
+            device_ids = self._rollup_device_ids(start, resolution)
+            source = "rollup" if device_ids or source == "rollup" else "raw"
+        if source == "raw":
+            device_ids = self._raw_device_ids(start)
+
+        by_risk_level = {"low": 0, "medium": 0, "high": 0}
+        for offset in range(0, len(device_ids), self.chunk_devices):
+            chunk = np.array(device_ids[offset:offset + self.chunk_devices])
+            if source == "rollup":
+                trends, analyzed = self._rollup_trends(chunk, start, resolution)
+            else:
+                trends, analyzed = self._raw_trends(chunk, start)
+            rows = self._snapshot_rows(chunk, trends, analyzed, time_window_days, source, scored_at)
+            self._write(rows)
+            self.db.commit()
+            for row in rows:
+                by_risk_level[row["risk_level"]] += 1
+
+        # Dispositivos sem dados na janela saem do snapshot
+        self.db.execute(delete(DeviceRisk).where(DeviceRisk.scored_at < scored_at))
+        self.db.commit()
+
+        duration = time.perf_counter() - started
+        logger.info(f"Risco da frota calculado para {len(device_ids)} dispositivos em {duration:.2f}s ({source})")
+        return {
+            "devices_scored": len(device_ids),
+            "by_risk_level": by_risk_level,
+            "source": source,
+            "resolution": resolution if source == "rollup" else None,
+            "window_days": time_window_days,
+            "scored_at": scored_at.isoformat(),
+            "duration": duration
+        }
+
+    def _rollup_device_ids(self, start: datetime, resolution: str) -> List[str]:
+        """Dispositivos com buckets de rollup na janela, em ordem"""
+        return sorted(self.db.execute(
+            select(DiagnosticMetricRollup.device_id).distinct().where(
+                DiagnosticMetricRollup.resolution == resolution,
+                DiagnosticMetricRollup.bucket_start >= start
+            )
+        ).scalars())
+
+    def _raw_device_ids(self, start: datetime) -> List[str]:
+        """Dispositivos com diagnósticos na janela, em ordem"""
+        return sorted(self.db.execute(
+            select(Diagnostic.device_id).distinct().where(
+                Diagnostic.device_id.is_not(None),
+                Diagnostic.created_at >= start
+            )
+        ).scalars())
+
+    def _rollup_trends(self, devices: np.ndarray, start: datetime, resolution: str) -> tuple:
+        """Calcula as tendências do bloco a partir dos rollups.
+
+        Args:
+            devices: IDs dos dispositivos do bloco, ordenados
+            start: Início da janela
+            resolution: Resolução dos rollups
+
+        Returns:
+            Tupla com as tendências por métrica e o número de diagnósticos por dispositivo
+        """
+        # Consulta Core: sem o carregamento de linhas do ORM
+        rows = self.db.connection().execute(
+            select(
+                DiagnosticMetricRollup.device_id, DiagnosticMetricRollup.metric,
+                DiagnosticMetricRollup.bucket_start, DiagnosticMetricRollup.sum_value,
+                DiagnosticMetricRollup.count, DiagnosticMetricRollup.last_value
+            ).where(
+                DiagnosticMetricRollup.device_id.in_(devices.tolist()),
+                DiagnosticMetricRollup.resolution == resolution,
+                DiagnosticMetricRollup.metric.in_(TREND_METRICS),
+                DiagnosticMetricRollup.bucket_start >= start
+            )
+        ).all()
+        device_column, metric_column, bucket_starts, sums, counts, last_values = (
+            list(zip(*rows)) if rows else ([], [], [], [], [], [])
+        )
+        groups = np.searchsorted(devices, np.array(device_column, dtype=devices.dtype))
+        metrics = np.array(metric_column, dtype=str)
+        epoch_seconds = to_epoch_seconds(bucket_starts)
+        counts = np.array(counts, dtype=np.float64)
+        averages = np.array(sums, dtype=np.float64) / np.maximum(counts, 1)
+        last_values = np.array(last_values, dtype=np.float64)
+
+        trends = {}
+        analyzed = np.zeros(len(devices), dtype=np.int64)
+        for metric in TREND_METRICS:
+            selected = metrics == metric
+            trends[metric] = compute_group_trends(
+                groups[selected], epoch_seconds[selected], averages[selected], len(devices),
+                inverse=metric in INVERSE_TREND_METRICS,
+                weights=counts[selected], last_values=last_values[selected]
+            )
+            metric_counts = np.bincount(groups[selected], weights=counts[selected], minlength=len(devices))
+            analyzed = np.maximum(analyzed, metric_counts.astype(np.int64))
+        return trends, analyzed
+
+    def _raw_trends(self, devices: np.ndarray, start: datetime) -> tuple:
+        """Calcula as tendências do bloco a partir dos diagnósticos brutos.
+
+        Args:
+            devices: IDs dos dispositivos do bloco, ordenados
+            start: Início da janela
+
+        Returns:
+            Tupla com as tendências por métrica e o número de diagnósticos por dispositivo
+        """
+        rows = self.db.connection().execute(
+            select(Diagnostic.device_id, Diagnostic.created_at, *[getattr(Diagnostic, metric) for metric in TREND_METRICS])
+            .where(Diagnostic.device_id.in_(devices.tolist()), Diagnostic.created_at >= start)
+        ).all()
+        columns = list(zip(*rows))
+        groups = np.searchsorted(devices, np.array(columns[0], dtype=devices.dtype))
+        epoch_seconds = to_epoch_seconds(columns[1])
+        trends = {
+            metric: compute_group_trends(
+                groups, epoch_seconds, np.array(column, dtype=np.float64),
+                len(devices), inverse=metric in INVERSE_TREND_METRICS
+            )
+            for metric, column in zip(TREND_METRICS, columns[2:])
+        }
+        return trends, np.bincount(groups, minlength=len(devices))
+
+    def _snapshot_rows(
+        self,
+        devices: np.ndarray,
+        trends: Dict[str, Dict[str, np.ndarray]],
+        analyzed: np.ndarray,
+        time_window_days: int,
+        source: str,
+        scored_at: datetime
+    ) -> List[Dict[str, Any]]:
+        """Aplica as regras de risco de ``PredictiveService`` a todo o bloco.
+
+        Returns:
+            Linhas do snapshot ``device_risk``
+        """
+        at_risk = {}
+        for component, metric, threshold in RISK_RULES:
+            trend = trends[metric]
+            with np.errstate(invalid="ignore"):
+                beyond = trend["current"] > threshold if metric in INVERSE_TREND_METRICS else trend["current"] < threshold
+            at_risk[component] = (trend["trend"] == "degrading") & beyond
+        components_at_risk = sum(flags.astype(np.int64) for flags in at_risk.values())
+
+        health = trends["overall_health"]["current"]
+        with np.errstate(invalid="ignore"):
+            risk_level = np.where(
+                (components_at_risk >= 3) | (health < HIGH_RISK_HEALTH), "high",
+                np.where((components_at_risk >= 1) | (health < MEDIUM_RISK_HEALTH), "medium", "low")
+            )
+
+        columns = {}
+        for metric, (value_column, slope_column) in SNAPSHOT_COLUMNS.items():
+            columns[value_column] = _nullable(trends[metric]["current"])
+            columns[slope_column] = _nullable(trends[metric]["slope"])
+        risk_components = [
+            [component for component, flags in at_risk.items() if flags[i]] for i in range(len(devices))
+        ]
+
+        return [
+            {
+                "device_id": device_id,
+                "risk_level": str(risk_level[i]),
+                "risk_components": risk_components[i],
+                **{column: values[i] for column, values in columns.items()},
+                "diagnostics_analyzed": int(analyzed[i]),
+                "window_days": time_window_days,
+                "source": source,
+                "scored_at": scored_at
+            }
+            for i, device_id in enumerate(devices.tolist())
+        ]
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        """Grava as linhas do snapshot (upsert por dispositivo)"""
+        if not rows:
+            return
+        table = DeviceRisk.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            self.db.execute(delete(DeviceRisk).where(DeviceRisk.device_id.in_([row["device_id"] for row in rows])))
+            self.db.execute(insert(table), rows)
+            return
+
+        statement = dialect_insert(table)
+        updated = [column for column in rows[0] if column != "device_id"]
+        statement = statement.on_conflict_do_update(
+            index_elements=["device_id"],
+            set_={
+                **{column: statement.excluded[column] for column in updated},
+                "updated_at": datetime.now(timezone.utc)
+            }
+        )
+        self.db.execute(statement, rows)
+
+
+def _nullable(values: np.ndarray) -> List[Optional[float]]:
+    """Converte um array em lista de floats, com None no lugar de NaN"""
+    return [None if np.isnan(value) else float(value) for value in values.tolist()]
+
+
+def get_device_risk_snapshot(
+    db: Session,
+    risk_levels: Optional[Sequence[str]] = None,
+    limit: int = 100,
+    offset: int = 0,
+    user_id: Optional[str] = None
+) -> List[DeviceRisk]:
+    """Lê o snapshot de risco, dos dispositivos mais críticos para os menos.
+
+    Args:
+        db: Sessão do banco de dados
+        risk_levels: Filtra pelos níveis de risco
+        limit: Número máximo de dispositivos
+        offset: Deslocamento
+        user_id: Restringe aos dispositivos com diagnósticos do usuário
+
+    Returns:
+        Linhas do snapshot
+    """
+    severity = case({"high": 0, "medium": 1, "low": 2}, value=DeviceRisk.risk_level, else_=3)
+    query = select(DeviceRisk)
+    if user_id is not None:
+        query = query.where(DeviceRisk.device_id.in_(user_device_ids(user_id)))
+    if risk_levels:
+        query = query.where(DeviceRisk.risk_level.in_(list(risk_levels)))
+    query = query.order_by(severity, DeviceRisk.overall_health.asc(), DeviceRisk.device_id)
+    return list(db.execute(query.offset(offset).limit(limit)).scalars())
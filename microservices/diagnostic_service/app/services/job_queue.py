@@ -0,0 +1,543 @@
+"""
+Fila de jobs durável para diagnósticos
+
+Os jobs ficam em um arquivo SQLite local, então sobrevivem à reinicialização
+do worker e não exigem broker externo. Um pool de threads consome a fila por
+prioridade; falhas são reenfileiradas com backoff exponencial até o limite de
+tentativas. Jobs cujo lease expira (processo morto no meio da execução) voltam
+a ser elegíveis automaticamente.
+
+Conclusão, falha e progresso só são gravados pelo worker que ainda detém o
+lease: um worker cujo job expirou e foi reservado por outro não sobrescreve
+o estado da nova tentativa. Handlers longos renovam o lease com ``renew_lease``.
+
+Jobs concluídos ou com falha definitiva são removidos pelos workers ociosos
+depois do período de retenção; a partir daí a ``idempotency_key`` deles pode
+ser reutilizada.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(RuntimeError):
+    """O job foi reservado por outro worker (lease expirado)"""
+
+
+class JobStatus:
+    """Estados possíveis de um job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    worker TEXT,
+    result TEXT,
+    progress TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (status, priority DESC, available_at, created_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs (status, finished_at);
+"""
+
+
+@dataclass
+class Job:
+    """Job persistido na fila"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    idempotency_key: Optional[str]
+    available_at: float
+    lease_expires_at: Optional[float]
+    worker: Optional[str]
+    result: Optional[Dict[str, Any]]
+    progress: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"])
+        data["result"] = json.loads(data["result"]) if data["result"] is not None else None
+        data["progress"] = json.loads(data["progress"]) if data.get("progress") is not None else None
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte o job para dicionário"""
+        return asdict(self)
+
+
+class JobQueue:
+    """Fila de jobs em SQLite com pool de workers."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        lease: Optional[float] = None,
+        retention_days: Optional[float] = None,
+        prune_interval: Optional[float] = None
+    ):
+        """Inicializa a fila.
+
+        Args:
+            path: Arquivo SQLite da fila
+            workers: Número de threads consumidoras
+            max_attempts: Tentativas padrão por job
+            backoff: Atraso base do retry em segundos (dobra a cada tentativa)
+            backoff_max: Atraso máximo do retry em segundos
+            poll_interval: Intervalo de consulta quando a fila está vazia
+            lease: Tempo máximo de execução antes do job ser considerado abandonado
+            retention_days: Dias que jobs finalizados ficam na fila (0 desativa a limpeza)
+            prune_interval: Intervalo mínimo em segundos entre limpezas
+        """
+        self.path = path or settings.JOB_QUEUE_PATH
+        self.workers = workers if workers is not None else settings.JOB_QUEUE_WORKERS
+        self.max_attempts = max_attempts if max_attempts is not None else settings.JOB_QUEUE_MAX_ATTEMPTS
+        self.backoff = backoff if backoff is not None else settings.JOB_QUEUE_RETRY_BACKOFF_SECONDS
+        self.backoff_max = backoff_max if backoff_max is not None else settings.JOB_QUEUE_RETRY_BACKOFF_MAX_SECONDS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_QUEUE_POLL_INTERVAL_SECONDS
+        self.lease = lease if lease is not None else settings.JOB_QUEUE_LEASE_SECONDS
+        self.retention_days = (retention_days if retention_days is not None
+                               else settings.JOB_QUEUE_RETENTION_DAYS)
+        self.prune_interval = (prune_interval if prune_interval is not None
+                               else settings.JOB_QUEUE_PRUNE_INTERVAL_SECONDS)
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_prune = 0.0
+        # Sufixo por instância: workers de processos diferentes no mesmo arquivo têm IDs distintos
+        self._instance = uuid.uuid4().hex[:8]
+
+    # ------------------------------------------------------------------
+    # Armazenamento
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "progress" not in columns:
+                # Arquivos criados antes da coluna de progresso
+                conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """Fecha a conexão com o arquivo da fila"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> Job:
+        """Adiciona um job à fila.
+
+        Se já existir um job com a mesma ``idempotency_key``, ele é retornado
+        e nenhum job novo é criado.
+
+        Args:
+            kind: Tipo do job (nome do handler registrado)
+            payload: Dados serializáveis em JSON
+            priority: Prioridade (maior executa primeiro)
+            idempotency_key: Chave de idempotência do cliente
+            job_id: ID do job (padrão: UUID gerado)
+            max_attempts: Tentativas máximas (padrão: configuração da fila)
+
+        Returns:
+            Job criado ou existente
+        """
+        now = time.time()
+        job_id = job_id or str(uuid.uuid4())
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                """
+                INSERT INTO jobs (id, kind, payload, priority, status, attempts, max_attempts,
+                                  idempotency_key, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO NOTHING
+                """,
+                (job_id, kind, json.dumps(payload, default=str), priority, JobStatus.QUEUED,
+                 max_attempts or self.max_attempts, idempotency_key, now, now, now)
+            )
+            if idempotency_key is not None:
+                row = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        self._wakeup.set()
+        return Job.from_row(row)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Obtém um job pelo ID.
+
+        Args:
+            job_id: ID do job
+
+        Returns:
+            Job ou None se não encontrado
+        """
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(self, worker: str = "worker") -> Optional[Job]:
+        """Reserva o próximo job pronto, por prioridade e ordem de chegada.
+
+        Args:
+            worker: Identificador do worker
+
+        Returns:
+            Job reservado ou None se a fila estiver vazia
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs com lease expirado pertenciam a um worker que morreu
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?
+                    WHERE status = ? AND lease_expires_at <= ? AND attempts >= max_attempts
+                    """,
+                    (JobStatus.FAILED, "Job lease expired", now, now, JobStatus.RUNNING, now)
+                )
+                row = conn.execute(
+                    """
+                    SELECT id FROM jobs
+                    WHERE (status = ? AND available_at <= ?)
+                       OR (status = ? AND lease_expires_at <= ?)
+                    ORDER BY priority DESC, available_at, created_at
+                    LIMIT 1
+                    """,
+                    (JobStatus.QUEUED, now, JobStatus.RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?,
+                                    lease_expires_at = ?, started_at = ?, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (JobStatus.RUNNING, worker, now + self.lease, now, now, row["id"])
+                )
+                claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return Job.from_row(claimed)
+
+    @staticmethod
+    def _owner_clause(worker: Optional[str]) -> Tuple[str, Tuple[Any, ...]]:
+        """Condição extra do UPDATE que restringe a escrita ao dono do lease"""
+        if worker is None:
+            return "", ()
+        return " AND worker = ? AND status = ?", (worker, JobStatus.RUNNING)
+
+    def complete(self, job_id: str, result: Optional[Dict[str, Any]] = None,
+                 worker: Optional[str] = None) -> bool:
+        """Marca um job como concluído.
+
+        Args:
+            job_id: ID do job
+            result: Resultado serializável em JSON
+            worker: Worker que reservou o job; se informado, só ele pode concluí-lo
+
+        Returns:
+            False se o lease foi perdido para outro worker
+        """
+        now = time.time()
+        owner, owner_params = self._owner_clause(worker)
+        with self._lock:
+            cursor = self._connection().execute(
+                """
+                UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL,
+                                finished_at = ?, updated_at = ?
+                WHERE id = ?
+                """ + owner,
+                (JobStatus.COMPLETED, json.dumps(result, default=str) if result is not None else None,
+                 now, now, job_id) + owner_params
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"Job {job_id}: lease perdido por {worker}, resultado descartado")
+            return False
+        return True
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any], worker: Optional[str] = None):
+        """Registra o progresso parcial de um job em execução e renova o lease.
+
+        Args:
+            job_id: ID do job
+            progress: Contadores/resultados parciais serializáveis em JSON
+            worker: Worker que reservou o job; se informado, só ele pode atualizá-lo
+
+        Raises:
+            LeaseLostError: Se o job não pertence mais ao worker
+        """
+        now = time.time()
+        owner, owner_params = self._owner_clause(worker)
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET progress = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?" + owner,
+                (json.dumps(progress, default=str), now + self.lease, now, job_id) + owner_params
+            )
+        if worker is not None and cursor.rowcount == 0:
+            raise LeaseLostError(f"Job {job_id} não pertence mais ao worker {worker}")
+
+    def renew_lease(self, job_id: str, worker: str):
+        """Renova o lease de um job em execução.
+
+        Args:
+            job_id: ID do job
+            worker: Worker que reservou o job
+
+        Raises:
+            LeaseLostError: Se o job não pertence mais ao worker
+        """
+        now = time.time()
+        owner, owner_params = self._owner_clause(worker)
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ?" + owner,
+                (now + self.lease, now, job_id) + owner_params
+            )
+        if cursor.rowcount == 0:
+            raise LeaseLostError(f"Job {job_id} não pertence mais ao worker {worker}")
+
+    def fail(self, job_id: str, error: str, worker: Optional[str] = None) -> Optional[Job]:
+        """Registra a falha de uma tentativa.
+
+        O job volta para a fila com backoff exponencial enquanto houver
+        tentativas restantes; caso contrário fica com status ``failed``.
+
+        Args:
+            job_id: ID do job
+            error: Mensagem de erro
+            worker: Worker que reservou o job; se informado, só ele pode registrar a falha
+
+        Returns:
+            Job atualizado
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        now = time.time()
+        if job.attempts < job.max_attempts:
+            delay = min(self.backoff * (2 ** (job.attempts - 1)), self.backoff_max)
+            status, available_at, finished_at = JobStatus.QUEUED, now + delay, None
+            logger.warning(f"Job {job_id} falhou (tentativa {job.attempts}/{job.max_attempts}), "
+                           f"nova tentativa em {delay:.1f}s: {error}")
+        else:
+            status, available_at, finished_at = JobStatus.FAILED, job.available_at, now
+            logger.error(f"Job {job_id} falhou definitivamente após {job.attempts} tentativas: {error}")
+
+        owner, owner_params = self._owner_clause(worker)
+        with self._lock:
+            cursor = self._connection().execute(
+                """
+                UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires_at = NULL,
+                                finished_at = ?, updated_at = ?
+                WHERE id = ?
+                """ + owner,
+                (status, error, available_at, finished_at, now, job_id) + owner_params
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"Job {job_id}: lease perdido por {worker}, falha descartada")
+        return self.get(job_id)
+
+    def prune(self, older_than: Optional[float] = None) -> int:
+        """Remove jobs concluídos ou com falha definitiva além da retenção.
+
+        Args:
+            older_than: Idade mínima em segundos desde o fim do job (padrão: retenção da fila)
+
+        Returns:
+            Número de jobs removidos
+        """
+        if older_than is None:
+            if not self.retention_days:
+                return 0
+            older_than = self.retention_days * 86400
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JobStatus.COMPLETED, JobStatus.FAILED, time.time() - older_than)
+            )
+        if cursor.rowcount:
+            logger.info(f"{cursor.rowcount} jobs finalizados removidos da fila")
+        return cursor.rowcount
+
+    def _prune_if_due(self):
+        """Executa a limpeza no máximo uma vez por ``prune_interval`` entre os workers"""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_prune and now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        try:
+            self.prune()
+        except Exception as e:
+            logger.error(f"Erro ao limpar jobs finalizados: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna a contagem de jobs por status"""
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        """Registra o handler de um tipo de job.
+
+        Args:
+            kind: Tipo do job
+            handler: Função (ou corrotina) que recebe o payload e retorna o resultado
+        """
+        self._handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        """Indica se há workers ativos"""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        """Inicia o pool de workers"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, args=(f"job-worker-{i}@{self._instance}",),
+                             name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Job queue iniciada ({self.workers} workers, {self.path})")
+
+    def stop(self, timeout: float = 5.0):
+        """Para o pool de workers; jobs em execução terminam antes"""
+        self._stop_event.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Job queue parada")
+
+    def _worker_loop(self, worker: str):
+        while not self._stop_event.is_set():
+            try:
+                job = self.claim(worker)
+            except Exception as e:
+                logger.error(f"Erro ao reservar job: {e}")
+                job = None
+
+            if job is None:
+                self._prune_if_due()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self.run_job(job)
+
+    def run_job(self, job: Job):
+        """Executa um job já reservado e registra o resultado.
+
+        Args:
+            job: Job reservado por ``claim``
+        """
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            self.fail(job.id, f"No handler registered for job kind '{job.kind}'", job.worker)
+            return
+
+        try:
+            if inspect.iscoroutinefunction(handler):
+                result = asyncio.run(handler(job.payload))
+            else:
+                result = handler(job.payload)
+        except Exception as e:
+            logger.exception(f"Erro ao executar job {job.id} ({job.kind}): {e}")
+            self.fail(job.id, str(e), job.worker)
+            return
+
+        self.complete(job.id, result, job.worker)
+
+
+# Instância global
+job_queue = JobQueue()
+
+
+def get_job_queue() -> JobQueue:
+    """Retorna a fila de jobs global"""
+    return job_queue
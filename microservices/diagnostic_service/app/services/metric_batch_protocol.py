@@ -0,0 +1,251 @@
+"""
+Protocolo binário de lotes de métricas enviados pelos agentes
+
+Cada upload é um mapa msgpack, opcionalmente comprimido com gzip ou zstd
+(header ``Content-Encoding``)::
+
+    {
+        "v": 1,
+        "devices": [
+            {
+                "device_id": "dev-1",
+                "t0": 1767225600000,          # epoch em ms
+                "dt": [0, 60000, 60000],      # deltas em ms (o primeiro é relativo a t0)
+                "metrics": {
+                    "cpu_usage": b"...",      # float32 little-endian (NaN = ausente)
+                    "memory_usage": [41.0, None, 43.5]
+                }
+            }
+        ]
+    }
+
+Cada amostra vira uma linha de ``diagnostic`` concluída, só com as colunas de
+métricas, sem o JSON por amostra nem os dicionários dos analisadores. O dono
+das amostras é sempre o usuário autenticado do upload; o formato não carrega
+``user_id``.
+"""
+import gzip
+import io
+import math
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.diagnostic import DiagnosticStatus
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+PROTOCOL_VERSION = 1
+MSGPACK_CONTENT_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+
+# Colunas de ``diagnostic`` aceitas como séries de métricas
+METRIC_COLUMNS: Sequence[str] = (
+    "cpu_usage", "cpu_temperature", "memory_usage", "memory_available",
+    "disk_usage", "disk_available", "network_speed", "overall_health"
+)
+INTEGER_METRICS = ("overall_health",)
+# Instantes aceitos (epoch ms): de 1970 até 31/12/9999, dentro do limite de ``datetime``
+MAX_EPOCH_MS = int(datetime(9999, 12, 31, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class MetricBatchError(ValueError):
+    """Lote de métricas inválido."""
+
+
+class MetricBatchTooLarge(MetricBatchError):
+    """Lote de métricas acima dos limites de tamanho."""
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Valores de ``Content-Encoding`` aceitos"""
+    return ("identity", "gzip", "zstd") if ZSTD_AVAILABLE else ("identity", "gzip")
+
+
+def decompress_payload(body: bytes, content_encoding: Optional[str], max_bytes: int) -> bytes:
+    """Descomprime o corpo do upload sem passar de ``max_bytes``.
+
+    Args:
+        body: Corpo recebido
+        content_encoding: Valor do header ``Content-Encoding``
+        max_bytes: Tamanho máximo do conteúdo descomprimido
+
+    Returns:
+        Conteúdo msgpack
+
+    Raises:
+        MetricBatchError: Se a codificação não for suportada ou o corpo for inválido
+        MetricBatchTooLarge: Se o conteúdo descomprimido passar do limite
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding not in supported_encodings():
+        raise MetricBatchError(f"Content-Encoding não suportado: {encoding}")
+    try:
+        if encoding == "gzip":
+            # Limita a saída para não expandir uploads maliciosos na memória
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data = decompressor.decompress(body, max_bytes + 1)
+        elif encoding == "zstd":
+            data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(max_bytes + 1)
+        else:
+            data = body
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise MetricBatchError(f"Corpo comprimido inválido: {e}")
+    if len(data) > max_bytes:
+        raise MetricBatchTooLarge(f"Lote excede {max_bytes} bytes descomprimido")
+    return data
+
+
+def decode_metric_batch(
+    body: bytes,
+    content_encoding: Optional[str] = None,
+    user_id: Optional[str] = None,
+    max_bytes: int = 16 * 1024 * 1024,
+    max_samples: int = 50000
+) -> List[Dict[str, Any]]:
+    """Decodifica um upload em linhas prontas para a tabela ``diagnostic``.
+
+    Args:
+        body: Corpo recebido
+        content_encoding: Valor do header ``Content-Encoding``
+        user_id: Usuário autenticado, dono de todas as amostras
+        max_bytes: Tamanho máximo do conteúdo descomprimido
+        max_samples: Número máximo de amostras no upload
+
+    Returns:
+        Linhas de diagnóstico, com IDs atribuídos
+
+    Raises:
+        MetricBatchError: Se o lote for inválido
+        MetricBatchTooLarge: Se o lote passar dos limites
+    """
+    if not MSGPACK_AVAILABLE:
+        raise MetricBatchError("Pacote msgpack não está instalado")
+    data = decompress_payload(body, content_encoding, max_bytes)
+    try:
+        payload = msgpack.unpackb(data, raw=False, strict_map_key=False)
+    except Exception as e:
+        raise MetricBatchError(f"msgpack inválido: {e}")
+    if not isinstance(payload, dict) or payload.get("v") != PROTOCOL_VERSION:
+        raise MetricBatchError(f"Versão do protocolo não suportada (esperada {PROTOCOL_VERSION})")
+    devices = payload.get("devices")
+    if not isinstance(devices, list):
+        raise MetricBatchError("Campo 'devices' ausente")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows: List[Dict[str, Any]] = []
+    for position, device in enumerate(devices):
+        timestamps, columns = _decode_device(device, position)
+        if len(rows) + len(timestamps) > max_samples:
+            raise MetricBatchTooLarge(f"Lote excede o limite de {max_samples} amostras")
+        base = {
+            "user_id": user_id,
+            "device_id": device["device_id"],
+            "status": DiagnosticStatus.COMPLETED,
+            "updated_at": now,
+            "system_info_id": None,
+            "raw_data": None
+        }
+        values = {metric: column.tolist() for metric, column in columns.items()}
+        for index, timestamp in enumerate(timestamps.tolist()):
+            row = dict(base, id=str(uuid.uuid4()),
+                       created_at=datetime.fromtimestamp(timestamp / 1000, timezone.utc).replace(tzinfo=None))
+            for metric in METRIC_COLUMNS:
+                value = values[metric][index] if metric in values else None
+                if value is None or math.isnan(value):
+                    row[metric] = None
+                else:
+                    row[metric] = int(round(value)) if metric in INTEGER_METRICS else value
+            rows.append(row)
+    return rows
+
+
+def encode_metric_batch(devices: List[Dict[str, Any]], compression: Optional[str] = "gzip") -> bytes:
+    """Codifica amostras no formato do protocolo (lado do agente).
+
+    Args:
+        devices: Blocos com ``device_id``, ``timestamps`` (datetime, UTC se sem fuso),
+            ``metrics`` (nome -> lista de valores)
+        compression: "gzip", "zstd" ou None
+
+    Returns:
+        Corpo do upload
+    """
+    encoded = []
+    for device in devices:
+        epoch_ms = np.array([_epoch_ms(timestamp) for timestamp in device["timestamps"]], dtype=np.int64)
+        t0 = int(epoch_ms[0]) if len(epoch_ms) else 0
+        block = {
+            "device_id": device["device_id"],
+            "t0": t0,
+            "dt": np.diff(epoch_ms, prepend=t0).tolist(),
+            "metrics": {
+                metric: np.array(values, dtype=float).astype("<f4").tobytes()
+                for metric, values in device["metrics"].items()
+            }
+        }
+        encoded.append(block)
+    data = msgpack.packb({"v": PROTOCOL_VERSION, "devices": encoded}, use_bin_type=True)
+    if compression == "gzip":
+        return gzip.compress(data, 6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def _decode_device(device: Any, position: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Reconstrói instantes (epoch ms) e séries de um bloco de dispositivo"""
+    if not isinstance(device, dict) or not device.get("device_id"):
+        raise MetricBatchError(f"devices[{position}]: 'device_id' ausente")
+    try:
+        t0 = int(device.get("t0", 0))
+        deltas = np.asarray(device.get("dt") or [], dtype=np.float64)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise MetricBatchError(f"devices[{position}]: instantes inválidos: {e}")
+    if not 0 <= t0 <= MAX_EPOCH_MS or deltas.ndim != 1:
+        raise MetricBatchError(f"devices[{position}]: instantes fora do intervalo suportado")
+    # Soma em float64: exata enquanto os instantes ficam no intervalo e sem overflow silencioso do int64
+    timestamps = t0 + np.cumsum(deltas)
+    if timestamps.size and not (
+        np.isfinite(timestamps).all() and timestamps.min() >= 0 and timestamps.max() <= MAX_EPOCH_MS
+    ):
+        raise MetricBatchError(f"devices[{position}]: instantes fora do intervalo suportado")
+    timestamps = timestamps.astype(np.int64)
+
+    columns: Dict[str, np.ndarray] = {}
+    for metric, values in (device.get("metrics") or {}).items():
+        if metric not in METRIC_COLUMNS:
+            raise MetricBatchError(f"devices[{position}]: métrica desconhecida '{metric}'")
+        try:
+            if isinstance(values, (bytes, bytearray)):
+                column = np.frombuffer(values, dtype="<f4").astype(np.float64)
+            else:
+                column = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise MetricBatchError(f"devices[{position}].{metric}: valores inválidos: {e}")
+        if column.shape != timestamps.shape:
+            raise MetricBatchError(
+                f"devices[{position}].{metric}: {column.size} valores para {timestamps.size} instantes"
+            )
+        columns[metric] = column
+    return timestamps, columns
+
+
+def _epoch_ms(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(round(value.timestamp() * 1000))
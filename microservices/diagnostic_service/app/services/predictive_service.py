@@ -2,13 +2,32 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional
 
-from sqlalchemy import func
+import numpy as np
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.db.repositories.diagnostic_repository import summary_options
+from app.db.telemetry_store import TelemetryWindow, get_telemetry_store
 from app.models.diagnostic import Diagnostic
+from app.services.rollup_service import RollupService, bucket_start
+from app.services.trend_engine import INVERSE_TREND_METRICS, TREND_METRICS, compute_trend, to_epoch_seconds
+from app.services.trend_state_service import TrendStateService
 
 logger = logging.getLogger(__name__)
 
+# Componente em risco: métrica em degradação além do limite (componente, métrica, limite)
+RISK_RULES = (
+    ("cpu", "cpu_usage", 80),
+    ("memory", "memory_usage", 80),
+    ("disk", "disk_usage", 85),
+    ("overall_health", "overall_health", 70)
+)
+
+# Saúde geral abaixo destes valores eleva o risco independentemente da tendência
+HIGH_RISK_HEALTH = 50
+MEDIUM_RISK_HEALTH = 70
+
 
 class PredictiveService:
     """Serviço para análise preditiva de falhas com base em diagnósticos."""
@@ -22,13 +41,15 @@ class PredictiveService:
         self.db = db
     
     def predict_failures(
-        self, device_id: str, time_window_days: int = 30
+        self, device_id: str, time_window_days: int = 30, series_points: Optional[int] = None
     ) -> Dict[str, Any]:
         """Prevê possíveis falhas com base no histórico de diagnósticos.
         
         Args:
             device_id: ID do dispositivo para análise
             time_window_days: Janela de tempo em dias para análise
+            series_points: Pontos da série de cada tendência; 0 omite as séries
+                (padrão: PREDICTIVE_SERIES_POINTS)
             
         Returns:
             Dicionário com previsões de falhas
@@ -36,13 +57,43 @@ class PredictiveService:
         # Define o período de análise
         start_date = datetime.now(timezone.utc) - timedelta(days=time_window_days)
         
-        # Obtém os diagnósticos do dispositivo no período
-        diagnostics = self.db.query(Diagnostic).filter(
-            Diagnostic.device_id == device_id,
-            Diagnostic.created_at >= start_date
-        ).order_by(Diagnostic.created_at.asc()).all()
-        
-        if not diagnostics:
+        # Histórico do store colunar: fatias dos arquivos mapeados. Os rollups
+        # confirmam que o store não ficou atrás do banco na janela
+        window = self._query_telemetry(device_id, start_date)
+        rollups = self._query_rollups(device_id, start_date)
+        if window is not None and not self._telemetry_behind(device_id, start_date, rollups):
+            epoch_seconds = window.timestamps / 1000.0
+            trends = {
+                metric: compute_trend(
+                    epoch_seconds, np.asarray(window.columns[metric], dtype=np.float64),
+                    inverse=metric in INVERSE_TREND_METRICS, series_points=series_points
+                )
+                for metric in TREND_METRICS
+            }
+            result = self._build_result(device_id, start_date, time_window_days, len(window), trends)
+            result["source"] = "telemetry"
+            return result
+        
+        # Tendências a partir dos rollups: centenas de buckets em vez dos diagnósticos brutos
+        if rollups is not None:
+            series = rollups["series"]
+            trends = {
+                metric: self._analyze_rollup_trend(series[metric], metric in INVERSE_TREND_METRICS, series_points)
+                for metric in TREND_METRICS
+            }
+            diagnostics_analyzed = max(sum(bucket.count for bucket in buckets) for buckets in series.values())
+            result = self._build_result(device_id, start_date, time_window_days, diagnostics_analyzed, trends)
+            result["rollup_resolution"] = rollups["resolution"]
+            return result
+        
+        # Só as colunas das métricas, sem carregar objetos Diagnostic
+        rows = self.db.execute(
+            select(Diagnostic.created_at, *[getattr(Diagnostic, metric) for metric in TREND_METRICS])
+            .where(Diagnostic.device_id == device_id, Diagnostic.created_at >= start_date)
+            .order_by(Diagnostic.created_at.asc())
+        ).all()
+        
+        if not rows:
             logger.warning(f"No diagnostics found for device {device_id} in the last {time_window_days} days")
             return {
                 "device_id": device_id,
@@ -52,10 +103,81 @@ class PredictiveService:
             }
         
         # Analisa tendências nos componentes
-        cpu_trend = self._analyze_component_trend(diagnostics, "cpu_usage")
-        memory_trend = self._analyze_component_trend(diagnostics, "memory_usage")
-        disk_trend = self._analyze_component_trend(diagnostics, "disk_usage")
-        health_trend = self._analyze_component_trend(diagnostics, "overall_health", inverse=True)
+        columns = list(zip(*rows))
+        epoch_seconds = to_epoch_seconds(columns[0])
+        trends = {
+            metric: compute_trend(
+                epoch_seconds, np.array(column, dtype=np.float64),
+                inverse=metric in INVERSE_TREND_METRICS, series_points=series_points
+            )
+            for metric, column in zip(TREND_METRICS, columns[1:])
+        }
+        
+        return self._build_result(device_id, start_date, time_window_days, len(rows), trends)
+    
+    def get_current_trend(self, device_id: str) -> Dict[str, Any]:
+        """Retorna a tendência atual do dispositivo.
+        
+        Responde a partir do estado incremental (``device_trend_state``) sem
+        ler o histórico; sem estado, calcula a partir dos diagnósticos.
+        
+        Args:
+            device_id: ID do dispositivo
+            
+        Returns:
+            Dicionário com as tendências, o nível de risco e a fonte ("state" ou "history")
+        """
+        try:
+            state = TrendStateService(self.db).current_trends(device_id)
+        except Exception as e:
+            logger.warning(f"Estado de tendência indisponível para {device_id}: {e}")
+            state = None
+        
+        if state is None:
+            result = self.predict_failures(device_id, series_points=0)
+            return {
+                "device_id": device_id,
+                "source": "history",
+                "trends": result.get("trends", {}),
+                "risk_level": result["risk_level"],
+                "risk_components": result.get("risk_components", []),
+                "diagnostics_analyzed": result.get("diagnostics_analyzed", 0)
+            }
+        
+        trends = state["trends"]
+        risk_level, risk_components = self._calculate_risk_level(
+            trends["cpu_usage"], trends["memory_usage"], trends["disk_usage"], trends["overall_health"]
+        )
+        return {
+            "device_id": device_id,
+            "source": "state",
+            "trends": trends,
+            "risk_level": risk_level,
+            "risk_components": risk_components,
+            "diagnostics_analyzed": state["samples"],
+            "last_at": state["last_at"]
+        }
+    
+    def _build_result(
+        self, device_id: str, start_date: datetime, time_window_days: int,
+        diagnostics_analyzed: int, trends: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Calcula o risco e as previsões e compila o resultado.
+        
+        Args:
+            device_id: ID do dispositivo
+            start_date: Início da janela de análise
+            time_window_days: Janela de tempo em dias
+            diagnostics_analyzed: Número de diagnósticos considerados
+            trends: Tendência de cada métrica
+            
+        Returns:
+            Dicionário com previsões de falhas
+        """
+        cpu_trend = trends["cpu_usage"]
+        memory_trend = trends["memory_usage"]
+        disk_trend = trends["disk_usage"]
+        health_trend = trends["overall_health"]
         
         # Calcula o risco geral
         risk_level, risk_components = self._calculate_risk_level(
@@ -64,91 +186,142 @@ class PredictiveService:
         
         # Gera previsões específicas
         predictions = self._generate_predictions(
-            diagnostics, cpu_trend, memory_trend, disk_trend, health_trend
+            device_id, cpu_trend, memory_trend, disk_trend, health_trend
         )
         
         # Compila os resultados
-        result = {
+        return {
             "device_id": device_id,
             "analysis_period": {
                 "start_date": start_date.isoformat(),
                 "end_date": datetime.now(timezone.utc).isoformat(),
                 "days": time_window_days
             },
-            "diagnostics_analyzed": len(diagnostics),
-            "trends": {
-                "cpu_usage": cpu_trend,
-                "memory_usage": memory_trend,
-                "disk_usage": disk_trend,
-                "overall_health": health_trend
-            },
+            "diagnostics_analyzed": diagnostics_analyzed,
+            "trends": trends,
             "risk_level": risk_level,
             "risk_components": risk_components,
             "predictions": predictions,
             "recommended_actions": self._get_recommended_actions(risk_level, risk_components)
         }
+    
+    def _query_telemetry(self, device_id: str, start_date: datetime) -> Optional[TelemetryWindow]:
+        """Obtém as amostras do dispositivo na janela a partir do store colunar.
         
-        return result
+        Args:
+            device_id: ID do dispositivo
+            start_date: Início da janela de análise
+            
+        Returns:
+            Janela de amostras ou None se o store estiver desativado ou vazio
+        """
+        if not settings.TELEMETRY_STORE_ENABLED:
+            return None
+        try:
+            window = get_telemetry_store().range(device_id, start_date, metrics=TREND_METRICS)
+        except Exception as e:
+            logger.warning(f"Store de telemetria indisponível para {device_id}: {e}")
+            return None
+        return window if len(window) else None
+    
+    def _telemetry_behind(
+        self, device_id: str, start_date: datetime, rollups: Optional[Dict[str, Any]]
+    ) -> bool:
+        """Verifica se o store tem menos amostras que os rollups na janela.
+        
+        O store descarta amostras mais antigas que a última gravada e só grava
+        depois do commit; os rollups são atualizados na própria transação do
+        diagnóstico e contam todas as amostras.
+        
+        Args:
+            device_id: ID do dispositivo
+            start_date: Início da janela de análise
+            rollups: Resultado de ``_query_rollups``
+            
+        Returns:
+            True se faltarem amostras no store
+        """
+        if rollups is None:
+            return False
+        # Os rollups começam no bucket que contém o início da janela
+        since = bucket_start(start_date, rollups["resolution"])
+        try:
+            stats = get_telemetry_store().aggregate(device_id, since, metrics=TREND_METRICS)
+        except Exception as e:
+            logger.warning(f"Store de telemetria indisponível para {device_id}: {e}")
+            return True
+        for metric in TREND_METRICS:
+            expected = sum(bucket.count for bucket in rollups["series"][metric])
+            if stats[metric]["count"] < expected:
+                logger.info(
+                    f"Store de telemetria atrás dos rollups para {device_id} "
+                    f"({metric}: {stats[metric]['count']} de {expected} amostras); usando rollups"
+                )
+                return True
+        return False
+    
+    def _query_rollups(self, device_id: str, start_date: datetime) -> Optional[Dict[str, Any]]:
+        """Obtém a série de rollups do dispositivo na janela.
+        
+        Args:
+            device_id: ID do dispositivo
+            start_date: Início da janela de análise
+            
+        Returns:
+            Resultado de ``RollupService.query`` ou None se não houver rollups
+        """
+        try:
+            rollups = RollupService(self.db).query(device_id, start_date, metrics=TREND_METRICS)
+        except Exception as e:
+            logger.warning(f"Rollups indisponíveis para {device_id}, usando diagnósticos brutos: {e}")
+            return None
+        if not any(rollups["series"].values()):
+            return None
+        return rollups
     
-    def _analyze_component_trend(
-        self, diagnostics: List[Diagnostic], attribute: str, inverse: bool = False
+    def _analyze_rollup_trend(
+        self, buckets: List[Any], inverse: bool = False, series_points: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Analisa a tendência de um componente ao longo do tempo.
+        """Analisa a tendência de uma métrica a partir dos buckets de rollup.
+        
+        A média de cada bucket entra na regressão com peso igual ao número de
+        amostras; mínimo, máximo e valor atual vêm dos próprios buckets.
         
         Args:
-            diagnostics: Lista de diagnósticos
-            attribute: Nome do atributo a ser analisado
-            inverse: Se True, valores mais altos são piores (ex: uso de CPU)
-                     Se False, valores mais altos são melhores (ex: saúde geral)
+            buckets: Buckets da métrica em ordem cronológica
+            inverse: Se True, valores mais altos são piores
+            series_points: Pontos da série retornada; 0 omite a série
             
         Returns:
             Dicionário com análise de tendência
         """
-        values = []
-        dates = []
-        
-        for diag in diagnostics:
-            value = getattr(diag, attribute)
-            if value is not None:
-                values.append(value)
-                dates.append(diag.created_at)
-        
-        if not values:
-            return {"trend": "unknown", "slope": 0, "values": []}
-        
-        # Calcula estatísticas básicas
-        avg = sum(values) / len(values)
-        latest = values[-1] if values else None
-        
-        # Calcula a tendência (simplificada)
-        if len(values) >= 2:
-            first_half = values[:len(values)//2]
-            second_half = values[len(values)//2:]
-            first_avg = sum(first_half) / len(first_half)
-            second_avg = sum(second_half) / len(second_half)
-            slope = second_avg - first_avg
-            
-            # Determina a direção da tendência
-            if abs(slope) < 0.05 * avg:  # Menos de 5% de variação
-                trend = "stable"
-            else:
-                if inverse:
-                    trend = "improving" if slope < 0 else "degrading"
-                else:
-                    trend = "improving" if slope > 0 else "degrading"
-        else:
-            trend = "unknown"
-            slope = 0
+        if not buckets:
+            return {"trend": "unknown", "slope": 0, "current": None, "values": []}
+        
+        trend = compute_trend(
+            to_epoch_seconds([bucket.bucket_start for bucket in buckets]),
+            np.array([bucket.avg_value for bucket in buckets], dtype=np.float64),
+            inverse=inverse,
+            weights=np.array([bucket.count for bucket in buckets], dtype=np.float64),
+            series_points=series_points
+        )
+        trend["current"] = buckets[-1].last_value
+        trend["min"] = min(bucket.min_value for bucket in buckets)
+        trend["max"] = max(bucket.max_value for bucket in buckets)
+        return trend
+    
+    def _latest_diagnostic(self, device_id: str) -> Optional[Diagnostic]:
+        """Retorna o diagnóstico mais recente do dispositivo, sem raw_data.
         
-        return {
-            "trend": trend,
-            "slope": slope,
-            "current": latest,
-            "average": avg,
-            "min": min(values),
-            "max": max(values),
-            "values": list(zip([d.isoformat() for d in dates], values))
-        }
+        Args:
+            device_id: ID do dispositivo
+            
+        Returns:
+            Diagnóstico mais recente ou None
+        """
+        return self.db.query(Diagnostic).options(*summary_options()).filter(
+            Diagnostic.device_id == device_id
+        ).order_by(Diagnostic.created_at.desc()).first()
     
     def _calculate_risk_level(
         self, cpu_trend: Dict[str, Any], memory_trend: Dict[str, Any], 
@@ -166,24 +339,27 @@ class PredictiveService:
             Tupla com nível de risco e componentes em risco
         """
         risk_components = []
+        trends = {
+            "cpu_usage": cpu_trend,
+            "memory_usage": memory_trend,
+            "disk_usage": disk_trend,
+            "overall_health": health_trend
+        }
         
         # Verifica componentes em degradação
-        if cpu_trend["trend"] == "degrading" and cpu_trend["current"] > 80:
-            risk_components.append("cpu")
-        
-        if memory_trend["trend"] == "degrading" and memory_trend["current"] > 80:
-            risk_components.append("memory")
-        
-        if disk_trend["trend"] == "degrading" and disk_trend["current"] > 85:
-            risk_components.append("disk")
-        
-        if health_trend["trend"] == "degrading" and health_trend["current"] < 70:
-            risk_components.append("overall_health")
+        for component, metric, threshold in RISK_RULES:
+            trend = trends[metric]
+            if trend["trend"] != "degrading":
+                continue
+            if metric in INVERSE_TREND_METRICS and trend["current"] > threshold:
+                risk_components.append(component)
+            elif metric not in INVERSE_TREND_METRICS and trend["current"] < threshold:
+                risk_components.append(component)
         
         # Determina o nível de risco
-        if len(risk_components) >= 3 or (health_trend["current"] and health_trend["current"] < 50):
+        if len(risk_components) >= 3 or (health_trend["current"] and health_trend["current"] < HIGH_RISK_HEALTH):
             risk_level = "high"
-        elif len(risk_components) >= 1 or (health_trend["current"] and health_trend["current"] < 70):
+        elif len(risk_components) >= 1 or (health_trend["current"] and health_trend["current"] < MEDIUM_RISK_HEALTH):
             risk_level = "medium"
         else:
             risk_level = "low"
@@ -191,14 +367,16 @@ class PredictiveService:
         return risk_level, risk_components
     
     def _generate_predictions(
-        self, diagnostics: List[Diagnostic], cpu_trend: Dict[str, Any], 
+        self, device_id: str, cpu_trend: Dict[str, Any], 
         memory_trend: Dict[str, Any], disk_trend: Dict[str, Any], 
         health_trend: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Gera previsões específicas com base nas tendências.
         
+        As inclinações das tendências estão em unidades por dia.
+        
         Args:
-            diagnostics: Lista de diagnósticos
+            device_id: ID do dispositivo
             cpu_trend: Tendência de uso da CPU
             memory_trend: Tendência de uso da memória
             disk_trend: Tendência de uso do disco
@@ -213,7 +391,7 @@ class PredictiveService:
         if disk_trend["trend"] == "degrading" and disk_trend["slope"] > 0:
             # Estima quando o disco ficará cheio
             remaining_space = 100 - disk_trend["current"]
-            days_to_full = remaining_space / (disk_trend["slope"] * 30) if disk_trend["slope"] > 0 else 999
+            days_to_full = remaining_space / disk_trend["slope"]
             
             if days_to_full < 30:
                 predictions["disk_full"] = {
@@ -227,14 +405,15 @@ class PredictiveService:
             # Estima quando a saúde cairá abaixo de um limite crítico
             current_health = health_trend["current"]
             critical_threshold = 40
-            days_to_critical = (current_health - critical_threshold) / abs(health_trend["slope"] * 30) if health_trend["slope"] < 0 else 999
+            days_to_critical = (current_health - critical_threshold) / abs(health_trend["slope"])
             
             if days_to_critical < 60:
+                latest = self._latest_diagnostic(device_id)
                 predictions["hardware_failure"] = {
                     "message": f"Possível falha de hardware em aproximadamente {int(days_to_critical)} dias",
                     "estimated_date": (datetime.now(timezone.utc) + timedelta(days=days_to_critical)).isoformat(),
                     "confidence": "medium",
-                    "affected_components": self._identify_failing_components(diagnostics[-1])
+                    "affected_components": self._identify_failing_components(latest) if latest else []
                 }
         
         # Previsão de problemas de desempenho
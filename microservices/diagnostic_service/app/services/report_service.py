@@ -1,9 +1,12 @@
+import asyncio
 import logging
 import os
 import uuid
 from datetime import datetime
 from typing import Optional, List, Tuple
 
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -214,4 +217,186 @@ class ReportService:
                     error_message=str(e)
                 )
             )
-            return self.get_report(report_id)
\ No newline at end of file
+            return self.get_report(report_id)
+
+class AsyncReportService:
+    """Versão assíncrona de ``ReportService`` para endpoints async.
+    
+    A geração do PDF, que bloqueia, roda em uma thread.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        """Inicializa o serviço de relatórios.
+        
+        Args:
+            db: Sessão assíncrona do banco de dados
+        """
+        self.db = db
+        
+        # Garante que o diretório de armazenamento de relatórios existe
+        os.makedirs(settings.REPORT_STORAGE_PATH, exist_ok=True)
+    
+    async def create_report(self, obj_in: ReportCreate) -> Report:
+        """Cria um novo relatório.
+        
+        Args:
+            obj_in: Dados para criação do relatório
+            
+        Returns:
+            Objeto Report criado
+        """
+        diagnostic_id = await self.db.scalar(select(Diagnostic.id).where(Diagnostic.id == obj_in.diagnostic_id))
+        if not diagnostic_id:
+            raise ValueError(f"Diagnostic not found: {obj_in.diagnostic_id}")
+        
+        db_obj = Report(
+            title=obj_in.title,
+            description=obj_in.description,
+            format=obj_in.format,
+            diagnostic_id=obj_in.diagnostic_id,
+            status=ReportStatus.PENDING
+        )
+        
+        self.db.add(db_obj)
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        logger.info(f"Created report with ID: {db_obj.id}")
+        return db_obj
+    
+    async def get_report(self, report_id: str) -> Optional[Report]:
+        """Obtém um relatório pelo ID.
+        
+        Args:
+            report_id: ID do relatório
+            
+        Returns:
+            Objeto Report ou None se não encontrado
+        """
+        result = await self.db.execute(select(Report).where(Report.id == report_id))
+        return result.scalars().first()
+    
+    async def get_reports(
+        self, 
+        diagnostic_id: Optional[str] = None,
+        skip: int = 0, 
+        limit: int = 100
+    ) -> Tuple[List[Report], int]:
+        """Obtém uma lista de relatórios com filtros opcionais.
+        
+        Args:
+            diagnostic_id: Filtrar por ID do diagnóstico
+            skip: Número de registros para pular
+            limit: Número máximo de registros para retornar
+            
+        Returns:
+            Tupla com lista de relatórios e contagem total
+        """
+        query = select(Report)
+        if diagnostic_id:
+            query = query.where(Report.diagnostic_id == diagnostic_id)
+        
+        total = await self.db.scalar(select(func.count()).select_from(query.subquery()))
+        result = await self.db.execute(query.order_by(Report.created_at.desc()).offset(skip).limit(limit))
+        
+        return list(result.scalars()), total or 0
+    
+    async def update_report(
+        self, report_id: str, obj_in: ReportUpdate
+    ) -> Optional[Report]:
+        """Atualiza um relatório existente.
+        
+        Args:
+            report_id: ID do relatório
+            obj_in: Dados para atualização
+            
+        Returns:
+            Objeto Report atualizado ou None se não encontrado
+        """
+        db_obj = await self.get_report(report_id)
+        if not db_obj:
+            return None
+        
+        for field, value in obj_in.model_dump(exclude_unset=True).items():
+            setattr(db_obj, field, value)
+        
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        logger.info(f"Updated report with ID: {db_obj.id}")
+        return db_obj
+    
+    async def delete_report(self, report_id: str) -> bool:
+        """Exclui um relatório pelo ID.
+        
+        Args:
+            report_id: ID do relatório
+            
+        Returns:
+            True se excluído com sucesso, False caso contrário
+        """
+        db_obj = await self.get_report(report_id)
+        if not db_obj:
+            return False
+        
+        # Remove o arquivo físico se existir
+        if db_obj.file_path and os.path.exists(db_obj.file_path):
+            try:
+                await asyncio.to_thread(os.remove, db_obj.file_path)
+            except Exception as e:
+                logger.error(f"Error removing report file: {str(e)}")
+        
+        await self.db.delete(db_obj)
+        await self.db.commit()
+        logger.info(f"Deleted report with ID: {report_id}")
+        return True
+    
+    async def generate_report(self, report_id: str) -> Optional[Report]:
+        """Gera um relatório a partir de um diagnóstico.
+        
+        Args:
+            report_id: ID do relatório a ser gerado
+            
+        Returns:
+            Objeto Report atualizado ou None em caso de erro
+        """
+        report = await self.get_report(report_id)
+        if not report:
+            logger.error(f"Report not found: {report_id}")
+            return None
+        
+        result = await self.db.execute(select(Diagnostic).where(Diagnostic.id == report.diagnostic_id))
+        diagnostic = result.scalars().first()
+        if not diagnostic:
+            error_msg = f"Diagnostic not found for report: {report_id}"
+            logger.error(error_msg)
+            return await self.update_report(
+                report_id=report_id,
+                obj_in=ReportUpdate(status=ReportStatus.FAILED, error_message=error_msg)
+            )
+        
+        await self.update_report(
+            report_id=report_id,
+            obj_in=ReportUpdate(status=ReportStatus.GENERATING)
+        )
+        
+        try:
+            filename = f"report_{report_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+            file_path = os.path.join(settings.REPORT_STORAGE_PATH, filename)
+            
+            await asyncio.to_thread(generate_pdf_report, diagnostic, file_path)
+            
+            logger.info(f"Report generated successfully: {report_id}")
+            return await self.update_report(
+                report_id=report_id,
+                obj_in=ReportUpdate(
+                    status=ReportStatus.COMPLETED,
+                    file_path=file_path,
+                    public_url=f"/api/v1/reports/{report_id}/download"
+                )
+            )
+            
+        except Exception as e:
+            logger.exception(f"Error generating report {report_id}: {str(e)}")
+            return await self.update_report(
+                report_id=report_id,
+                obj_in=ReportUpdate(status=ReportStatus.FAILED, error_message=str(e))
+            )
@@ -0,0 +1,336 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+
+logger = logging.getLogger(__name__)
+
+# Resoluções disponíveis, da mais fina para a mais grossa (nome -> segundos)
+ROLLUP_RESOLUTIONS: Dict[str, int] = {"1m": 60, "1h": 3600, "1d": 86400}
+
+ROLLUP_METRICS: Sequence[str] = (
+    "cpu_usage", "memory_usage", "disk_usage", "network_speed", "overall_health"
+)
+
+
+def _to_utc_naive(value: Optional[datetime]) -> datetime:
+    """Normaliza um instante para UTC sem fuso (formato das colunas DateTime)"""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Retorna o início do bucket que contém o instante.
+
+    Args:
+        timestamp: Instante da medição (UTC)
+        resolution: Resolução do rollup (1m, 1h, 1d)
+
+    Returns:
+        Início do bucket em UTC sem fuso
+    """
+    step = ROLLUP_RESOLUTIONS[resolution]
+    timestamp = _to_utc_naive(timestamp)
+    epoch = int(timestamp.replace(tzinfo=timezone.utc).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % step, timezone.utc).replace(tzinfo=None)
+
+
+class RollupService:
+    """Mantém e consulta rollups de métricas de diagnóstico por dispositivo."""
+
+    def __init__(self, db: Session):
+        """Inicializa o serviço de rollups.
+
+        Args:
+            db: Sessão do banco de dados
+        """
+        self.db = db
+
+    def retention(self, resolution: str) -> Optional[timedelta]:
+        """Retorna por quanto tempo os buckets de uma resolução são mantidos.
+
+        Args:
+            resolution: Resolução do rollup
+
+        Returns:
+            Período de retenção ou None se os buckets não expiram
+        """
+        if resolution == "1m":
+            return timedelta(days=settings.METRIC_ROLLUP_MINUTE_RETENTION_DAYS)
+        if resolution == "1h":
+            return timedelta(days=settings.METRIC_ROLLUP_HOUR_RETENTION_DAYS)
+        return None
+
+    def ingest(self, diagnostics: Iterable[Any]) -> int:
+        """Adiciona diagnósticos concluídos aos rollups.
+
+        Aceita objetos ``Diagnostic`` ou dicionários com as mesmas chaves. Os
+        buckets são atualizados com um único upsert; a transação não é
+        confirmada aqui, para que o chamador grave tudo no mesmo commit.
+
+        Args:
+            diagnostics: Diagnósticos concluídos
+
+        Returns:
+            Número de buckets atualizados
+        """
+        buckets: Dict[tuple, Dict[str, Any]] = {}
+        for diagnostic in diagnostics:
+            get = diagnostic.get if isinstance(diagnostic, dict) else (lambda key: getattr(diagnostic, key, None))
+            device_id = get("device_id")
+            if not device_id or get("status") not in (DiagnosticStatus.COMPLETED, DiagnosticStatus.COMPLETED.value):
+                continue
+            measured_at = _to_utc_naive(get("created_at"))
+            for metric in ROLLUP_METRICS:
+                value = get(metric)
+                if value is None:
+                    continue
+                value = float(value)
+                for resolution in ROLLUP_RESOLUTIONS:
+                    key = (device_id, resolution, metric, bucket_start(measured_at, resolution))
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        buckets[key] = {
+                            "device_id": device_id,
+                            "resolution": resolution,
+                            "metric": metric,
+                            "bucket_start": key[3],
+                            "min_value": value,
+                            "max_value": value,
+                            "sum_value": value,
+                            "count": 1,
+                            "last_value": value,
+                            "last_at": measured_at
+                        }
+                        continue
+                    # Vários diagnósticos no mesmo bucket viram uma única linha do upsert
+                    bucket["min_value"] = min(bucket["min_value"], value)
+                    bucket["max_value"] = max(bucket["max_value"], value)
+                    bucket["sum_value"] += value
+                    bucket["count"] += 1
+                    if measured_at >= bucket["last_at"]:
+                        bucket["last_value"], bucket["last_at"] = value, measured_at
+
+        if buckets:
+            self._upsert(list(buckets.values()))
+        return len(buckets)
+
+    def _upsert(self, rows: List[Dict[str, Any]]):
+        """Mescla os buckets com os existentes (min/max/soma/contagem/último)"""
+        table = DiagnosticMetricRollup.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            least, greatest = func.least, func.greatest
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            least, greatest = func.min, func.max
+        else:
+            self._upsert_generic(rows)
+            return
+
+        now = datetime.now(timezone.utc)
+        statement = dialect_insert(table)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=["device_id", "resolution", "metric", "bucket_start"],
+            set_={
+                "min_value": least(table.c.min_value, excluded.min_value),
+                "max_value": greatest(table.c.max_value, excluded.max_value),
+                "sum_value": table.c.sum_value + excluded.sum_value,
+                "count": table.c.count + excluded.count,
+                "last_value": case(
+                    (excluded.last_at >= table.c.last_at, excluded.last_value),
+                    else_=table.c.last_value
+                ),
+                "last_at": greatest(table.c.last_at, excluded.last_at),
+                "updated_at": now
+            }
+        )
+        self.db.execute(statement, rows)
+
+    def _upsert_generic(self, rows: List[Dict[str, Any]]):
+        """Upsert linha a linha para bancos sem ON CONFLICT"""
+        for row in rows:
+            existing = self.db.execute(
+                select(DiagnosticMetricRollup).where(
+                    DiagnosticMetricRollup.device_id == row["device_id"],
+                    DiagnosticMetricRollup.resolution == row["resolution"],
+                    DiagnosticMetricRollup.metric == row["metric"],
+                    DiagnosticMetricRollup.bucket_start == row["bucket_start"]
+                )
+            ).scalar_one_or_none()
+            if existing is None:
+                self.db.add(DiagnosticMetricRollup(**row))
+                continue
+            existing.min_value = min(existing.min_value, row["min_value"])
+            existing.max_value = max(existing.max_value, row["max_value"])
+            existing.sum_value += row["sum_value"]
+            existing.count += row["count"]
+            if row["last_at"] >= existing.last_at:
+                existing.last_value, existing.last_at = row["last_value"], row["last_at"]
+        self.db.flush()
+
+    def choose_resolution(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        min_points: Optional[int] = None
+    ) -> str:
+        """Escolhe a resolução mais grossa que ainda atende à janela.
+
+        A resolução precisa gerar pelo menos ``min_points`` buckets na janela
+        e ainda ter dados retidos desde o início dela.
+
+        Args:
+            start: Início da janela
+            end: Fim da janela (padrão: agora)
+            min_points: Número mínimo de pontos (padrão: METRIC_ROLLUP_MIN_POINTS)
+
+        Returns:
+            Nome da resolução
+        """
+        if min_points is None:
+            min_points = settings.METRIC_ROLLUP_MIN_POINTS
+        now = _to_utc_naive(None)
+        start = _to_utc_naive(start)
+        end = _to_utc_naive(end) if end is not None else now
+        window = (end - start).total_seconds()
+
+        covering = []
+        for resolution in ROLLUP_RESOLUTIONS:
+            retention = self.retention(resolution)
+            if retention is None or start >= now - retention:
+                covering.append(resolution)
+
+        for resolution in reversed(covering):
+            if window / ROLLUP_RESOLUTIONS[resolution] >= min_points:
+                return resolution
+        # Janela curta demais para qualquer resolução: usa a mais fina disponível
+        return covering[0] if covering else "1d"
+
+    def query(
+        self,
+        device_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        metrics: Optional[Sequence[str]] = None,
+        resolution: Optional[str] = None,
+        min_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Consulta a série de rollups de um dispositivo.
+
+        Args:
+            device_id: ID do dispositivo
+            start: Início da janela
+            end: Fim da janela (padrão: agora)
+            metrics: Métricas desejadas (padrão: todas)
+            resolution: Resolução fixa (padrão: escolhida por ``choose_resolution``)
+            min_points: Número mínimo de pontos para a escolha da resolução
+
+        Returns:
+            Dicionário com a resolução usada e a série de buckets por métrica
+        """
+        if resolution is None:
+            resolution = self.choose_resolution(start, end, min_points)
+        elif resolution not in ROLLUP_RESOLUTIONS:
+            raise ValueError(f"Invalid rollup resolution: {resolution}")
+        metrics = list(metrics or ROLLUP_METRICS)
+        unknown = set(metrics) - set(ROLLUP_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown rollup metrics: {sorted(unknown)}")
+
+        query = select(DiagnosticMetricRollup).where(
+            DiagnosticMetricRollup.device_id == device_id,
+            DiagnosticMetricRollup.resolution == resolution,
+            DiagnosticMetricRollup.metric.in_(metrics),
+            DiagnosticMetricRollup.bucket_start >= bucket_start(start, resolution)
+        )
+        if end is not None:
+            query = query.where(DiagnosticMetricRollup.bucket_start <= _to_utc_naive(end))
+        rows = self.db.execute(query.order_by(DiagnosticMetricRollup.bucket_start)).scalars().all()
+
+        series: Dict[str, List[DiagnosticMetricRollup]] = {metric: [] for metric in metrics}
+        for row in rows:
+            series[row.metric].append(row)
+        return {"device_id": device_id, "resolution": resolution, "series": series}
+
+    def backfill(self, device_id: Optional[str] = None, since: Optional[datetime] = None,
+                 chunk_size: int = 1000) -> int:
+        """Recalcula os rollups a partir dos diagnósticos já gravados.
+
+        Os buckets afetados devem estar vazios (ex.: após criar a tabela),
+        pois os valores são somados aos existentes.
+
+        Args:
+            device_id: Limita a um dispositivo
+            since: Considera apenas diagnósticos a partir desta data
+            chunk_size: Diagnósticos lidos por consulta
+
+        Returns:
+            Número de diagnósticos processados
+        """
+        columns = [Diagnostic.id, Diagnostic.device_id, Diagnostic.status, Diagnostic.created_at,
+                   *[getattr(Diagnostic, metric) for metric in ROLLUP_METRICS]]
+        query = select(*columns).where(Diagnostic.status == DiagnosticStatus.COMPLETED)
+        if device_id:
+            query = query.where(Diagnostic.device_id == device_id)
+        if since:
+            query = query.where(Diagnostic.created_at >= _to_utc_naive(since))
+
+        processed = 0
+        for partition in self.db.execute(query.execution_options(yield_per=chunk_size)).mappings().partitions():
+            self.ingest([dict(row) for row in partition])
+            processed += len(partition)
+        self.db.commit()
+        return processed
+
+    def prune(self) -> int:
+        """Remove buckets além do período de retenção.
+
+        Returns:
+            Número de buckets removidos
+        """
+        now = _to_utc_naive(None)
+        removed = 0
+        for resolution in ROLLUP_RESOLUTIONS:
+            retention = self.retention(resolution)
+            if retention is None:
+                continue
+            result = self.db.execute(
+                delete(DiagnosticMetricRollup).where(
+                    DiagnosticMetricRollup.resolution == resolution,
+                    DiagnosticMetricRollup.bucket_start < now - retention
+                )
+            )
+            removed += result.rowcount or 0
+        self.db.commit()
+        return removed
+
+
+def record_diagnostic_rollups(db: Session, diagnostics: Iterable[Any]):
+    """Atualiza os rollups sem comprometer a transação do diagnóstico.
+
+    O upsert roda em um SAVEPOINT; uma falha é registrada e descartada para
+    que o diagnóstico em si seja gravado normalmente.
+
+    Args:
+        db: Sessão do diagnóstico
+        diagnostics: Diagnósticos concluídos
+    """
+    if not settings.METRIC_ROLLUPS_ENABLED:
+        return
+    try:
+        with db.begin_nested():
+            RollupService(db).ingest(diagnostics)
+    except Exception as e:
+        logger.warning(f"Rollups de métricas não atualizados: {e}")
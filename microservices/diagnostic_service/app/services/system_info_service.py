@@ -1,19 +1,27 @@
 import logging
+import os
 import platform
 import psutil
 import socket
+import threading
 import uuid
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from sqlalchemy.orm import Session
 
+from app.core.system_sampler import system_sampler
 from app.models.system_info import SystemInfo
 from app.schemas.system_info import SystemInfoCreate, SystemInfoUpdate
 from app.services.analyzers import CPUAnalyzer, MemoryAnalyzer, DiskAnalyzer, NetworkAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# Fatos estáticos do sistema, compartilhados por todas as instâncias do serviço
+_static_facts: Optional[Dict[str, Any]] = None
+_static_facts_boot_time: Optional[float] = None
+_static_facts_lock = threading.Lock()
+
 
 class SystemInfoService:
     """Serviço para gerenciar informações do sistema."""
@@ -117,25 +125,26 @@ class SystemInfoService:
         logger.info(f"Deleted system info record: {id}")
         return obj
     
-    def collect_system_info(self) -> Dict[str, Any]:
+    def collect_system_info(self, force_refresh: bool = False) -> Dict[str, Any]:
         """Coleta informações completas do sistema.
         
+        Os fatos estáticos (host, SO, arquitetura, boot) são calculados uma vez
+        por processo e reaproveitados enquanto o boot time não mudar; apenas
+        uptime, usuários e processos são coletados a cada chamada.
+        
+        Args:
+            force_refresh: Recalcula também os fatos estáticos
+            
         Returns:
             Dicionário com informações do sistema
         """
         try:
-            system_info = {
-                "hostname": self._get_hostname(),
-                "os_name": self._get_os_name(),
-                "os_version": self._get_os_version(),
-                "architecture": self._get_architecture(),
-                "platform": self._get_platform(),
-                "python_version": self._get_python_version(),
-                "boot_time": self._get_boot_time(),
+            system_info = dict(self._get_static_facts(force_refresh))
+            system_info.update({
                 "uptime": self._get_uptime(),
                 "users": self._get_users(),
                 "processes": self._get_process_count()
-            }
+            })
             
             logger.info("System information collected successfully")
             return system_info
@@ -147,6 +156,37 @@ class SystemInfoService:
                 "timestamp": datetime.now().isoformat()
             }
     
+    def _get_static_facts(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Retorna os fatos do sistema que só mudam após reinicialização.
+        
+        Args:
+            force_refresh: Ignora o cache
+            
+        Returns:
+            Dicionário com os fatos estáticos
+        """
+        global _static_facts, _static_facts_boot_time
+        
+        boot_timestamp = psutil.boot_time()
+        facts = _static_facts
+        if facts is not None and not force_refresh and _static_facts_boot_time == boot_timestamp:
+            return facts
+        
+        with _static_facts_lock:
+            if _static_facts is None or force_refresh or _static_facts_boot_time != boot_timestamp:
+                _static_facts = {
+                    "hostname": self._get_hostname(),
+                    "os_name": self._get_os_name(),
+                    "os_version": self._get_os_version(),
+                    "architecture": self._get_architecture(),
+                    "platform": self._get_platform(),
+                    "python_version": self._get_python_version(),
+                    "boot_time": self._get_boot_time(boot_timestamp)
+                }
+                _static_facts_boot_time = boot_timestamp
+                logger.info("Static system facts collected")
+            return _static_facts
+    
     def _get_hostname(self) -> str:
         """Obtém o nome do host do sistema.
         
@@ -219,14 +259,18 @@ class SystemInfoService:
             logger.error(f"Error getting Python version: {str(e)}")
             return "unknown"
     
-    def _get_boot_time(self) -> str:
+    def _get_boot_time(self, boot_timestamp: Optional[float] = None) -> str:
         """Obtém o horário do último boot do sistema.
         
+        Args:
+            boot_timestamp: Timestamp do boot já lido (padrão: lê do psutil)
+            
         Returns:
             Horário do último boot em formato ISO
         """
         try:
-            boot_timestamp = psutil.boot_time()
+            if boot_timestamp is None:
+                boot_timestamp = psutil.boot_time()
             boot_time = datetime.fromtimestamp(boot_timestamp)
             return boot_time.isoformat()
         except Exception as e:
@@ -299,10 +343,21 @@ class SystemInfoService:
     def _get_process_count(self) -> int:
         """Obtém o número total de processos em execução.
         
+        Usa o snapshot recente do amostrador quando disponível e, no Linux,
+        conta as entradas numéricas de ``/proc`` sem instanciar processos.
+        
         Returns:
             Número de processos
         """
         try:
+            snapshot = system_sampler.fresh()
+            if snapshot is not None:
+                return snapshot.process_count
+            
+            if os.path.isdir("/proc"):
+                with os.scandir("/proc") as entries:
+                    return sum(1 for entry in entries if entry.name.isdigit())
+            
             return len(psutil.pids())
         except Exception as e:
             logger.error(f"Error getting process count: {str(e)}")
@@ -0,0 +1,235 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400.0
+
+EPOCH = datetime(1970, 1, 1)
+
+# Variação projetada na janela abaixo da qual a tendência é estável (fração da média)
+STABLE_CHANGE_RATIO = 0.05
+
+TREND_PERCENTILES = (50, 90, 95)
+
+TREND_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "overall_health")
+
+# Métricas em que valores mais altos são piores
+INVERSE_TREND_METRICS = ("cpu_usage", "memory_usage", "disk_usage")
+
+
+def to_epoch_seconds(timestamps: Sequence[datetime]) -> np.ndarray:
+    """Converte instantes em segundos desde a época (UTC).
+
+    Instantes sem fuso são tratados como UTC, o formato das colunas DateTime.
+
+    Args:
+        timestamps: Instantes em ordem cronológica
+
+    Returns:
+        Array float64 com os segundos
+    """
+    # Subtração em Python: converter objetos datetime com np.array é ~10x mais lento
+    return np.fromiter(
+        (
+            ((ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo is not None else ts) - EPOCH).total_seconds()
+            for ts in timestamps
+        ),
+        dtype=np.float64,
+        count=len(timestamps)
+    )
+
+
+def classify_trend(slope: float, span_days: float, average: float, inverse: bool) -> str:
+    """Classifica a tendência a partir da inclinação.
+
+    Args:
+        slope: Inclinação em unidades por dia
+        span_days: Duração da série em dias
+        average: Média da série
+        inverse: Se True, valores mais altos são piores
+
+    Returns:
+        "stable", "improving" ou "degrading"
+    """
+    if abs(slope * span_days) < STABLE_CHANGE_RATIO * abs(average):
+        return "stable"
+    if inverse:
+        return "improving" if slope < 0 else "degrading"
+    return "improving" if slope > 0 else "degrading"
+
+
+def downsample(epoch_seconds: np.ndarray, values: np.ndarray, max_points: int) -> np.ndarray:
+    """Reduz a série a no máximo ``max_points`` pontos pela média de blocos contíguos.
+
+    Args:
+        epoch_seconds: Instantes em segundos (ordem cronológica)
+        values: Valores sem NaN
+        max_points: Número máximo de pontos
+
+    Returns:
+        Array (n, 2) com instante médio e valor médio de cada bloco
+    """
+    if len(values) <= max_points:
+        return np.column_stack((epoch_seconds, values))
+    bounds = np.linspace(0, len(values), max_points + 1).astype(np.int64)
+    starts, counts = bounds[:-1], np.diff(bounds)
+    return np.column_stack((
+        np.add.reduceat(epoch_seconds, starts) / counts,
+        np.add.reduceat(values, starts) / counts
+    ))
+
+
+def compute_trend(
+    epoch_seconds: np.ndarray,
+    values: np.ndarray,
+    inverse: bool = False,
+    weights: Optional[np.ndarray] = None,
+    alpha: Optional[float] = None,
+    series_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """Calcula a tendência de uma métrica em uma única passada vetorizada.
+
+    A inclinação é a dos mínimos quadrados (ponderados por ``weights``) em
+    unidades por dia; a tendência é estável se a variação projetada na janela
+    for menor que 5% da média.
+
+    Args:
+        epoch_seconds: Instantes em segundos (ordem cronológica)
+        values: Valores da métrica (NaN para ausentes)
+        inverse: Se True, valores mais altos são piores (ex: uso de CPU)
+                 Se False, valores mais altos são melhores (ex: saúde geral)
+        weights: Peso de cada ponto (ex: amostras de um bucket de rollup)
+        alpha: Fator de suavização da EWMA (padrão: PREDICTIVE_EWMA_ALPHA)
+        series_points: Pontos da série retornada; 0 omite a série
+            (padrão: PREDICTIVE_SERIES_POINTS)
+
+    Returns:
+        Dicionário com tendência, inclinação, estatísticas e série reduzida
+    """
+    if alpha is None:
+        alpha = settings.PREDICTIVE_EWMA_ALPHA
+    if series_points is None:
+        series_points = settings.PREDICTIVE_SERIES_POINTS
+
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    if not present.any():
+        return {"trend": "unknown", "slope": 0, "current": None, "values": []}
+
+    values = values[present]
+    days = (np.asarray(epoch_seconds, dtype=np.float64)[present] - epoch_seconds[0]) / SECONDS_PER_DAY
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)[present]
+
+    avg = float(np.average(values, weights=weights))
+    span = days[-1] - days[0]
+    if len(values) >= 2 and span > 0:
+        days_centered = days - np.average(days, weights=weights)
+        slope = float(np.sum(weights * days_centered * (values - avg)) / np.sum(weights * days_centered ** 2))
+        trend = classify_trend(slope, span, avg, inverse)
+    else:
+        trend = "unknown"
+        slope = 0
+
+    # EWMA ajustada: pesos (1 - alpha)^k do ponto mais recente para o mais antigo
+    decay = (1.0 - alpha) ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)
+    ewma = float(np.dot(decay, values) / decay.sum())
+    percentiles = np.percentile(values, TREND_PERCENTILES)
+
+    series = []
+    if series_points:
+        points = downsample(epoch_seconds[present], values, series_points)
+        series = [
+            (datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(), float(value))
+            for ts, value in points
+        ]
+
+    return {
+        "trend": trend,
+        "slope": slope,
+        "current": float(values[-1]),
+        "average": avg,
+        "ewma": ewma,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": {f"p{p}": float(v) for p, v in zip(TREND_PERCENTILES, percentiles)},
+        "values": series
+    }
+
+
+def compute_group_trends(
+    groups: np.ndarray,
+    epoch_seconds: np.ndarray,
+    values: np.ndarray,
+    n_groups: int,
+    inverse: bool = False,
+    weights: Optional[np.ndarray] = None,
+    last_values: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """Calcula a tendência de muitas séries de uma vez (ex.: um dispositivo por grupo).
+
+    Aplica as mesmas regras de ``compute_trend`` com somas por grupo
+    (``np.bincount``), sem laço em Python por série.
+
+    Args:
+        groups: Índice do grupo de cada ponto (0 a ``n_groups - 1``)
+        epoch_seconds: Instantes em segundos
+        values: Valores da métrica (NaN para ausentes)
+        n_groups: Número de grupos
+        inverse: Se True, valores mais altos são piores
+        weights: Peso de cada ponto
+        last_values: Valor "atual" de cada ponto (padrão: o próprio valor)
+
+    Returns:
+        Arrays por grupo: trend, slope (por dia), current, average e points
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    groups = np.asarray(groups, dtype=np.int64)[present]
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)[present]
+    values = values[present]
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)[present]
+    last_values = values if last_values is None else np.asarray(last_values, dtype=np.float64)[present]
+
+    # Ordena por grupo e instante para localizar o primeiro e o último ponto de cada série
+    order = np.lexsort((epoch_seconds, groups))
+    groups, epoch_seconds, values = groups[order], epoch_seconds[order], values[order]
+    weights, last_values = weights[order], last_values[order]
+
+    present_groups, first = np.unique(groups, return_index=True)
+    last = np.append(first[1:], len(groups))[:len(first)] - 1
+    origin = np.zeros(n_groups)
+    origin[present_groups] = epoch_seconds[first]
+    days = (epoch_seconds - origin[groups]) / SECONDS_PER_DAY
+
+    def group_sum(data: np.ndarray) -> np.ndarray:
+        return np.bincount(groups, weights=data, minlength=n_groups)
+
+    points = np.bincount(groups, minlength=n_groups)
+    sw, sx, sy = group_sum(weights), group_sum(weights * days), group_sum(weights * values)
+    sxx, sxy = group_sum(weights * days * days), group_sum(weights * days * values)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = np.where(sw > 0, sy / sw, np.nan)
+        denominator = sw * sxx - sx * sx
+        slope = np.where(denominator > 0, (sw * sxy - sx * sy) / denominator, 0.0)
+
+    span = np.zeros(n_groups)
+    span[present_groups] = days[last]
+    current = np.full(n_groups, np.nan)
+    current[present_groups] = last_values[last]
+
+    degrading = slope > 0 if inverse else slope < 0
+    stable = np.abs(slope * span) < STABLE_CHANGE_RATIO * np.abs(np.nan_to_num(average))
+    trend = np.where(
+        (points < 2) | (span <= 0), "unknown",
+        np.where(stable, "stable", np.where(degrading, "degrading", "improving"))
+    )
+    slope = np.where(trend == "unknown", 0.0, slope)
+
+    return {"trend": trend, "slope": slope, "current": current, "average": average, "points": points}
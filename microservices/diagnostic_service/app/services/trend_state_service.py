@@ -0,0 +1,280 @@
+import logging
+import math
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import DiagnosticStatus
+from app.services.trend_engine import (
+    EPOCH, INVERSE_TREND_METRICS, SECONDS_PER_DAY, TREND_METRICS, classify_trend
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricTrendState:
+    """Estatísticas incrementais de uma métrica de um dispositivo.
+
+    - Média e variância de toda a história (Welford), mínimo e máximo
+    - EWMA e último valor
+    - Somas da regressão dos últimos ``capacity`` pontos, mantidas ao
+      adicionar o ponto novo e subtrair o que sai do buffer circular
+
+    Instantes são segundos desde a época; ``x`` da regressão é em dias desde
+    o primeiro ponto (``origin``).
+    """
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    ewma: Optional[float] = None
+    last_value: Optional[float] = None
+    last_at: Optional[float] = None
+    origin: Optional[float] = None
+    sx: float = 0.0
+    sy: float = 0.0
+    sxx: float = 0.0
+    sxy: float = 0.0
+    head: int = 0
+    size: int = 0
+    ring_t: List[Optional[float]] = field(default_factory=list)
+    ring_v: List[Optional[float]] = field(default_factory=list)
+
+    def update(self, timestamp: float, value: float, capacity: int, alpha: float):
+        """Adiciona uma medição em O(1).
+
+        Medições mais antigas que a última entram só nas estatísticas de toda
+        a história (Welford, mínimo e máximo), não na janela nem na EWMA.
+
+        Args:
+            timestamp: Instante da medição (segundos desde a época)
+            value: Valor medido
+            capacity: Tamanho da janela da regressão
+            alpha: Fator de suavização da EWMA
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if self.last_at is not None and timestamp < self.last_at:
+            return
+        if self.origin is None:
+            self.origin = timestamp
+        if len(self.ring_t) != capacity:
+            self._resize(capacity)
+
+        if self.size == capacity:
+            self._accumulate(self.ring_t[self.head], self.ring_v[self.head], -1)
+            self.size -= 1
+        self.ring_t[self.head], self.ring_v[self.head] = timestamp, value
+        self.head = (self.head + 1) % capacity
+        self.size += 1
+        self._accumulate(timestamp, value, 1)
+        if self.head == 0:
+            # Recalcula as somas a cada volta do buffer para não acumular erro de arredondamento
+            self._recompute_sums()
+
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+        self.last_value, self.last_at = value, timestamp
+
+    def window(self) -> List[Tuple[float, float]]:
+        """Pontos da janela em ordem cronológica"""
+        if not self.ring_t:
+            return []
+        capacity = len(self.ring_t)
+        start = (self.head - self.size) % capacity
+        return [
+            (self.ring_t[(start + i) % capacity], self.ring_v[(start + i) % capacity])
+            for i in range(self.size)
+        ]
+
+    def trend(self, inverse: bool = False) -> Dict[str, Any]:
+        """Tendência atual a partir do estado, no formato de ``compute_trend``.
+
+        Args:
+            inverse: Se True, valores mais altos são piores
+
+        Returns:
+            Dicionário com tendência e estatísticas
+        """
+        if self.count == 0:
+            return {"trend": "unknown", "slope": 0, "current": None, "values": []}
+
+        points = self.window()
+        n = self.size
+        average = self.sy / n if n else self.mean
+        span = (points[-1][0] - points[0][0]) / SECONDS_PER_DAY if n else 0
+        denominator = n * self.sxx - self.sx * self.sx
+        if n >= 2 and span > 0 and denominator > 0:
+            slope = (n * self.sxy - self.sx * self.sy) / denominator
+            trend = classify_trend(slope, span, average, inverse)
+        else:
+            slope, trend = 0, "unknown"
+
+        return {
+            "trend": trend,
+            "slope": slope,
+            "current": self.last_value,
+            "average": average,
+            "ewma": self.ewma,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "samples": self.count,
+            "values": [
+                (datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None).isoformat(), v)
+                for t, v in points
+            ]
+        }
+
+    def _accumulate(self, timestamp: float, value: float, sign: int):
+        x = (timestamp - self.origin) / SECONDS_PER_DAY
+        self.sx += sign * x
+        self.sy += sign * value
+        self.sxx += sign * x * x
+        self.sxy += sign * x * value
+
+    def _recompute_sums(self):
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        for timestamp, value in self.window():
+            self._accumulate(timestamp, value, 1)
+
+    def _resize(self, capacity: int):
+        """Ajusta o buffer a uma nova capacidade mantendo os pontos mais recentes"""
+        points = self.window()[-capacity:] if self.ring_t else []
+        self.ring_t = [t for t, _ in points] + [None] * (capacity - len(points))
+        self.ring_v = [v for _, v in points] + [None] * (capacity - len(points))
+        self.size = len(points)
+        self.head = self.size % capacity
+        self._recompute_sums()
+
+
+class TrendStateService:
+    """Mantém e consulta o estado incremental das tendências por dispositivo."""
+
+    def __init__(self, db: Session, window: Optional[int] = None, alpha: Optional[float] = None):
+        """Inicializa o serviço.
+
+        Args:
+            db: Sessão do banco de dados
+            window: Pontos da janela da regressão (padrão: TREND_STATE_WINDOW)
+            alpha: Fator de suavização da EWMA (padrão: PREDICTIVE_EWMA_ALPHA)
+        """
+        self.db = db
+        self.window = window or settings.TREND_STATE_WINDOW
+        self.alpha = alpha if alpha is not None else settings.PREDICTIVE_EWMA_ALPHA
+
+    def record(self, diagnostics: Iterable[Any]) -> int:
+        """Atualiza o estado dos dispositivos com diagnósticos concluídos.
+
+        Aceita objetos ``Diagnostic`` ou dicionários com as mesmas chaves. Os
+        estados dos dispositivos envolvidos são lidos com uma única consulta;
+        a transação não é confirmada aqui.
+
+        Args:
+            diagnostics: Diagnósticos concluídos
+
+        Returns:
+            Número de dispositivos atualizados
+        """
+        samples: Dict[str, List[Tuple[float, Any]]] = {}
+        for diagnostic in diagnostics:
+            get = diagnostic.get if isinstance(diagnostic, dict) else (lambda key: getattr(diagnostic, key, None))
+            device_id = get("device_id")
+            if not device_id or get("status") not in (DiagnosticStatus.COMPLETED, DiagnosticStatus.COMPLETED.value):
+                continue
+            samples.setdefault(device_id, []).append((_epoch_seconds(get("created_at")), get))
+        if not samples:
+            return 0
+
+        states = {
+            state.device_id: state
+            for state in self.db.execute(
+                select(DeviceTrendState).where(DeviceTrendState.device_id.in_(list(samples))).with_for_update()
+            ).scalars()
+        }
+        for device_id, device_samples in samples.items():
+            row = states.get(device_id)
+            if row is None:
+                row = DeviceTrendState(device_id=device_id, samples=0, metrics={})
+                self.db.add(row)
+            metrics = {metric: MetricTrendState(**data) for metric, data in (row.metrics or {}).items()}
+            last_at = row.last_at
+            for timestamp, get in sorted(device_samples, key=lambda sample: sample[0]):
+                for metric in TREND_METRICS:
+                    value = get(metric)
+                    if value is not None:
+                        metrics.setdefault(metric, MetricTrendState()).update(
+                            timestamp, float(value), self.window, self.alpha
+                        )
+                measured_at = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+                last_at = measured_at if last_at is None else max(last_at, measured_at)
+            # Atribuição de um novo dicionário para o ORM detectar a mudança na coluna JSON
+            row.metrics = {metric: asdict(state) for metric, state in metrics.items()}
+            row.samples = (row.samples or 0) + len(device_samples)
+            row.last_at = last_at
+        self.db.flush()
+        return len(samples)
+
+    def current_trends(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Tendências atuais do dispositivo a partir do estado, sem ler o histórico.
+
+        Args:
+            device_id: ID do dispositivo
+
+        Returns:
+            Dicionário com as tendências por métrica ou None se não houver estado
+        """
+        row = self.db.execute(
+            select(DeviceTrendState).where(DeviceTrendState.device_id == device_id)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        metrics = row.metrics or {}
+        return {
+            "device_id": device_id,
+            "samples": row.samples,
+            "last_at": row.last_at.isoformat() if row.last_at else None,
+            "trends": {
+                metric: MetricTrendState(**metrics[metric]).trend(metric in INVERSE_TREND_METRICS)
+                if metric in metrics else {"trend": "unknown", "slope": 0, "current": None, "values": []}
+                for metric in TREND_METRICS
+            }
+        }
+
+
+def _epoch_seconds(value: Optional[datetime]) -> float:
+    """Segundos desde a época de um instante (agora se None; sem fuso = UTC)"""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH).total_seconds()
+
+
+def record_trend_state(db: Session, diagnostics: Iterable[Any]):
+    """Atualiza o estado das tendências sem comprometer a transação do diagnóstico.
+
+    Args:
+        db: Sessão do diagnóstico
+        diagnostics: Diagnósticos concluídos
+    """
+    if not settings.TREND_STATE_ENABLED:
+        return
+    try:
+        with db.begin_nested():
+            TrendStateService(db).record(diagnostics)
+    except Exception as e:
+        logger.warning(f"Estado de tendência não atualizado: {e}")
@@ -0,0 +1,255 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ai.baselines import StreamingBaselines, hours_of_week
+from app.ai.ml_engine import AnomalyDetector, AnomalyType
+from app.api.core.ai import endpoints as ai_endpoints
+
+
+class TestStreamingBaselines:
+    """Testes para as linhas de base em streaming."""
+
+    def setup_method(self):
+        """Cria linhas de base de duas métricas."""
+        self.baselines = StreamingBaselines(
+            metrics=["cpu_usage", "latency_ms"], min_scales=[2.0, 10.0],
+            memory_budget_bytes=StreamingBaselines.bytes_per_device(2) * 3, min_samples=20
+        )
+        self.start = datetime(2026, 6, 1)
+
+    def _feed(self, device_id, samples, noise=1.0, seed=0):
+        rng = np.random.default_rng(seed)
+        for i in range(samples):
+            self.baselines.observe(device_id, np.array([30.0 + rng.normal(0, noise), 50.0]),
+                                   self.start + timedelta(minutes=i))
+
+    def test_scores_deviation_against_baseline(self):
+        """Testa a pontuação só depois do aquecimento e só para desvios para cima."""
+        first = self.baselines.observe("dev-1", np.array([30.0, np.nan]), self.start)
+        assert not first.ready.any()
+        assert np.isnan(first.score).all()
+
+        self._feed("dev-1", 200)
+        spike = self.baselines.observe("dev-1", np.array([80.0, np.nan]), self.start + timedelta(hours=4))
+        normal = self.baselines.observe("dev-1", np.array([31.0, 50.0]), self.start + timedelta(hours=4))
+        drop = self.baselines.observe("dev-1", np.array([5.0, 50.0]), self.start + timedelta(hours=4))
+
+        assert spike.ready.tolist() == [True, False]
+        assert spike.score[0] > 10
+        assert 28 < spike.expected[0] < 32
+        assert normal.score[0] < 2
+        assert normal.score[1] == 0.0
+        assert drop.score[0] < 0
+
+    def test_hour_of_week_seasonality(self):
+        """Testa que a carga habitual de um horário não vira anomalia."""
+        for week in range(3):
+            for hour in range(24 * 7):
+                timestamp = self.start + timedelta(weeks=week, hours=hour)
+                value = 90.0 if hour % 24 == 2 else 20.0
+                for minute in range(3):
+                    self.baselines.observe("dev-1", np.array([value, np.nan]), timestamp + timedelta(minutes=minute))
+        backup_window = self.start + timedelta(weeks=3, hours=2)
+
+        assert self.baselines.observe("dev-1", np.array([90.0, np.nan]), backup_window).score[0] < 1
+        assert self.baselines.observe("dev-1", np.array([90.0, np.nan]), backup_window + timedelta(hours=10)).score[0] > 4
+
+    def test_batch_matches_sequential_observe(self):
+        """Testa que a matriz dá o mesmo resultado que amostras uma a uma."""
+        sequential = StreamingBaselines(metrics=["cpu_usage", "latency_ms"], min_scales=[2.0, 10.0],
+                                        memory_budget_bytes=10 ** 6, min_samples=5)
+        batch = StreamingBaselines(metrics=["cpu_usage", "latency_ms"], min_scales=[2.0, 10.0],
+                                   memory_budget_bytes=10 ** 6, min_samples=5)
+        rng = np.random.default_rng(1)
+        device_ids = [f"dev-{i % 4}" for i in range(40)]
+        timestamps = [self.start + timedelta(minutes=i) for i in range(40)]
+        values = rng.normal(30, 3, size=(40, 2))
+        values[::7, 1] = np.nan
+
+        expected = [sequential.observe(device_id, row, timestamp).score
+                    for device_id, row, timestamp in zip(device_ids, values, timestamps)]
+        scores = batch.observe_batch(device_ids, values, timestamps)
+
+        np.testing.assert_allclose(scores.score, np.array(expected), equal_nan=True)
+        assert scores.ready[:20].sum() == 0 and scores.ready[20:, 0].all()
+
+    def test_hours_of_week_from_epoch_seconds(self):
+        """Testa o bucket da hora da semana a partir de segundos desde a época."""
+        timestamps = [datetime(2026, 6, 1, 0), datetime(2026, 6, 3, 13), datetime(2026, 6, 7, 23)]
+        epoch = np.array([(timestamp - datetime(1970, 1, 1)).total_seconds() for timestamp in timestamps])
+
+        assert hours_of_week(timestamps).tolist() == [0, 61, 167]
+        assert hours_of_week(epoch).tolist() == [0, 61, 167]
+
+    def test_hours_of_week_converts_aware_timestamps_to_utc(self):
+        """Testa que instantes com fuso caem no mesmo bucket do instante em UTC."""
+        brt = timezone(timedelta(hours=-3))
+        aware = [datetime(2026, 6, 7, 22, tzinfo=brt), datetime(2026, 6, 3, 13, tzinfo=timezone.utc)]
+
+        assert hours_of_week(aware).tolist() == [1, 61]
+
+    def test_memory_budget_evicts_least_recent_device(self):
+        """Testa o número fixo de linhas e a reutilização da mais antiga."""
+        for device in ("dev-1", "dev-2", "dev-3"):
+            self._feed(device, 25)
+        self._feed("dev-1", 1)
+        memory = self.baselines.stats()["memory_bytes"]
+
+        self._feed("dev-4", 1)
+
+        stats = self.baselines.stats()
+        assert (stats["devices"], stats["capacity"], stats["evictions"]) == (3, 3, 1)
+        assert stats["memory_bytes"] == memory
+        assert self.baselines.observe("dev-2", np.array([30.0, 50.0]), self.start).ready.tolist() == [False, False]
+        assert self.baselines.observe("dev-1", np.array([30.0, 50.0]), self.start).ready.all()
+
+        self.baselines.reset("dev-1")
+        assert self.baselines.stats()["devices"] == 2
+
+
+class TestAnomalyDetectorBaselines:
+    """Testes para o detector de anomalias com linhas de base."""
+
+    def setup_method(self):
+        """Cria o detector."""
+        self.detector = AnomalyDetector()
+        self.start = datetime(2026, 6, 1)
+
+    def _metrics(self, minute, cpu, device_id="server-1"):
+        return {
+            "device_id": device_id,
+            "timestamp": (self.start + timedelta(minutes=minute)).isoformat(),
+            "cpu": {"usage_percent": cpu, "temperature": 60.0},
+            "memory": {"usage_percent": 50.0}
+        }
+
+    def test_thresholds_until_baseline_is_ready(self):
+        """Testa os limites fixos no aquecimento e a linha de base depois dele."""
+        busy = asyncio.run(self.detector.detect_anomalies(self._metrics(0, 97.0)))
+        assert [anomaly.anomaly_type for anomaly in busy] == [AnomalyType.CPU_SPIKE]
+
+        for minute in range(1, 60):
+            asyncio.run(self.detector.detect_anomalies(self._metrics(minute, 96.0 + minute % 3)))
+        steady = asyncio.run(self.detector.detect_anomalies(self._metrics(60, 97.0)))
+        assert steady == []
+
+        other = asyncio.run(self.detector.detect_anomalies(self._metrics(60, 45.0, device_id="server-2")))
+        assert other == []
+        for minute in range(1, 60):
+            asyncio.run(self.detector.detect_anomalies(self._metrics(minute, 20.0 + minute % 3, "server-2")))
+        spike = asyncio.run(self.detector.detect_anomalies(self._metrics(61, 75.0, device_id="server-2")))
+        assert [anomaly.anomaly_type for anomaly in spike] == [AnomalyType.CPU_SPIKE]
+        assert "cpu_usage 75.0" in spike[0].description
+        assert spike[0].timestamp == self.start + timedelta(minutes=61)
+        assert 0.5 <= spike[0].severity <= 1.0
+
+    def test_history_is_bounded(self, monkeypatch):
+        """Testa o histórico de anomalias em buffer circular."""
+        monkeypatch.setattr("app.ai.ml_engine.settings.ANOMALY_HISTORY_SIZE", 5)
+        detector = AnomalyDetector()
+
+        for minute in range(20):
+            asyncio.run(detector.detect_anomalies(self._metrics(minute, 99.0, device_id=f"dev-{minute}")))
+
+        assert len(detector.anomaly_history) == 5
+        info = asyncio.run(detector.get_model_info())
+        assert info["anomaly_history_size"] == 5
+        assert info["baselines"]["devices"] == 20
+
+
+class TestBatchAnomalyDetection:
+    """Testes para a detecção de anomalias numa matriz de amostras."""
+
+    def setup_method(self):
+        """Cria o detector e um histórico de uma frota."""
+        self.detector = AnomalyDetector()
+        self.start = datetime(2026, 6, 1)
+        self.devices = [f"dev-{i}" for i in range(50)]
+        rng = np.random.default_rng(2)
+        for minute in range(40):
+            self.detector.detect_anomalies_batch(
+                self.devices, [self.start + timedelta(minutes=minute)] * 50,
+                np.column_stack([rng.normal(30, 1, 50), rng.normal(60, 1, 50)]),
+                metrics=["cpu_usage", "cpu_temperature"]
+            )
+
+    def test_sparse_records(self):
+        """Testa que só as células anômalas voltam, pontuadas contra a linha de base."""
+        values = np.column_stack([np.full(50, 30.0), np.full(50, 60.0)])
+        values[7, 0] = 85.0
+        values[31, 1] = 79.0
+        timestamp = self.start + timedelta(minutes=40)
+
+        records = self.detector.detect_anomalies_batch(
+            self.devices, [timestamp] * 50, values, metrics=["cpu_usage", "cpu_temperature"]
+        )
+
+        assert [(record["device_id"], record["metric"]) for record in records] == [
+            ("dev-7", "cpu_usage"), ("dev-31", "cpu_temperature")
+        ]
+        assert records[0]["anomaly_type"] == AnomalyType.CPU_SPIKE.value
+        assert records[1]["anomaly_type"] == AnomalyType.TEMPERATURE_ABNORMAL.value
+        assert records[0]["method"] == "baseline"
+        assert 29 < records[0]["expected"] < 31
+        assert records[0]["index"] == 7 and records[0]["timestamp"] == timestamp
+
+    def test_threshold_during_warm_up_and_invalid_input(self):
+        """Testa os limites fixos para dispositivos novos e entradas inválidas."""
+        records = self.detector.detect_anomalies_batch(
+            ["new-1", "new-2"], [self.start] * 2, np.array([[97.0], [np.nan]]), metrics=["cpu_usage"]
+        )
+
+        assert len(records) == 1
+        assert (records[0]["method"], records[0]["severity"], records[0]["score"]) == ("threshold", 0.9, None)
+        with pytest.raises(ValueError, match="gpu_usage"):
+            self.detector.detect_anomalies_batch(["d"], [self.start], np.array([[1.0]]), metrics=["gpu_usage"])
+        with pytest.raises(ValueError):
+            self.detector.detect_anomalies_batch(["d"], [self.start], np.array([[1.0, 2.0]]), metrics=["cpu_usage"])
+        with pytest.raises(ValueError, match="repetidas"):
+            self.detector.detect_anomalies_batch(
+                ["d"], [self.start], np.array([[1.0, 2.0]]), metrics=["cpu_usage", "cpu_usage"]
+            )
+
+    def test_endpoint(self, monkeypatch):
+        """Testa a detecção em lote pela API."""
+        monkeypatch.setattr(ai_endpoints, "anomaly_detector", self.detector)
+        app = FastAPI()
+        app.include_router(ai_endpoints.router, prefix="/api/core/ai")
+        client = TestClient(app)
+        timestamp = (self.start + timedelta(minutes=40)).isoformat()
+
+        response = client.post("/api/core/ai/detect-anomalies/batch", json={
+            "device_ids": ["dev-1", "dev-2"], "timestamps": [timestamp, timestamp],
+            "metrics": ["cpu_usage"], "values": [[30.5], [90.0]], "sensitivity": 1.0
+        })
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["samples"], body["devices"]) == (2, 2)
+        assert [record["device_id"] for record in body["anomalies"]] == ["dev-2"]
+
+        mismatch = client.post("/api/core/ai/detect-anomalies/batch", json={
+            "device_ids": ["dev-1"], "timestamps": [timestamp, timestamp],
+            "metrics": ["cpu_usage"], "values": [[1.0], [2.0]]
+        })
+        assert mismatch.status_code == 400
+        unknown = client.post("/api/core/ai/detect-anomalies/batch", json={
+            "device_ids": ["dev-1"], "timestamps": [timestamp], "metrics": ["gpu_usage"], "values": [[1.0]]
+        })
+        assert unknown.status_code == 400
+        repeated = client.post("/api/core/ai/detect-anomalies/batch", json={
+            "device_ids": ["dev-1"], "timestamps": [timestamp], "metrics": ["cpu_usage", "cpu_usage"],
+            "values": [[1.0, 2.0]]
+        })
+        assert repeated.status_code == 400
+        monkeypatch.setattr(ai_endpoints, "ANOMALY_BATCH_MAX_SAMPLES", 1)
+        too_large = client.post("/api/core/ai/detect-anomalies/batch", json={
+            "device_ids": ["dev-1", "dev-2"], "timestamps": [timestamp, timestamp],
+            "metrics": ["cpu_usage"], "values": [[1.0], [2.0]]
+        })
+        assert too_large.status_code == 413
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import platform
@@ -55,7 +57,7 @@ class TestAntivirusAnalyzer:
                  {'name': 'Windows Defender', 'version': '4.18.2104.14', 'enabled': True}
              ]):
             
-            result = self.analyzer._get_installed_antiviruses()
+            result = asyncio.run(self.analyzer._get_installed_antiviruses())
             
             assert len(result) == 1
             assert result[0]['name'] == 'Windows Defender'
@@ -67,7 +69,7 @@ class TestAntivirusAnalyzer:
                  {'name': 'ClamAV', 'version': '0.103.6', 'enabled': True}
              ]):
             
-            result = self.analyzer._get_installed_antiviruses()
+            result = asyncio.run(self.analyzer._get_installed_antiviruses())
             
             assert len(result) == 1
             assert result[0]['name'] == 'ClamAV'
@@ -111,12 +113,12 @@ class TestAntivirusAnalyzer:
             with patch('winreg.OpenKey'), \
                  patch('winreg.QueryValueEx', return_value=(1, 'REG_DWORD')):
                 
-                result = self.analyzer._check_windows_defender()
+                result = asyncio.run(self.analyzer._check_windows_defender())
                 
                 assert result['enabled'] == True
         else:
             # Em sistemas não-Windows, o método deve retornar valores padrão
-            result = self.analyzer._check_windows_defender()
+            result = asyncio.run(self.analyzer._check_windows_defender())
             assert 'enabled' in result
     
     def test_check_firewall_enabled(self):
@@ -127,7 +129,7 @@ class TestAntivirusAnalyzer:
                 'status': 'healthy'
             }) if platform.system() == "Windows" else patch('subprocess.run'):
             
-            result = self.analyzer._check_firewall()
+            result = asyncio.run(self.analyzer._check_firewall())
             
             assert 'enabled' in result
             if platform.system() == "Windows":
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.core.diagnostics import endpoints
+from app.db.base import Base
+from app.db.repositories.diagnostic_repository import AsyncDiagnosticRepository
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.report import Report, ReportStatus
+from app.models.system_info import SystemInfo
+from app.schemas.diagnostic import DiagnosticCreate
+from app.schemas.report import ReportCreate
+from app.services.diagnostic_service import AsyncDiagnosticService
+from app.services.report_service import AsyncReportService
+
+
+class TestAsyncDiagnostics:
+    """Testes para a pilha assíncrona (AsyncSession) do domínio de diagnósticos."""
+
+    def setup_method(self):
+        """Cria as tabelas em um arquivo SQLite acessado pelo driver aiosqlite."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "diagnostics.db")
+        sync_engine = create_engine(f"sqlite:///{self.db_path}")
+        Base.metadata.create_all(sync_engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceTrendState.__table__, Report.__table__
+        ])
+        sync_engine.dispose()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+
+    def teardown_method(self):
+        """Remove o banco."""
+        self.tmpdir.cleanup()
+
+    def _session(self) -> AsyncSession:
+        return AsyncSession(self.engine, expire_on_commit=False)
+
+    @pytest.mark.asyncio
+    async def test_repository_crud_and_keyset(self):
+        """Testa o CRUD assíncrono e a paginação por cursor via ``run_sync``."""
+        now = datetime.utcnow()
+        async with self._session() as db:
+            repo = AsyncDiagnosticRepository(db)
+            created = await repo.create({
+                "user_id": "user-1", "device_id": "dev-1", "status": DiagnosticStatus.COMPLETED,
+                "raw_data": {"cpu": {"usage": 10}}
+            })
+            for i in range(4):
+                await repo.create({"user_id": "user-1", "status": DiagnosticStatus.PENDING,
+                                   "created_at": now - timedelta(minutes=i + 1)})
+
+        async with self._session() as db:
+            repo = AsyncDiagnosticRepository(db)
+            loaded = await repo.get_by_id(created.id)
+            assert loaded.raw_data == {"cpu": {"usage": 10}}
+
+            updated = await repo.update(created.id, {"overall_health": 80})
+            assert updated.overall_health == 80
+
+            first = await repo.get_diagnostics_keyset("user-1", limit=3, total="exact")
+            second = await repo.get_diagnostics_keyset("user-1", limit=3, cursor=first.next_cursor)
+            assert first.total == 5
+            assert len(first.items) + len(second.items) == 5
+            assert second.next_cursor is None
+
+            assert await repo.delete(created.id) is True
+            assert await repo.get_by_id(created.id) is None
+            assert len(await repo.get_by_user_id("user-1")) == 4
+
+    @pytest.mark.asyncio
+    async def test_run_diagnostic_does_not_block_event_loop(self):
+        """Testa que os analisadores rodam fora do event loop e o resultado é gravado."""
+        async with self._session() as db:
+            service = AsyncDiagnosticService(db)
+            diagnostic = await service.create_diagnostic(DiagnosticCreate(user_id="user-1", device_id="dev-1"))
+
+            def blocking_analyzers(concurrent=None):
+                time.sleep(0.3)
+                return {
+                    "cpu": {"status": "healthy", "usage": 30.0},
+                    "memory": {"status": "warning", "usage": 85.0},
+                    "disk": {"status": "healthy", "usage": 50.0},
+                    "network": {"status": "healthy"}
+                }
+
+            service.analysis._run_analyzers = blocking_analyzers
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            try:
+                result = await service.run_diagnostic(diagnostic.id, checkpoint=False)
+            finally:
+                task.cancel()
+
+            assert ticks >= 10
+            assert result.status == DiagnosticStatus.COMPLETED
+            assert result.memory_usage == 85.0
+
+        async with self._session() as db:
+            stored = await AsyncDiagnosticService(db).get_diagnostic(diagnostic.id)
+            assert stored.status == DiagnosticStatus.COMPLETED
+            assert stored.raw_data["system_info"]["id"] == stored.system_info_id
+            assert await db.get(SystemInfo, stored.system_info_id) is not None
+            rollups = (await db.execute(select(DiagnosticMetricRollup).where(
+                DiagnosticMetricRollup.device_id == "dev-1"
+            ))).scalars().all()
+            assert rollups
+
+    @pytest.mark.asyncio
+    async def test_run_diagnostic_not_found(self):
+        """Testa diagnóstico inexistente."""
+        async with self._session() as db:
+            with pytest.raises(ValueError):
+                await AsyncDiagnosticService(db).run_diagnostic("missing")
+
+    @pytest.mark.asyncio
+    async def test_report_service(self, tmp_path, monkeypatch):
+        """Testa o CRUD assíncrono de relatórios."""
+        monkeypatch.setattr("app.services.report_service.settings.REPORT_STORAGE_PATH", str(tmp_path))
+        async with self._session() as db:
+            diagnostic = await AsyncDiagnosticRepository(db).create({"user_id": "user-1"})
+            service = AsyncReportService(db)
+
+            report = await service.create_report(ReportCreate(title="Relatório", diagnostic_id=diagnostic.id))
+            items, total = await service.get_reports(diagnostic_id=diagnostic.id)
+            assert total == 1
+            assert items[0].id == report.id
+            assert items[0].status == ReportStatus.PENDING
+
+            with pytest.raises(ValueError):
+                await service.create_report(ReportCreate(title="Relatório", diagnostic_id="missing"))
+
+            assert await service.delete_report(report.id) is True
+            assert await service.get_report(report.id) is None
+
+    def test_endpoints_use_async_session(self):
+        """Testa os endpoints de histórico, detalhes e remoção com a sessão assíncrona."""
+        async def seed():
+            async with self._session() as db:
+                repo = AsyncDiagnosticRepository(db)
+                diagnostic = await repo.create({
+                    "user_id": "dev-user", "device_id": "dev-1", "status": DiagnosticStatus.COMPLETED,
+                    "overall_health": 75, "raw_data": {"recommendations": [{"action": "limpar disco"}]}
+                })
+                await repo.create({"user_id": "other-user", "status": DiagnosticStatus.COMPLETED})
+                return diagnostic.id
+
+        diagnostic_id = asyncio.run(seed())
+
+        async def get_async_db():
+            async with self._session() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        client = TestClient(app)
+
+        history = client.get("/api/core/diagnostics/history", params={"exact_total": True})
+        assert history.status_code == 200
+        assert [item["id"] for item in history.json()] == [diagnostic_id]
+        assert history.headers["X-Total-Count"] == "1"
+
+        details = client.get(f"/api/core/diagnostics/{diagnostic_id}")
+        assert details.status_code == 200
+        assert details.json()["recommendations"] == [{"action": "limpar disco"}]
+
+        assert client.delete(f"/api/core/diagnostics/{diagnostic_id}").status_code == 200
+        assert client.get(f"/api/core/diagnostics/{diagnostic_id}").status_code == 404
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.core.diagnostics import endpoints
+from app.db.base import Base
+from app.db.raw_data_store import is_manifest
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.diagnostic_ingest_service import DiagnosticIngestService, ingest_diagnostics
+
+
+class RecordingPool:
+    """Pool que registra as chamadas de COPY em vez de gravar no PostgreSQL."""
+
+    def __init__(self, error=None):
+        self.copies = []
+        self.error = error
+
+    async def copy_records(self, copies):
+        if self.error:
+            raise self.error
+        self.copies.extend(copies)
+        return sum(len(records) for _, _, records in copies)
+
+
+class TestDiagnosticIngest:
+    """Testes para a ingestão em lote de diagnósticos."""
+
+    def setup_method(self):
+        """Cria um banco SQLite em arquivo (compartilhado com o engine assíncrono)."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "ingest.db")
+        self.engine = create_engine(f"sqlite:///{self.db_path}")
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceTrendState.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine, autoflush=False)()
+        self.async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+        self.now = datetime.utcnow()
+        self.inserts = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO diagnostic "):
+                self.inserts.append(executemany)
+
+    def teardown_method(self):
+        """Fecha a sessão e remove o banco."""
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _item(self, day, device_id="dev-1", **extra):
+        item = {
+            "device_id": device_id,
+            "created_at": (self.now - timedelta(days=10 - day)).isoformat(),
+            "cpu_usage": 30.0,
+            "memory_usage": 40.0 + day,
+            "disk_usage": 60.0,
+            "overall_health": 90 - day,
+            "raw_data": {"cpu": {"usage": 30.0, "cores": list(range(128))}},
+            "system_info": {"hostname": f"host-{device_id}", "cpu_cores": 8}
+        }
+        item.update(extra)
+        return item
+
+    def test_ingest_executemany_with_validation_errors(self):
+        """Testa a gravação em um executemany e os erros de validação por item."""
+        items = [self._item(day) for day in range(5)]
+        items.insert(2, self._item(5, overall_health=150))
+        items.append({"device_id": "dev-2", "status": "unknown"})
+
+        result = DiagnosticIngestService(self.db).ingest(items)
+
+        assert (result["total"], result["inserted"], result["failed"]) == (7, 5, 2)
+        assert result["method"] == "executemany"
+        assert [row["index"] for row in result["results"]] == list(range(7))
+        assert "overall_health" in result["results"][2]["error"]
+        assert "status" in result["results"][6]["error"]
+        assert self.inserts == [True]
+
+        stored = self.db.get(Diagnostic, result["results"][0]["id"])
+        assert stored.status == DiagnosticStatus.COMPLETED
+        assert stored.system_info_id == result["results"][0]["system_info_id"]
+        assert stored.system_info.hostname == "host-dev-1"
+        assert stored.raw_data["cpu"]["cores"] == list(range(128))
+        assert self.db.query(SystemInfo).count() == 5
+        assert self.db.query(DeviceTrendState).filter_by(device_id="dev-1").one().samples == 5
+        assert self.db.query(DiagnosticMetricRollup).filter_by(device_id="dev-1").count() > 0
+
+    def test_database_error_falls_back_to_rows(self):
+        """Testa que uma linha rejeitada pelo banco não descarta o restante do lote."""
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TRIGGER block_device BEFORE INSERT ON diagnostic "
+                "WHEN NEW.device_id = 'blocked' BEGIN SELECT RAISE(ABORT, 'dispositivo bloqueado'); END"
+            ))
+        items = [self._item(0), self._item(1, device_id="blocked"), self._item(2)]
+
+        result = DiagnosticIngestService(self.db).ingest(items)
+
+        assert (result["inserted"], result["failed"]) == (2, 1)
+        assert "dispositivo bloqueado" in result["results"][1]["error"]
+        assert result["results"][1]["id"] is None
+        assert self.db.query(Diagnostic).count() == 2
+        assert self.db.query(SystemInfo).count() == 2
+
+    def test_copy_through_pool(self):
+        """Testa o COPY pelo pool: registros convertidos e dados derivados pela sessão."""
+        pool = RecordingPool()
+
+        async def run():
+            async with AsyncSession(self.async_engine, expire_on_commit=False) as db:
+                return await ingest_diagnostics(db, [self._item(day) for day in range(3)], pool=pool)
+
+        result = asyncio.run(run())
+
+        assert result["method"] == "copy"
+        assert result["inserted"] == 3
+        (system_table, _, system_records), (table, columns, records) = pool.copies
+        assert (system_table, table) == ("systeminfo", "diagnostic")
+        assert len(system_records) == 3
+        row = dict(zip(columns, records[0]))
+        assert row["id"] == result["results"][0]["id"]
+        assert row["status"] == "COMPLETED"
+        assert is_manifest(json.loads(row["raw_data"]))
+        assert row["created_at"].tzinfo is None
+        assert self.db.query(Diagnostic).count() == 0
+        assert self.db.query(DeviceTrendState).filter_by(device_id="dev-1").one().samples == 3
+
+    def test_copy_failure_uses_executemany(self):
+        """Testa a volta para o executemany quando o COPY falha."""
+        async def run():
+            async with AsyncSession(self.async_engine, expire_on_commit=False) as db:
+                return await ingest_diagnostics(db, [self._item(day) for day in range(3)],
+                                                pool=RecordingPool(error=RuntimeError("conexão perdida")))
+
+        result = asyncio.run(run())
+
+        assert result["method"] == "executemany"
+        assert self.db.query(Diagnostic).count() == 3
+        stored = self.db.get(Diagnostic, result["results"][0]["id"])
+        assert stored.raw_data["cpu"]["cores"] == list(range(128))
+
+    def test_ingest_settings_are_read_from_config(self, monkeypatch):
+        """Testa que os limites da ingestão vêm das configurações."""
+        from app.core.config import Settings
+
+        monkeypatch.setenv("DIAGNOSTIC_INGEST_MAX_ITEMS", "250")
+        monkeypatch.setenv("DIAGNOSTIC_INGEST_USE_COPY", "false")
+        configured = Settings()
+
+        assert (configured.DIAGNOSTIC_INGEST_MAX_ITEMS, configured.DIAGNOSTIC_INGEST_USE_COPY) == (250, False)
+        assert endpoints.DIAGNOSTIC_INGEST_MAX_ITEMS == endpoints.settings.DIAGNOSTIC_INGEST_MAX_ITEMS
+        assert endpoints.QUICK_DIAGNOSTIC_MAX_STALENESS == endpoints.settings.QUICK_DIAGNOSTIC_MAX_STALENESS_SECONDS
+
+    def test_endpoint(self, monkeypatch):
+        """Testa a ingestão pela API, com o usuário autenticado e o limite do lote."""
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+
+        async def get_async_db():
+            async with AsyncSession(self.async_engine, expire_on_commit=False) as db:
+                yield db
+
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        client = TestClient(app)
+
+        response = client.post("/api/core/diagnostics/ingest", json={
+            "items": [self._item(0, user_id="other-user"), self._item(1, memory_usage="alto")]
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["inserted"], body["failed"], body["method"]) == (1, 1, "executemany")
+        assert self.db.get(Diagnostic, body["results"][0]["id"]).user_id == "dev-user"
+
+        monkeypatch.setattr(endpoints, "DIAGNOSTIC_INGEST_MAX_ITEMS", 1)
+        response = client.post("/api/core/diagnostics/ingest", json={"items": [self._item(0), self._item(1)]})
+        assert response.status_code == 413
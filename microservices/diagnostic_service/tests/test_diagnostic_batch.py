@@ -0,0 +1,219 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.core.diagnostics import endpoints
+from app.db.base import Base
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.job_queue import JobQueue, JobStatus
+
+
+class TestBatchDiagnostics:
+    """Testes para o diagnóstico em lote da frota."""
+
+    @pytest.fixture(autouse=True)
+    def setup_batch(self, tmp_path):
+        """Monta o router com fila e banco temporários e diagnóstico simulado."""
+        self.queue = JobQueue(path=str(tmp_path / "jobs.db"), poll_interval=0.02, backoff=0)
+        self.queue.register(endpoints.BATCH_JOB_KIND, endpoints._execute_batch_job)
+
+        self.engine = create_engine("sqlite://", poolclass=StaticPool,
+                                    connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine, tables=[SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+                                                      DiagnosticMetricRollup.__table__])
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.inserts = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def count_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("INSERT INTO DIAGNOSTIC "):
+                self.inserts.append(len(parameters) if executemany else 1)
+
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+        async def fake_run_diagnostic_level(request, diagnostic_id):
+            self.calls.append(request.device_id)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await asyncio.sleep(0.01)
+                if request.device_id == "broken":
+                    raise RuntimeError("device unreachable")
+                return {
+                    "diagnostic_id": diagnostic_id,
+                    "timestamp": datetime.now(),
+                    "status": "completed",
+                    "overall_health": 90,
+                    "components": {},
+                    "recommendations": []
+                }
+            finally:
+                self.active -= 1
+
+        self.run_diagnostic_level = endpoints._run_diagnostic_level
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        with patch.multiple(endpoints, job_queue=self.queue,
+                            create_session_factory=lambda: self.session_factory,
+                            _run_diagnostic_level=fake_run_diagnostic_level,
+                            FLEET_BATCH_CONCURRENCY=3, FLEET_BATCH_INSERT_SIZE=4,
+                            FLEET_BATCH_MAX_DEVICES=50):
+            self.client = TestClient(app)
+            yield
+        self.queue.close()
+
+    def _submit(self, device_ids, **extra):
+        response = self.client.post("/api/core/diagnostics/batch",
+                                    json={"device_ids": device_ids, **extra})
+        assert response.status_code == 202
+        return response.json()
+
+    def _run_next_job(self):
+        self.queue.run_job(self.queue.claim())
+
+    def test_batch_is_enqueued_as_single_job(self):
+        """Testa que o lote retorna um handle com dispositivos deduplicados."""
+        handle = self._submit(["dev-1", "dev-2", "dev-1"], device_levels={"dev-2": "standard"})
+
+        assert handle["total_devices"] == 2
+        assert handle["status_url"] == f"/api/core/diagnostics/batch/{handle['batch_id']}"
+        job = self.queue.get(handle["batch_id"])
+        assert job.payload["devices"] == [
+            {"device_id": "dev-1", "diagnostic_level": "quick"},
+            {"device_id": "dev-2", "diagnostic_level": "standard"}
+        ]
+
+        status = self.client.get(handle["status_url"]).json()
+        assert status["status"] == JobStatus.QUEUED
+        assert status["pending"] == 2
+        assert status["results"] == []
+
+    def test_batch_rejects_too_many_devices(self):
+        """Testa o limite de dispositivos por lote."""
+        response = self.client.post("/api/core/diagnostics/batch",
+                                    json={"device_ids": [f"dev-{i}" for i in range(51)]})
+
+        assert response.status_code == 413
+
+    def test_batch_runs_with_bounded_concurrency_and_bulk_inserts(self):
+        """Testa a concorrência limitada, os inserts em bloco e os contadores."""
+        device_ids = [f"dev-{i}" for i in range(9)] + ["broken"]
+        handle = self._submit(device_ids)
+
+        self._run_next_job()
+
+        assert self.max_active == 3
+        assert self.inserts == [4, 4, 2]
+        with self.session_factory() as db:
+            rows = db.query(Diagnostic).all()
+        assert len(rows) == 10
+        assert {row.device_id for row in rows} == set(device_ids)
+        failed_row = next(row for row in rows if row.device_id == "broken")
+        assert failed_row.status == DiagnosticStatus.FAILED
+        assert failed_row.error_message == "device unreachable"
+
+        status = self.client.get(handle["status_url"]).json()
+        assert status["status"] == JobStatus.COMPLETED
+        assert (status["completed"], status["failed"], status["pending"], status["persisted"]) == (9, 1, 0, 10)
+        assert len(status["results"]) == 10
+        with self.session_factory() as db:
+            (health,) = db.query(DiagnosticMetricRollup).filter_by(device_id="dev-0", resolution="1d").all()
+        assert (health.metric, health.count, health.last_value) == ("overall_health", 1, 90)
+
+        page = self.client.get(handle["status_url"], params={"offset": 8, "limit": 5}).json()
+        assert len(page["results"]) == 2
+
+    def test_retry_skips_devices_already_persisted(self):
+        """Testa que um retry do lote retoma a partir do progresso gravado."""
+        handle = self._submit(["dev-1", "dev-2", "dev-3"])
+        batch_id = handle["batch_id"]
+        self.queue.update_progress(batch_id, {
+            "completed": 1, "failed": 0, "running": 0, "persisted": 1,
+            "results": [{"device_id": "dev-2", "diagnostic_id": f"{batch_id}_1",
+                         "diagnostic_level": "quick", "status": "completed",
+                         "overall_health": 80, "execution_time": 0.1, "error": None}]
+        })
+
+        self._run_next_job()
+
+        assert sorted(self.calls) == ["dev-1", "dev-3"]
+        job = self.queue.get(batch_id)
+        assert job.result["completed"] == 3
+        assert job.result["persisted"] == 3
+        with self.session_factory() as db:
+            ids = {row.id for row in db.query(Diagnostic).all()}
+        assert ids == {f"{batch_id}_0", f"{batch_id}_2"}
+
+    def test_database_error_retries_unpersisted_devices(self):
+        """Testa que um bloco não gravado faz o lote ser repetido só com os dispositivos que faltam."""
+        device_ids = [f"dev-{i}" for i in range(10)]
+        handle = self._submit(device_ids)
+        bulk_create = endpoints.DiagnosticRepository.bulk_create
+        writes = []
+
+        def flaky_bulk_create(repository, rows, commit=True):
+            writes.append(len(rows))
+            if len(writes) == 2:
+                raise RuntimeError("database is locked")
+            return bulk_create(repository, rows, commit)
+
+        with patch.object(endpoints.DiagnosticRepository, "bulk_create", flaky_bulk_create):
+            self._run_next_job()
+
+        job = self.queue.get(handle["batch_id"])
+        assert (job.status, job.error) == (JobStatus.QUEUED, "database is locked")
+        assert job.progress["persisted"] == 4
+        assert {result["device_id"] for result in job.progress["results"]} == set(self.calls[:4])
+
+        self.calls.clear()
+        self._run_next_job()
+
+        assert len(self.calls) == 6
+        job = self.queue.get(handle["batch_id"])
+        assert job.status == JobStatus.COMPLETED
+        assert (job.result["completed"], job.result["persisted"]) == (10, 10)
+        with self.session_factory() as db:
+            assert db.query(Diagnostic).count() == 10
+
+    def test_retry_does_not_reinsert_rows_whose_progress_was_lost(self):
+        """Testa que linhas gravadas numa tentativa que caiu antes do progresso não são duplicadas."""
+        handle = self._submit(["dev-1", "dev-2"])
+
+        with patch.object(self.queue, "update_progress", side_effect=RuntimeError("worker killed")):
+            self._run_next_job()
+        self._run_next_job()
+
+        job = self.queue.get(handle["batch_id"])
+        assert job.status == JobStatus.COMPLETED
+        assert job.result["persisted"] == 2
+        assert self.inserts == [2]
+
+    def test_batch_runs_real_standard_and_comprehensive_levels(self):
+        """Testa o lote com os analisadores reais dos níveis padrão e completo."""
+        handle = self._submit(["dev-std", "dev-full"],
+                              device_levels={"dev-std": "standard", "dev-full": "comprehensive"})
+
+        with patch.object(endpoints, "_run_diagnostic_level", self.run_diagnostic_level):
+            self._run_next_job()
+
+        job = self.queue.get(handle["batch_id"])
+        assert job.status == JobStatus.COMPLETED
+        assert sorted((r["device_id"], r["status"], r["error"]) for r in job.result["results"]) == [
+            ("dev-full", DiagnosticStatus.COMPLETED, None),
+            ("dev-std", DiagnosticStatus.COMPLETED, None)
+        ]
+        with self.session_factory() as db:
+            full = db.get(Diagnostic, f"{handle['batch_id']}_1")
+            assert set(full.raw_data["components"]) >= {"antivirus", "drivers", "system_info"}
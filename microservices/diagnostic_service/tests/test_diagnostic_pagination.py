@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.db.repositories.diagnostic_repository import DiagnosticRepository
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.diagnostic_service import DiagnosticService
+
+
+class TestKeysetPagination:
+    """Testes para a paginação por cursor das listagens de diagnóstico."""
+
+    def setup_method(self):
+        """Cria diagnósticos em SQLite em memória, com datas repetidas."""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__])
+        self.db = sessionmaker(bind=self.engine)()
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.statements.append(statement)
+
+        base = datetime(2026, 1, 1)
+        for i in range(25):
+            self.db.add(Diagnostic(
+                id=f"diag-{i:02d}",
+                user_id="user-1",
+                device_id="dev-a" if i % 2 else "dev-b",
+                status=DiagnosticStatus.COMPLETED,
+                # Pares de diagnósticos com o mesmo created_at exigem o desempate por id
+                created_at=base + timedelta(minutes=i // 2),
+                raw_data={"payload": "x" * 100}
+            ))
+        self.db.add(Diagnostic(id="other-user", user_id="user-2", status=DiagnosticStatus.COMPLETED))
+        self.db.commit()
+        self.db.expunge_all()
+        self.statements.clear()
+        self.repo = DiagnosticRepository(self.db)
+
+    def teardown_method(self):
+        """Fecha a sessão."""
+        self.db.close()
+
+    def _walk(self, fetch):
+        ids, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            ids.extend(item.id for item in page.items)
+            if page.next_cursor is None:
+                return ids
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        """Testa a codificação e decodificação do cursor."""
+        created_at = datetime(2026, 1, 1, 12, 30, 15, 123)
+
+        assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+    def test_walks_all_pages_without_gaps_or_duplicates(self):
+        """Testa que percorrer as páginas retorna todos os itens em ordem."""
+        ids = self._walk(lambda cursor: self.repo.get_diagnostics_keyset(
+            "user-1", limit=4, cursor=cursor, total=None))
+
+        expected = sorted((f"diag-{i:02d}" for i in range(25)), reverse=True)
+        assert ids == expected
+        # Uma consulta por página, sem COUNT quando o total não é pedido
+        assert len(self.statements) == 7
+        assert not any("count(" in statement for statement in self.statements)
+
+    def test_list_view_defers_raw_data(self):
+        """Testa que raw_data não é carregado nas listagens por padrão."""
+        page = self.repo.get_diagnostics_keyset("user-1", limit=3, total=None)
+
+        assert "raw_data" in inspect(page.items[0]).unloaded
+        assert "raw_data" not in self.statements[-1].split("FROM")[0]
+
+        detailed = self.repo.get_diagnostics_keyset("user-1", limit=3, total=None, include_details=True)
+        assert "raw_data" not in inspect(detailed.items[0]).unloaded
+
+    def test_estimated_total_is_capped(self):
+        """Testa que a estimativa conta no máximo o limite configurado."""
+        with patch("app.db.repositories.diagnostic_repository.settings") as mock_settings:
+            mock_settings.DIAGNOSTIC_COUNT_ESTIMATE_CAP = 10
+            estimated = self.repo.get_diagnostics_keyset("user-1", limit=5)
+            mock_settings.DIAGNOSTIC_COUNT_ESTIMATE_CAP = 100
+            exact_below_cap = self.repo.get_diagnostics_keyset("user-1", limit=5)
+        exact = self.repo.get_diagnostics_keyset("user-1", limit=5, total="exact")
+
+        assert (estimated.total, estimated.total_is_estimate) == (10, True)
+        assert (exact_below_cap.total, exact_below_cap.total_is_estimate) == (25, False)
+        assert (exact.total, exact.total_is_estimate) == (25, False)
+
+    def test_service_page_filters_by_device(self):
+        """Testa a paginação por cursor no serviço com filtro de dispositivo."""
+        service = DiagnosticService(self.db)
+
+        ids = self._walk(lambda cursor: service.get_diagnostics_page(
+            user_id="user-1", device_id="dev-a", cursor=cursor, limit=5, total=None))
+
+        assert ids == sorted((f"diag-{i:02d}" for i in range(1, 25, 2)), reverse=True)
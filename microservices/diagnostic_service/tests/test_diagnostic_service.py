@@ -259,4 +259,90 @@ class TestDiagnosticService:
         assert isinstance(result, int)
         assert 0 <= result <= 100
         # Cálculo esperado: (100*0.3 + 60*0.25 + 100*0.25 + 60*0.2) = 82
-        assert result == 82
\ No newline at end of file
+        assert result == 82
+
+    def test_run_analyzers_concurrent_timeout(self):
+        """Testa execução concorrente com analisador que excede o timeout."""
+        # Arrange
+        import time
+        from app.services.analyzer_runner import AnalyzerRunner
+        
+        self.service.cpu_analyzer.analyze = Mock(return_value={"status": "healthy"})
+        self.service.memory_analyzer.analyze = Mock(return_value={"status": "healthy"})
+        self.service.disk_analyzer.analyze = Mock(side_effect=lambda: time.sleep(0.5) or {"status": "healthy"})
+        self.service.network_analyzer.analyze = Mock(side_effect=Exception("Test error"))
+        runner = AnalyzerRunner(analyzer_timeout=0.1, deadline=0.2)
+        
+        # Act
+        with patch("app.services.diagnostic_service.AnalyzerRunner", return_value=runner):
+            start = time.monotonic()
+            results = self.service._run_analyzers(concurrent=True)
+            elapsed = time.monotonic() - start
+        
+        # Assert
+        assert elapsed < 0.4
+        assert results["cpu"]["status"] == "healthy"
+        assert results["memory"]["status"] == "healthy"
+        assert results["disk"]["status"] == "timed_out"
+        assert results["disk"]["timed_out"] is True
+        assert results["network"]["status"] == "error"
+    
+    def test_run_analyzers_sequential(self):
+        """Testa execução sequencial dos analisadores."""
+        # Arrange
+        for analyzer in (self.service.cpu_analyzer, self.service.memory_analyzer,
+                         self.service.disk_analyzer, self.service.network_analyzer):
+            analyzer.analyze = Mock(return_value={"status": "healthy"})
+        
+        # Act
+        results = self.service._run_analyzers(concurrent=False)
+        
+        # Assert
+        assert list(results) == ["cpu", "memory", "disk", "network"]
+        assert all(r["status"] == "healthy" for r in results.values())
+    
+    def test_analyzer_timeout_counts_from_start(self):
+        """Testa que analisadores na fila do executor não expiram antes de começar."""
+        # Arrange
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services.analyzer_runner import AnalyzerRunner
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        slow = lambda: time.sleep(0.15) or {"status": "healthy"}
+        runner = AnalyzerRunner(executor=executor, analyzer_timeout=0.25, deadline=2.0)
+        
+        # Act
+        results = runner.run({"cpu": slow, "memory": slow, "disk": slow})
+        executor.shutdown()
+        
+        # Assert
+        assert all(r["status"] == "healthy" for r in results.values())
+    
+    def test_stuck_analyzers_replace_shared_executor(self):
+        """Testa que workers presos em analisadores expirados são substituídos."""
+        # Arrange
+        import threading
+        from app.services import analyzer_runner
+        from app.services.analyzer_runner import AnalyzerRunner
+        
+        release = threading.Event()
+        hang = lambda: release.wait(5) and {"status": "healthy"}
+        
+        with patch.object(analyzer_runner, "_executor", None), \
+             patch.object(analyzer_runner, "_stuck_futures", set()), \
+             patch.object(analyzer_runner.settings, "DIAGNOSTIC_ANALYZER_WORKERS", 4):
+            first = analyzer_runner.get_analyzer_executor()
+            
+            # Act
+            results = AnalyzerRunner(analyzer_timeout=0.05, deadline=1.0).run({"cpu": hang})
+            stuck_after_one = analyzer_runner.stuck_analyzer_count()
+            AnalyzerRunner(analyzer_timeout=0.05, deadline=1.0).run({"memory": hang})
+            replaced = analyzer_runner.get_analyzer_executor()
+            release.set()
+            replaced.shutdown()
+        
+        # Assert
+        assert results["cpu"]["status"] == "timed_out"
+        assert stuck_after_one == 1
+        assert replaced is not first
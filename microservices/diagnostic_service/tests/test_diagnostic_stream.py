@@ -0,0 +1,143 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, WebSocketDisconnect, WebSocketException, status
+from fastapi.testclient import TestClient
+
+from app.api.core.diagnostics import endpoints
+
+
+def _fake_analyzer(status, delay):
+    class FakeAnalyzer:
+        def analyze(self):
+            time.sleep(delay)
+            return {"status": status}
+    return FakeAnalyzer
+
+
+def _async_fake_analyzer(status):
+    class FakeAsyncAnalyzer:
+        async def analyze(self):
+            return {"status": status}
+    return FakeAsyncAnalyzer
+
+
+class TestDiagnosticStream:
+    """Testes para o streaming de resultados por componente."""
+    
+    @pytest.fixture(autouse=True)
+    def setup_app(self):
+        """Monta o router com analisadores simulados de durações diferentes."""
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        analyzers = {
+            "CPUAnalyzer": _fake_analyzer("healthy", 0.3),
+            "MemoryAnalyzer": _fake_analyzer("warning", 0.0),
+            "DiskAnalyzer": _async_fake_analyzer("healthy"),
+            "NetworkAnalyzer": _fake_analyzer("healthy", 0.15),
+            "AntivirusAnalyzer": _fake_analyzer("critical", 0.0),
+            "DriverAnalyzer": _fake_analyzer("healthy", 0.0)
+        }
+        with patch.multiple(endpoints, **analyzers):
+            self.client = TestClient(app)
+            yield
+    
+    def _parse_sse(self, text):
+        events = []
+        for block in text.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((lines["event"], json.loads(lines["data"])))
+        return events
+    
+    def test_sse_emits_components_as_they_finish(self):
+        """Testa que os componentes chegam por ordem de conclusão e o score vem no final."""
+        response = self.client.post("/api/core/diagnostics/run/stream",
+                                    json={"diagnostic_level": "comprehensive"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self._parse_sse(response.text)
+        
+        assert events[0][0] == "started"
+        components = [data["component"] for name, data in events if name == "component"]
+        assert sorted(components) == ["antivirus", "cpu", "disk", "drivers", "memory", "network"]
+        assert components[-2:] == ["network", "cpu"]
+        
+        name, health = events[-1]
+        expected = endpoints._calculate_health_score({
+            data["component"]: data["result"] for name, data in events if name == "component"
+        })
+        assert name == "health"
+        assert health["overall_health"] == expected
+    
+    def test_standard_level_streams_core_components(self):
+        """Testa que o nível padrão transmite apenas os quatro componentes básicos."""
+        response = self.client.post("/api/core/diagnostics/run/stream",
+                                    json={"diagnostic_level": "standard"})
+        events = self._parse_sse(response.text)
+        
+        assert events[0][1]["components"] == ["cpu", "memory", "disk", "network"]
+        assert len([e for e in events if e[0] == "component"]) == 4
+    
+    def test_slow_analyzer_times_out(self):
+        """Testa que um analisador lento é emitido como timed_out."""
+        with patch.object(endpoints, "STREAM_ANALYZER_TIMEOUT", 0.1):
+            response = self.client.post("/api/core/diagnostics/run/stream",
+                                        json={"diagnostic_level": "standard"})
+        events = self._parse_sse(response.text)
+        results = {data["component"]: data["result"] for name, data in events if name == "component"}
+        
+        assert results["cpu"]["status"] == "timed_out"
+        assert results["memory"]["status"] == "warning"
+    
+    def test_websocket_streams_events(self):
+        """Testa o canal WebSocket com o mesmo fluxo de eventos."""
+        with self.client.websocket_connect("/api/core/diagnostics/ws/run") as websocket:
+            websocket.send_text(json.dumps({"diagnostic_level": "standard"}))
+            messages = []
+            while True:
+                message = json.loads(websocket.receive_text())
+                messages.append(message)
+                if message["type"] == "health":
+                    break
+        
+        assert messages[0]["type"] == "started"
+        assert [m["type"] for m in messages].count("component") == 4
+        assert 0 <= messages[-1]["overall_health"] <= 100
+    
+    def test_websocket_resolves_user_before_accept(self):
+        """Testa que um usuário rejeitado no handshake não abre o canal nem roda os analisadores."""
+        route = next(route for route in endpoints.router.routes if route.path == "/ws/run")
+        
+        async def reject():
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+        
+        self.client.app.dependency_overrides[route.dependant.dependencies[0].call] = reject
+        with patch.object(endpoints, "_stream_component_results") as stream:
+            with pytest.raises(WebSocketDisconnect) as error:
+                with self.client.websocket_connect("/api/core/diagnostics/ws/run"):
+                    pass
+        
+        assert error.value.code == status.WS_1008_POLICY_VIOLATION
+        stream.assert_not_called()
+    
+    def test_target_components_and_quick_level_filter_the_stream(self):
+        """Testa o filtro por target_components e o limite de dois componentes do nível rápido."""
+        def streamed(payload):
+            response = self.client.post("/api/core/diagnostics/run/stream", json=payload)
+            events = self._parse_sse(response.text)
+            components = [data["component"] for name, data in events if name == "component"]
+            return events[0][1]["components"], sorted(components)
+        
+        assert streamed({"diagnostic_level": "standard", "target_components": ["disk", "memory", "antivirus"]}) == (
+            ["disk", "memory"], ["disk", "memory"]
+        )
+        assert streamed({"diagnostic_level": "comprehensive", "target_components": ["drivers", "cpu"]}) == (
+            ["drivers", "cpu"], ["cpu", "drivers"]
+        )
+        assert streamed({"diagnostic_level": "quick"}) == (["cpu", "memory"], ["cpu", "memory"])
+        assert streamed({"diagnostic_level": "quick", "target_components": ["network", "disk", "cpu"]})[0] == [
+            "network", "disk"
+        ]
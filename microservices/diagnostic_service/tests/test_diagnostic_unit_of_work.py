@@ -0,0 +1,107 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.diagnostic_service import DiagnosticService
+
+
+class TestDiagnosticUnitOfWork:
+    """Testes para a execução de diagnóstico em uma única transação."""
+    
+    def setup_method(self):
+        """Cria um banco SQLite em memória e conta commits e SELECTs."""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+                                                      DiagnosticMetricRollup.__table__])
+        self.db = sessionmaker(bind=self.engine, autoflush=False)()
+        self.commits = 0
+        self.selects = 0
+        
+        # Commits reais da conexão; a liberação de um SAVEPOINT não conta
+        @event.listens_for(self.engine, "commit")
+        def count_commit(conn):
+            self.commits += 1
+        
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def count_select(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                self.selects += 1
+        
+        diagnostic = Diagnostic(user_id="user-1", status=DiagnosticStatus.PENDING)
+        self.db.add(diagnostic)
+        self.db.commit()
+        self.diagnostic_id = diagnostic.id
+        self.db.expire_all()
+        self.commits = 0
+        self.selects = 0
+        
+        self.service = DiagnosticService(self.db)
+        results = {
+            "cpu": {"status": "healthy", "usage": 30.5},
+            "memory": {"status": "warning", "usage": 85.0},
+            "disk": {"status": "healthy", "usage": 50.0},
+            "network": {"status": "healthy"}
+        }
+        self.service._run_analyzers = lambda concurrent=None: results
+    
+    def teardown_method(self):
+        """Fecha a sessão."""
+        self.db.close()
+    
+    def test_single_commit_without_checkpoint(self):
+        """Testa que todo o resultado é gravado em um único commit."""
+        diagnostic = self.service.run_diagnostic(self.diagnostic_id, unit_of_work=True, checkpoint=False)
+        
+        assert self.commits == 1
+        assert self.selects == 1
+        assert diagnostic.status == DiagnosticStatus.COMPLETED
+        assert diagnostic.memory_status == "warning"
+        assert diagnostic.system_info_id is not None
+        assert self.db.get(SystemInfo, diagnostic.system_info_id) is not None
+        assert diagnostic.raw_data["system_info"]["id"] == diagnostic.system_info_id
+    
+    def test_checkpoint_adds_one_commit(self):
+        """Testa que o checkpoint de progresso grava apenas o status IN_PROGRESS."""
+        seen = []
+        
+        def analyzers(concurrent=None):
+            with self.engine.connect() as conn:
+                seen.append(conn.exec_driver_sql(
+                    "SELECT status FROM diagnostic WHERE id = ?", (self.diagnostic_id,)
+                ).scalar())
+            return {name: {"status": "healthy"} for name in ["cpu", "memory", "disk", "network"]}
+        
+        self.service._run_analyzers = analyzers
+        diagnostic = self.service.run_diagnostic(self.diagnostic_id, unit_of_work=True, checkpoint=True)
+        
+        assert self.commits == 2
+        assert seen == [DiagnosticStatus.IN_PROGRESS.name]
+        assert diagnostic.status == DiagnosticStatus.COMPLETED
+    
+    def test_failure_is_recorded_in_same_transaction(self):
+        """Testa que falhas nos analisadores também são gravadas em um commit."""
+        def failing(concurrent=None):
+            raise RuntimeError("analyzer crashed")
+        
+        self.service._run_analyzers = failing
+        diagnostic = self.service.run_diagnostic(self.diagnostic_id, unit_of_work=True, checkpoint=False)
+        
+        assert self.commits == 1
+        assert diagnostic.status == DiagnosticStatus.FAILED
+        assert diagnostic.error_message == "analyzer crashed"
+    
+    def test_legacy_mode_commits_per_step(self):
+        """Testa que o modo padrão continua gravando cada etapa."""
+        self.service.run_diagnostic(self.diagnostic_id, unit_of_work=False)
+        
+        assert self.commits >= 4
+    
+    def test_not_found(self):
+        """Testa diagnóstico inexistente no modo unit of work."""
+        with pytest.raises(ValueError):
+            self.service.run_diagnostic("missing", unit_of_work=True)
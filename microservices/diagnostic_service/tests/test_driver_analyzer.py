@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import platform
@@ -46,7 +48,7 @@ class TestDriverAnalyzer:
                  {"name": "Intel HD Graphics", "version": "27.20.100.9268", "manufacturer": "Intel", "date": "2023-01-15", "signed": True}
              ]):
             
-            result = self.analyzer._get_drivers_info()
+            result = asyncio.run(self.analyzer._get_drivers_info())
             
             assert len(result) == 1
             assert result[0]['name'] == 'Intel HD Graphics'
@@ -58,7 +60,7 @@ class TestDriverAnalyzer:
                  {"name": "i915", "version": "5.15.0", "status": "ok"}
              ]):
             
-            result = self.analyzer._get_drivers_info()
+            result = asyncio.run(self.analyzer._get_drivers_info())
             
             assert len(result) == 1
             assert result[0]['name'] == 'i915'
@@ -73,8 +75,11 @@ class TestDriverAnalyzer:
                  "Manufacturer": "Intel", "DriverDate": "\/Date(1673740800000)\/", "IsSigned": True}
             ])
             
-            with patch('subprocess.run', return_value=mock_process):
-                result = self.analyzer._get_windows_drivers()
+            async def fake_run_commands(commands, timeout):
+                return {"drivers": mock_process, "problems": None}
+            
+            with patch('app.services.analyzers.driver_analyzer.run_commands', side_effect=fake_run_commands):
+                result = asyncio.run(self.analyzer._get_windows_drivers())
                 
                 assert len(result) == 1
                 assert result[0]['name'] == 'Intel HD Graphics'
@@ -0,0 +1,199 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.core.diagnostics import endpoints
+from app.db.base import Base
+from app.models.device_risk import DeviceRisk
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.fleet_risk_service import FleetRiskScorer, get_device_risk_snapshot
+from app.services.job_queue import JobQueue, JobStatus
+from app.services.predictive_service import PredictiveService
+from app.services.rollup_service import RollupService
+
+# Perfis de dispositivo: (cpu inicial, cpu por dia, disco inicial, disco por dia, saúde inicial, saúde por dia)
+PROFILES = {
+    "dev-healthy": (20.0, 0.0, 40.0, 0.0, 95.0, 0.0),
+    "dev-disk": (30.0, 0.0, 70.0, 1.5, 85.0, 0.0),
+    "dev-failing": (60.0, 2.0, 80.0, 1.0, 90.0, -2.5),
+    "dev-hot": (70.0, 1.0, 50.0, 0.0, 65.0, 0.0),
+    "dev-single": (50.0, 0.0, 50.0, 0.0, 80.0, 0.0)
+}
+
+# Dispositivo com diagnósticos só de outro usuário
+FOREIGN_DEVICE = "dev-hot"
+FOREIGN_USER = "other-user"
+
+
+class TestFleetRiskScorer:
+    """Testes para a pontuação de risco da frota."""
+
+    def setup_method(self):
+        """Cria diagnósticos de vários perfis de dispositivo em um arquivo SQLite."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "fleet.db")
+        self.engine = create_engine(f"sqlite:///{self.db_path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceRisk.__table__
+        ])
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.db = self.session_factory()
+
+        now = datetime.utcnow()
+        self.rows = []
+        for device_id, (cpu, cpu_step, disk, disk_step, health, health_step) in PROFILES.items():
+            days = 1 if device_id == "dev-single" else 20
+            for day in range(days):
+                self.rows.append({
+                    "device_id": device_id,
+                    "user_id": FOREIGN_USER if device_id == FOREIGN_DEVICE else "dev-user",
+                    "status": DiagnosticStatus.COMPLETED,
+                    "created_at": now - timedelta(days=20 - day, hours=3),
+                    "cpu_usage": cpu + cpu_step * day,
+                    "memory_usage": 40.0,
+                    "disk_usage": disk + disk_step * day,
+                    "overall_health": health + health_step * day
+                })
+        self.db.add_all(Diagnostic(**row) for row in self.rows)
+        self.db.commit()
+
+    def teardown_method(self):
+        """Fecha a sessão e remove o banco."""
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _snapshot(self):
+        self.db.expire_all()
+        return {row.device_id: row for row in self.db.query(DeviceRisk).all()}
+
+    def _assert_matches_predictive_service(self, snapshot):
+        predictive = PredictiveService(self.db)
+        for device_id in PROFILES:
+            expected = predictive.predict_failures(device_id, time_window_days=30, series_points=0)
+            row = snapshot[device_id]
+            assert row.risk_level == expected["risk_level"], device_id
+            assert row.risk_components == expected["risk_components"], device_id
+            assert row.diagnostics_analyzed == expected["diagnostics_analyzed"]
+            assert row.disk_slope == pytest.approx(expected["trends"]["disk_usage"]["slope"], abs=1e-6)
+            assert row.overall_health == expected["trends"]["overall_health"]["current"]
+
+    def test_raw_scores_match_predictive_service(self):
+        """Testa que a pontuação em lote reproduz o risco calculado por dispositivo."""
+        summary = FleetRiskScorer(self.db, chunk_devices=2).score_all(30, source="raw")
+
+        assert summary["devices_scored"] == 5
+        assert summary["source"] == "raw"
+        snapshot = self._snapshot()
+        assert snapshot["dev-failing"].risk_level == "high"
+        assert snapshot["dev-healthy"].risk_level == "low"
+        assert snapshot["dev-single"].disk_slope == 0
+        with patch.object(PredictiveService, "_query_rollups", return_value=None):
+            self._assert_matches_predictive_service(snapshot)
+
+    def test_rollup_scores_match_predictive_service(self):
+        """Testa a pontuação a partir dos rollups."""
+        RollupService(self.db).ingest(self.rows)
+        self.db.commit()
+
+        summary = FleetRiskScorer(self.db).score_all(30)
+
+        assert (summary["source"], summary["resolution"]) == ("rollup", "1d")
+        self._assert_matches_predictive_service(self._snapshot())
+
+    def test_snapshot_is_replaced(self):
+        """Testa que dispositivos sem dados na janela saem do snapshot."""
+        self.db.add(DeviceRisk(device_id="dev-retired", risk_level="high", window_days=30,
+                               source="raw", scored_at=datetime.utcnow() - timedelta(days=1)))
+        self.db.commit()
+
+        FleetRiskScorer(self.db).score_all(30, source="raw")
+        FleetRiskScorer(self.db).score_all(30, source="raw")
+
+        snapshot = self._snapshot()
+        assert "dev-retired" not in snapshot
+        assert len(snapshot) == 5
+
+    def test_snapshot_is_ordered_by_severity(self):
+        """Testa a leitura do snapshot pelo painel."""
+        FleetRiskScorer(self.db).score_all(30, source="raw")
+
+        rows = get_device_risk_snapshot(self.db)
+        levels = [row.risk_level for row in rows]
+        assert levels == sorted(levels, key=["high", "medium", "low"].index)
+        # Mesmo nível: pior saúde primeiro
+        assert [row.device_id for row in get_device_risk_snapshot(self.db, ["low"])] == ["dev-single", "dev-healthy"]
+        assert FOREIGN_DEVICE not in [row.device_id for row in get_device_risk_snapshot(self.db, user_id="dev-user")]
+        assert [row.device_id for row in get_device_risk_snapshot(self.db, user_id=FOREIGN_USER)] == [FOREIGN_DEVICE]
+
+    def test_job_and_endpoints(self, tmp_path):
+        """Testa o job enfileirado e a leitura do snapshot pela API."""
+        queue = JobQueue(path=str(tmp_path / "jobs.db"), poll_interval=0.02)
+        queue.register(endpoints.FLEET_RISK_JOB_KIND, endpoints._execute_fleet_risk_job)
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+        
+        async def get_async_db():
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                yield db
+        
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        try:
+            with patch.multiple(endpoints, job_queue=queue, create_session_factory=lambda: self.session_factory):
+                client = TestClient(app)
+                handle = client.post("/api/core/diagnostics/fleet/risk/score", json={"source": "raw"})
+                assert handle.status_code == 202
+                queue.run_job(queue.claim())
+
+                job = client.get(handle.json()["status_url"]).json()
+                assert job["status"] == JobStatus.COMPLETED
+                assert job["result"]["devices_scored"] == 5
+
+                rows = client.get("/api/core/diagnostics/fleet/risk", params={"risk_level": "high"}).json()
+                assert [row["device_id"] for row in rows] == ["dev-failing"]
+                
+                # Dispositivos só de outro usuário ficam fora do snapshot
+                rows = client.get("/api/core/diagnostics/fleet/risk").json()
+                assert sorted(row["device_id"] for row in rows) == sorted(set(PROFILES) - {FOREIGN_DEVICE})
+
+                # Jobs de outro usuário não são visíveis
+                foreign = queue.enqueue(endpoints.FLEET_RISK_JOB_KIND, {"user_id": "other-user", "source": "raw"})
+                foreign_url = endpoints.FLEET_RISK_STATUS_URL_TEMPLATE.format(job_id=foreign.id)
+                assert client.get(foreign_url).status_code == 404
+        finally:
+            queue.close()
+
+    def test_device_metrics_are_scoped_to_owner(self):
+        """Testa que as métricas de um dispositivo só são servidas ao dono."""
+        RollupService(self.db).ingest(self.rows)
+        self.db.commit()
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+        
+        async def get_async_db():
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                yield db
+        
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        client = TestClient(app)
+        
+        response = client.get("/api/core/diagnostics/devices/dev-disk/metrics", params={"metrics": ["disk_usage"]})
+        assert response.status_code == 200
+        assert response.json()["series"]["disk_usage"]
+        assert client.get(f"/api/core/diagnostics/devices/{FOREIGN_DEVICE}/metrics").status_code == 404
+        assert client.get("/api/core/diagnostics/devices/dev-unknown/metrics").status_code == 404
@@ -0,0 +1,190 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ai.inference_scheduler import InferenceScheduler
+from app.ai.ml_engine import PredictiveAnalyzer, PredictionType
+from app.api.core.ai import endpoints as ai_endpoints
+
+
+def random_systems(count, seed=0):
+    """Dados de sistemas com seções ausentes, históricos vazios e valores nos limites das regras."""
+    rng = np.random.default_rng(seed)
+    systems = []
+    for i in range(count):
+        system = {}
+        if i % 5 != 1:
+            system["cpu"] = {
+                "usage_history": rng.uniform(40, 100, int(rng.integers(0, 12))).tolist(),
+                "temperature": float(rng.uniform(40, 90)),
+                "frequency": 3.2
+            }
+            if i % 7 == 0:
+                del system["cpu"]["usage_history"]
+        if i % 5 != 2:
+            system["memory"] = {"usage_percent": float(rng.uniform(50, 100)), "swap_percent": float(rng.uniform(0, 90))}
+        if i % 5 != 3:
+            system["disk"] = {"usage_percent": float(rng.uniform(60, 100)), "health_score": float(rng.uniform(50, 100))}
+        if i % 5 != 4:
+            system["network"] = {"latency_ms": 20.0, "packet_loss_percent": float(rng.uniform(0, 8))}
+        systems.append(system)
+    return systems
+
+
+class TestInferenceScheduler:
+    """Testes para o agendador de inferência em micro-lotes."""
+
+    def setup_method(self):
+        """Cria um agendador que registra os lotes avaliados."""
+        self.batches = []
+
+        def double(items):
+            self.batches.append(list(items))
+            return [item * 2 for item in items]
+
+        self.scheduler = InferenceScheduler(double, window_ms=5, max_batch_size=16)
+
+    def test_coalesces_concurrent_calls(self):
+        """Testa chamadas simultâneas num lote só, com cada resultado no seu chamador."""
+        async def run():
+            return await asyncio.gather(*(self.scheduler.submit(i) for i in range(10)))
+
+        assert asyncio.run(run()) == [i * 2 for i in range(10)]
+        assert self.batches == [list(range(10))]
+        assert self.scheduler.stats()["average_batch"] == 10
+
+    def test_full_batch_does_not_wait_for_window(self):
+        """Testa o disparo pelo tamanho máximo e o restante na janela seguinte."""
+        self.scheduler.window_seconds = 10.0
+
+        async def run():
+            full = await asyncio.wait_for(
+                asyncio.gather(*(self.scheduler.submit(i) for i in range(16))), timeout=1
+            )
+            return full, len(self.scheduler._pending)
+
+        full, pending = asyncio.run(run())
+        assert full == [i * 2 for i in range(16)]
+        assert pending == 0
+        assert [len(batch) for batch in self.batches] == [16]
+
+    def test_sequential_calls_and_errors(self):
+        """Testa chamadas em lotes separados e a falha do lote entregue a todos os chamadores."""
+        async def run():
+            first = await self.scheduler.submit(1)
+            second = await self.scheduler.submit(2)
+            self.scheduler.batch_fn = lambda items: 1 / 0
+            failures = await asyncio.gather(*(self.scheduler.submit(i) for i in range(3)), return_exceptions=True)
+            return first, second, failures
+
+        first, second, failures = asyncio.run(run())
+        assert (first, second) == (2, 4)
+        assert len(failures) == 3 and all(isinstance(failure, ZeroDivisionError) for failure in failures)
+        assert self.scheduler.stats()["batches"] == 3
+
+
+class TestBatchedPredictions:
+    """Testes para a previsão de falhas vetorizada e agrupada."""
+
+    def setup_method(self):
+        """Cria o analisador."""
+        self.analyzer = PredictiveAnalyzer()
+
+    def test_batch_matches_single_predictions(self):
+        """Testa que o lote dá o mesmo resultado que predict_failure sistema a sistema."""
+        systems = random_systems(200)
+        systems.append({})
+
+        batch = self.analyzer.predict_failure_batch(systems)
+        # Outro analisador, para a previsão sistema a sistema não vir do cache do lote
+        reference = PredictiveAnalyzer()
+
+        for system, result in zip(systems, batch):
+            single = asyncio.run(reference.predict_failure(system))
+            assert result.prediction_type == single.prediction_type
+            assert result.probability == single.probability
+            assert result.confidence == single.confidence
+            assert result.time_to_failure == single.time_to_failure
+            assert result.risk_level == single.risk_level
+            assert result.recommended_actions == single.recommended_actions
+            assert result.details["features_analyzed"] == single.details["features_analyzed"]
+            assert result.details["trend_indicators"] == single.details["trend_indicators"]
+        assert {result.prediction_type for result in batch} == set(PredictionType)
+
+    def test_concurrent_predict_calls_share_a_batch(self):
+        """Testa que chamadas simultâneas de predict() são avaliadas num único lote."""
+        systems = random_systems(40, seed=1)
+
+        async def run():
+            return await asyncio.gather(*(
+                self.analyzer.predict(data=[system], prediction_type="failure_prediction") for system in systems
+            ))
+
+        results = asyncio.run(run())
+
+        assert self.analyzer.scheduler.stats()["batches"] == 1
+        expected = self.analyzer.predict_failure_batch(systems)
+        assert [result["values"]["probability"] for result in results] == [item.probability for item in expected]
+        assert len({result["prediction_id"] for result in results}) == 40
+
+    def test_non_numeric_feature_fails_only_its_caller(self):
+        """Testa que um valor não numérico falha só a chamada que o enviou, não o lote inteiro."""
+        bad = {"cpu": {"usage_history": [50.0], "temperature": "hot"}}
+        good = {"disk": {"health_score": 60, "usage_percent": 97}}
+
+        async def run():
+            return await asyncio.gather(
+                self.analyzer.predict(data=[bad], prediction_type="failure_prediction"),
+                self.analyzer.predict(data=[good], prediction_type="failure_prediction"),
+                return_exceptions=True
+            )
+
+        failed, succeeded = asyncio.run(run())
+
+        assert isinstance(failed, ValueError)
+        assert "cpu_temperature" in str(failed)
+        assert succeeded["values"]["probability"] == pytest.approx(0.7)
+        assert self.analyzer.scheduler.stats()["requests"] == 1
+
+    def test_endpoint(self, monkeypatch):
+        """Testa a predição pela API com o analisador agrupado."""
+        monkeypatch.setattr(ai_endpoints, "predictive_analyzer", self.analyzer)
+        app = FastAPI()
+        app.include_router(ai_endpoints.router, prefix="/api/core/ai")
+        client = TestClient(app)
+
+        response = client.post("/api/core/ai/predict", json={
+            "historical_data": [{"disk": {"health_score": 60, "usage_percent": 97}}],
+            "prediction_type": "failure_prediction"
+        })
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["predicted_values"]["probability"] == pytest.approx(0.7)
+        assert body["risk_factors"] == ["hardware_failure_risk"]
+        assert self.analyzer.scheduler.stats()["requests"] == 1
+
+        for bad in ({"cpu": {"temperature": "quente"}}, {"cpu": {"usage_history": ["alto"]}}):
+            invalid = client.post("/api/core/ai/predict", json={
+                "historical_data": [bad], "prediction_type": "failure_prediction"
+            })
+            assert invalid.status_code == 400
+        assert self.analyzer.scheduler.stats()["requests"] == 1
+
+    def test_model_routes_use_engines(self):
+        """Testa as rotas de modelos com os engines reais, sem treino offline."""
+        app = FastAPI()
+        app.include_router(ai_endpoints.router, prefix="/api/core/ai")
+        client = TestClient(app)
+
+        models = client.get("/api/core/ai/models")
+        assert models.status_code == 200
+        assert [model["model_id"] for model in models.json()] == [
+            "predictive_analyzer_v3", "anomaly_detector_v3", "pattern_recognizer_v3"
+        ]
+        assert client.get("/api/core/ai/performance-metrics").status_code == 200
+        assert client.get("/api/core/ai/training-status/training_1").status_code == 404
+        assert client.delete("/api/core/ai/models/predictive_analyzer_v3").status_code == 404
@@ -0,0 +1,197 @@
+import asyncio
+import sys
+from unittest.mock import AsyncMock, patch
+
+
+from app.services.analyzers.antivirus_analyzer import AntivirusAnalyzer
+from app.services.analyzers.driver_analyzer import DriverAnalyzer
+from app.services.analyzers.inventory_cache import CommandResult, InventoryCache, run_commands
+
+
+class TestInventoryCache:
+    """Testes para o cache de inventário de drivers e antivírus."""
+    
+    def setup_method(self):
+        """Setup para cada teste."""
+        self.key = ("Linux", 1000.0, 1.0, ())
+        self.cache = InventoryCache(max_age=3600, enabled=True, key_func=lambda paths: self.key)
+    
+    def _get(self, cache, name, loader, **kwargs):
+        return asyncio.run(cache.aget(name, loader, **kwargs))
+    
+    def test_repeat_get_skips_loader(self):
+        """Testa que a segunda leitura usa o cache."""
+        loader = AsyncMock(return_value=[{"name": "i915"}])
+        
+        first = self._get(self.cache, "drivers", loader)
+        second = self._get(self.cache, "drivers", loader)
+        
+        assert first == second == [{"name": "i915"}]
+        assert loader.call_count == 1
+    
+    def test_returns_copies(self):
+        """Testa que alterar o resultado não altera o cache."""
+        loader = AsyncMock(return_value=[{"name": "i915", "status": "ok"}])
+        self._get(self.cache, "drivers", loader)[0]["status"] = "error"
+        
+        assert self._get(self.cache, "drivers", AsyncMock())[0]["status"] == "ok"
+    
+    def test_force_refresh_bypasses_cache(self):
+        """Testa que force_refresh recarrega a entrada."""
+        loader = AsyncMock(return_value=[])
+        
+        self._get(self.cache, "drivers", loader)
+        self._get(self.cache, "drivers", loader, force_refresh=True)
+        
+        assert loader.call_count == 2
+    
+    def test_reboot_or_package_change_invalidates(self):
+        """Testa que mudança de boot time ou do banco de pacotes invalida o cache."""
+        loader = AsyncMock(return_value=[])
+        
+        self._get(self.cache, "drivers", loader)
+        self.key = ("Linux", 2000.0, 1.0, ())
+        self._get(self.cache, "drivers", loader)
+        self.key = ("Linux", 2000.0, 2.0, ())
+        self._get(self.cache, "drivers", loader)
+        
+        assert loader.call_count == 3
+    
+    def test_disabled_cache_always_loads(self):
+        """Testa que o cache desativado sempre chama o loader."""
+        cache = InventoryCache(enabled=False)
+        loader = AsyncMock(return_value=[])
+        
+        self._get(cache, "drivers", loader)
+        self._get(cache, "drivers", loader)
+        
+        assert loader.call_count == 2
+    
+    def test_run_commands_in_parallel(self):
+        """Testa a execução paralela e tolerante a comandos inexistentes."""
+        sleep = [sys.executable, "-c", "import time; time.sleep(0.3); print('ok')"]
+        
+        loop = asyncio.new_event_loop()
+        try:
+            start = loop.time()
+            results = loop.run_until_complete(run_commands({
+                "a": sleep,
+                "b": sleep,
+                "missing": ["techze-command-that-does-not-exist"]
+            }, timeout=5))
+            elapsed = loop.time() - start
+        finally:
+            loop.close()
+        
+        assert results["a"].stdout.strip() == "ok"
+        assert results["b"].returncode == 0
+        assert results["missing"] is None
+        assert elapsed < 0.55
+    
+    def test_driver_analyzer_repeat_run_skips_subprocesses(self):
+        """Testa que análises repetidas não executam lsmod novamente."""
+        analyzer = DriverAnalyzer(cache=self.cache)
+        lsmod = CommandResult(returncode=0, stdout="Module Size Used by\ni915 2000000 3\n", stderr="")
+        
+        async def fake_run_commands(commands, timeout):
+            return {name: lsmod for name in commands}
+        
+        with patch("platform.system", return_value="Linux"), \
+             patch("app.services.analyzers.driver_analyzer.run_commands", side_effect=fake_run_commands) as mock_run:
+            first = analyzer.analyze()
+            second = analyzer.analyze()
+            assert mock_run.call_count == 1
+            
+            analyzer.analyze(force_refresh=True)
+            assert mock_run.call_count == 2
+        
+        assert first["total_drivers"] == second["total_drivers"] == 1
+        assert second["drivers_info"][0]["name"] == "i915"
+    
+    def test_antivirus_analyzer_caches_linux_inventory(self):
+        """Testa que antivírus e firewall do Linux são consultados uma única vez."""
+        analyzer = AntivirusAnalyzer(cache=self.cache)
+        
+        async def fake_run_commands(commands, timeout):
+            results = {name: CommandResult(returncode=1, stdout="", stderr="") for name in commands}
+            if "ClamAV" in results:
+                results["ClamAV"] = CommandResult(returncode=0, stdout="/usr/bin/clamscan\n", stderr="")
+            if "ufw" in results:
+                results["ufw"] = CommandResult(returncode=0, stdout="Status: active\n", stderr="")
+            return results
+        
+        with patch("platform.system", return_value="Linux"), \
+             patch("app.services.analyzers.antivirus_analyzer.run_commands", side_effect=fake_run_commands) as mock_run:
+            first = analyzer.analyze()
+            second = analyzer.analyze()
+        
+        # Uma chamada para os antivírus e uma para os firewalls
+        assert mock_run.call_count == 2
+        assert first == second
+        assert second["installed_antiviruses"][0]["name"] == "ClamAV"
+        assert second["firewall"]["type"] == "ufw"
+    
+    def test_analyze_async_awaits_commands_on_the_callers_loop(self):
+        """Testa que as análises assíncronas não param o event loop enquanto os comandos rodam."""
+        lsmod = CommandResult(returncode=0, stdout="Module Size Used by\ni915 2000000 3\n", stderr="")
+        ticks = []
+        
+        async def slow_run_commands(commands, timeout):
+            await asyncio.sleep(0.2)
+            return {name: lsmod if name == "lsmod" else None for name in commands}
+        
+        async def run():
+            async def ticker():
+                while True:
+                    ticks.append(None)
+                    await asyncio.sleep(0.01)
+            
+            ticking = asyncio.ensure_future(ticker())
+            try:
+                return await asyncio.gather(
+                    DriverAnalyzer(cache=self.cache).analyze_async(),
+                    AntivirusAnalyzer(cache=self.cache).analyze_async()
+                )
+            finally:
+                ticking.cancel()
+        
+        with patch("platform.system", return_value="Linux"), \
+             patch("app.services.analyzers.driver_analyzer.run_commands", side_effect=slow_run_commands), \
+             patch("app.services.analyzers.antivirus_analyzer.run_commands", side_effect=slow_run_commands), \
+             patch("app.services.analyzers.inventory_cache.ThreadPoolExecutor") as thread_fallback:
+            drivers, antivirus = asyncio.run(run())
+        
+        thread_fallback.assert_not_called()
+        assert len(ticks) >= 10
+        assert drivers["drivers_info"][0]["name"] == "i915"
+        assert antivirus["status"] == "critical"
+    
+    def test_windows_defender_and_firewall_use_async_subprocesses(self):
+        """Testa o Windows Defender e o firewall do Windows consultados por subprocessos assíncronos."""
+        analyzer = AntivirusAnalyzer(cache=self.cache)
+        netsh = CommandResult(returncode=0, stdout=(
+            "Domain Profile Settings:\nState ON\n\nPrivate Profile Settings:\nState ON\n\n"
+            "Public Profile Settings:\nState OFF\n"
+        ), stderr="")
+        
+        async def fake_run_commands(commands, timeout):
+            return {
+                "status": CommandResult(returncode=0, stdout="AntivirusEnabled : True\n", stderr=""),
+                "preference": CommandResult(returncode=0, stdout="DisableRealtimeMonitoring : False\n", stderr="")
+            }
+        
+        async def fake_run_command(command, timeout):
+            return netsh
+        
+        with patch("platform.system", return_value="Windows"), \
+             patch.object(analyzer, "_scan_windows_antiviruses", return_value=[]), \
+             patch("app.services.analyzers.antivirus_analyzer.run_commands", side_effect=fake_run_commands), \
+             patch("app.services.analyzers.antivirus_analyzer.run_command", side_effect=fake_run_command) as mock_netsh:
+            result = asyncio.run(analyzer.analyze_async())
+        
+        assert mock_netsh.call_args[0][0][0] == "netsh"
+        assert result["windows_defender"]["enabled"] is True
+        assert result["windows_defender"]["real_time_protection"] is True
+        assert result["firewall"]["profiles"] == {"domain": True, "private": True, "public": False}
+        assert result["real_time_protection"]["sources"] == ["Windows Defender"]
+        assert result["status"] == "healthy"
@@ -0,0 +1,344 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.job_queue import JobQueue, JobStatus, LeaseLostError
+
+
+class TestJobQueue:
+    """Testes para a fila de jobs em SQLite."""
+    
+    @pytest.fixture(autouse=True)
+    def setup_queue(self, tmp_path):
+        """Cria uma fila em um arquivo temporário."""
+        self.path = str(tmp_path / "jobs.db")
+        self.queue = JobQueue(path=self.path, workers=2, max_attempts=3, backoff=0.05,
+                              backoff_max=1.0, poll_interval=0.02, lease=60)
+        yield
+        self.queue.stop()
+        self.queue.close()
+    
+    def _wait_for(self, job_id, statuses, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.queue.get(job_id)
+            if job.status in statuses:
+                return job
+            time.sleep(0.02)
+        raise AssertionError(f"Job {job_id} did not reach {statuses}: {self.queue.get(job_id)}")
+    
+    def test_enqueue_is_durable(self):
+        """Testa que jobs sobrevivem à reabertura do arquivo."""
+        job = self.queue.enqueue("echo", {"value": 1})
+        self.queue.close()
+        
+        reopened = JobQueue(path=self.path)
+        try:
+            stored = reopened.get(job.id)
+            assert stored.status == JobStatus.QUEUED
+            assert stored.payload == {"value": 1}
+        finally:
+            reopened.close()
+    
+    def test_idempotency_key_returns_existing_job(self):
+        """Testa que a mesma chave de idempotência não cria um novo job."""
+        first = self.queue.enqueue("echo", {"value": 1}, idempotency_key="abc")
+        second = self.queue.enqueue("echo", {"value": 2}, idempotency_key="abc")
+        
+        assert first.id == second.id
+        assert second.payload == {"value": 1}
+        assert self.queue.stats() == {JobStatus.QUEUED: 1}
+    
+    def test_claim_respects_priority(self):
+        """Testa que jobs de maior prioridade são reservados primeiro."""
+        low = self.queue.enqueue("echo", {}, priority=0)
+        high = self.queue.enqueue("echo", {}, priority=5)
+        
+        assert self.queue.claim().id == high.id
+        assert self.queue.claim().id == low.id
+        assert self.queue.claim() is None
+    
+    def test_workers_execute_jobs(self):
+        """Testa a execução de handlers síncronos e assíncronos pelo pool."""
+        async def async_handler(payload):
+            return {"double": payload["value"] * 2}
+        
+        self.queue.register("sync", lambda payload: {"value": payload["value"]})
+        self.queue.register("async", async_handler)
+        self.queue.start()
+        
+        sync_job = self.queue.enqueue("sync", {"value": 3})
+        async_job = self.queue.enqueue("async", {"value": 4})
+        
+        assert self._wait_for(sync_job.id, [JobStatus.COMPLETED]).result == {"value": 3}
+        assert self._wait_for(async_job.id, [JobStatus.COMPLETED]).result == {"double": 8}
+    
+    def test_retry_with_backoff(self):
+        """Testa que falhas são reenfileiradas com backoff até o sucesso."""
+        calls = []
+        
+        def flaky(payload):
+            calls.append(time.time())
+            if len(calls) < 3:
+                raise RuntimeError("transient")
+            return {"ok": True}
+        
+        self.queue.register("flaky", flaky)
+        self.queue.start()
+        job = self.queue.enqueue("flaky", {})
+        
+        done = self._wait_for(job.id, [JobStatus.COMPLETED])
+        assert done.attempts == 3
+        assert calls[1] - calls[0] >= 0.05
+        assert calls[2] - calls[1] >= 0.1
+    
+    def test_fails_after_max_attempts(self):
+        """Testa que o job fica como failed após esgotar as tentativas."""
+        def broken(payload):
+            raise RuntimeError("boom")
+        
+        self.queue.register("broken", broken)
+        self.queue.start()
+        job = self.queue.enqueue("broken", {}, max_attempts=2)
+        
+        failed = self._wait_for(job.id, [JobStatus.FAILED])
+        assert failed.attempts == 2
+        assert failed.error == "boom"
+    
+    def test_expired_lease_is_reclaimed(self):
+        """Testa que jobs de um worker morto voltam a ser executados."""
+        queue = JobQueue(path=self.path, lease=0.0)
+        job = queue.enqueue("echo", {})
+        assert queue.claim("dead-worker").id == job.id
+        
+        reclaimed = queue.claim("new-worker")
+        queue.close()
+        
+        assert reclaimed.id == job.id
+        assert reclaimed.worker == "new-worker"
+        assert reclaimed.attempts == 2
+    
+    def test_stale_worker_cannot_overwrite_reclaimed_job(self):
+        """Testa que o worker cujo lease expirou não conclui, falha nem atualiza o job de outro."""
+        queue = JobQueue(path=self.path, lease=0.0)
+        job = queue.enqueue("echo", {})
+        stale = queue.claim("dead-worker")
+        queue.lease = 60
+        queue.claim("new-worker")
+        queue.register("echo", lambda payload: {"from": "dead-worker"})
+        
+        try:
+            queue.run_job(stale)
+            assert queue.complete(job.id, {"from": "dead-worker"}, "dead-worker") is False
+            queue.fail(job.id, "boom", "dead-worker")
+            with pytest.raises(LeaseLostError):
+                queue.update_progress(job.id, {"done": 1}, "dead-worker")
+            
+            current = queue.get(job.id)
+            assert (current.status, current.worker, current.result) == (JobStatus.RUNNING, "new-worker", None)
+            assert current.error is None and current.progress is None
+            
+            queue.update_progress(job.id, {"done": 1}, "new-worker")
+            assert queue.complete(job.id, {"from": "new-worker"}, "new-worker") is True
+            assert queue.get(job.id).result == {"from": "new-worker"}
+            assert queue.complete(job.id, {"again": True}, "new-worker") is False
+        finally:
+            queue.close()
+
+    
+    def test_prune_removes_finished_jobs_after_retention(self):
+        """Testa que só jobs finalizados além da retenção são removidos, também pelos workers ociosos."""
+        done = self.queue.enqueue("echo", {})
+        running = self.queue.enqueue("echo", {})
+        queued = self.queue.enqueue("echo", {}, priority=-1)
+        self.queue.complete(done.id, {})
+        self.queue.claim("worker-1")
+        
+        assert self.queue.prune(older_than=60) == 0
+        assert self.queue.prune(older_than=0) == 1
+        assert self.queue.get(done.id) is None
+        assert self.queue.get(running.id).status == JobStatus.RUNNING
+        assert self.queue.get(queued.id).status == JobStatus.QUEUED
+        
+        queue = JobQueue(path=self.path, workers=1, poll_interval=0.02, retention_days=1e-9, prune_interval=0)
+        queue.register("echo", lambda payload: {})
+        finished = queue.enqueue("echo", {})
+        try:
+            queue.start()
+            deadline = time.time() + 5
+            while queue.get(finished.id) is not None and time.time() < deadline:
+                time.sleep(0.02)
+            assert queue.get(finished.id) is None
+        finally:
+            queue.stop()
+            queue.close()
+    
+    def test_renew_lease(self):
+        """Testa que só o dono do lease pode renová-lo."""
+        queue = JobQueue(path=self.path, lease=0.05)
+        job = queue.enqueue("echo", {})
+        queue.claim("worker-1")
+        try:
+            time.sleep(0.03)
+            queue.renew_lease(job.id, "worker-1")
+            time.sleep(0.03)
+            assert queue.claim("worker-2") is None
+            with pytest.raises(LeaseLostError):
+                queue.renew_lease(job.id, "worker-2")
+        finally:
+            queue.close()
+
+
+class TestDiagnosticJobEndpoints:
+    """Testes para os endpoints de diagnóstico enfileirado."""
+    
+    @pytest.fixture(autouse=True)
+    def setup_app(self, tmp_path):
+        """Monta o router de diagnósticos com uma fila temporária."""
+        from app.api.core.diagnostics import endpoints
+        
+        self.queue = JobQueue(path=str(tmp_path / "jobs.db"), workers=1, poll_interval=0.02, backoff=0.01)
+        self.queue.register(endpoints.DIAGNOSTIC_JOB_KIND, endpoints._execute_diagnostic_job)
+        self.queue.register(endpoints.AI_ANALYSIS_JOB_KIND, endpoints._execute_ai_analysis_job)
+        
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine, tables=[SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__])
+        self.session_factory = sessionmaker(bind=engine)
+        
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        with patch.multiple(endpoints, job_queue=self.queue, create_session_factory=lambda: self.session_factory):
+            self.client = TestClient(app)
+            yield
+        self.queue.stop()
+        self.queue.close()
+    
+    def test_run_returns_202_and_status_is_pollable(self):
+        """Testa que /run responde 202 e o status pode ser consultado."""
+        response = self.client.post("/api/core/diagnostics/run",
+                                    json={"diagnostic_level": "quick", "include_ai_analysis": False})
+        
+        assert response.status_code == 202
+        body = response.json()
+        assert body["status"] == JobStatus.QUEUED
+        assert body["status_url"] == f"/api/core/diagnostics/{body['diagnostic_id']}/status"
+        
+        status_response = self.client.get(body["status_url"])
+        assert status_response.status_code == 200
+        assert status_response.json()["status"] == JobStatus.QUEUED
+        
+        self.queue.start()
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            status_body = self.client.get(body["status_url"]).json()
+            if status_body["status"] == JobStatus.COMPLETED:
+                break
+            time.sleep(0.05)
+        
+        assert status_body["status"] == JobStatus.COMPLETED
+        assert status_body["result"]["diagnostic_id"] == body["diagnostic_id"]
+        assert "overall_health" in status_body["result"]
+    
+    def test_idempotency_key_header(self):
+        """Testa que o header Idempotency-Key evita jobs duplicados."""
+        headers = {"Idempotency-Key": "request-1"}
+        first = self.client.post("/api/core/diagnostics/run", json={}, headers=headers).json()
+        second = self.client.post("/api/core/diagnostics/run", json={}, headers=headers).json()
+        
+        assert first["diagnostic_id"] == second["diagnostic_id"]
+    
+    def test_status_unknown_diagnostic(self):
+        """Testa 404 para diagnóstico inexistente."""
+        response = self.client.get("/api/core/diagnostics/diag_missing/status")
+        
+        assert response.status_code == 404
+    
+    def test_job_handler_persists_row_with_job_id(self):
+        """Testa que o job grava o diagnóstico no banco com o ID devolvido pelo 202."""
+        body = self.client.post("/api/core/diagnostics/run", json={
+            "diagnostic_level": "quick", "device_id": "dev-1", "include_ai_analysis": False
+        }).json()
+        
+        self.queue.run_job(self.queue.claim())
+        
+        assert self.queue.get(body["diagnostic_id"]).status == JobStatus.COMPLETED
+        with self.session_factory() as db:
+            row = db.get(Diagnostic, body["diagnostic_id"])
+            assert row.device_id == "dev-1"
+            assert row.status == DiagnosticStatus.COMPLETED
+            assert row.raw_data["diagnostic_id"] == body["diagnostic_id"]
+            assert row.overall_health == row.raw_data["overall_health"]
+    
+    @pytest.mark.parametrize("level,components", [
+        ("standard", {"cpu", "memory", "disk", "network"}),
+        ("comprehensive", {"cpu", "memory", "disk", "network", "antivirus", "drivers", "system_info"})
+    ])
+    def test_job_runs_real_analyzers(self, level, components):
+        """Testa o job com os analisadores reais dos níveis padrão e completo."""
+        body = self.client.post("/api/core/diagnostics/run", json={
+            "diagnostic_level": level, "include_ai_analysis": False
+        }).json()
+        
+        self.queue.run_job(self.queue.claim())
+        
+        job = self.queue.get(body["diagnostic_id"])
+        assert (job.status, job.error) == (JobStatus.COMPLETED, None)
+        assert set(job.result["components"]) == components
+        assert 0 <= job.result["overall_health"] <= 100
+    
+    def test_database_error_retries_job(self):
+        """Testa que uma falha do banco reenfileira o job em vez de concluí-lo sem a linha."""
+        from app.api.core.diagnostics import endpoints
+        
+        body = self.client.post("/api/core/diagnostics/run", json={
+            "diagnostic_level": "quick", "include_ai_analysis": False
+        }).json()
+        
+        with patch.object(endpoints.DiagnosticRepository, "update", side_effect=RuntimeError("database is locked")):
+            self.queue.run_job(self.queue.claim())
+        
+        job = self.queue.get(body["diagnostic_id"])
+        assert (job.status, job.error) == (JobStatus.QUEUED, "database is locked")
+        
+        # O retry completa a linha criada na primeira tentativa
+        time.sleep(0.02)
+        self.queue.run_job(self.queue.claim())
+        assert self.queue.get(body["diagnostic_id"]).status == JobStatus.COMPLETED
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, body["diagnostic_id"]).status == DiagnosticStatus.COMPLETED
+    
+    def test_long_diagnostic_renews_lease(self):
+        """Testa que um diagnóstico mais longo que o lease não é reservado por outro worker."""
+        from app.api.core.diagnostics import endpoints
+        
+        body = self.client.post("/api/core/diagnostics/run", json={
+            "diagnostic_level": "quick", "include_ai_analysis": False
+        }).json()
+        run_diagnostic_level = endpoints._run_diagnostic_level
+        stolen = []
+        
+        async def slow_run(request, diagnostic_id):
+            for _ in range(4):
+                await asyncio.sleep(0.1)
+                stolen.append(self.queue.claim("other-worker"))
+            return await run_diagnostic_level(request, diagnostic_id)
+        
+        self.queue.lease = 0.15
+        with patch.object(endpoints, "_run_diagnostic_level", slow_run):
+            self.queue.run_job(self.queue.claim("worker-1"))
+        
+        assert stolen == [None] * 4
+        job = self.queue.get(body["diagnostic_id"])
+        assert (job.status, job.attempts) == (JobStatus.COMPLETED, 1)
@@ -0,0 +1,208 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.core.diagnostics import endpoints
+from app.db.base import Base
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.metric_batch_protocol import (
+    ZSTD_AVAILABLE, MetricBatchError, MetricBatchTooLarge, decode_metric_batch, encode_metric_batch
+)
+
+
+class TestMetricBatchProtocol:
+    """Testes para a codificação binária dos lotes de métricas."""
+
+    def setup_method(self):
+        """Cria uma série de amostras por minuto."""
+        self.start = datetime(2026, 3, 1, 12, 0, 0)
+        self.timestamps = [self.start + timedelta(minutes=i) for i in range(120)]
+        self.metrics = {
+            "cpu_usage": [20.0 + (i % 7) for i in range(120)],
+            "memory_usage": [None if i % 10 == 0 else 50.5 for i in range(120)],
+            "overall_health": [90.4 - i / 10 for i in range(120)]
+        }
+
+    def _devices(self):
+        return [{"device_id": "dev-1", "timestamps": self.timestamps, "metrics": self.metrics}]
+
+    def test_round_trip(self):
+        """Testa instantes em delta, séries float32, ausências e colunas inteiras."""
+        rows = decode_metric_batch(encode_metric_batch(self._devices()), "gzip", user_id="user-1")
+
+        assert len(rows) == 120
+        assert [row["created_at"] for row in rows] == self.timestamps
+        assert rows[3]["cpu_usage"] == pytest.approx(23.0)
+        assert rows[0]["memory_usage"] is None
+        assert rows[1]["memory_usage"] == pytest.approx(50.5)
+        assert rows[5]["overall_health"] == 90
+        assert rows[0]["disk_usage"] is None
+        assert rows[0]["status"] == DiagnosticStatus.COMPLETED
+        assert rows[0]["user_id"] == "user-1"
+        assert len({row["id"] for row in rows}) == 120
+
+    def test_smaller_than_json(self):
+        """Testa que o upload binário é bem menor que os payloads JSON por amostra."""
+        as_json = json.dumps([
+            {"device_id": "dev-1", "created_at": timestamp.isoformat(),
+             **{metric: values[i] for metric, values in self.metrics.items()}}
+            for i, timestamp in enumerate(self.timestamps)
+        ]).encode()
+
+        assert len(encode_metric_batch(self._devices(), compression=None)) * 3 < len(as_json)
+
+    def test_plain_lists_without_compression(self):
+        """Testa séries como listas msgpack e corpo sem compressão."""
+        body = msgpack.packb({"v": 1, "devices": [{
+            "device_id": "dev-2", "user_id": "spoofed", "t0": 1767225600000, "dt": [0, 1000, 1000],
+            "metrics": {"disk_usage": [70.0, None, 71.5]}
+        }]})
+
+        rows = decode_metric_batch(body, None, user_id="user-1")
+
+        assert [row["disk_usage"] for row in rows] == [70.0, None, 71.5]
+        assert (rows[2]["created_at"] - rows[0]["created_at"]).total_seconds() == 2
+        # O user_id do bloco é ignorado: o dono é sempre o usuário autenticado
+        assert {row["user_id"] for row in rows} == {"user-1"}
+
+    @pytest.mark.parametrize("device, message", [
+        ({"device_id": "d", "t0": 0, "dt": [0], "metrics": {"gpu_usage": [1.0]}}, "desconhecida"),
+        ({"device_id": "d", "t0": 0, "dt": [0, 1], "metrics": {"cpu_usage": [1.0]}}, "1 valores para 2"),
+        ({"t0": 0, "dt": [0], "metrics": {}}, "device_id"),
+        ({"device_id": "d", "t0": 10 ** 18, "dt": [0], "metrics": {}}, "fora do intervalo"),
+        ({"device_id": "d", "t0": -1, "dt": [0], "metrics": {}}, "fora do intervalo"),
+        ({"device_id": "d", "t0": 0, "dt": [2 ** 62, 2 ** 62, 2 ** 62], "metrics": {}}, "fora do intervalo"),
+        ({"device_id": "d", "t0": "agora", "dt": [0], "metrics": {}}, "instantes inválidos"),
+    ])
+    def test_invalid_devices(self, device, message):
+        """Testa blocos de dispositivo inválidos."""
+        with pytest.raises(MetricBatchError, match=message):
+            decode_metric_batch(msgpack.packb({"v": 1, "devices": [device]}))
+
+    def test_invalid_payloads(self):
+        """Testa versão, corpo corrompido e codificação não suportada."""
+        with pytest.raises(MetricBatchError, match="Versão"):
+            decode_metric_batch(msgpack.packb({"v": 2, "devices": []}))
+        with pytest.raises(MetricBatchError, match="comprimido"):
+            decode_metric_batch(b"not gzip", "gzip")
+        with pytest.raises(MetricBatchError, match="Content-Encoding"):
+            decode_metric_batch(b"", "br")
+
+    def test_limits(self):
+        """Testa os limites de tamanho descomprimido e de amostras."""
+        with pytest.raises(MetricBatchTooLarge):
+            decode_metric_batch(gzip.compress(b"\0" * 10_000_000), "gzip", max_bytes=1024)
+        with pytest.raises(MetricBatchTooLarge, match="amostras"):
+            decode_metric_batch(encode_metric_batch(self._devices()), "gzip", max_samples=100)
+
+    @pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard não instalado")
+    def test_zstd(self):
+        """Testa o corpo comprimido com zstd."""
+        rows = decode_metric_batch(encode_metric_batch(self._devices(), compression="zstd"), "zstd")
+        assert len(rows) == 120
+
+
+class TestMetricBatchEndpoint:
+    """Testes para o endpoint de ingestão binária."""
+
+    def setup_method(self):
+        """Cria um banco SQLite em arquivo (compartilhado com o engine assíncrono)."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "metrics.db")
+        self.engine = create_engine(f"sqlite:///{self.db_path}")
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceTrendState.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+
+        async def get_async_db():
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/diagnostics")
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        self.client = TestClient(app)
+
+    def teardown_method(self):
+        """Fecha a sessão e remove o banco."""
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _post(self, body, content_type="application/x-msgpack", encoding="gzip"):
+        return self.client.post("/api/core/diagnostics/ingest/metrics", content=body,
+                                headers={"Content-Type": content_type, "Content-Encoding": encoding})
+
+    def test_ingest(self):
+        """Testa a gravação nas tabelas de diagnóstico, rollups e estado de tendência."""
+        start = datetime.utcnow() - timedelta(hours=2)
+        body = encode_metric_batch([
+            {"device_id": device_id, "timestamps": [start + timedelta(minutes=i) for i in range(30)],
+             "metrics": {"cpu_usage": [40.0] * 30, "disk_usage": [60.0 + i for i in range(30)]}}
+            for device_id in ("dev-1", "dev-2")
+        ])
+
+        response = self._post(body)
+
+        assert response.status_code == 200
+        assert response.json() == {"devices": 2, "samples": 60, "inserted": 60, "failed": 0,
+                                   "method": "executemany", "errors": []}
+        assert self.db.query(Diagnostic).filter_by(device_id="dev-1", user_id="dev-user").count() == 30
+        assert self.db.query(DiagnosticMetricRollup).filter_by(
+            device_id="dev-2", resolution="1h", metric="disk_usage"
+        ).count() >= 1
+        assert self.db.query(DeviceTrendState).filter_by(device_id="dev-2").one().samples == 30
+
+    def test_rejects_invalid_requests(self):
+        """Testa tipo de conteúdo, codificação e corpo inválidos."""
+        body = encode_metric_batch([{"device_id": "d", "timestamps": [], "metrics": {}}])
+
+        assert self._post(body, content_type="application/json").status_code == 415
+        assert self._post(body, encoding="br").status_code == 415
+        assert self._post(b"corrompido").status_code == 400
+        out_of_range = msgpack.packb({"v": 1, "devices": [{"device_id": "d", "t0": 10 ** 18, "dt": [0],
+                                                            "metrics": {}}]})
+        assert self._post(out_of_range, encoding="identity").status_code == 400
+
+    def test_rejects_oversized_body(self, monkeypatch):
+        """Testa o limite do corpo comprimido, pelo Content-Length e lendo o stream."""
+        monkeypatch.setattr(endpoints, "METRIC_BATCH_MAX_BYTES", 64)
+        body = gzip.compress(os.urandom(256))
+
+        assert self._post(body).status_code == 413
+
+        def chunks():
+            yield body[:100]
+            yield body[100:]
+
+        response = self.client.post("/api/core/diagnostics/ingest/metrics", content=chunks(),
+                                    headers={"Content-Type": "application/x-msgpack", "Content-Encoding": "gzip"})
+        assert response.status_code == 413
+
+    def test_ignores_user_id_in_upload(self):
+        """Testa que as amostras são gravadas para o usuário autenticado."""
+        body = msgpack.packb({"v": 1, "devices": [{
+            "device_id": "dev-1", "user_id": "other-user", "t0": 1767225600000, "dt": [0, 1000],
+            "metrics": {"cpu_usage": [10.0, 11.0]}
+        }]})
+
+        assert self._post(body, encoding="identity").status_code == 200
+        assert {row.user_id for row in self.db.query(Diagnostic).all()} == {"dev-user"}
@@ -0,0 +1,170 @@
+import asyncio
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+import psutil
+import pytest
+
+from app.services.analyzers.network_analyzer import NetworkAnalyzer
+from app.services.analyzers.network_prober import NetworkProber, parse_default_gateway, split_target
+
+
+class TestNetworkAnalyzer:
+    """Testes para o analisador de rede com sondas concorrentes."""
+    
+    def setup_method(self):
+        """Sobe um servidor TCP local usado como alvo substituto."""
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.target = f"127.0.0.1:{self.server.getsockname()[1]}"
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+    
+    def teardown_method(self):
+        """Encerra o servidor local."""
+        self._stop.set()
+        self.server.close()
+    
+    def _accept_loop(self):
+        self.server.settimeout(0.05)
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.server.accept()
+                conn.close()
+            except (socket.timeout, OSError):
+                continue
+    
+    def test_split_target(self):
+        """Testa a separação de alvos host e host:porta."""
+        assert split_target("8.8.8.8") == ("8.8.8.8", None)
+        assert split_target("127.0.0.1:8080") == ("127.0.0.1", 8080)
+        assert split_target("::1") == ("::1", None)
+    
+    def test_parse_default_gateway(self):
+        """Testa a extração do gateway das saídas de ``ip route`` e ``ipconfig``."""
+        assert parse_default_gateway("default via 10.0.0.1 dev eth0 proto dhcp", "linux") == "10.0.0.1"
+        assert parse_default_gateway("   Default Gateway . . . : 192.168.0.1\r\n", "windows") == "192.168.0.1"
+        assert parse_default_gateway("", "linux") is None
+    
+    def test_analyze_with_local_targets(self):
+        """Testa a análise completa usando o servidor local como alvo."""
+        analyzer = NetworkAnalyzer(
+            ping_targets=[self.target],
+            dns_domains=["localhost"],
+            probe_timeout=2.0,
+            sample_window=0.05
+        )
+        
+        result = analyzer.analyze()
+        
+        assert result["connectivity"]["internet_connected"] is True
+        assert result["latency"]["targets"][self.target]["success"] is True
+        assert result["latency"]["average_ms"] is not None
+        assert result["dns"]["working"] is True
+        assert result["timed_out_probes"] == []
+    
+    def test_interfaces_share_one_sample_window(self):
+        """Testa que os contadores são lidos uma única vez antes e depois."""
+        analyzer = NetworkAnalyzer(ping_targets=[], dns_domains=[], sample_window=0.05)
+        
+        with patch("app.services.analyzers.network_analyzer.psutil.net_io_counters",
+                   wraps=psutil.net_io_counters) as counters:
+            analyzer._get_network_interfaces()
+        
+        assert counters.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_probes_respect_shared_budget(self):
+        """Testa que sondas lentas são canceladas dentro do orçamento total."""
+        prober = NetworkProber([self.target], ["localhost"], timeout=0.2)
+        
+        async def slow_dns(domain):
+            await asyncio.sleep(5)
+        
+        start = time.perf_counter()
+        with patch.object(prober, "_probe_dns", side_effect=slow_dns):
+            results = await prober.probe_all()
+        elapsed = time.perf_counter() - start
+        
+        assert elapsed < 1.0
+        assert results["timed_out"] == ["localhost"]
+        assert results["dns"]["localhost"]["timed_out"] is True
+        assert results["latency"][self.target]["success"] is True
+    
+    @pytest.mark.asyncio
+    async def test_run_probes_inside_running_loop(self):
+        """Testa a execução síncrona das sondas a partir de um endpoint async."""
+        analyzer = NetworkAnalyzer(ping_targets=[self.target], dns_domains=[], probe_timeout=2.0)
+        
+        probes = analyzer._run_probes()
+        
+        assert probes["latency"][self.target]["success"] is True
+    
+    @pytest.mark.asyncio
+    async def test_analyze_async_keeps_event_loop_free(self):
+        """Testa que a análise assíncrona não para o event loop durante a janela e as sondas."""
+        analyzer = NetworkAnalyzer(
+            ping_targets=[self.target],
+            dns_domains=["localhost"],
+            probe_timeout=2.0,
+            sample_window=0.3
+        )
+        ticks = []
+        
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+        
+        ticking = asyncio.ensure_future(ticker())
+        try:
+            result = await analyzer.analyze_async()
+        finally:
+            ticking.cancel()
+        
+        assert result["latency"]["targets"][self.target]["success"] is True
+        assert result["dns"]["working"] is True
+        assert len(ticks) >= 10
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15
+    
+    @pytest.mark.asyncio
+    async def test_host_details_come_from_the_prober(self):
+        """Testa que IP local e gateway são consultados pelo prober, não no loop."""
+        analyzer = NetworkAnalyzer(ping_targets=[self.target], dns_domains=[], probe_timeout=2.0)
+        prober = NetworkProber([self.target], [], timeout=2.0)
+        
+        async def gateway():
+            return "10.0.0.1"
+        
+        with patch.object(prober, "_default_gateway", side_effect=gateway), \
+             patch("app.services.analyzers.network_prober.socket.gethostbyname", return_value="10.0.0.5"):
+            probes = await prober.probe_all()
+        with patch("app.services.analyzers.network_analyzer.socket.gethostbyname") as blocking_lookup:
+            connectivity = analyzer._check_connectivity(probes)
+        
+        assert connectivity["local_ip"] == "10.0.0.5"
+        assert connectivity["gateway"] == "10.0.0.1"
+        assert connectivity["internet_connected"] is True
+        blocking_lookup.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_analyze_from_thread_runs_on_bound_loop(self):
+        """Testa que analyze() chamado de uma thread usa o loop do chamador async."""
+        analyzer = NetworkAnalyzer(ping_targets=[self.target], dns_domains=[], probe_timeout=2.0, sample_window=0.05)
+        analyzer.loop = asyncio.get_running_loop()
+        loops = []
+        original = analyzer.analyze_async
+        
+        async def tracking_analyze_async():
+            loops.append(asyncio.get_running_loop())
+            return await original()
+        
+        with patch.object(analyzer, "analyze_async", side_effect=tracking_analyze_async):
+            result = await asyncio.to_thread(analyzer.analyze)
+        
+        assert loops == [analyzer.loop]
+        assert result["latency"]["targets"][self.target]["success"] is True
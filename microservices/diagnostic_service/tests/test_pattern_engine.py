@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ai.ml_engine import PatternRecognizer
+from app.ai.pattern_engine import (
+    PatternFrame, correlation_matrix, dominant_periods, hourly_profile, periodicity
+)
+from app.api.core.ai import endpoints as ai_endpoints
+from app.db import telemetry_store as telemetry_module
+from app.db.telemetry_store import TelemetryStore
+
+DAY = 86400.0
+
+
+def synthetic_history(days=28, step=600.0, seed=0):
+    """CPU com ciclo diário, memória acompanhando a CPU e disco com oscilação de 6 horas."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, days * DAY, step) + 1_767_225_600.0
+    cpu = 50 + 20 * np.sin(2 * np.pi * t / DAY) + rng.normal(0, 2, len(t))
+    memory = 30 + 0.5 * cpu + rng.normal(0, 1, len(t))
+    disk = 60 + 5 * np.sin(2 * np.pi * t / (6 * 3600)) + rng.normal(0, 0.5, len(t))
+    return t, {"cpu_usage": cpu, "memory_usage": memory, "disk_usage": disk}
+
+
+class TestPatternEngine:
+    """Testes para os cálculos vetorizados de padrões."""
+
+    def test_frame_from_records(self):
+        """Testa a grade regular com médias por bucket e buckets vazios como NaN."""
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        records = [
+            {"timestamp": start.isoformat(), "cpu_usage": 10, "status": "ok"},
+            {"timestamp": (start + timedelta(minutes=30)).isoformat(), "cpu_usage": 20, "memory_usage": 5.0},
+            {"timestamp": (start + timedelta(hours=2)).isoformat(), "cpu_usage": None, "memory_usage": 7.0},
+            {"timestamp": "inválido", "cpu_usage": 99}
+        ]
+
+        frame = PatternFrame.from_records(records, 3600)
+
+        assert frame.metrics == ("cpu_usage", "memory_usage")
+        assert frame.epoch_seconds.tolist() == [start.timestamp() + 3600 * i for i in range(3)]
+        assert frame.values[0].tolist() == [15.0, 5.0]
+        assert np.isnan(frame.values[1]).all()
+        assert np.isnan(frame.values[2, 0]) and frame.values[2, 1] == 7.0
+
+    def test_correlation_matrix(self):
+        """Testa a matriz de correlação contra o numpy e colunas constantes."""
+        t, columns = synthetic_history(days=7)
+        values = np.column_stack([columns["cpu_usage"], columns["memory_usage"], np.full(len(t), 3.0)])
+
+        corr = correlation_matrix(values)
+
+        np.testing.assert_allclose(corr[:2, :2], np.corrcoef(values[:, :2], rowvar=False), atol=1e-9)
+        assert np.isnan(corr[2]).all() and np.isnan(corr[:, 2]).all()
+
+    def test_periodicity_and_dominant_periods(self):
+        """Testa a força do ciclo diário, o período dominante e o perfil por hora."""
+        t, columns = synthetic_history()
+        frame = PatternFrame.from_arrays(t, columns, 3600)
+
+        strengths = periodicity(frame)
+        periods, shares = dominant_periods(frame)
+        profile = hourly_profile(frame)
+
+        assert strengths["daily"][0] > 0.9
+        assert strengths["weekly"][0] < strengths["daily"][0] + 0.1
+        assert periods[0] == pytest.approx(DAY, rel=0.05)
+        assert periods[2] == pytest.approx(6 * 3600, rel=0.05)
+        assert shares[2] > 0.8
+        assert profile.shape == (24, 3)
+        assert np.nanargmax(profile[:, 0]) in (5, 6, 7)
+
+    def test_short_window_has_no_cycles(self):
+        """Testa ciclos que não cabem duas vezes na janela."""
+        t, columns = synthetic_history(days=3)
+        strengths = periodicity(PatternFrame.from_arrays(t, columns, 3600))
+
+        assert not np.isnan(strengths["daily"]).any()
+        assert np.isnan(strengths["weekly"]).all()
+
+
+class TestPatternRecognizer:
+    """Testes para o reconhecedor de padrões sobre o histórico real."""
+
+    def setup_method(self):
+        """Cria o reconhecedor e um histórico sintético."""
+        self.recognizer = PatternRecognizer()
+        self.t, self.columns = synthetic_history()
+
+    def _records(self):
+        return [
+            {"timestamp": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+             **{metric: float(values[i]) for metric, values in self.columns.items()}}
+            for i, ts in enumerate(self.t.tolist())
+        ]
+
+    def test_recognize_patterns(self):
+        """Testa ciclos, correlações e oscilações encontrados nos dados."""
+        patterns = asyncio.run(self.recognizer.recognize_patterns(self._records()))
+        names = [pattern.pattern_name for pattern in patterns]
+
+        assert "Ciclo diário de cpu_usage" in names
+        assert "Ciclo semanal de cpu_usage" not in names
+        assert "Correlação cpu_usage × memory_usage" in names
+        assert "Oscilação de disk_usage a cada 6.0 h" in names
+        correlation = patterns[names.index("Correlação cpu_usage × memory_usage")]
+        assert correlation.correlation_strength > 0.9
+        assert correlation.related_events == ["cpu_usage", "memory_usage"]
+
+    def test_analyze_patterns_by_type(self):
+        """Testa o resultado da API v3 e o filtro por tipo de padrão."""
+        result = asyncio.run(self.recognizer.analyze_patterns(
+            self._records(), pattern_types=["seasonal"], granularity="hourly"
+        ))
+
+        assert result["seasonal"]["detected"] is True
+        assert result["seasonal"]["type"] == "daily"
+        assert all(pattern["name"].startswith("Ciclo") for pattern in result["patterns"])
+        assert {"metric": "disk_usage", "period_hours": 6.0, "strength": pytest.approx(0.9, abs=0.1)} \
+            in result["cycles"]
+        # CPU e memória no pico às 06:00, disco às 07:30
+        assert result["usage"]["peak_hours"] in ("06:00-07:00", "07:00-08:00")
+        assert len(result["usage"]["hourly_profile"]["cpu_usage"]) == 24
+        assert result["samples"] == 28 * 24
+
+    def test_empty_history(self):
+        """Testa a análise sem dados."""
+        result = asyncio.run(self.recognizer.analyze_patterns([], granularity="hourly"))
+
+        assert (result["patterns"], result["strength"], result["cycles"]) == ([], 0, [])
+        assert result["seasonal"]["detected"] is False
+
+
+class TestDevicePatternCache:
+    """Testes para a análise do histórico no store de telemetria e o cache por marca d'água."""
+
+    @pytest.fixture(autouse=True)
+    def setup_store(self, tmp_path, monkeypatch):
+        """Grava 90 dias de histórico de um dispositivo num store temporário."""
+        self.store = TelemetryStore(root=str(tmp_path))
+        monkeypatch.setattr(telemetry_module, "telemetry_store", self.store)
+        now = datetime.now(timezone.utc).timestamp()
+        t, columns = synthetic_history(days=90, step=1800.0)
+        self.offset = now - t[-1] - 3600
+        self.store.append("dev-1", ((t + self.offset) * 1000).astype(np.int64).tolist(), columns)
+        self.recognizer = PatternRecognizer()
+
+    def test_cache_follows_watermark(self):
+        """Testa o acerto enquanto não há amostras novas e o recálculo depois."""
+        first = self.recognizer.analyze_device("dev-1", analysis_period=90)
+        second = self.recognizer.analyze_device("dev-1", analysis_period=90)
+
+        assert (first["cached"], second["cached"]) == (False, True)
+        assert second["patterns"] == first["patterns"]
+        assert second["analysis_id"] != first["analysis_id"]
+        assert first["seasonal"]["type"] == "daily"
+        assert 89 * 24 <= first["samples"] <= 91 * 24
+
+        self.store.append("dev-1", [int(datetime.now(timezone.utc).timestamp() * 1000)], {"cpu_usage": [50.0]})
+        assert self.recognizer.analyze_device("dev-1", analysis_period=90)["cached"] is False
+        assert (self.recognizer.cache_hits, self.recognizer.cache_misses) == (1, 2)
+        assert self.recognizer.analyze_device("dev-1", analysis_period=90, pattern_types=["usage"])["cached"] is False
+
+    def test_endpoint_uses_device_history(self, monkeypatch):
+        """Testa a análise de padrões pela API a partir do device_id."""
+        monkeypatch.setattr(ai_endpoints, "pattern_recognizer", self.recognizer)
+        app = FastAPI()
+        app.include_router(ai_endpoints.router, prefix="/api/core/ai")
+        client = TestClient(app)
+
+        response = client.post("/api/core/ai/analyze-patterns", json={
+            "device_id": "dev-1", "analysis_period": 90, "granularity": "hourly"
+        })
+
+        assert response.status_code == 200
+        body = response.json()
+        assert any(pattern["name"] == "Ciclo diário de cpu_usage" for pattern in body["identified_patterns"])
+        assert body["seasonal_trends"]["type"] == "daily"
+        assert client.post("/api/core/ai/analyze-patterns", json={
+            "device_id": "dev-1", "analysis_period": 90, "granularity": "hourly"
+        }).status_code == 200
+        assert self.recognizer.cache_hits == 1
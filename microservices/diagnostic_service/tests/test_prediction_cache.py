@@ -0,0 +1,163 @@
+import asyncio
+
+import numpy as np
+
+from app.ai import ml_engine
+from app.ai import prediction_cache as cache_module
+from app.ai.ml_engine import PredictiveAnalyzer, RecommendationEngine
+from app.ai.prediction_cache import PredictionCache, feature_key, quantize
+from app.core.prometheus_metrics import registry
+
+
+def system(cpu_history, disk_health=90.0, packet_loss=0.5):
+    """Dados de um sistema com as quatro seções."""
+    return {
+        "cpu": {"usage_history": cpu_history, "temperature": 65.0, "frequency": 3.2},
+        "memory": {"usage_percent": 70.0, "available_gb": 4.0},
+        "disk": {"usage_percent": 80.0, "health_score": disk_health},
+        "network": {"latency_ms": 20.0, "packet_loss_percent": packet_loss}
+    }
+
+
+class TestPredictionCache:
+    """Testes para o cache LRU com TTL e a chave das features quantizadas."""
+
+    def test_quantize_and_key(self):
+        """Testa o bucket de cada valor e a chave por estado e versão do modelo."""
+        values = quantize(np.array([85.4, 85.9, 3.07, np.nan]), np.array([1.0, 1.0, 0.1, 1.0]))
+
+        assert values[:2].tolist() == [85.0, 85.0]
+        assert values[2] == np.floor(3.07 / 0.1) * 0.1
+        assert np.isnan(values[3])
+        assert feature_key("v1", values[:2]) == feature_key("v1", np.array([85.0, 85.0]))
+        assert feature_key("v1", values[:2]) != feature_key("v2", values[:2])
+        assert feature_key("v1", values[:2], "beginner") != feature_key("v1", values[:2], None)
+
+    def test_lru_eviction_and_ttl(self, monkeypatch):
+        """Testa a saída da entrada usada há mais tempo e a expiração pelo TTL."""
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        cache = PredictionCache(max_entries=2, ttl_seconds=60)
+
+        cache.put(b"a", 1)
+        cache.put(b"b", 2)
+        assert cache.get(b"a") == 1
+        cache.put(b"c", 3)
+        assert cache.get(b"b") is None
+        assert (cache.get(b"a"), cache.get(b"c")) == (1, 3)
+
+        now[0] += 61
+        assert cache.get(b"a") is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (3, 2, 1, 1)
+        assert stats["entries"] == 1
+
+    def test_disabled_cache(self):
+        """Testa o cache com tamanho zero."""
+        cache = PredictionCache(max_entries=0)
+        cache.put(b"a", 1)
+        assert cache.get(b"a") is None
+
+
+class TestCachedPredictions:
+    """Testes para o cache na frente do analisador preditivo e do motor de recomendações."""
+
+    def setup_method(self):
+        """Cria o analisador e o motor de recomendações."""
+        self.analyzer = PredictiveAnalyzer()
+        self.engine = RecommendationEngine()
+
+    def test_same_bucket_skips_model(self, monkeypatch):
+        """Testa a previsão reaproveitada para o mesmo estado quantizado."""
+        def model_called(*args):
+            raise AssertionError("modelo chamado com o estado em cache")
+
+        first = asyncio.run(self.analyzer.predict_failure(system([91.2, 91.6])))
+        monkeypatch.setattr(self.analyzer, "_predict_with_ml", model_called)
+        second = asyncio.run(self.analyzer.predict_failure(system([91.0, 91.9])))
+
+        assert (first.cached, second.cached) == (False, True)
+        assert second.probability == first.probability
+        assert second.prediction_type == first.prediction_type
+        assert second.details["trend_indicators"]["cpu_usage_avg"] == "increasing_rapidly"
+
+        second.recommended_actions.append("alterada")
+        third = asyncio.run(self.analyzer.predict_failure(system([91.0, 91.9])))
+        assert third.recommended_actions == first.recommended_actions
+
+    def test_model_scores_raw_features_at_thresholds(self):
+        """Testa que valores logo acima dos limiares estritos não caem para o bucket de baixo ao pontuar."""
+        hot = system([50.0])
+        hot["cpu"]["temperature"] = 75.5
+        cool = system([50.0])
+        cool["cpu"]["temperature"] = 74.9
+        neighbour = system([50.0])
+        neighbour["cpu"]["temperature"] = 75.0
+
+        single = asyncio.run(self.analyzer.predict_failure(hot))
+        batch = PredictiveAnalyzer().predict_failure_batch([hot, cool, neighbour])
+
+        assert single.probability == batch[0].probability == 0.4
+        assert single.details["trend_indicators"]["cpu_temperature"] == "concerning_rise"
+        assert batch[1].probability == 0.0
+        # Mesmo bucket do primeiro sistema: reaproveita a previsão dele (aproximada dentro do bucket)
+        assert batch[2].probability == 0.4
+        titles = [rec.title for rec in asyncio.run(self.engine.generate_recommendations(
+            "u1", {"cpu": {"usage_percent": 80.5}}
+        ))]
+        assert "Otimizar Uso de CPU" in titles
+
+    def test_new_state_or_model_version_misses(self, monkeypatch):
+        """Testa que outro bucket ou outra versão do modelo recalculam a previsão."""
+        asyncio.run(self.analyzer.predict_failure(system([50.0])))
+
+        assert asyncio.run(self.analyzer.predict_failure(system([51.0]))).cached is False
+        monkeypatch.setattr(ml_engine, "PREDICTIVE_MODEL_VERSION", "v3.1")
+        assert asyncio.run(self.analyzer.predict_failure(system([50.0]))).cached is False
+        assert self.analyzer.cache.stats()["hits"] == 0
+
+    def test_batch_shares_cache_and_scores_each_state_once(self):
+        """Testa o lote com o cache do caminho individual e estados repetidos no mesmo lote."""
+        asyncio.run(self.analyzer.predict_failure(system([40.0], disk_health=60.0)))
+        systems = [system([40.3], disk_health=60.0)] + [system([75.5], packet_loss=4.0)] * 30
+
+        results = self.analyzer.predict_failure_batch(systems)
+
+        assert [result.cached for result in results[:2]] == [True, False]
+        assert results[1].probability == results[30].probability
+        assert results[1] is not results[30]
+        stats = self.analyzer.cache.stats()
+        assert (stats["entries"], stats["hits"]) == (2, 1)
+        assert asyncio.run(self.analyzer.predict(data=[systems[5]], prediction_type="failure"))["cached"] is True
+
+    def test_recommendations_cache(self):
+        """Testa as recomendações reaproveitadas para o mesmo estado, perfil e preferências."""
+        state = {"cpu": {"usage_percent": 88.2}, "disk": {"usage_percent": 90.7}}
+
+        first = asyncio.run(self.engine.generate_recommendations_v3(state))
+        second = asyncio.run(self.engine.generate_recommendations_v3(
+            {"cpu": {"usage_percent": 88.9}, "disk": {"usage_percent": 90.1}}
+        ))
+        with_preferences = asyncio.run(self.engine.generate_recommendations_v3(
+            state, user_preferences={"auto_optimization": True}
+        ))
+
+        assert (first["cached"], second["cached"], with_preferences["cached"]) == (False, True, False)
+        assert second["recommendations"] == first["recommendations"]
+        assert len(with_preferences["recommendations"]) == 3
+        self.engine.user_profiles["u1"] = {"experience_level": "beginner"}
+        titles = [rec.title for rec in asyncio.run(self.engine.generate_recommendations("u1", state))]
+        assert "Tutorial de Manutenção Básica" in titles
+        assert self.engine.recommendation_history["u1"][0].title == "Otimizar Uso de CPU"
+
+    def test_hits_and_misses_exported_to_prometheus(self):
+        """Testa os contadores de hit/miss registrados por track_ai_prediction."""
+        def count(name):
+            return registry.get_sample_value(name, {"model": "predictive_analyzer"}) or 0.0
+
+        hits, misses = count("ai_prediction_cache_hit_total"), count("ai_prediction_cache_miss_total")
+        for _ in range(3):
+            asyncio.run(self.analyzer.predict_failure(system([33.0])))
+
+        assert count("ai_prediction_cache_miss_total") - misses == 1
+        assert count("ai_prediction_cache_hit_total") - hits == 2
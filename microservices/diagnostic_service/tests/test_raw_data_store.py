@@ -0,0 +1,266 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import defer, sessionmaker
+
+from app.db.base import Base
+from app.db.raw_data_store import (
+    RawDataBlobStore, canonical_json, is_manifest, rehydrate, split_raw_data
+)
+from app.db.repositories.diagnostic_repository import DiagnosticRepository
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.report import Report
+from app.models.system_info import SystemInfo
+
+
+def _raw_data(cpu_usage):
+    """raw_data com partes estáveis grandes e um valor volátil pequeno."""
+    return {
+        "components": {
+            "cpu": {"usage": cpu_usage, "status": "healthy"},
+            "disk": {
+                "partitions": [{"device": f"/dev/sda{i}", "mountpoint": f"/mnt/{i}", "fstype": "ext4"}
+                               for i in range(20)]
+            }
+        },
+        "system_info": {"hostname": "workstation-01", "packages": [f"pkg-{i}" for i in range(50)]}
+    }
+
+
+class TestRawDataSplitting:
+    """Testes para a divisão do raw_data em blocos."""
+
+    def test_split_and_rehydrate_round_trip(self):
+        """Testa que o manifesto reidratado reproduz o raw_data original."""
+        raw_data = _raw_data(12.5)
+        manifest, chunks = split_raw_data(raw_data, min_chunk_size=64, max_depth=3)
+
+        assert is_manifest(manifest)
+        # O valor volátil pequeno fica inline no manifesto
+        assert manifest["tree"]["components"]["cpu"] == {"usage": 12.5, "status": "healthy"}
+        assert len(chunks) == 2
+        blobs = {digest: json.loads(data) for digest, data in chunks.items()}
+        assert rehydrate(manifest, blobs) == raw_data
+
+    def test_small_values_are_not_split(self):
+        """Testa que raw_data pequeno não gera blocos."""
+        manifest, chunks = split_raw_data({"status": "ok"}, min_chunk_size=64, max_depth=3)
+
+        assert chunks == {}
+        assert manifest["tree"] == {"status": "ok"}
+
+
+class TestRawDataBlobStore:
+    """Testes para o armazenamento de raw_data em blocos no banco."""
+
+    def setup_method(self):
+        """Cria um banco SQLite em memória e um store com cache vazio."""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[SystemInfo.__table__, Diagnostic.__table__,
+                                                      RawDataBlob.__table__, RawDataBlobRef.__table__,
+                                                      Report.__table__])
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.store = RawDataBlobStore(enabled=True, codec="zlib", min_chunk_size=64, max_depth=3)
+        self.patcher = patch("app.db.raw_data_store.raw_data_store", self.store)
+        self.patcher.start()
+
+    def teardown_method(self):
+        """Remove o store simulado."""
+        self.patcher.stop()
+
+    def _stored_column(self, diagnostic_id):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(Diagnostic.__table__.c.raw_data).where(Diagnostic.__table__.c.id == diagnostic_id)
+            ).scalar()
+
+    def _blob_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(RawDataBlob.__table__)).scalar()
+
+    def _ref_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(RawDataBlobRef.__table__)).scalar()
+
+    def test_repeated_chunks_are_stored_once(self):
+        """Testa a deduplicação dos blocos entre diagnósticos."""
+        with self.session_factory() as db:
+            for i in range(5):
+                db.add(Diagnostic(id=f"diag-{i}", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(10.0 + i)))
+            db.commit()
+
+        assert self._blob_count() == 2
+        stored = self._stored_column("diag-3")
+        assert is_manifest(stored)
+        assert len(canonical_json(stored)) < len(canonical_json(_raw_data(13.0))) / 4
+
+    def test_reads_rehydrate_transparently(self):
+        """Testa a reidratação na carga normal, adiada e após o flush."""
+        with self.session_factory() as db:
+            diagnostic = Diagnostic(id="diag-1", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(42.0))
+            db.add(diagnostic)
+            db.flush()
+            # O objeto em memória mantém o dicionário completo após o flush
+            assert diagnostic.raw_data == _raw_data(42.0)
+            db.commit()
+
+        self.store.clear_cache()
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "diag-1").raw_data == _raw_data(42.0)
+
+        with self.session_factory() as db:
+            deferred = db.query(Diagnostic).options(defer(Diagnostic.raw_data)).one()
+            assert deferred.raw_data == _raw_data(42.0)
+
+    def test_legacy_rows_are_read_as_is(self):
+        """Testa que linhas gravadas antes do store continuam legíveis."""
+        self.store.enabled = False
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="legacy", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.commit()
+        self.store.enabled = True
+
+        assert not is_manifest(self._stored_column("legacy"))
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "legacy").raw_data == _raw_data(1.0)
+
+    def test_bulk_create_packs_raw_data(self):
+        """Testa que o insert em massa também grava o raw_data em blocos."""
+        with self.session_factory() as db:
+            DiagnosticRepository(db).bulk_create([
+                {"id": f"bulk-{i}", "status": "completed", "raw_data": _raw_data(float(i))}
+                for i in range(3)
+            ])
+
+        assert self._blob_count() == 2
+        assert self._ref_count() == 6
+        assert is_manifest(self._stored_column("bulk-2"))
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "bulk-2").raw_data == _raw_data(2.0)
+
+    def test_zstd_falls_back_to_zlib(self):
+        """Testa o fallback para zlib quando o zstandard não está instalado."""
+        with patch("app.db.raw_data_store.ZSTD_AVAILABLE", False):
+            store = RawDataBlobStore(codec="zstd")
+
+        assert store.codec == "zlib"
+
+    def test_rolled_back_write_does_not_leave_dangling_references(self):
+        """Testa que blocos lidos de uma gravação desfeita são gravados de novo na próxima."""
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="rolled-back", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.flush()
+            # A leitura na mesma transação coloca os blocos no cache
+            db.expire_all()
+            assert db.get(Diagnostic, "rolled-back").raw_data == _raw_data(1.0)
+            db.rollback()
+        assert self._blob_count() == 0
+
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="diag-1", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(2.0)))
+            db.commit()
+
+        self.store.clear_cache()
+        assert self._blob_count() == 2
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "diag-1").raw_data == _raw_data(2.0)
+
+    def test_garbage_collection_removes_only_unreferenced_blobs(self):
+        """Testa a coleta dos blocos sem referência fora da carência."""
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="keep", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            unique = _raw_data(2.0)
+            unique["system_info"]["packages"] = [f"other-{i}" for i in range(50)]
+            db.add(Diagnostic(id="drop", status=DiagnosticStatus.COMPLETED, raw_data=unique))
+            db.commit()
+            assert self._blob_count() == 3
+            db.execute(Diagnostic.__table__.delete().where(Diagnostic.__table__.c.id == "drop"))
+            db.commit()
+
+            # Dentro da carência nada é apagado
+            assert self.store.collect_garbage(db) == 0
+            assert self.store.collect_garbage(db, grace_seconds=0) == 1
+            db.commit()
+
+        assert self._blob_count() == 2
+        self.store.clear_cache()
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "keep").raw_data == _raw_data(1.0)
+
+    def test_reused_blob_is_renewed_before_collection(self):
+        """Testa que um bloco antigo reutilizado por uma gravação nova sai da coleta."""
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="old", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.commit()
+            db.execute(Diagnostic.__table__.delete().where(Diagnostic.__table__.c.id == "old"))
+            db.execute(RawDataBlob.__table__.update().values(updated_at=datetime(2020, 1, 1)))
+            db.commit()
+
+            db.add(Diagnostic(id="new", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(3.0)))
+            db.flush()
+            renewed = db.execute(select(RawDataBlob.__table__.c.updated_at)).scalars().all()
+            assert len(renewed) == 2 and min(renewed) > datetime(2020, 1, 1)
+            assert self.store.collect_garbage(db, grace_seconds=60) == 0
+            db.commit()
+
+        self.store.clear_cache()
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "new").raw_data == _raw_data(3.0)
+
+    def test_references_follow_updates_and_deletes(self):
+        """Testa que as referências acompanham a atualização e a remoção pelo ORM."""
+        unique = _raw_data(2.0)
+        unique["system_info"]["packages"] = [f"other-{i}" for i in range(50)]
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="shared", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.add(Diagnostic(id="changed", status=DiagnosticStatus.COMPLETED, raw_data=unique))
+            db.commit()
+            assert self._ref_count() == 4
+
+            db.get(Diagnostic, "changed").raw_data = _raw_data(5.0)
+            db.commit()
+            assert self.store.collect_garbage(db, grace_seconds=0) == 1
+            db.commit()
+
+            db.delete(db.get(Diagnostic, "shared"))
+            db.commit()
+            assert self._ref_count() == 2
+            assert self.store.collect_garbage(db, grace_seconds=0) == 0
+
+        assert self._blob_count() == 2
+        self.store.clear_cache()
+        with self.session_factory() as db:
+            assert db.get(Diagnostic, "changed").raw_data == _raw_data(5.0)
+
+    def test_garbage_collection_does_not_read_manifests(self):
+        """Testa que a coleta acha os órfãos pelas referências, sem ler raw_data."""
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="keep", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.commit()
+
+        statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        with self.session_factory() as db:
+            assert self.store.collect_garbage(db, grace_seconds=0) == 0
+
+        assert statements
+        assert not any("raw_data" in statement for statement in statements)
+
+    def test_backfill_registers_legacy_manifests(self):
+        """Testa que manifestos sem referência gravada voltam a segurar os blocos."""
+        with self.session_factory() as db:
+            db.add(Diagnostic(id="legacy", status=DiagnosticStatus.COMPLETED, raw_data=_raw_data(1.0)))
+            db.commit()
+            db.execute(RawDataBlobRef.__table__.delete())
+            db.commit()
+
+            assert self.store.backfill_refs(db) == 1
+            db.commit()
+            assert self._ref_count() == 2
+            assert self.store.collect_garbage(db, grace_seconds=0) == 0
+
+        assert self._blob_count() == 2
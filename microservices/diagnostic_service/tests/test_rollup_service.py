@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.diagnostic_service import DiagnosticService
+from app.services.predictive_service import PredictiveService
+from app.services.rollup_service import RollupService, bucket_start
+
+
+class TestRollupService:
+    """Testes para os rollups de métricas por dispositivo."""
+
+    def setup_method(self):
+        """Cria um banco SQLite em memória com as tabelas de diagnóstico e rollup."""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__, DiagnosticMetricRollup.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        self.service = RollupService(self.db)
+
+    def teardown_method(self):
+        """Fecha a sessão."""
+        self.db.close()
+
+    def _diagnostic(self, created_at, cpu_usage, **extra):
+        return {
+            "device_id": "dev-1",
+            "status": DiagnosticStatus.COMPLETED,
+            "created_at": created_at,
+            "cpu_usage": cpu_usage,
+            **extra
+        }
+
+    def _bucket(self, resolution, metric="cpu_usage"):
+        return self.db.query(DiagnosticMetricRollup).filter_by(
+            device_id="dev-1", resolution=resolution, metric=metric
+        ).all()
+
+    def test_bucket_start(self):
+        """Testa o alinhamento dos buckets por resolução."""
+        timestamp = datetime(2026, 3, 10, 14, 37, 52)
+
+        assert bucket_start(timestamp, "1m") == datetime(2026, 3, 10, 14, 37)
+        assert bucket_start(timestamp, "1h") == datetime(2026, 3, 10, 14)
+        assert bucket_start(timestamp, "1d") == datetime(2026, 3, 10)
+
+    def test_ingest_merges_samples_across_calls(self):
+        """Testa min/max/média/contagem/último acumulados entre ingestões."""
+        base = datetime(2026, 3, 10, 14, 0, 5)
+        self.service.ingest([self._diagnostic(base, 40.0), self._diagnostic(base + timedelta(seconds=20), 60.0)])
+        self.service.ingest([
+            self._diagnostic(base + timedelta(minutes=5), 20.0),
+            # Diagnóstico fora de ordem não substitui o último valor
+            self._diagnostic(base - timedelta(seconds=2), 90.0),
+            {"device_id": "dev-1", "status": DiagnosticStatus.FAILED, "created_at": base, "cpu_usage": 99.0}
+        ])
+        self.db.commit()
+
+        minute_buckets = self._bucket("1m")
+        assert len(minute_buckets) == 2
+        (hour,) = self._bucket("1h")
+        assert (hour.min_value, hour.max_value, hour.count) == (20.0, 90.0, 4)
+        assert hour.avg_value == 52.5
+        assert hour.last_value == 20.0
+        assert len(self._bucket("1d")) == 1
+        assert self._bucket("1h", "memory_usage") == []
+
+    def test_choose_resolution_by_window(self):
+        """Testa a escolha da resolução mais grossa que atende à janela."""
+        now = datetime.utcnow()
+
+        assert self.service.choose_resolution(now - timedelta(days=90), now) == "1d"
+        assert self.service.choose_resolution(now - timedelta(days=3), now) == "1h"
+        assert self.service.choose_resolution(now - timedelta(hours=2), now) == "1m"
+        # Buckets de 1 minuto já expiraram há 30 dias; 1 hora é a mais fina disponível
+        assert self.service.choose_resolution(now - timedelta(days=30), now, min_points=5000) == "1h"
+
+    def test_query_returns_series_per_metric(self):
+        """Testa a consulta da série na resolução escolhida."""
+        now = datetime.utcnow().replace(microsecond=0)
+        self.service.ingest([
+            self._diagnostic(now - timedelta(days=day), 10.0 + day, overall_health=80.0)
+            for day in range(5)
+        ])
+        self.db.commit()
+
+        result = self.service.query("dev-1", now - timedelta(days=60), metrics=["cpu_usage", "overall_health"])
+
+        assert result["resolution"] == "1d"
+        assert [bucket.last_value for bucket in result["series"]["cpu_usage"]] == [14.0, 13.0, 12.0, 11.0, 10.0]
+        assert len(result["series"]["overall_health"]) == 5
+
+    def test_completed_diagnostic_updates_rollups(self):
+        """Testa o gancho de ingestão ao concluir um diagnóstico."""
+        diagnostic = Diagnostic(user_id="user-1", device_id="dev-1", status=DiagnosticStatus.PENDING)
+        self.db.add(diagnostic)
+        self.db.commit()
+        service = DiagnosticService(self.db)
+        service._run_analyzers = lambda concurrent=None: {
+            "cpu": {"status": "healthy", "usage": 30.5},
+            "memory": {"status": "warning", "usage": 85.0},
+            "disk": {"status": "healthy", "usage": 50.0},
+            "network": {"status": "healthy"}
+        }
+
+        service.run_diagnostic(diagnostic.id, unit_of_work=True, checkpoint=False)
+
+        (cpu,) = self._bucket("1d")
+        assert (cpu.count, cpu.last_value) == (1, 30.5)
+        assert self._bucket("1d", "memory_usage")[0].last_value == 85.0
+
+    def test_predict_failures_reads_rollups(self):
+        """Testa que a previsão pelos rollups tem as mesmas tendências dos diagnósticos brutos."""
+        now = datetime.utcnow().replace(microsecond=0)
+        rows = []
+        for day in range(20):
+            for sample in range(3):
+                rows.append(self._diagnostic(
+                    now - timedelta(days=20 - day, hours=sample),
+                    30.0,
+                    memory_usage=40.0,
+                    disk_usage=50.0 + day * 2,
+                    overall_health=90.0 - day
+                ))
+        self.db.add_all(Diagnostic(**row) for row in rows)
+        self.service.ingest(rows)
+        self.db.commit()
+        predictive = PredictiveService(self.db)
+
+        result = predictive.predict_failures("dev-1", time_window_days=30)
+        with patch.object(PredictiveService, "_query_rollups", return_value=None):
+            raw_result = predictive.predict_failures("dev-1", time_window_days=30)
+
+        assert result["rollup_resolution"] == "1d"
+        assert result["diagnostics_analyzed"] == raw_result["diagnostics_analyzed"] == 60
+        for metric in ["cpu_usage", "memory_usage", "disk_usage", "overall_health"]:
+            trend, raw_trend = result["trends"][metric], raw_result["trends"][metric]
+            assert trend["trend"] == raw_trend["trend"]
+            # A regressão dos buckets usa o início do dia; a dos diagnósticos, o horário real
+            assert trend["slope"] == pytest.approx(raw_trend["slope"], rel=1e-3, abs=1e-9)
+            assert (trend["min"], trend["max"], trend["current"]) == (raw_trend["min"], raw_trend["max"], raw_trend["current"])
+            assert abs(trend["average"] - raw_trend["average"]) < 1e-9
+        assert result["risk_level"] == raw_result["risk_level"]
+        assert result["predictions"].keys() == raw_result["predictions"].keys()
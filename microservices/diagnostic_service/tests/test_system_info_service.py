@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from app.services.system_info_service import SystemInfoService
+
+
+class TestSystemInfoService:
+    """Testes para a coleta de informações do sistema."""
+    
+    def setup_method(self):
+        """Setup para cada teste."""
+        self.service = SystemInfoService()
+    
+    def test_collect_system_info_fields(self):
+        """Testa que a coleta mantém os campos estáticos e dinâmicos."""
+        result = self.service.collect_system_info(force_refresh=True)
+        
+        for field in ["hostname", "os_name", "os_version", "architecture", "platform",
+                      "python_version", "boot_time", "uptime", "users", "processes"]:
+            assert field in result
+        assert result["processes"] > 0
+    
+    def test_static_facts_are_cached(self):
+        """Testa que os fatos estáticos não são recalculados a cada coleta."""
+        self.service.collect_system_info(force_refresh=True)
+        
+        with patch.object(self.service, "_get_platform", return_value="changed") as mock_platform:
+            result = SystemInfoService().collect_system_info()
+            assert mock_platform.call_count == 0
+            assert result["platform"] != "changed"
+            
+            result = self.service.collect_system_info(force_refresh=True)
+            assert result["platform"] == "changed"
+        
+        self.service.collect_system_info(force_refresh=True)
+    
+    def test_static_facts_refresh_after_reboot(self):
+        """Testa que uma mudança no boot time invalida os fatos estáticos."""
+        self.service.collect_system_info(force_refresh=True)
+        
+        with patch("app.services.system_info_service.psutil.boot_time", return_value=0.0):
+            result = self.service.collect_system_info()
+        
+        assert result["boot_time"].startswith("1970") or result["boot_time"].startswith("1969")
+        self.service.collect_system_info(force_refresh=True)
+    
+    def test_process_count_uses_fresh_snapshot(self):
+        """Testa que a contagem de processos reaproveita o snapshot do amostrador."""
+        with patch("app.services.system_info_service.system_sampler.fresh") as mock_fresh:
+            mock_fresh.return_value.process_count = 1234
+            assert self.service._get_process_count() == 1234
+            
+            mock_fresh.return_value = None
+            assert self.service._get_process_count() > 0
@@ -0,0 +1,126 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.system_sampler import SystemSampler
+from app.services.analyzers.cpu_analyzer import CPUAnalyzer
+
+
+class TestSystemSampler:
+    """Testes para o amostrador compartilhado de métricas."""
+    
+    def setup_method(self):
+        """Setup para cada teste."""
+        self.sampler = SystemSampler(interval=0.05, capacity=3)
+    
+    def teardown_method(self):
+        """Para a thread de coleta ao fim de cada teste."""
+        self.sampler.stop()
+    
+    def test_sample_publishes_latest(self):
+        """Testa que uma coleta publica o snapshot mais recente."""
+        snapshot = self.sampler.sample()
+        
+        assert self.sampler.latest() is snapshot
+        assert 0.0 <= snapshot.cpu_percent <= 100.0
+        assert snapshot.memory.total > 0
+        assert 0.0 <= snapshot.disk_percent <= 100.0
+    
+    def test_history_is_bounded_ring_buffer(self):
+        """Testa que o histórico mantém apenas os snapshots mais recentes."""
+        snapshots = [self.sampler.sample() for _ in range(5)]
+        
+        history = self.sampler.history()
+        
+        assert len(history) == 3
+        assert history == snapshots[-3:]
+        assert self.sampler.history(limit=1) == snapshots[-1:]
+    
+    def test_latest_respects_max_age(self):
+        """Testa que snapshots antigos são ignorados."""
+        self.sampler.sample()
+        time.sleep(0.05)
+        
+        assert self.sampler.latest(max_age=0.01) is None
+        assert self.sampler.latest(max_age=10) is not None
+    
+    def test_background_sampling(self):
+        """Testa a coleta em background."""
+        self.sampler.start()
+        time.sleep(0.3)
+        
+        assert self.sampler.running
+        assert len(self.sampler.history()) >= 2
+        assert self.sampler.fresh() is not None
+    
+    def test_cpu_analyzer_uses_fresh_snapshot(self):
+        """Testa que o CPUAnalyzer lê o snapshot em vez de bloquear no psutil."""
+        snapshot = self.sampler.sample()
+        
+        with patch("app.services.analyzers.cpu_analyzer.system_sampler", self.sampler), \
+             patch("psutil.cpu_percent") as mock_cpu_percent:
+            usage = CPUAnalyzer()._get_cpu_usage()
+        
+        assert usage == snapshot.cpu_percent
+        mock_cpu_percent.assert_not_called()
+    
+    def test_cpu_analyzer_windows_load_uses_snapshot(self):
+        """Testa que a aproximação de carga no Windows também lê o snapshot."""
+        snapshot = self.sampler.sample()
+        
+        with patch("app.services.analyzers.cpu_analyzer.system_sampler", self.sampler), \
+             patch("platform.system", return_value="Windows"), \
+             patch("psutil.cpu_percent") as mock_cpu_percent:
+            load = CPUAnalyzer()._get_cpu_load()
+        
+        assert load["current"] == snapshot.cpu_percent / 100.0
+        mock_cpu_percent.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_quick_metrics_from_cached_snapshot(self):
+        """Testa que o diagnóstico rápido responde a partir do snapshot em cache."""
+        from app.api.core.diagnostics import endpoints
+        
+        snapshot = self.sampler.sample()
+        
+        with patch.object(endpoints, "system_sampler", self.sampler):
+            metrics, age = await endpoints._get_quick_metrics(max_staleness_seconds=10)
+        
+        assert metrics["cpu"]["percent"] == snapshot.cpu_percent
+        assert metrics["memory"]["percent"] == snapshot.memory.percent
+        assert age is not None and age < 10
+    
+    @pytest.mark.asyncio
+    async def test_quick_metrics_resamples_when_stale(self):
+        """Testa que um snapshot fora do limite de staleness é descartado."""
+        from app.api.core.diagnostics import endpoints
+        
+        stale = self.sampler.sample()
+        time.sleep(0.05)
+        
+        with patch.object(endpoints, "system_sampler", self.sampler):
+            _, age = await endpoints._get_quick_metrics(max_staleness_seconds=0.01)
+        
+        assert self.sampler.latest() is not stale
+        assert age < 0.05
+    
+    @pytest.mark.asyncio
+    async def test_quick_metrics_samples_off_the_event_loop(self):
+        """Testa que a coleta de um snapshot novo não roda na thread do event loop."""
+        from app.api.core.diagnostics import endpoints
+        
+        loop_thread = threading.get_ident()
+        sample_threads = []
+        original_sample = self.sampler.sample
+        
+        def sample():
+            sample_threads.append(threading.get_ident())
+            return original_sample()
+        
+        with patch.object(endpoints, "system_sampler", self.sampler), \
+             patch.object(self.sampler, "sample", side_effect=sample):
+            await endpoints._get_quick_metrics(use_cached_snapshot=False)
+        
+        assert sample_threads and sample_threads[0] != loop_thread
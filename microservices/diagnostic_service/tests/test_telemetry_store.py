@@ -0,0 +1,313 @@
+import multiprocessing
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.ai.ml_engine import load_device_history
+from app.api.core.analytics import endpoints as analytics_endpoints
+from app.db import telemetry_store as telemetry_module
+from app.db.base import Base
+from app.db.repositories.diagnostic_repository import DiagnosticRepository
+from app.db.telemetry_store import TelemetryStore
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.predictive_service import PredictiveService
+
+
+def _append_from_process(root, worker, count):
+    store = TelemetryStore(root=root, shards=4)
+    start = datetime(2026, 5, 1)
+    for i in range(count):
+        store.append("dev-shared", [start + timedelta(seconds=i)], {"cpu_usage": [float(worker)]})
+
+
+class TestTelemetryStore:
+    """Testes para o store colunar de métricas."""
+
+    def setup_method(self):
+        """Cria um store com uma série de 10 minutos."""
+        self.start = datetime(2026, 5, 1, 0, 0, 0)
+        self.timestamps = [self.start + timedelta(minutes=i) for i in range(10)]
+
+    def _store(self, tmp_path):
+        store = TelemetryStore(root=str(tmp_path), shards=4)
+        store.append("dev-1", self.timestamps, {
+            "cpu_usage": [10.0 * i for i in range(10)],
+            "memory_usage": [None if i % 2 else 50.0 + i for i in range(10)]
+        })
+        return store
+
+    def test_range_is_zero_copy_slice(self, tmp_path):
+        """Testa a janela como fatia dos arquivos mapeados."""
+        store = self._store(tmp_path)
+
+        window = store.range("dev-1", self.timestamps[2], self.timestamps[5])
+
+        assert window.datetimes() == self.timestamps[2:5]
+        assert isinstance(window.columns["cpu_usage"], np.memmap)
+        assert window.columns["cpu_usage"].tolist() == [20.0, 30.0, 40.0]
+        assert np.isnan(window.columns["memory_usage"][1])
+        assert store.length("dev-1") == 10
+        assert store.devices() == ["dev-1"]
+        assert len(store.range("dev-missing")) == 0
+
+    def test_append_only_index_and_new_metrics(self, tmp_path):
+        """Testa o descarte de amostras antigas e métricas novas preenchidas com NaN."""
+        store = self._store(tmp_path)
+
+        written = store.append("dev-1", [self.start - timedelta(minutes=1), self.start + timedelta(minutes=10)],
+                               {"disk_usage": [1.0, 70.0]})
+
+        assert written == 1
+        window = store.range("dev-1")
+        assert len(window) == 11
+        assert np.isnan(window.columns["disk_usage"][:10]).all()
+        assert window.columns["disk_usage"][10] == 70.0
+        assert np.isnan(window.columns["cpu_usage"][10])
+        with pytest.raises(ValueError):
+            store.append("dev-1", [self.start], {"gpu_usage": [1.0]})
+
+    def test_interrupted_write_is_not_visible(self, tmp_path):
+        """Testa que colunas gravadas sem o índice de tempo são ignoradas e truncadas."""
+        store = self._store(tmp_path)
+        directory = store._device_dir("dev-1")
+        with open(os.path.join(directory, "cpu_usage.f4"), "ab") as handle:
+            np.array([999.0], dtype="<f4").tofile(handle)
+
+        assert store.range("dev-1").columns["cpu_usage"].tolist()[-1] == 90.0
+        store.append("dev-1", [self.start + timedelta(minutes=10)], {"cpu_usage": [100.0]})
+        assert store.range("dev-1").columns["cpu_usage"].tolist()[-2:] == [90.0, 100.0]
+
+    def test_concurrent_process_appends_keep_columns_aligned(self, tmp_path):
+        """Testa que gravações de vários processos no mesmo dispositivo não intercalam linhas."""
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_append_from_process, args=(str(tmp_path), worker, 200))
+                   for worker in range(4)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        store = TelemetryStore(root=str(tmp_path), shards=4)
+        window = store.range("dev-shared")
+        directory = store._device_dir("dev-shared")
+        assert len(window) > 0
+        assert os.path.getsize(os.path.join(directory, "cpu_usage.f4")) == len(window) * 4
+        assert not np.isnan(window.columns["cpu_usage"]).any()
+        assert (np.diff(window.timestamps) >= 0).all()
+        assert store._metric_names(directory) == ["cpu_usage"]
+
+    def test_downsample_and_aggregate(self, tmp_path):
+        """Testa buckets alinhados à época e agregações que ignoram NaN."""
+        store = self._store(tmp_path)
+
+        avg = store.downsample("dev-1", 300, metrics=["cpu_usage", "memory_usage"])
+        assert avg.datetimes() == [self.start, self.start + timedelta(minutes=5)]
+        assert avg.columns["cpu_usage"].tolist() == [20.0, 70.0]
+        assert avg.columns["memory_usage"].tolist() == [52.0, 57.0]
+        assert store.downsample("dev-1", 300, metrics=["memory_usage"], aggregation="last").columns[
+            "memory_usage"].tolist() == [54.0, 58.0]
+        assert store.downsample("dev-1", 300, metrics=["memory_usage"], aggregation="count").columns[
+            "memory_usage"].tolist() == [3.0, 2.0]
+        assert store.downsample("dev-1", 300, metrics=["cpu_usage"], aggregation="max").columns[
+            "cpu_usage"].tolist() == [40.0, 90.0]
+        with pytest.raises(ValueError):
+            store.downsample("dev-1", 300, aggregation="median")
+
+        stats = store.aggregate("dev-1", metrics=["memory_usage"])["memory_usage"]
+        assert stats == {"count": 5, "min": 50.0, "max": 58.0, "avg": 54.0, "last": 58.0}
+
+    def test_load_device_history(self, tmp_path, monkeypatch):
+        """Testa o histórico no formato consumido pelo motor de ML."""
+        monkeypatch.setattr(telemetry_module, "telemetry_store", TelemetryStore(root=str(tmp_path)))
+        now = datetime.utcnow().replace(second=0, microsecond=0)
+        telemetry_module.get_telemetry_store().append(
+            "dev-1", [now - timedelta(minutes=3), now - timedelta(minutes=2)], {"cpu_usage": [30.0, None]}
+        )
+
+        history = load_device_history("dev-1", days=1, step_seconds=None)
+
+        assert [record["cpu_usage"] for record in history] == [30.0, None]
+        assert history[0]["timestamp"] == (now - timedelta(minutes=3)).isoformat()
+
+
+class TestTelemetryIntegration:
+    """Testes para a gravação após o commit e o uso pela análise preditiva e de analytics."""
+
+    @pytest.fixture(autouse=True)
+    def setup_store(self, tmp_path, monkeypatch):
+        """Ativa um store temporário e cria o banco SQLite."""
+        self.store = TelemetryStore(root=str(tmp_path))
+        monkeypatch.setattr(telemetry_module.settings, "TELEMETRY_STORE_ENABLED", True)
+        monkeypatch.setattr(telemetry_module, "telemetry_store", self.store)
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceTrendState.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        self.now = datetime.utcnow()
+        yield
+        self.db.close()
+
+    def _diagnostics(self, device_id="dev-1", days=20):
+        return [
+            {
+                "device_id": device_id,
+                "status": DiagnosticStatus.COMPLETED,
+                "created_at": self.now - timedelta(days=days - day),
+                "cpu_usage": 30.0 + day % 3,
+                "memory_usage": 40.0,
+                "disk_usage": 60.0 + 2 * day,
+                "overall_health": 90 - day
+            }
+            for day in range(days)
+        ]
+
+    def test_samples_written_only_after_commit(self):
+        """Testa que o rollback descarta as amostras e o commit as grava."""
+        DiagnosticRepository(self.db).bulk_create(self._diagnostics(days=5), commit=False)
+        self.db.rollback()
+        assert self.store.length("dev-1") == 0
+
+        DiagnosticRepository(self.db).bulk_create(self._diagnostics(days=5))
+        telemetry_module.flush_telemetry(timeout=10)
+        assert self.store.length("dev-1") == 5
+        assert self.store.range("dev-1").columns["disk_usage"].tolist() == [60.0, 62.0, 64.0, 66.0, 68.0]
+
+    def test_savepoints_do_not_commit_or_discard_outer_samples(self):
+        """Testa que liberar ou desfazer um SAVEPOINT não grava nem descarta as amostras da transação externa."""
+        rows = self._diagnostics(days=3)
+        telemetry_module.record_telemetry(self.db, rows[:1])
+        with self.db.begin_nested():
+            telemetry_module.record_telemetry(self.db, rows[1:2])
+        try:
+            with self.db.begin_nested():
+                telemetry_module.record_telemetry(self.db, rows[2:])
+                raise RuntimeError("upsert falhou")
+        except RuntimeError:
+            pass
+        telemetry_module.flush_telemetry(timeout=10)
+        assert self.store.length("dev-1") == 0
+
+        self.db.commit()
+        telemetry_module.flush_telemetry(timeout=10)
+        assert self.store.range("dev-1").columns["disk_usage"].tolist() == [60.0, 62.0]
+
+    def test_samples_written_off_the_committing_thread(self, monkeypatch):
+        """Testa que o commit só enfileira as amostras e o append roda no worker do store."""
+        threads = []
+        append_samples = self.store.append_samples
+
+        def recording_append(samples):
+            threads.append(threading.current_thread().name)
+            return append_samples(samples)
+
+        monkeypatch.setattr(self.store, "append_samples", recording_append)
+        DiagnosticRepository(self.db).bulk_create(self._diagnostics(days=2))
+        telemetry_module.flush_telemetry(timeout=10)
+
+        assert len(threads) == 1
+        assert threads[0].startswith("telemetry-writer")
+        assert self.store.length("dev-1") == 2
+
+    def test_predictive_service_reads_store(self):
+        """Testa as tendências a partir do store, sem varrer o histórico no banco."""
+        rows = self._diagnostics()
+        self.store.append_samples(
+            (row["device_id"], row["created_at"], {key: row[key] for key in ("cpu_usage", "memory_usage",
+                                                                            "disk_usage", "overall_health")})
+            for row in rows
+        )
+        self.db.add_all(Diagnostic(**row) for row in rows)
+        self.db.commit()
+        statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        result = PredictiveService(self.db).predict_failures("dev-1", series_points=0)
+
+        assert result["source"] == "telemetry"
+        assert result["diagnostics_analyzed"] == 20
+        assert result["trends"]["disk_usage"]["slope"] == pytest.approx(2.0, rel=1e-4)
+        assert result["trends"]["disk_usage"]["trend"] == "degrading"
+        assert not any("created_at >=" in statement for statement in statements)
+
+    def test_predictive_service_falls_back_when_store_is_behind(self):
+        """Testa que amostras fora de ordem descartadas pelo store levam a análise aos rollups."""
+        rows = self._diagnostics()
+        repository = DiagnosticRepository(self.db)
+        repository.bulk_create(rows[:10] + rows[12:])
+        telemetry_module.flush_telemetry(timeout=10)
+
+        result = PredictiveService(self.db).predict_failures("dev-1", series_points=0)
+        assert result["source"] == "telemetry"
+        assert result["diagnostics_analyzed"] == 18
+
+        # Chegam atrasadas: os rollups as contam, o store append-only não
+        repository.bulk_create(rows[10:12])
+        telemetry_module.flush_telemetry(timeout=10)
+        assert self.store.length("dev-1") == 18
+
+        result = PredictiveService(self.db).predict_failures("dev-1", series_points=0)
+        assert "source" not in result
+        assert result["diagnostics_analyzed"] == 20
+        assert result["rollup_resolution"] in ("1h", "1d")
+
+    def test_analytics_query_uses_store(self, monkeypatch, tmp_path):
+        """Testa a consulta de analytics filtrada por dispositivo."""
+        monkeypatch.setattr(analytics_endpoints, "TELEMETRY_STORE_ENABLED", True)
+        start = self.now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        self.store.append("dev-1", [start + timedelta(minutes=30 * i) for i in range(6)],
+                          {"cpu_usage": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]})
+        # A posse do dispositivo vem dos diagnósticos do usuário
+        db_path = tmp_path / "analytics.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(engine, tables=[SystemInfo.__table__, Diagnostic.__table__])
+        with engine.begin() as conn:
+            conn.execute(insert(Diagnostic.__table__), [
+                {"id": "owned", "device_id": "dev-1", "user_id": "dev-user", "status": DiagnosticStatus.COMPLETED},
+                {"id": "foreign", "device_id": "dev-2", "user_id": "other-user", "status": DiagnosticStatus.COMPLETED}
+            ])
+        engine.dispose()
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+
+        async def get_async_db():
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(analytics_endpoints.router, prefix="/api/core/analytics")
+        app.dependency_overrides[analytics_endpoints.get_async_db] = get_async_db
+        client = TestClient(app)
+
+        def query(device_id):
+            return client.post("/api/core/analytics/query", json={
+                "metrics": ["cpu_usage", "memory_usage", "error_rate"], "time_range": "24h", "granularity": "1h",
+                "aggregation": "avg", "filters": {"device_id": device_id}
+            })
+
+        response = query("dev-1")
+        assert response.status_code == 200
+        cpu = response.json()["metrics"]["cpu_usage"]
+        assert cpu["source"] == "telemetry"
+        assert [point["value"] for point in cpu["values"]] == [15.0, 35.0, 55.0]
+        assert cpu["statistics"]["count"] == 6
+        # Métrica do dispositivo sem amostras: série vazia, não simulada
+        memory = response.json()["metrics"]["memory_usage"]
+        assert memory["source"] == "telemetry" and memory["values"] == []
+        assert "source" not in response.json()["metrics"]["error_rate"]
+        assert query("dev-2").status_code == 404
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.predictive_service import PredictiveService
+from app.services.trend_engine import compute_trend, downsample, to_epoch_seconds
+
+
+class TestTrendEngine:
+    """Testes para o cálculo vetorizado de tendências."""
+
+    def setup_method(self):
+        """Cria uma série diária de 10 dias."""
+        base = datetime(2026, 1, 1)
+        self.epoch_seconds = to_epoch_seconds([base + timedelta(days=day) for day in range(10)])
+
+    def test_least_squares_slope_per_day(self):
+        """Testa a inclinação em unidades por dia e a direção da tendência."""
+        values = 50.0 + 2.0 * np.arange(10)
+
+        rising = compute_trend(self.epoch_seconds, values, series_points=0)
+        falling_usage = compute_trend(self.epoch_seconds, values[::-1], inverse=True, series_points=0)
+        flat = compute_trend(self.epoch_seconds, np.full(10, 40.0), series_points=0)
+
+        assert rising["slope"] == pytest.approx(2.0)
+        assert rising["trend"] == "improving"
+        assert falling_usage["slope"] == pytest.approx(-2.0)
+        assert falling_usage["trend"] == "improving"
+        assert flat["trend"] == "stable"
+
+    def test_statistics(self):
+        """Testa média, EWMA, percentis e o tratamento de valores ausentes."""
+        values = np.array([10.0, np.nan, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0, 90.0, 100.0])
+
+        trend = compute_trend(self.epoch_seconds, values, alpha=0.5, series_points=0)
+
+        present = values[~np.isnan(values)]
+        decay = 0.5 ** np.arange(len(present) - 1, -1, -1)
+        assert trend["average"] == pytest.approx(present.mean())
+        assert trend["ewma"] == pytest.approx(np.dot(decay, present) / decay.sum())
+        assert trend["percentiles"]["p50"] == pytest.approx(np.percentile(present, 50))
+        assert (trend["min"], trend["max"], trend["current"]) == (10.0, 100.0, 100.0)
+        assert trend["values"] == []
+
+    def test_missing_series_is_unknown(self):
+        """Testa uma métrica sem nenhum valor."""
+        trend = compute_trend(self.epoch_seconds, np.full(10, np.nan))
+
+        assert trend == {"trend": "unknown", "slope": 0, "current": None, "values": []}
+
+    def test_downsample_averages_contiguous_blocks(self):
+        """Testa a redução da série pela média de blocos."""
+        points = downsample(np.arange(10, dtype=float), np.arange(10, dtype=float) * 10, 4)
+
+        assert points.shape == (4, 2)
+        assert points[:, 1].tolist() == [5.0, 30.0, 55.0, 80.0]
+
+        trend = compute_trend(self.epoch_seconds, np.arange(10, dtype=float), series_points=5)
+        assert len(trend["values"]) == 5
+        assert trend["values"][0] == ("2026-01-01T12:00:00", 0.5)
+
+
+class TestPredictiveServiceTrends:
+    """Testes para a previsão a partir dos diagnósticos brutos."""
+
+    def setup_method(self):
+        """Cria diagnósticos com disco enchendo e saúde caindo."""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__, DiagnosticMetricRollup.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        now = datetime.utcnow()
+        for day in range(20):
+            self.db.add(Diagnostic(
+                device_id="dev-1",
+                status=DiagnosticStatus.COMPLETED,
+                created_at=now - timedelta(days=20 - day),
+                cpu_usage=30.0,
+                memory_usage=None if day % 5 == 0 else 40.0,
+                disk_usage=60.0 + day * 2,
+                overall_health=90.0 - day,
+                disk_status="critical",
+                raw_data={"payload": "x" * 1000}
+            ))
+        self.db.commit()
+        self.db.expunge_all()
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.statements.append(statement)
+
+    def teardown_method(self):
+        """Fecha a sessão."""
+        self.db.close()
+
+    def test_reads_only_metric_columns(self):
+        """Testa que a previsão lê só as colunas das métricas."""
+        result = PredictiveService(self.db).predict_failures("dev-1", series_points=0)
+
+        assert result["diagnostics_analyzed"] == 20
+        assert "raw_data" not in " ".join(self.statements)
+        assert result["trends"]["disk_usage"]["slope"] == pytest.approx(2.0)
+        assert result["trends"]["memory_usage"]["trend"] == "stable"
+        assert result["trends"]["overall_health"]["values"] == []
+        # Saúde em 71 caindo 1 ponto por dia: limite crítico (40) em ~31 dias
+        failure = result["predictions"]["hardware_failure"]
+        assert failure["message"].startswith("Possível falha de hardware em aproximadamente 3")
+        assert failure["affected_components"] == ["disk"]
+        assert result["trends"]["disk_usage"]["trend"] == "degrading"
+        assert "disk_full" in result["predictions"]
+
+    def test_downsampled_series(self):
+        """Testa a série reduzida no resultado."""
+        result = PredictiveService(self.db).predict_failures("dev-1", series_points=4)
+
+        assert len(result["trends"]["cpu_usage"]["values"]) == 4
+        assert len(result["trends"]["memory_usage"]["values"]) == 4
@@ -0,0 +1,225 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.core.ai import endpoints
+from app.db.base import Base
+from app.models.device_trend_state import DeviceTrendState
+from app.models.diagnostic import Diagnostic, DiagnosticStatus
+from app.models.metric_rollup import DiagnosticMetricRollup
+from app.models.raw_data_blob import RawDataBlob, RawDataBlobRef
+from app.models.system_info import SystemInfo
+from app.services.diagnostic_service import DiagnosticService
+from app.services.predictive_service import PredictiveService
+from app.services.trend_engine import compute_trend, to_epoch_seconds
+from app.services.trend_state_service import MetricTrendState, TrendStateService
+
+
+class TestMetricTrendState:
+    """Testes para as estatísticas incrementais de uma métrica."""
+
+    def setup_method(self):
+        """Cria uma série horária com ruído."""
+        rng = np.random.default_rng(7)
+        self.base = datetime(2026, 1, 1)
+        self.timestamps = [self.base + timedelta(hours=6 * i) for i in range(100)]
+        self.epoch_seconds = to_epoch_seconds(self.timestamps)
+        self.values = 40.0 + 0.5 * np.arange(100) / 4 + rng.normal(0, 2, 100)
+
+    def _state(self, capacity=30, alpha=0.3):
+        state = MetricTrendState()
+        for timestamp, value in zip(self.epoch_seconds.tolist(), self.values.tolist()):
+            state.update(timestamp, value, capacity, alpha)
+        return state
+
+    def test_welford_matches_numpy(self):
+        """Testa média, desvio padrão, mínimo e máximo de toda a história."""
+        trend = self._state().trend()
+
+        assert trend["mean"] == pytest.approx(self.values.mean())
+        assert trend["std"] == pytest.approx(self.values.std(ddof=1))
+        assert (trend["min"], trend["max"]) == (self.values.min(), self.values.max())
+        assert trend["samples"] == 100
+
+    def test_window_regression_matches_compute_trend(self):
+        """Testa que a janela reproduz ``compute_trend`` sobre os últimos N pontos."""
+        trend = self._state(capacity=30).trend(inverse=True)
+        expected = compute_trend(self.epoch_seconds[-30:], self.values[-30:], inverse=True, series_points=0)
+
+        assert trend["slope"] == pytest.approx(expected["slope"])
+        assert trend["average"] == pytest.approx(expected["average"])
+        assert trend["trend"] == expected["trend"] == "degrading"
+        assert trend["current"] == self.values[-1]
+        assert len(trend["values"]) == 30
+        assert trend["values"][-1] == (self.timestamps[-1].isoformat(), self.values[-1])
+
+    def test_ewma(self):
+        """Testa a EWMA recursiva."""
+        ewma = self.values[0]
+        for value in self.values[1:]:
+            ewma = 0.3 * value + 0.7 * ewma
+
+        assert self._state().trend()["ewma"] == pytest.approx(ewma)
+
+    def test_out_of_order_sample_only_updates_history(self):
+        """Testa que uma medição atrasada não altera a janela."""
+        state = self._state(capacity=10)
+        window = state.window()
+
+        state.update(self.epoch_seconds[0] - 3600, 1000.0, 10, 0.3)
+
+        assert state.window() == window
+        assert state.trend()["max"] == 1000.0
+        assert state.count == 101
+
+    def test_capacity_change_keeps_latest_points(self):
+        """Testa a mudança do tamanho da janela."""
+        state = self._state(capacity=30)
+        state.update(self.epoch_seconds[-1] + 3600, 50.0, 10, 0.3)
+
+        points = state.window()
+        assert len(points) == 10
+        assert points[-1][1] == 50.0
+        assert points[0][1] == pytest.approx(self.values[-9])
+
+    def test_serialization_round_trip(self):
+        """Testa a conversão para o JSON do modelo e de volta."""
+        from dataclasses import asdict
+
+        state = self._state()
+        restored = MetricTrendState(**asdict(state))
+
+        assert restored.trend() == state.trend()
+
+
+class TestTrendStateService:
+    """Testes para o estado das tendências no banco."""
+
+    def setup_method(self):
+        """Cria um banco SQLite em arquivo (compartilhado com o engine assíncrono da API)."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "trend.db")
+        self.engine = create_engine(f"sqlite:///{self.db_path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine, tables=[
+            SystemInfo.__table__, Diagnostic.__table__, RawDataBlob.__table__, RawDataBlobRef.__table__,
+            DiagnosticMetricRollup.__table__, DeviceTrendState.__table__
+        ])
+        self.db = sessionmaker(bind=self.engine, autoflush=False)()
+        self.now = datetime.utcnow()
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.statements.append(statement)
+
+    def teardown_method(self):
+        """Fecha a sessão e remove o banco."""
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _diagnostic(self, day, device_id="dev-1", status=DiagnosticStatus.COMPLETED):
+        return {
+            "device_id": device_id,
+            "status": status,
+            "created_at": self.now - timedelta(days=20 - day),
+            "cpu_usage": 30.0,
+            "memory_usage": 40.0,
+            "disk_usage": 60.0 + 2 * day,
+            "overall_health": 90.0 - day
+        }
+
+    def test_record_in_batches(self):
+        """Testa lotes sucessivos e o filtro de diagnósticos não concluídos."""
+        service = TrendStateService(self.db, window=30)
+        assert service.record([self._diagnostic(day) for day in range(10)]) == 1
+        service.record([self._diagnostic(day) for day in range(10, 20)]
+                       + [self._diagnostic(20, status=DiagnosticStatus.FAILED)])
+        self.db.commit()
+
+        state = service.current_trends("dev-1")
+        assert state["samples"] == 20
+        assert state["trends"]["disk_usage"]["slope"] == pytest.approx(2.0)
+        assert state["trends"]["disk_usage"]["trend"] == "degrading"
+        assert state["trends"]["cpu_usage"]["trend"] == "stable"
+        assert service.current_trends("dev-missing") is None
+
+    def test_run_diagnostic_updates_state(self):
+        """Testa o gancho na conclusão de ``run_diagnostic``."""
+        diagnostic = Diagnostic(device_id="dev-1", user_id="user-1", status=DiagnosticStatus.PENDING)
+        self.db.add(diagnostic)
+        self.db.commit()
+        service = DiagnosticService(self.db)
+        service._run_analyzers = lambda concurrent=None: {
+            "cpu": {"status": "healthy", "usage": 30.5},
+            "memory": {"status": "warning", "usage": 85.0},
+            "disk": {"status": "healthy", "usage": 50.0},
+            "network": {"status": "healthy"}
+        }
+
+        service.run_diagnostic(diagnostic.id, unit_of_work=True, checkpoint=False)
+
+        row = self.db.query(DeviceTrendState).filter_by(device_id="dev-1").one()
+        assert row.samples == 1
+        assert row.metrics["memory_usage"]["last_value"] == 85.0
+
+    def test_current_trend_does_not_scan_history(self):
+        """Testa que a tendência atual é respondida sem ler a tabela de diagnósticos."""
+        rows = [self._diagnostic(day) for day in range(20)]
+        self.db.add_all(Diagnostic(**row) for row in rows)
+        TrendStateService(self.db).record(rows)
+        self.db.commit()
+        self.statements.clear()
+
+        result = PredictiveService(self.db).get_current_trend("dev-1")
+
+        assert result["source"] == "state"
+        assert "FROM diagnostic " not in " ".join(self.statements)
+        history = PredictiveService(self.db).predict_failures("dev-1", series_points=0)
+        assert result["risk_level"] == history["risk_level"]
+        assert result["trends"]["disk_usage"]["slope"] == pytest.approx(history["trends"]["disk_usage"]["slope"])
+
+    def test_current_trend_falls_back_to_history(self):
+        """Testa o cálculo a partir do histórico quando não há estado."""
+        self.db.add_all(Diagnostic(**self._diagnostic(day)) for day in range(5))
+        self.db.commit()
+
+        result = PredictiveService(self.db).get_current_trend("dev-1")
+
+        assert result["source"] == "history"
+        assert result["diagnostics_analyzed"] == 5
+
+    def test_endpoint(self):
+        """Testa a consulta pela API de IA."""
+        rows = [self._diagnostic(day) for day in range(20)]
+        foreign = [self._diagnostic(day, device_id="dev-2") for day in range(20)]
+        TrendStateService(self.db).record(rows + foreign)
+        # A posse do dispositivo vem dos diagnósticos do usuário
+        self.db.add(Diagnostic(**rows[-1], user_id="dev-user"))
+        self.db.add(Diagnostic(**foreign[-1], user_id="other-user"))
+        self.db.commit()
+        app = FastAPI()
+        app.include_router(endpoints.router, prefix="/api/core/ai")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", poolclass=NullPool)
+
+        async def get_async_db():
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                yield db
+
+        app.dependency_overrides[endpoints.get_async_db] = get_async_db
+        client = TestClient(app)
+
+        response = client.get("/api/core/ai/devices/dev-1/trend")
+        assert response.status_code == 200
+        assert response.json()["trends"]["overall_health"]["trend"] == "degrading"
+        assert client.get("/api/core/ai/devices/dev-2/trend").status_code == 404
+        assert client.get("/api/core/ai/devices/dev-unknown/trend").status_code == 404